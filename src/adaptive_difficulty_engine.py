@@ -3,14 +3,14 @@ Adaptive Difficulty Engine for NeuroPulse
 Dynamically adjusts content difficulty based on performance patterns and learning analytics
 """
 
-import json
-import os
 import uuid
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 import math
 import statistics
 
+from record_store import record_store
+
 class AdaptiveDifficultyEngine:
     def __init__(self):
         self.user_performance_file = 'user_performance_profiles.json'
@@ -41,15 +41,15 @@ class AdaptiveDifficultyEngine:
         self.learning_analytics = self._load_json_file(self.learning_analytics_file, {})
     
     def _load_json_file(self, filename: str, default: dict) -> dict:
-        try:
-            with open(filename, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return default
+        return record_store.load_collection(filename, default)
     
-    def _save_json_file(self, filename: str, data: dict):
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+    def _save_json_file(self, filename: str, data: dict, record_id: str = None):
+        if record_id is None:
+            record_store.save_collection(filename, data)
+        elif record_id in data:
+            record_store.save_record(filename, record_id, data[record_id])
+        else:
+            record_store.delete_record(filename, record_id)
     
     def initialize_user_profile(self, user_id: str, subject_category: str) -> dict:
         """Initialize performance profile for new user/subject combination"""
@@ -78,41 +78,42 @@ class AdaptiveDifficultyEngine:
                 'updated_at': datetime.now().isoformat()
             }
         
-        self._save_json_file(self.user_performance_file, self.user_profiles)
+        self._save_json_file(self.user_performance_file, self.user_profiles, user_id)
         return self.user_profiles[user_id][subject_category]
     
     def record_performance(self, user_id: str, subject_category: str, performance_data: dict) -> dict:
         """Record performance data and trigger adaptation analysis"""
-        profile = self.initialize_user_profile(user_id, subject_category)
-        
-        # Create performance record
-        performance_record = {
-            'timestamp': datetime.now().isoformat(),
-            'question_id': performance_data.get('question_id'),
-            'difficulty_level': performance_data.get('difficulty_level', profile['current_difficulty']),
-            'response_time': performance_data.get('response_time', 0),
-            'accuracy': performance_data.get('accuracy', 0),
-            'confidence_level': performance_data.get('confidence_level', 3),  # 1-5 scale
-            'hint_usage': performance_data.get('hint_usage', 0),
-            'attempt_count': performance_data.get('attempt_count', 1),
-            'topic': performance_data.get('topic', ''),
-            'question_type': performance_data.get('question_type', 'multiple_choice')
-        }
-        
-        # Add to performance history
-        profile['performance_history'].append(performance_record)
-        
-        # Update session analytics
-        self._update_session_analytics(profile, performance_record)
-        
-        # Analyze performance patterns and adapt difficulty
-        adaptation_result = self._analyze_and_adapt(user_id, subject_category, profile)
-        
-        # Update learning patterns
-        self._update_learning_patterns(profile)
-        
-        profile['updated_at'] = datetime.now().isoformat()
-        self._save_json_file(self.user_performance_file, self.user_profiles)
+        self.user_profiles.setdefault(user_id, {})
+        with record_store.editing(self.user_performance_file, self.user_profiles, user_id):
+            profile = self.initialize_user_profile(user_id, subject_category)
+            
+            # Create performance record
+            performance_record = {
+                'timestamp': datetime.now().isoformat(),
+                'question_id': performance_data.get('question_id'),
+                'difficulty_level': performance_data.get('difficulty_level', profile['current_difficulty']),
+                'response_time': performance_data.get('response_time', 0),
+                'accuracy': performance_data.get('accuracy', 0),
+                'confidence_level': performance_data.get('confidence_level', 3),  # 1-5 scale
+                'hint_usage': performance_data.get('hint_usage', 0),
+                'attempt_count': performance_data.get('attempt_count', 1),
+                'topic': performance_data.get('topic', ''),
+                'question_type': performance_data.get('question_type', 'multiple_choice')
+            }
+            
+            # Add to performance history
+            profile['performance_history'].append(performance_record)
+            
+            # Update session analytics
+            self._update_session_analytics(profile, performance_record)
+            
+            # Analyze performance patterns and adapt difficulty
+            adaptation_result = self._analyze_and_adapt(user_id, subject_category, profile)
+            
+            # Update learning patterns
+            self._update_learning_patterns(profile)
+            
+            profile['updated_at'] = datetime.now().isoformat()
         
         return {
             'performance_recorded': True,
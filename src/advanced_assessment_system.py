@@ -11,6 +11,8 @@ from typing import Dict, List, Optional
 from enum import Enum
 from openai import OpenAI
 
+from record_store import record_store
+
 class AssessmentType(Enum):
     FORMATIVE = "formative"
     SUMMATIVE = "summative" 
@@ -53,17 +55,17 @@ class AdvancedAssessmentManager:
         self.digital_badges = self._load_json_file(self.digital_badges_file, {})
     
     def _load_json_file(self, filename: str, default: dict) -> dict:
-        """Load JSON file with fallback to default"""
-        try:
-            with open(filename, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return default
+        """Load a collection from the shared record store with fallback to default"""
+        return record_store.load_collection(filename, default)
     
-    def _save_json_file(self, filename: str, data: dict):
-        """Save data to JSON file"""
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+    def _save_json_file(self, filename: str, data: dict, record_id: str = None):
+        """Persist one record when record_id is given, otherwise only the changed records"""
+        if record_id is None:
+            record_store.save_collection(filename, data)
+        elif record_id in data:
+            record_store.save_record(filename, record_id, data[record_id])
+        else:
+            record_store.delete_record(filename, record_id)
     
     def create_advanced_assessment(self, creator_id: str, assessment_data: dict) -> str:
         """Create advanced assessment with AI-generated questions"""
@@ -109,7 +111,7 @@ class AdvancedAssessmentManager:
         }
         
         self.assessments[assessment_id] = assessment
-        self._save_json_file(self.assessments_file, self.assessments)
+        self._save_json_file(self.assessments_file, self.assessments, assessment_id)
         
         return assessment_id
     
@@ -252,7 +254,7 @@ class AdvancedAssessmentManager:
         }
         
         self.proctoring_sessions[session_id] = proctoring_session
-        self._save_json_file(self.proctoring_sessions_file, self.proctoring_sessions)
+        self._save_json_file(self.proctoring_sessions_file, self.proctoring_sessions, session_id)
         
         return session_id
     
@@ -261,28 +263,25 @@ class AdvancedAssessmentManager:
         if session_id not in self.proctoring_sessions:
             return {'error': 'Session not found'}
         
-        session = self.proctoring_sessions[session_id]
-        
-        # Analyze monitoring data for violations
-        violations = self._analyze_monitoring_data(monitoring_data)
-        
-        if violations:
-            session['monitoring_data']['violations'].extend(violations)
-            session['warnings_issued'] += len(violations)
+        with record_store.editing(self.proctoring_sessions_file, self.proctoring_sessions, session_id) as session:
+            # Analyze monitoring data for violations
+            violations = self._analyze_monitoring_data(monitoring_data)
             
-            # Reduce integrity score based on violations
-            severity_reduction = sum(v['severity_score'] for v in violations)
-            session['integrity_score'] = max(0, session['integrity_score'] - severity_reduction)
-        
-        # Check for session timeout
-        current_time = datetime.now()
-        expected_end = datetime.fromisoformat(session['expected_end'])
-        
-        if current_time > expected_end:
-            session['status'] = 'timed_out'
-            session['ended_at'] = current_time.isoformat()
-        
-        self._save_json_file(self.proctoring_sessions_file, self.proctoring_sessions)
+            if violations:
+                session['monitoring_data']['violations'].extend(violations)
+                session['warnings_issued'] += len(violations)
+                
+                # Reduce integrity score based on violations
+                severity_reduction = sum(v['severity_score'] for v in violations)
+                session['integrity_score'] = max(0, session['integrity_score'] - severity_reduction)
+            
+            # Check for session timeout
+            current_time = datetime.now()
+            expected_end = datetime.fromisoformat(session['expected_end'])
+            
+            if current_time > expected_end:
+                session['status'] = 'timed_out'
+                session['ended_at'] = current_time.isoformat()
         
         return {
             'session_status': session['status'],
@@ -367,7 +366,7 @@ class AdvancedAssessmentManager:
         }
         
         self.certifications[pathway_id] = certification
-        self._save_json_file(self.certifications_file, self.certifications)
+        self._save_json_file(self.certifications_file, self.certifications, pathway_id)
         
         return pathway_id
     
@@ -376,31 +375,29 @@ class AdvancedAssessmentManager:
         if pathway_id not in self.certifications:
             return False
         
-        certification = self.certifications[pathway_id]
-        
-        # Check prerequisites
-        if not self._check_certification_prerequisites(user_id, certification['prerequisites']):
-            return False
-        
-        enrollment_id = str(uuid.uuid4())
-        
-        certification['enrollments'][user_id] = {
-            'enrollment_id': enrollment_id,
-            'user_id': user_id,
-            'enrolled_at': datetime.now().isoformat(),
-            'status': CertificationStatus.IN_PROGRESS.value,
-            'progress': {
-                'completed_assessments': [],
-                'completed_projects': [],
-                'current_competency_scores': {},
-                'overall_progress_percentage': 0
-            },
-            'expected_completion': (datetime.now() + timedelta(weeks=certification['duration_weeks'])).isoformat()
-        }
-        
-        certification['completion_statistics']['total_enrolled'] += 1
+        with record_store.editing(self.certifications_file, self.certifications, pathway_id) as certification:
+            # Check prerequisites
+            if not self._check_certification_prerequisites(user_id, certification['prerequisites']):
+                return False
+            
+            enrollment_id = str(uuid.uuid4())
+            
+            certification['enrollments'][user_id] = {
+                'enrollment_id': enrollment_id,
+                'user_id': user_id,
+                'enrolled_at': datetime.now().isoformat(),
+                'status': CertificationStatus.IN_PROGRESS.value,
+                'progress': {
+                    'completed_assessments': [],
+                    'completed_projects': [],
+                    'current_competency_scores': {},
+                    'overall_progress_percentage': 0
+                },
+                'expected_completion': (datetime.now() + timedelta(weeks=certification['duration_weeks'])).isoformat()
+            }
+            
+            certification['completion_statistics']['total_enrolled'] += 1
         
-        self._save_json_file(self.certifications_file, self.certifications)
         return True
     
     def _check_certification_prerequisites(self, user_id: str, prerequisites: List[str]) -> bool:
@@ -456,35 +453,32 @@ class AdvancedAssessmentManager:
                 'progression_history': []
             }
         
-        competency_data = self.competency_maps[competency_id]
-        
-        # Analyze assessment results to determine competency level
-        new_level = self._calculate_competency_level(assessment_results)
-        
-        # Update competency data
-        old_level = competency_data['current_level']
-        competency_data['current_level'] = new_level
-        competency_data['last_assessed'] = datetime.now().isoformat()
-        
-        # Add evidence
-        competency_data['evidence'].append({
-            'type': 'assessment',
-            'assessment_id': assessment_results.get('assessment_id'),
-            'score': assessment_results.get('score', 0),
-            'timestamp': datetime.now().isoformat(),
-            'evidence_strength': assessment_results.get('evidence_strength', 'moderate')
-        })
-        
-        # Track progression
-        if new_level != old_level:
-            competency_data['progression_history'].append({
-                'from_level': old_level,
-                'to_level': new_level,
-                'date': datetime.now().isoformat(),
-                'trigger': 'assessment_completion'
+        with record_store.editing(self.competency_maps_file, self.competency_maps, competency_id) as competency_data:
+            # Analyze assessment results to determine competency level
+            new_level = self._calculate_competency_level(assessment_results)
+            
+            # Update competency data
+            old_level = competency_data['current_level']
+            competency_data['current_level'] = new_level
+            competency_data['last_assessed'] = datetime.now().isoformat()
+            
+            # Add evidence
+            competency_data['evidence'].append({
+                'type': 'assessment',
+                'assessment_id': assessment_results.get('assessment_id'),
+                'score': assessment_results.get('score', 0),
+                'timestamp': datetime.now().isoformat(),
+                'evidence_strength': assessment_results.get('evidence_strength', 'moderate')
             })
-        
-        self._save_json_file(self.competency_maps_file, self.competency_maps)
+            
+            # Track progression
+            if new_level != old_level:
+                competency_data['progression_history'].append({
+                    'from_level': old_level,
+                    'to_level': new_level,
+                    'date': datetime.now().isoformat(),
+                    'trigger': 'assessment_completion'
+                })
         
         return {
             'competency': competency,
@@ -573,7 +567,7 @@ class AdvancedAssessmentManager:
         }
         
         self.digital_badges[badge_id] = badge
-        self._save_json_file(self.digital_badges_file, self.digital_badges)
+        self._save_json_file(self.digital_badges_file, self.digital_badges, badge_id)
         
         return badge_id
     
@@ -3,15 +3,24 @@ Advanced Collaboration Tools for NeuroPulse
 Provides virtual whiteboards, breakout rooms, peer review systems, and real-time document collaboration
 """
 
-import json
-import os
 import uuid
+import zlib
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
+from record_store import record_store
+from whiteboard_oplog import OPERATION_TYPES, WhiteboardCanvas
+from peer_review_matching import assign_reviewers
+from group_formation import complementary_partition, group_count, random_partition, snake_draft
+
+LEARNING_STYLES = ['visual', 'auditory', 'kinesthetic', 'reading_writing']
+
 class AdvancedCollaborationManager:
     def __init__(self):
         self.whiteboards_file = 'virtual_whiteboards.json'
+        self.whiteboard_operations_file = 'whiteboard_operations.json'
+        self.whiteboard_sequences_file = 'whiteboard_sequences.json'  # last sequence issued per whiteboard, by any worker
+        self.whiteboard_snapshot_interval = 200  # operations between canvas snapshots
         self.breakout_rooms_file = 'breakout_rooms_data.json'
         self.peer_reviews_file = 'peer_review_system.json'
         self.collaborative_docs_file = 'collaborative_documents.json'
@@ -26,17 +35,39 @@ class AdvancedCollaborationManager:
         self.peer_reviews = self._load_json_file(self.peer_reviews_file, {})
         self.collaborative_docs = self._load_json_file(self.collaborative_docs_file, {})
         self.analytics = self._load_json_file(self.collaboration_analytics_file, {})
+        self._load_whiteboard_canvases()
+    
+    def _load_whiteboard_canvases(self):
+        """Rebuild live canvases from each whiteboard's snapshot plus the operations logged since"""
+        self.canvases = {}
+        for whiteboard_id, whiteboard in self.whiteboards.items():
+            whiteboard.pop('activity_log', None)  # superseded by the operation log
+            self.canvases[whiteboard_id] = WhiteboardCanvas(whiteboard['canvas_data']['elements'],
+                                                            whiteboard.get('snapshot_sequence', 0))
+        
+        operations = self._load_json_file(self.whiteboard_operations_file, {})
+        stale = []
+        for key in sorted(operations):
+            operation = operations[key]
+            canvas = self.canvases.get(operation['whiteboard_id'])
+            if canvas is None or operation['sequence'] <= canvas.sequence:
+                stale.append(key)  # already folded into a snapshot, or whiteboard gone
+                continue
+            canvas.apply(operation)
+            canvas.record(operation)
+        if stale:
+            record_store.save_records(self.whiteboard_operations_file, {}, deleted=stale)
     
     def _load_json_file(self, filename: str, default: dict) -> dict:
-        try:
-            with open(filename, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return default
+        return record_store.load_collection(filename, default)
     
-    def _save_json_file(self, filename: str, data: dict):
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+    def _save_json_file(self, filename: str, data: dict, record_id: str = None):
+        if record_id is None:
+            record_store.save_collection(filename, data)
+        elif record_id in data:
+            record_store.save_record(filename, record_id, data[record_id])
+        else:
+            record_store.delete_record(filename, record_id)
     
     def create_virtual_whiteboard(self, creator_id: str, session_data: dict) -> str:
         """Create virtual whiteboard for collaborative problem-solving"""
@@ -75,16 +106,21 @@ class AdvancedCollaborationManager:
                 'edit_permissions': 'all_participants'
             },
             'session_state': 'active',
-            'activity_log': []
+            'snapshot_sequence': 0
         }
         
         self.whiteboards[whiteboard_id] = whiteboard
-        self._save_json_file(self.whiteboards_file, self.whiteboards)
+        self.canvases[whiteboard_id] = WhiteboardCanvas([])
+        self._save_json_file(self.whiteboards_file, self.whiteboards, whiteboard_id)
         
         return whiteboard_id
     
     def update_whiteboard_canvas(self, whiteboard_id: str, user_id: str, canvas_update: dict) -> dict:
-        """Update whiteboard canvas with real-time changes"""
+        """Apply one canvas change as a sequence-numbered operation and return it.
+        
+        Pass 'since_sequence' to also receive every operation after that
+        sequence (other participants' changes included) in the response.
+        """
         if whiteboard_id not in self.whiteboards:
             return {'error': 'Whiteboard not found'}
         
@@ -93,8 +129,17 @@ class AdvancedCollaborationManager:
         if user_id not in whiteboard['participants']:
             return {'error': 'User not authorized to edit this whiteboard'}
         
-        # Apply canvas update
         update_type = canvas_update.get('type', 'element_add')
+        if update_type not in OPERATION_TYPES:
+            return {'error': f'Unsupported update type: {update_type}'}
+        
+        timestamp = datetime.now().isoformat()
+        operation = {
+            'whiteboard_id': whiteboard_id,
+            'type': update_type,
+            'author': user_id,
+            'timestamp': timestamp
+        }
         
         if update_type == 'element_add':
             element = {
@@ -102,37 +147,121 @@ class AdvancedCollaborationManager:
                 'type': canvas_update['element_type'],
                 'data': canvas_update['element_data'],
                 'author': user_id,
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': timestamp,
                 'position': canvas_update.get('position', {'x': 0, 'y': 0})
             }
-            whiteboard['canvas_data']['elements'].append(element)
-        
+            operation['element_id'] = element['id']
+            operation['element'] = element
         elif update_type == 'element_update':
-            element_id = canvas_update['element_id']
-            for element in whiteboard['canvas_data']['elements']:
-                if element['id'] == element_id:
-                    element['data'].update(canvas_update['updates'])
-                    element['last_modified'] = datetime.now().isoformat()
-                    break
-        
-        elif update_type == 'element_delete':
-            element_id = canvas_update['element_id']
-            whiteboard['canvas_data']['elements'] = [
-                e for e in whiteboard['canvas_data']['elements'] 
-                if e['id'] != element_id
-            ]
-        
-        # Log activity
-        whiteboard['activity_log'].append({
-            'user_id': user_id,
-            'action': update_type,
-            'timestamp': datetime.now().isoformat(),
-            'details': canvas_update
-        })
-        
-        self._save_json_file(self.whiteboards_file, self.whiteboards)
-        
-        return {'success': True, 'whiteboard_state': whiteboard['canvas_data']}
+            operation['element_id'] = canvas_update['element_id']
+            operation['updates'] = canvas_update['updates']
+        else:
+            operation['element_id'] = canvas_update['element_id']
+        
+        # The sequence is allocated in the shared store, and the operations other workers
+        # logged before it are applied first, so every worker sees the same order
+        with record_store.transaction() as txn:
+            canvas = self.canvases[whiteboard_id]
+            operation['sequence'] = txn.get(self.whiteboard_sequences_file, whiteboard_id, canvas.sequence) + 1
+            canvas = self._catch_up(whiteboard_id, operation['sequence'] - 1, txn.get)
+            if not canvas.apply(operation):
+                return {'error': 'Element not found'}
+            canvas.record(operation)
+            # One small record per change; the full canvas is only written at snapshots
+            txn.put(self.whiteboard_sequences_file, whiteboard_id, operation['sequence'])
+            txn.put(self.whiteboard_operations_file,
+                    self._operation_key(whiteboard_id, operation['sequence']), operation)
+        
+        # The local snapshot sequence only decides whether to try; _snapshot_whiteboard checks the stored one
+        whiteboard = self.whiteboards[whiteboard_id]
+        if operation['sequence'] - whiteboard.get('snapshot_sequence', 0) >= self.whiteboard_snapshot_interval:
+            self._snapshot_whiteboard(whiteboard_id)
+        
+        result = {'success': True, 'sequence': canvas.sequence, 'operation': operation}
+        if canvas_update.get('since_sequence') is not None:
+            result.update(self.get_whiteboard_changes(whiteboard_id, canvas_update['since_sequence']))
+        return result
+    
+    def get_whiteboard_changes(self, whiteboard_id: str, since_sequence: int = 0) -> dict:
+        """Operations after since_sequence, or the full canvas if the client is too far behind"""
+        if whiteboard_id not in self.whiteboards:
+            return {'error': 'Whiteboard not found'}
+        
+        canvas = self._sync_canvas(whiteboard_id)
+        operations = canvas.changes_since(since_sequence)
+        if operations is None:
+            return {'sequence': canvas.sequence, 'snapshot': self.get_whiteboard_state(whiteboard_id)}
+        return {'sequence': canvas.sequence, 'operations': operations}
+    
+    def get_whiteboard_state(self, whiteboard_id: str) -> dict:
+        """Current canvas data with every element"""
+        if whiteboard_id not in self.whiteboards:
+            return {}
+        
+        canvas = self._sync_canvas(whiteboard_id)
+        return dict(self.whiteboards[whiteboard_id]['canvas_data'],
+                    elements=canvas.snapshot(), sequence=canvas.sequence)
+    
+    @staticmethod
+    def _operation_key(whiteboard_id: str, sequence: int) -> str:
+        return f"{whiteboard_id}:{sequence:010d}"
+    
+    def _load_stored(self, collection: str, key: str):
+        return record_store.load_records(collection, [key]).get(key)
+    
+    def _sync_canvas(self, whiteboard_id: str) -> WhiteboardCanvas:
+        """The whiteboard's canvas with every operation other workers have logged applied"""
+        sequence = self._load_stored(self.whiteboard_sequences_file, whiteboard_id)
+        if sequence is None:
+            return self.canvases[whiteboard_id]
+        return self._catch_up(whiteboard_id, sequence, self._load_stored)
+    
+    def _catch_up(self, whiteboard_id: str, sequence: int, load) -> WhiteboardCanvas:
+        """Apply logged operations up to `sequence` that this worker has not seen yet.
+        
+        `load(collection, key)` reads the store (inside a transaction when
+        the caller holds one). An operation missing from the log was folded
+        into a newer snapshot by another worker, so the canvas is rebuilt
+        from the stored snapshot and caught up from there.
+        """
+        canvas = self.canvases[whiteboard_id]
+        while canvas.sequence < sequence:
+            operation = load(self.whiteboard_operations_file, self._operation_key(whiteboard_id, canvas.sequence + 1))
+            if operation is not None:
+                canvas.apply(operation)
+                canvas.record(operation)
+                continue
+            stored = load(self.whiteboards_file, whiteboard_id)
+            if stored is None or stored.get('snapshot_sequence', 0) <= canvas.sequence:
+                break  # nothing newer to rebuild from
+            self.whiteboards[whiteboard_id] = stored
+            canvas = self.canvases[whiteboard_id] = WhiteboardCanvas(stored['canvas_data']['elements'],
+                                                                     stored['snapshot_sequence'])
+        return canvas
+    
+    def _snapshot_whiteboard(self, whiteboard_id: str):
+        """Fold logged operations into the stored canvas and drop them from the log.
+        
+        Decided against the stored snapshot under the write lock: when another
+        worker already wrote a snapshot at least as new, nothing is written,
+        and only the operations the written snapshot covers are deleted.
+        """
+        canvas = self.canvases[whiteboard_id]
+        with record_store.transaction() as txn:
+            whiteboard = txn.get(self.whiteboards_file, whiteboard_id)
+            if whiteboard is None:
+                return
+            self.whiteboards[whiteboard_id] = whiteboard
+            stored_sequence = whiteboard.get('snapshot_sequence', 0)
+            if stored_sequence >= canvas.sequence:
+                return
+            
+            whiteboard['canvas_data']['elements'] = canvas.snapshot()
+            whiteboard['snapshot_sequence'] = canvas.sequence
+            txn.put(self.whiteboards_file, whiteboard_id, whiteboard)
+            compacted = range(stored_sequence + 1, canvas.sequence + 1)
+            record_store.save_records(self.whiteboard_operations_file, {},
+                                      deleted=[self._operation_key(whiteboard_id, sequence) for sequence in compacted])
     
     def create_breakout_room(self, host_id: str, room_config: dict) -> str:
         """Create breakout room with dynamic group formation"""
@@ -164,7 +293,7 @@ class AdvancedCollaborationManager:
         }
         
         self.breakout_rooms[room_id] = breakout_room
-        self._save_json_file(self.breakout_rooms_file, self.breakout_rooms)
+        self._save_json_file(self.breakout_rooms_file, self.breakout_rooms, room_id)
         
         return room_id
     
@@ -175,118 +304,96 @@ class AdvancedCollaborationManager:
         
         room = self.breakout_rooms[room_id]
         strategy = room['grouping_strategy']
-        max_per_group = room['max_participants'] // max(1, len(participants) // room['max_participants'])
+        max_per_group = max(1, room['max_participants'])
+        seed = zlib.crc32(room_id.encode())
         
         if strategy == 'balanced_skills':
             groups = self._create_balanced_skill_groups(participants, max_per_group)
         elif strategy == 'complementary_learning':
-            groups = self._create_complementary_learning_groups(participants, max_per_group)
+            groups = self._create_complementary_learning_groups(participants, max_per_group, seed)
         elif strategy == 'random':
-            groups = self._create_random_groups(participants, max_per_group)
+            groups = self._create_random_groups(participants, max_per_group, seed)
         else:
             groups = self._create_manual_groups(participants, max_per_group)
         
         # Update room with formed groups
-        room['groups'] = groups
-        room['participants'] = [p['user_id'] for p in participants]
-        room['status'] = 'groups_formed'
-        
-        self._save_json_file(self.breakout_rooms_file, self.breakout_rooms)
+        with record_store.editing(self.breakout_rooms_file, self.breakout_rooms, room_id) as room:
+            room['groups'] = groups
+            room['participants'] = [p['user_id'] for p in participants]
+            room['status'] = 'groups_formed'
         
         return {'success': True, 'groups': groups, 'grouping_rationale': self._explain_grouping(strategy)}
     
-    def _create_balanced_skill_groups(self, participants: List[dict], max_per_group: int) -> List[dict]:
-        """Create groups with balanced skill levels"""
-        from analytics_dashboard import analytics_manager
-        
-        # Get skill levels for participants
-        participant_skills = []
-        for participant in participants:
-            user_data = analytics_manager.get_user_dashboard_data(participant['user_id'])
-            skill_level = user_data.get('overview', {}).get('overall_accuracy', 75)
-            participant_skills.append({
-                'user_id': participant['user_id'],
-                'skill_level': skill_level,
-                'learning_style': participant.get('learning_style', 'balanced')
-            })
-        
-        # Sort by skill level
-        participant_skills.sort(key=lambda x: x['skill_level'], reverse=True)
-        
-        # Distribute into groups using snake draft method
-        groups = []
-        num_groups = max(1, len(participants) // max_per_group)
-        
-        for i in range(num_groups):
-            groups.append({
+    def _participant_skill(self, participant: dict) -> float:
+        """Skill level supplied with the participant, else their average accuracy"""
+        from analytics_dashboard import analytics_dashboard
+        
+        if participant.get('skill_level') is not None:
+            return participant['skill_level']
+        metrics = analytics_dashboard.user_metrics.get(participant['user_id'], {})
+        return metrics.get('avg_accuracy') or 75
+    
+    @staticmethod
+    def _empty_groups(count: int, task: str, **fields) -> List[dict]:
+        return [
+            dict({
                 'group_id': str(uuid.uuid4()),
                 'group_number': i + 1,
                 'participants': [],
-                'assigned_task': f"Collaborative problem-solving group {i + 1}",
-                'skill_balance': 'mixed'
-            })
-        
-        # Snake draft assignment
-        for i, participant in enumerate(participant_skills):
-            group_index = i % num_groups if (i // num_groups) % 2 == 0 else num_groups - 1 - (i % num_groups)
+                'assigned_task': f"{task} {i + 1}"
+            }, **fields)
+            for i in range(count)
+        ]
+    
+    def _create_balanced_skill_groups(self, participants: List[dict], max_per_group: int) -> List[dict]:
+        """Create groups with balanced skill levels"""
+        participant_skills = [{
+            'user_id': participant['user_id'],
+            'skill_level': self._participant_skill(participant),
+            'learning_style': participant.get('learning_style', 'balanced')
+        } for participant in participants]
+        
+        # Snake draft over participants sorted by skill
+        groups = self._empty_groups(group_count(len(participants), max_per_group),
+                                    'Collaborative problem-solving group', skill_balance='mixed')
+        assignment = snake_draft([p['skill_level'] for p in participant_skills], len(groups))
+        for participant, group_index in sorted(zip(participant_skills, assignment),
+                                               key=lambda item: -item[0]['skill_level']):
             groups[group_index]['participants'].append(participant)
         
         return groups
     
-    def _create_complementary_learning_groups(self, participants: List[dict], max_per_group: int) -> List[dict]:
+    def _create_complementary_learning_groups(self, participants: List[dict], max_per_group: int,
+                                              seed: int = 0) -> List[dict]:
         """Create groups with complementary learning styles"""
-        learning_styles = {'visual': [], 'auditory': [], 'kinesthetic': [], 'reading_writing': []}
-        
+        # Profile vector: one-hot dominant learning style plus skill scaled to [0, 1]
+        styles = []
+        features = []
         for participant in participants:
             style = participant.get('dominant_learning_style', 'balanced')
-            if style in learning_styles:
-                learning_styles[style].append(participant)
-            else:
-                learning_styles['visual'].append(participant)  # Default
-        
-        groups = []
-        num_groups = max(1, len(participants) // max_per_group)
-        
-        for i in range(num_groups):
-            group = {
-                'group_id': str(uuid.uuid4()),
-                'group_number': i + 1,
-                'participants': [],
-                'learning_style_mix': [],
-                'assigned_task': f"Multi-perspective analysis group {i + 1}"
-            }
-            
-            # Add one from each learning style if available
-            for style, style_participants in learning_styles.items():
-                if style_participants and len(group['participants']) < max_per_group:
-                    participant = style_participants.pop(0)
-                    group['participants'].append(participant)
-                    group['learning_style_mix'].append(style)
-            
-            groups.append(group)
+            style = style if style in LEARNING_STYLES else 'visual'  # Default
+            styles.append(style)
+            skill = participant.get('skill_level')
+            features.append([1.0 if style == s else 0.0 for s in LEARNING_STYLES]
+                            + [(skill if skill is not None else 75) / 100])
+        
+        groups = self._empty_groups(group_count(len(participants), max_per_group),
+                                    'Multi-perspective analysis group', learning_style_mix=[])
+        for participant, style, group_index in zip(participants, styles,
+                                                   complementary_partition(features, len(groups), seed)):
+            group = groups[group_index]
+            group['participants'].append(participant)
+            if style not in group['learning_style_mix']:
+                group['learning_style_mix'].append(style)
         
         return groups
     
-    def _create_random_groups(self, participants: List[dict], max_per_group: int) -> List[dict]:
+    def _create_random_groups(self, participants: List[dict], max_per_group: int, seed: int = 0) -> List[dict]:
         """Create random groups"""
-        import random
-        shuffled = participants.copy()
-        random.shuffle(shuffled)
-        
-        groups = []
-        num_groups = max(1, len(participants) // max_per_group)
-        
-        for i in range(num_groups):
-            start_idx = i * max_per_group
-            end_idx = min((i + 1) * max_per_group, len(shuffled))
-            
-            groups.append({
-                'group_id': str(uuid.uuid4()),
-                'group_number': i + 1,
-                'participants': shuffled[start_idx:end_idx],
-                'assigned_task': f"Collaborative exploration group {i + 1}",
-                'formation_method': 'random'
-            })
+        groups = self._empty_groups(group_count(len(participants), max_per_group),
+                                    'Collaborative exploration group', formation_method='random')
+        for participant, group_index in zip(participants, random_partition(len(participants), len(groups), seed)):
+            groups[group_index]['participants'].append(participant)
         
         return groups
     
@@ -335,7 +442,7 @@ class AdvancedCollaborationManager:
         }
         
         self.peer_reviews[review_id] = peer_review
-        self._save_json_file(self.peer_reviews_file, self.peer_reviews)
+        self._save_json_file(self.peer_reviews_file, self.peer_reviews, review_id)
         
         return review_id
     
@@ -344,27 +451,25 @@ class AdvancedCollaborationManager:
         if review_id not in self.peer_reviews:
             return {'error': 'Peer review assignment not found'}
         
-        review = self.peer_reviews[review_id]
-        
-        if review['status'] != 'open_for_submissions':
-            return {'error': 'Submission period has ended'}
-        
-        submission_id = str(uuid.uuid4())
-        
-        submission = {
-            'submission_id': submission_id,
-            'author_id': user_id,
-            'submitted_at': datetime.now().isoformat(),
-            'content': submission_data['content'],
-            'file_attachments': submission_data.get('attachments', []),
-            'metadata': submission_data.get('metadata', {}),
-            'quality_indicators': self._analyze_submission_quality(submission_data['content']),
-            'review_status': 'pending_reviews',
-            'received_reviews': []
-        }
-        
-        review['submissions'][user_id] = submission
-        self._save_json_file(self.peer_reviews_file, self.peer_reviews)
+        with record_store.editing(self.peer_reviews_file, self.peer_reviews, review_id) as review:
+            if review['status'] != 'open_for_submissions':
+                return {'error': 'Submission period has ended'}
+            
+            submission_id = str(uuid.uuid4())
+            
+            submission = {
+                'submission_id': submission_id,
+                'author_id': user_id,
+                'submitted_at': datetime.now().isoformat(),
+                'content': submission_data['content'],
+                'file_attachments': submission_data.get('attachments', []),
+                'metadata': submission_data.get('metadata', {}),
+                'quality_indicators': self._analyze_submission_quality(submission_data['content']),
+                'review_status': 'pending_reviews',
+                'received_reviews': []
+            }
+            
+            review['submissions'][user_id] = submission
         
         return {'success': True, 'submission_id': submission_id}
     
@@ -383,41 +488,36 @@ class AdvancedCollaborationManager:
         if review_id not in self.peer_reviews:
             return {'error': 'Peer review assignment not found'}
         
-        review = self.peer_reviews[review_id]
-        submissions = list(review['submissions'].values())
-        
-        if len(submissions) < 2:
-            return {'error': 'Insufficient submissions for peer review'}
-        
-        assignments = self._generate_review_assignments(submissions, review)
-        
-        review['review_assignments'] = assignments
-        review['status'] = 'reviews_assigned'
-        
-        self._save_json_file(self.peer_reviews_file, self.peer_reviews)
+        with record_store.editing(self.peer_reviews_file, self.peer_reviews, review_id) as review:
+            submissions = list(review['submissions'].values())
+            
+            if len(submissions) < 2:
+                return {'error': 'Insufficient submissions for peer review'}
+            
+            assignments = self._generate_review_assignments(submissions, review)
+            
+            review['review_assignments'] = assignments
+            review['status'] = 'reviews_assigned'
         
         return {'success': True, 'assignments': assignments}
     
     def _generate_review_assignments(self, submissions: List[dict], review_config: dict) -> dict:
-        """Generate optimal peer review assignments"""
+        """Generate load-balanced peer review assignments from reviewer match scores"""
         assignments = {}
-        reviews_per_submission = review_config['reviews_per_submission']
         
-        # Create assignment matrix ensuring each submission gets reviewed
-        for submission in submissions:
+        # Each author reviews other submissions; matched on complexity and structure of their own work
+        reviewer_indexes = assign_reviewers(
+            [s['quality_indicators']['complexity_score'] for s in submissions],
+            [s['quality_indicators']['structure_score'] for s in submissions],
+            review_config['reviews_per_submission'],
+            seed=zlib.crc32(review_config['id'].encode()),
+            authors=[s['author_id'] for s in submissions]
+        )
+        
+        for submission, reviewers in zip(submissions, reviewer_indexes):
             author_id = submission['author_id']
-            
-            # Find best reviewers for this submission
-            potential_reviewers = [s for s in submissions if s['author_id'] != author_id]
-            
-            # Sort by quality match and diversity
-            potential_reviewers.sort(key=lambda x: self._calculate_reviewer_match_score(submission, x))
-            
-            # Assign top reviewers
-            selected_reviewers = potential_reviewers[:reviews_per_submission]
-            
-            for reviewer_submission in selected_reviewers:
-                reviewer_id = reviewer_submission['author_id']
+            for reviewer_index in reviewers:
+                reviewer_id = submissions[reviewer_index]['author_id']
                 
                 if reviewer_id not in assignments:
                     assignments[reviewer_id] = []
@@ -432,22 +532,6 @@ class AdvancedCollaborationManager:
         
         return assignments
     
-    def _calculate_reviewer_match_score(self, submission: dict, potential_reviewer: dict) -> float:
-        """Calculate how well a reviewer matches a submission for quality review"""
-        sub_quality = submission['quality_indicators']
-        rev_quality = potential_reviewer['quality_indicators']
-        
-        # Similar complexity for meaningful reviews
-        complexity_diff = abs(sub_quality['complexity_score'] - rev_quality['complexity_score'])
-        
-        # Different structure for diverse perspectives
-        structure_diff = abs(sub_quality['structure_score'] - rev_quality['structure_score'])
-        
-        # Balance similarity and diversity
-        match_score = (10 - complexity_diff) + (structure_diff * 0.5)
-        
-        return match_score
-    
     def create_collaborative_document(self, creator_id: str, doc_config: dict) -> str:
         """Create real-time collaborative document"""
         doc_id = str(uuid.uuid4())
@@ -481,7 +565,7 @@ class AdvancedCollaborationManager:
         }
         
         self.collaborative_docs[doc_id] = document
-        self._save_json_file(self.collaborative_docs_file, self.collaborative_docs)
+        self._save_json_file(self.collaborative_docs_file, self.collaborative_docs, doc_id)
         
         return doc_id
     
@@ -549,7 +633,7 @@ class AdvancedCollaborationManager:
     def _analyze_whiteboard_tools(self, whiteboards: List[dict]) -> dict:
         tool_usage = {}
         for wb in whiteboards:
-            for element in wb['canvas_data']['elements']:
+            for element in self.canvases[wb['id']].elements.values():
                 tool_type = element['type']
                 tool_usage[tool_type] = tool_usage.get(tool_type, 0) + 1
         return dict(sorted(tool_usage.items(), key=lambda x: x[1], reverse=True)[:5])
@@ -3,14 +3,15 @@ Advanced Reporting Dashboard for NeuroPulse Enterprise
 Provides executive insights, institutional analytics, and comprehensive reporting
 """
 
-import json
-import os
+import time
 import uuid
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from collections import defaultdict
 import statistics
 
+from record_store import record_store
+
 class ReportingManager:
     def __init__(self):
         self.reports_file = 'executive_reports_data.json'
@@ -18,6 +19,11 @@ class ReportingManager:
         self.benchmarks_file = 'benchmark_data.json'
         self.custom_reports_file = 'custom_reports_data.json'
         
+        # institution_id -> {'data_version', 'computed_at', 'students'}; recomputed when the LMS
+        # data changes or the entry is older than the TTL (recency and engagement drift over time)
+        self._at_risk_cache = {}
+        self.at_risk_cache_ttl = 900  # seconds
+        
         self.load_data()
     
     def load_data(self):
@@ -28,17 +34,17 @@ class ReportingManager:
         self.custom_reports = self._load_json_file(self.custom_reports_file, {})
     
     def _load_json_file(self, filename: str, default: dict) -> dict:
-        """Load JSON file with fallback to default"""
-        try:
-            with open(filename, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return default
+        """Load a collection from the shared record store with fallback to default"""
+        return record_store.load_collection(filename, default)
     
-    def _save_json_file(self, filename: str, data: dict):
-        """Save data to JSON file"""
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+    def _save_json_file(self, filename: str, data: dict, record_id: str = None):
+        """Persist one record when record_id is given, otherwise only the changed records"""
+        if record_id is None:
+            record_store.save_collection(filename, data)
+        elif record_id in data:
+            record_store.save_record(filename, record_id, data[record_id])
+        else:
+            record_store.delete_record(filename, record_id)
     
     def generate_executive_dashboard(self, institution_id: str, time_period: str = '30d') -> dict:
         """Generate comprehensive executive dashboard"""
@@ -97,7 +103,7 @@ class ReportingManager:
         # Save report
         report_id = str(uuid.uuid4())
         self.reports[report_id] = dashboard
-        self._save_json_file(self.reports_file, self.reports)
+        self._save_json_file(self.reports_file, self.reports, report_id)
         
         return dashboard
     
@@ -172,7 +178,7 @@ class ReportingManager:
         
         # Video session participation
         video_participants = set()
-        for session in video_manager.sessions.values():
+        for session in video_manager.all_sessions():
             if start_date <= datetime.fromisoformat(session['created_at']) <= end_date:
                 video_participants.update(session['participants'])
         
@@ -256,7 +262,7 @@ class ReportingManager:
         capacity_utilization = (total_enrolled / total_capacity * 100) if total_capacity > 0 else 0
         
         # Video session utilization
-        video_sessions = [s for s in video_manager.sessions.values() 
+        video_sessions = [s for s in video_manager.all_sessions() 
                          if start_date <= datetime.fromisoformat(s['created_at']) <= end_date]
         
         total_video_capacity = sum(session['max_participants'] for session in video_sessions)
@@ -408,7 +414,7 @@ class ReportingManager:
         }
         
         self.custom_reports[report_id] = custom_report
-        self._save_json_file(self.custom_reports_file, self.custom_reports)
+        self._save_json_file(self.custom_reports_file, self.custom_reports, report_id)
         
         return custom_report
     
@@ -435,29 +441,42 @@ class ReportingManager:
         return round(sum(scores), 2)
     
     def _identify_at_risk_students(self, institution_id: str) -> list:
-        """Identify students at risk of dropping out or failing"""
+        """Identify students at risk of dropping out or failing (cached per institution)"""
         from lms_integration import lms_manager
-        from analytics_dashboard import analytics_manager
         
-        at_risk_students = []
+        cached = self._at_risk_cache.get(institution_id)
+        if (cached and cached['data_version'] == lms_manager.data_version
+                and time.time() - cached['computed_at'] < self.at_risk_cache_ttl):
+            return cached['students']
         
-        # Get all students in institution
-        institution_courses = [c for c in lms_manager.courses.values() 
-                             if c.get('institution_id') == institution_id]
+        at_risk_students = self._score_at_risk_students(institution_id)
+        self._at_risk_cache[institution_id] = {
+            'data_version': lms_manager.data_version,
+            'computed_at': time.time(),
+            'students': at_risk_students
+        }
+        return at_risk_students
+    
+    def _score_at_risk_students(self, institution_id: str) -> list:
+        """Score every active student of an institution from the LMS and analytics indexes"""
+        from lms_integration import lms_manager
+        from analytics_dashboard import analytics_dashboard
         
-        student_ids = set()
-        for course in institution_courses:
-            enrollments = [e for e in lms_manager.enrollments.values() 
-                          if e['course_id'] == course['id'] and e['status'] == 'active']
-            student_ids.update(e['student_id'] for e in enrollments)
+        at_risk_students = []
+        now = datetime.now()
+        submission_cutoff = (now - timedelta(days=14)).isoformat()
+        streak_cutoff = (now.date() - timedelta(days=1)).isoformat()
+        
+        # Students enrolled in the institution's courses, via the course -> enrollments index
+        student_ids = lms_manager.get_institution_student_ids(institution_id)
         
         for student_id in student_ids:
             risk_factors = []
             risk_score = 0
             
             # Check academic performance
-            student_grades = [g['overall_grade'] for g in lms_manager.gradebook.values() 
-                            if g['student_id'] == student_id and g['overall_grade'] is not None]
+            student_grades = [g['overall_grade'] for g in lms_manager.get_student_gradebook_entries(student_id)
+                              if g['overall_grade'] is not None]
             
             if student_grades:
                 avg_grade = statistics.mean(student_grades)
@@ -468,9 +487,9 @@ class ReportingManager:
                     risk_score += 15
             
             # Check engagement patterns
-            if student_id in analytics_manager.user_metrics:
-                metrics = analytics_manager.user_metrics[student_id]
-                engagement_score = metrics['engagement_metrics']['engagement_score']
+            metrics = analytics_dashboard.user_metrics.get(student_id)
+            if metrics is not None:
+                engagement_score = metrics.get('engagement_score', 0)
                 
                 if engagement_score < 40:
                     risk_factors.append("Low platform engagement")
@@ -478,14 +497,13 @@ class ReportingManager:
                 elif engagement_score < 60:
                     risk_score += 10
                 
-                # Check learning streak
-                if metrics['current_streak'] == 0:
+                # Check learning streak: it is broken once the last session is older than yesterday
+                if metrics.get('last_session', '')[:10] < streak_cutoff:
                     risk_factors.append("No recent learning activity")
                     risk_score += 20
             
             # Check assignment submission patterns
-            recent_submissions = self._get_recent_submissions(student_id, days=14)
-            if len(recent_submissions) == 0:
+            if lms_manager.student_last_submission.get(student_id, '') < submission_cutoff:
                 risk_factors.append("No recent assignment submissions")
                 risk_score += 15
             
@@ -521,21 +539,6 @@ class ReportingManager:
         
         return interventions
     
-    def _get_recent_submissions(self, student_id: str, days: int = 14) -> list:
-        """Get student's recent assignment submissions"""
-        from lms_integration import lms_manager
-        
-        cutoff_date = datetime.now() - timedelta(days=days)
-        submissions = []
-        
-        for assignment in lms_manager.assignments.values():
-            for submission in assignment['submissions'].values():
-                if (submission['student_id'] == student_id and 
-                    datetime.fromisoformat(submission['submitted_at']) >= cutoff_date):
-                    submissions.append(submission)
-        
-        return submissions
-    
     # Placeholder methods for complex calculations (would be fully implemented in production)
     def _calculate_retention_rate(self, institution_id: str, start_date: datetime, end_date: datetime) -> float:
         return 82.5  # Placeholder
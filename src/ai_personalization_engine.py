@@ -11,6 +11,8 @@ from typing import Dict, List, Optional
 import statistics
 from openai import OpenAI
 
+from record_store import record_store
+
 class PersonalizationEngine:
     def __init__(self):
         self.personalization_file = 'user_personalization_data.json'
@@ -31,17 +33,17 @@ class PersonalizationEngine:
         self.adaptive_paths = self._load_json_file(self.adaptive_paths_file, {})
     
     def _load_json_file(self, filename: str, default: dict) -> dict:
-        """Load JSON file with fallback to default"""
-        try:
-            with open(filename, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return default
+        """Load a collection from the shared record store with fallback to default"""
+        return record_store.load_collection(filename, default)
     
-    def _save_json_file(self, filename: str, data: dict):
-        """Save data to JSON file"""
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+    def _save_json_file(self, filename: str, data: dict, record_id: str = None):
+        """Persist one record when record_id is given, otherwise only the changed records"""
+        if record_id is None:
+            record_store.save_collection(filename, data)
+        elif record_id in data:
+            record_store.save_record(filename, record_id, data[record_id])
+        else:
+            record_store.delete_record(filename, record_id)
     
     def analyze_learning_style(self, user_id: str, session_data: dict) -> dict:
         """Analyze user's learning style using AI"""
@@ -64,27 +66,30 @@ class PersonalizationEngine:
             learning_style = self._ai_analyze_learning_style(user_analytics, session_data)
         
         # Update user profile
-        if user_id not in self.user_profiles:
-            self.user_profiles[user_id] = {
-                'learning_style': learning_style,
-                'preferences': {},
-                'optimal_conditions': {},
-                'performance_patterns': {},
-                'last_updated': datetime.now().isoformat()
-            }
-        else:
-            # Update with weighted average (new data has 30% weight)
-            current_style = self.user_profiles[user_id]['learning_style']
-            for style_type in learning_style:
-                if style_type != 'confidence':
-                    current_style[style_type] = (current_style[style_type] * 0.7 + 
-                                               learning_style[style_type] * 0.3)
+        with record_store.transaction() as txn:
+            profile = txn.get(self.personalization_file, user_id)
+            if profile is None:
+                profile = {
+                    'learning_style': learning_style,
+                    'preferences': {},
+                    'optimal_conditions': {},
+                    'performance_patterns': {},
+                    'last_updated': datetime.now().isoformat()
+                }
+            else:
+                # Update with weighted average (new data has 30% weight)
+                current_style = profile['learning_style']
+                for style_type in learning_style:
+                    if style_type != 'confidence':
+                        current_style[style_type] = (current_style[style_type] * 0.7 + 
+                                                   learning_style[style_type] * 0.3)
+                
+                current_style['confidence'] = min(1.0, current_style.get('confidence', 0) + 0.1)
+                profile['last_updated'] = datetime.now().isoformat()
             
-            current_style['confidence'] = min(1.0, current_style.get('confidence', 0) + 0.1)
-            self.user_profiles[user_id]['last_updated'] = datetime.now().isoformat()
-        
-        self._save_json_file(self.personalization_file, self.user_profiles)
-        return self.user_profiles[user_id]['learning_style']
+            self.user_profiles[user_id] = profile
+            txn.put(self.personalization_file, user_id, profile)
+        return profile['learning_style']
     
     def _ai_analyze_learning_style(self, user_analytics: dict, session_data: dict) -> dict:
         """Use AI to analyze learning style from user data"""
@@ -220,7 +225,7 @@ class PersonalizationEngine:
             'adaptations': []
         }
         
-        self._save_json_file(self.adaptive_paths_file, self.adaptive_paths)
+        self._save_json_file(self.adaptive_paths_file, self.adaptive_paths, path_id)
         return self.adaptive_paths[path_id]
     
     def _ai_generate_learning_path(self, user_profile: dict, current_level: str, 
@@ -348,25 +353,25 @@ class PersonalizationEngine:
         # Analyze performance and determine adaptations
         adaptations = self._ai_analyze_performance_and_adapt(path, performance_data)
         
-        # Apply adaptations
-        if adaptations.get('difficulty_adjustment'):
-            self._adjust_path_difficulty(path, adaptations['difficulty_adjustment'])
-        
-        if adaptations.get('content_type_adjustment'):
-            self._adjust_content_types(path, adaptations['content_type_adjustment'])
-        
-        if adaptations.get('pacing_adjustment'):
-            self._adjust_pacing(path, adaptations['pacing_adjustment'])
-        
-        # Record the adaptation
-        path['adaptations'].append({
-            'timestamp': datetime.now().isoformat(),
-            'trigger': performance_data,
-            'adaptations_applied': adaptations,
-            'reasoning': adaptations.get('reasoning', 'Performance-based adjustment')
-        })
+        with record_store.editing(self.adaptive_paths_file, self.adaptive_paths, path_id) as path:
+            # Apply adaptations
+            if adaptations.get('difficulty_adjustment'):
+                self._adjust_path_difficulty(path, adaptations['difficulty_adjustment'])
+            
+            if adaptations.get('content_type_adjustment'):
+                self._adjust_content_types(path, adaptations['content_type_adjustment'])
+            
+            if adaptations.get('pacing_adjustment'):
+                self._adjust_pacing(path, adaptations['pacing_adjustment'])
+            
+            # Record the adaptation
+            path['adaptations'].append({
+                'timestamp': datetime.now().isoformat(),
+                'trigger': performance_data,
+                'adaptations_applied': adaptations,
+                'reasoning': adaptations.get('reasoning', 'Performance-based adjustment')
+            })
         
-        self._save_json_file(self.adaptive_paths_file, self.adaptive_paths)
         return path
     
     def _ai_analyze_performance_and_adapt(self, path: dict, performance_data: dict) -> dict:
@@ -486,7 +491,7 @@ class PersonalizationEngine:
             'user_profile_snapshot': user_profile
         }
         
-        self._save_json_file(self.recommendations_file, self.recommendations)
+        self._save_json_file(self.recommendations_file, self.recommendations, user_id)
         return recommendations
     
     def _ai_generate_recommendations(self, user_analytics: dict, social_achievements: dict, user_profile: dict) -> List[dict]:
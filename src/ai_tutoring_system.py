@@ -10,6 +10,8 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from openai import OpenAI
 
+from record_store import record_store
+
 class AITutoringSystem:
     def __init__(self):
         self.tutoring_sessions_file = 'ai_tutoring_sessions.json'
@@ -32,17 +34,17 @@ class AITutoringSystem:
         self.tutor_analytics = self._load_json_file(self.tutor_analytics_file, {})
     
     def _load_json_file(self, filename: str, default: dict) -> dict:
-        """Load JSON file with fallback to default"""
-        try:
-            with open(filename, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return default
+        """Load a collection from the shared record store with fallback to default"""
+        return record_store.load_collection(filename, default)
     
-    def _save_json_file(self, filename: str, data: dict):
-        """Save data to JSON file"""
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+    def _save_json_file(self, filename: str, data: dict, record_id: str = None):
+        """Persist one record when record_id is given, otherwise only the changed records"""
+        if record_id is None:
+            record_store.save_collection(filename, data)
+        elif record_id in data:
+            record_store.save_record(filename, record_id, data[record_id])
+        else:
+            record_store.delete_record(filename, record_id)
     
     def start_tutoring_session(self, user_id: str, subject_category: str, topic: str, 
                              learning_context: dict = None) -> str:
@@ -85,7 +87,7 @@ class AITutoringSystem:
         })
         
         self.tutoring_sessions[session_id] = session
-        self._save_json_file(self.tutoring_sessions_file, self.tutoring_sessions)
+        self._save_json_file(self.tutoring_sessions_file, self.tutoring_sessions, session_id)
         
         return session_id
     
@@ -185,31 +187,30 @@ class AITutoringSystem:
         # Generate appropriate response based on question type
         response = self._generate_tutor_response(question, question_analysis, session)
         
-        # Update conversation history
-        session['conversation_history'].extend([
-            {
-                'timestamp': datetime.now().isoformat(),
-                'role': 'user',
-                'content': question,
-                'message_type': 'question',
-                'analysis': question_analysis
-            },
-            {
-                'timestamp': datetime.now().isoformat(),
-                'role': 'assistant',
-                'content': response['content'],
-                'message_type': response['type'],
-                'concepts_covered': response.get('concepts', []),
-                'follow_up_suggestions': response.get('follow_up', [])
-            }
-        ])
-        
-        # Update session metrics
-        session['session_metrics']['questions_asked'] += 1
-        session['session_metrics']['explanations_given'] += 1
-        session['session_metrics']['concepts_covered'].extend(response.get('concepts', []))
-        
-        self._save_json_file(self.tutoring_sessions_file, self.tutoring_sessions)
+        with record_store.editing(self.tutoring_sessions_file, self.tutoring_sessions, session_id) as session:
+            # Update conversation history
+            session['conversation_history'].extend([
+                {
+                    'timestamp': datetime.now().isoformat(),
+                    'role': 'user',
+                    'content': question,
+                    'message_type': 'question',
+                    'analysis': question_analysis
+                },
+                {
+                    'timestamp': datetime.now().isoformat(),
+                    'role': 'assistant',
+                    'content': response['content'],
+                    'message_type': response['type'],
+                    'concepts_covered': response.get('concepts', []),
+                    'follow_up_suggestions': response.get('follow_up', [])
+                }
+            ])
+            
+            # Update session metrics
+            session['session_metrics']['questions_asked'] += 1
+            session['session_metrics']['explanations_given'] += 1
+            session['session_metrics']['concepts_covered'].extend(response.get('concepts', []))
         
         # Store question for analytics
         self._store_student_question(session['user_id'], question, question_analysis, response)
@@ -389,7 +390,7 @@ class AITutoringSystem:
         }
         
         self.hint_system[hint_id] = hint_record
-        self._save_json_file(self.hint_system_file, self.hint_system)
+        self._save_json_file(self.hint_system_file, self.hint_system, hint_id)
         
         return hint
     
@@ -530,7 +531,7 @@ class AITutoringSystem:
         }
         
         self.essay_gradings[grading_id] = grading_record
-        self._save_json_file(self.essay_grading_file, self.essay_gradings)
+        self._save_json_file(self.essay_grading_file, self.essay_gradings, grading_id)
         
         return grading_record
     
@@ -691,7 +692,7 @@ class AITutoringSystem:
         }
         
         self.student_questions[question_id] = question_record
-        self._save_json_file(self.student_questions_file, self.student_questions)
+        self._save_json_file(self.student_questions_file, self.student_questions, question_id)
     
     def get_tutoring_analytics(self, institution_id: str = None, time_period: str = '30d') -> dict:
         """Generate analytics for AI tutoring system usage"""
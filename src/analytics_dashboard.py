@@ -3,109 +3,243 @@ Advanced Analytics Dashboard for NeuroPulse
 Provides comprehensive learning insights, predictive modeling, and executive reporting
 """
 
-import json
 import math
 import statistics
-from datetime import datetime, timedelta
+import time
+import uuid
+from datetime import date, datetime, timedelta
 from typing import Dict, List, Optional, Tuple, Any
 from collections import defaultdict, Counter
 import logging
 
+from record_store import record_store
+from event_store import ColumnarEventStore, FLOAT, JSON, STRING
+from institutional_aggregates import InstitutionalAggregates
+
 logger = logging.getLogger(__name__)
 
 class AnalyticsDashboard:
     """Advanced analytics engine with predictive learning modeling"""
     
+    EVENT_COLUMNS = {
+        'user_id': STRING,
+        'type': STRING,
+        'session_id': STRING,
+        'subject': STRING,
+        'difficulty': STRING,
+        'questions_answered': FLOAT,
+        'correct_answers': FLOAT,
+        'accuracy': FLOAT,
+        'time_spent': FLOAT,
+        'avg_confidence': FLOAT,
+        'energy_level': FLOAT,
+        'completion_rate': FLOAT,
+        'data': JSON
+    }
+    
+    # Session fields read back from the event store, with the defaults used when one was not recorded
+    SESSION_DEFAULTS = {
+        'subject': None,
+        'difficulty': None,
+        'questions_answered': 0,
+        'correct_answers': 0,
+        'accuracy': 0,
+        'time_spent': 0,
+        'avg_confidence': None,
+        'energy_level': 5,
+        'completion_rate': 100
+    }
+    SESSION_HISTORY_LIMIT = 100
+    
     def __init__(self):
         self.analytics_data = {}
         self.user_metrics = {}
         self.institutional_data = {}
         self.predictive_models = {}
+        self.data_file = 'data/analytics_data.json'
+        self.event_store_directory = 'data/analytics_events'
+        self.aggregate_fold_interval = 60  # seconds
+        self._last_aggregate_fold = time.time()
         self.load_data()
     
     def load_data(self):
         """Load analytics data from storage"""
-        try:
-            with open('data/analytics_data.json', 'r') as f:
-                data = json.load(f)
-                self.analytics_data = data.get('analytics', {})
-                self.user_metrics = data.get('user_metrics', {})
-                self.institutional_data = data.get('institutional', {})
-                self.predictive_models = data.get('models', {})
-        except FileNotFoundError:
-            self.analytics_data = {}
-            self.user_metrics = {}
-            self.institutional_data = {}
-            self.predictive_models = {}
+        self.analytics_data = self._load_section('analytics')
+        self.user_metrics = self._load_section('user_metrics')
+        self.institutional_data = self._load_section('institutional')
+        self.predictive_models = self._load_section('models')
+        self.event_store = ColumnarEventStore(self.event_store_directory, self.EVENT_COLUMNS)
+        if self.analytics_data and self.event_store.is_empty():
+            self._migrate_legacy_events()
+        
+        # Aggregate deltas are written in the same transaction as the user metrics they summarize,
+        # so the stored aggregates plus the stored deltas always match the stored metrics
+        if 'aggregates' in self.institutional_data:
+            self._fold_aggregate_deltas()
+        else:
+            self._rebuild_institutional_aggregates()
+    
+    def _migrate_legacy_events(self):
+        """Move per-user event lists from the legacy analytics section into the event store"""
+        for user_id, user_data in self.analytics_data.items():
+            for event in user_data.get('events', []):
+                epoch = datetime.fromisoformat(event['timestamp']).timestamp()
+                self.event_store.append(self._event_row(user_id, event['type'], event.get('data') or {}), epoch)
+        self.event_store.flush()
+        
+        record_store.save_records(f'{self.data_file}#analytics', {}, deleted=list(self.analytics_data))
+        self.analytics_data = {}
+        logger.info("Migrated legacy analytics events to the columnar event store")
+    
+    def _rebuild_institutional_aggregates(self):
+        """Materialize the institutional views from user metrics and stored sessions"""
+        self.institutional_aggregates = InstitutionalAggregates()
+        self.institutional_data['aggregates'] = self.institutional_aggregates.state
+        
+        for metrics in self.user_metrics.values():
+            for field in ('completion_sum', 'timed_sessions', 'timed_total', 'recent_accuracies',
+                          'subjects_studied', 'last_session', 'session_days'):
+                metrics.pop(field, None)
+        
+        columns = ['user_id', 'subject', 'accuracy', 'time_spent', 'completion_rate']
+        for row in self.event_store.scan(columns, where={'type': 'session_completed'}):
+            metrics = self.user_metrics.get(row['user_id'])
+            if metrics is None:
+                continue
+            session = {key: value for key, value in row.items() if value is not None}
+            self._accumulate_session(metrics, session, datetime.fromtimestamp(row['ts']).isoformat())
+            self.institutional_aggregates.record_session(session.get('subject'), session.get('accuracy', 0))
+        
+        for metrics in self.user_metrics.values():
+            metrics['engagement_score'] = self._calculate_engagement_score(metrics)
+            self.institutional_aggregates.apply(None, self._aggregate_snapshot(metrics))
+        
+        deltas_collection = f'{self.data_file}#aggregate_deltas'
+        with record_store.transaction() as txn:
+            for user_id, metrics in self.user_metrics.items():
+                txn.put(f'{self.data_file}#user_metrics', user_id, metrics)
+            txn.put(f'{self.data_file}#institutional', 'aggregates', self.institutional_aggregates.state)
+            # Any deltas are already counted in the rebuilt aggregates
+            stale = record_store.load_collection(deltas_collection, {})
+            record_store.save_records(deltas_collection, {}, deleted=list(stale))
+    
+    def _fold_aggregate_deltas(self):
+        """Merge every worker's stored aggregate deltas into the stored aggregates and drop them"""
+        self._last_aggregate_fold = time.time()
+        deltas_collection = f'{self.data_file}#aggregate_deltas'
+        with record_store.transaction() as txn:
+            aggregates = InstitutionalAggregates(txn.get(f'{self.data_file}#institutional', 'aggregates'))
+            deltas = record_store.load_collection(deltas_collection, {})
+            if deltas:
+                for delta in deltas.values():
+                    aggregates.merge(delta)
+                txn.put(f'{self.data_file}#institutional', 'aggregates', aggregates.state)
+                record_store.save_records(deltas_collection, {}, deleted=list(deltas))
+        
+        self.institutional_aggregates = aggregates
+        self.institutional_data['aggregates'] = aggregates.state
+    
+    def _refresh_institutional_aggregates(self):
+        """Bring the aggregates up to date with every worker's updates"""
+        self._fold_aggregate_deltas()
     
     def save_data(self):
         """Save analytics data to storage"""
-        import os
-        os.makedirs('data', exist_ok=True)
-        
-        data = {
-            'analytics': self.analytics_data,
-            'user_metrics': self.user_metrics,
-            'institutional': self.institutional_data,
-            'models': self.predictive_models,
-            'last_updated': datetime.now().isoformat()
-        }
-        
-        with open('data/analytics_data.json', 'w') as f:
-            json.dump(data, f, indent=2, default=str)
+        self._save_section('analytics', self.analytics_data)
+        self._save_section('user_metrics', self.user_metrics)
+        self._save_section('institutional', self.institutional_data)
+        self._save_section('models', self.predictive_models)
+    
+    def _load_section(self, section: str) -> dict:
+        """Load one section of the legacy data file as a record store collection"""
+        return record_store.load_collection(f'{self.data_file}#{section}', {}, self.data_file, section)
+    
+    def _save_section(self, section: str, data: dict):
+        """Persist only the changed records of one section"""
+        record_store.save_collection(f'{self.data_file}#{section}', data)
     
     def record_learning_event(self, user_id: str, event_type: str, event_data: Dict):
         """Record a learning event for analytics"""
-        if user_id not in self.analytics_data:
-            self.analytics_data[user_id] = {
-                'events': [],
-                'session_history': [],
-                'performance_trends': [],
-                'engagement_metrics': {}
-            }
+        # Buffered append; the event store writes batches in the background
+        now = time.time()
+        self.event_store.append(self._event_row(user_id, event_type, event_data), now)
+        
+        # Update real-time metrics from the stored copy, so updates made by other workers are
+        # retracted correctly, and write the metrics with a small delta row for the aggregates;
+        # the shared aggregates record is only rewritten when deltas are folded in
+        metrics_collection = f'{self.data_file}#user_metrics'
+        delta = InstitutionalAggregates.delta()
+        with record_store.transaction() as txn:
+            stored_metrics = txn.get(metrics_collection, user_id)
+            if stored_metrics is not None:
+                self.user_metrics[user_id] = stored_metrics
+            
+            self._update_user_metrics(user_id, event_type, event_data, datetime.fromtimestamp(now), delta)
+            
+            txn.put(metrics_collection, user_id, self.user_metrics[user_id])
+            txn.put(f'{self.data_file}#aggregate_deltas', uuid.uuid4().hex, delta.state)
         
-        event = {
-            'timestamp': datetime.now().isoformat(),
+        self.institutional_aggregates.merge(delta.state)
+        if now - self._last_aggregate_fold >= self.aggregate_fold_interval:
+            self._fold_aggregate_deltas()
+    
+    def _event_row(self, user_id: str, event_type: str, event_data: Dict) -> Dict:
+        """Flatten an event into event store columns"""
+        row = {
+            'user_id': user_id,
             'type': event_type,
-            'data': event_data,
             'session_id': event_data.get('session_id'),
-            'subject': event_data.get('subject')
+            'subject': event_data.get('subject'),
+            'data': event_data
         }
         
-        self.analytics_data[user_id]['events'].append(event)
-        
-        # Update session history if it's a session completion
         if event_type == 'session_completed':
-            self._update_session_history(user_id, event_data)
-        
-        # Update real-time metrics
-        self._update_user_metrics(user_id, event_type, event_data)
-        
-        self.save_data()
-    
-    def _update_session_history(self, user_id: str, session_data: Dict):
-        """Update user's session history for trend analysis"""
-        session_record = {
-            'date': datetime.now().isoformat(),
-            'subject': session_data.get('subject'),
-            'difficulty': session_data.get('difficulty'),
-            'questions_answered': session_data.get('questions_answered', 0),
-            'correct_answers': session_data.get('correct_answers', 0),
-            'accuracy': session_data.get('accuracy', 0),
-            'time_spent': session_data.get('time_spent', 0),
-            'confidence_ratings': session_data.get('confidence_ratings', []),
-            'energy_level': session_data.get('energy_level', 5),
-            'completion_rate': session_data.get('completion_rate', 100)
-        }
-        
-        self.analytics_data[user_id]['session_history'].append(session_record)
+            confidence_ratings = event_data.get('confidence_ratings', [])
+            row.update({
+                'difficulty': event_data.get('difficulty'),
+                'questions_answered': event_data.get('questions_answered', 0),
+                'correct_answers': event_data.get('correct_answers', 0),
+                'accuracy': event_data.get('accuracy', 0),
+                'time_spent': event_data.get('time_spent', 0),
+                'avg_confidence': statistics.mean([r.get('confidence', 3) for r in confidence_ratings]) if confidence_ratings else None,
+                'energy_level': event_data.get('energy_level', 5),
+                'completion_rate': event_data.get('completion_rate', 100)
+            })
         
-        # Keep only last 100 sessions for performance
-        if len(self.analytics_data[user_id]['session_history']) > 100:
-            self.analytics_data[user_id]['session_history'] = self.analytics_data[user_id]['session_history'][-100:]
+        return row
     
-    def _update_user_metrics(self, user_id: str, event_type: str, event_data: Dict):
-        """Update real-time user metrics"""
+    def _session_record(self, row: Dict) -> Dict:
+        """Session history record from an event store row"""
+        record = {'date': datetime.fromtimestamp(row['ts']).isoformat()}
+        for field, default in self.SESSION_DEFAULTS.items():
+            if field in row:
+                record[field] = row[field] if row[field] is not None else default
+        return record
+    
+    def _load_session_history(self, user_id: str, fields: List[str] = None) -> List[Dict]:
+        """A user's most recent sessions, oldest first, reading only the requested fields"""
+        # Stored metrics include session days added by other workers
+        metrics = record_store.load_records(f'{self.data_file}#user_metrics', [user_id]).get(user_id)
+        if metrics is not None:
+            self.user_metrics[user_id] = metrics
+        if 'last_session' not in (metrics or {}):
+            return []
+        
+        # The last SESSION_HISTORY_LIMIT sessions fall on the user's last SESSION_HISTORY_LIMIT active days;
+        # metrics saved before session_days existed scan every day
+        rows = self.event_store.scan(
+            fields or list(self.SESSION_DEFAULTS),
+            where={'user_id': user_id, 'type': 'session_completed'},
+            newest_first=True, limit=self.SESSION_HISTORY_LIMIT,
+            days=metrics.get('session_days')
+        )
+        return [self._session_record(row) for row in reversed(rows)]
+    
+    def _update_user_metrics(self, user_id: str, event_type: str, event_data: Dict, event_time: datetime,
+                             aggregates: InstitutionalAggregates):
+        """Update real-time user metrics and record the change to the institutional views in `aggregates`"""
+        previous = self._aggregate_snapshot(self.user_metrics[user_id]) if user_id in self.user_metrics else None
+        
         if user_id not in self.user_metrics:
             self.user_metrics[user_id] = {
                 'total_sessions': 0,
@@ -131,8 +265,64 @@ class AnalyticsDashboard:
             metrics['avg_accuracy'] = self._update_running_average(
                 metrics['avg_accuracy'], current_accuracy, metrics['total_sessions']
             )
+            
+            self._accumulate_session(metrics, event_data, event_time.isoformat())
+            metrics['engagement_score'] = self._calculate_engagement_score(metrics)
+            aggregates.record_session(event_data.get('subject'), current_accuracy)
         
         metrics['last_updated'] = datetime.now().isoformat()
+        
+        aggregates.apply(previous, self._aggregate_snapshot(metrics))
+    
+    def _accumulate_session(self, metrics: Dict, session_data: Dict, session_date: str):
+        """Fold one completed session into the per-user rollups behind the institutional views"""
+        metrics['completion_sum'] = metrics.get('completion_sum', 0) + session_data.get('completion_rate', 100)
+        
+        time_spent = session_data.get('time_spent', 0)
+        if time_spent > 0:
+            metrics['timed_sessions'] = metrics.get('timed_sessions', 0) + 1
+            metrics['timed_total'] = metrics.get('timed_total', 0) + time_spent
+        
+        metrics['recent_accuracies'] = (metrics.get('recent_accuracies', []) + [session_data.get('accuracy', 0)])[-5:]
+        
+        subject = session_data.get('subject')
+        subjects = metrics.setdefault('subjects_studied', [])
+        if subject and subject not in subjects:
+            subjects.append(subject)
+        
+        metrics['last_session'] = session_date
+        
+        # Day partitions holding the sessions a dashboard reads back
+        session_days = metrics.setdefault('session_days', [])
+        if not session_days or session_days[-1] != session_date[:10]:
+            session_days.append(session_date[:10])
+            del session_days[:-self.SESSION_HISTORY_LIMIT]
+    
+    def _calculate_engagement_score(self, metrics: Dict) -> float:
+        """Engagement score (0-100) from session rollups, as in _analyze_engagement_patterns"""
+        sessions = metrics.get('total_sessions', 0)
+        if sessions == 0:
+            return 0
+        
+        avg_completion = metrics.get('completion_sum', 0) / sessions
+        timed_sessions = metrics.get('timed_sessions', 0)
+        avg_session_length = metrics.get('timed_total', 0) / timed_sessions if timed_sessions else 0
+        
+        return (avg_completion * 0.4) + (min(avg_session_length / 15, 1) * 30) + (min(sessions / 20, 1) * 30)
+    
+    def _aggregate_snapshot(self, metrics: Dict) -> Dict:
+        """A user's contribution to the institutional views"""
+        recent_accuracies = metrics.get('recent_accuracies', [])
+        last_session = metrics.get('last_session')
+        return {
+            'sessions': metrics.get('total_sessions', 0),
+            'engagement_score': metrics.get('engagement_score', 0),
+            'accuracy': metrics.get('avg_accuracy', 0),
+            'subjects': list(metrics.get('subjects_studied', [])),
+            'active_day': metrics['last_updated'][:10],
+            'last_session_day': last_session[:10] if last_session else None,
+            'low_accuracy': len(recent_accuracies) >= 5 and statistics.mean(recent_accuracies) < 40
+        }
     
     def _update_running_average(self, current_avg: float, new_value: float, count: int) -> float:
         """Update running average efficiently"""
@@ -140,11 +330,7 @@ class AnalyticsDashboard:
     
     def generate_user_dashboard(self, user_id: str) -> Dict:
         """Generate comprehensive user analytics dashboard"""
-        if user_id not in self.analytics_data:
-            return self._generate_empty_dashboard(user_id)
-        
-        user_data = self.analytics_data[user_id]
-        session_history = user_data.get('session_history', [])
+        session_history = self._load_session_history(user_id)
         
         if not session_history:
             return self._generate_empty_dashboard(user_id)
@@ -278,9 +464,8 @@ class AnalyticsDashboard:
         # Confidence analysis
         confidence_data = []
         for session in session_history:
-            confidence_ratings = session.get('confidence_ratings', [])
-            if confidence_ratings:
-                avg_confidence = statistics.mean([r.get('confidence', 3) for r in confidence_ratings])
+            avg_confidence = session.get('avg_confidence')
+            if avg_confidence is not None:
                 accuracy = session.get('accuracy', 0)
                 confidence_data.append({'confidence': avg_confidence, 'accuracy': accuracy})
         
@@ -594,178 +779,54 @@ class AnalyticsDashboard:
         return recommendations[:5]  # Limit to top 5 recommendations
     
     def generate_institutional_report(self, institution_id: str = None) -> Dict:
-        """Generate comprehensive institutional analytics report"""
-        all_users = list(self.user_metrics.keys())
+        """Generate comprehensive institutional analytics report from the materialized views"""
+        self._refresh_institutional_aggregates()
+        aggregates = self.institutional_aggregates
+        total_users = aggregates.state['users']
         
-        if not all_users:
+        if not total_users:
             return {'error': 'No user data available'}
         
-        # Aggregate metrics
-        total_sessions = sum(metrics.get('total_sessions', 0) for metrics in self.user_metrics.values())
-        total_users = len(all_users)
-        active_users = sum(1 for metrics in self.user_metrics.values() 
-                          if (datetime.now() - datetime.fromisoformat(metrics.get('last_updated', datetime.now().isoformat()))).days <= 7)
-        
-        avg_accuracy = statistics.mean([metrics.get('avg_accuracy', 0) for metrics in self.user_metrics.values() if metrics.get('avg_accuracy', 0) > 0])
-        
-        # Risk analysis
-        at_risk_users = sum(1 for user_id in all_users if self._assess_user_risk(user_id) == 'high')
+        today = datetime.now().date()
+        avg_accuracy = aggregates.avg_accuracy()
         
         return {
             'institution_id': institution_id or 'default',
             'generated_at': datetime.now().isoformat(),
             'overview': {
                 'total_users': total_users,
-                'active_users': active_users,
-                'total_sessions': total_sessions,
+                'active_users': aggregates.active_users(today),
+                'total_sessions': aggregates.state['total_sessions'],
                 'avg_accuracy': round(avg_accuracy, 1) if avg_accuracy else 0,
-                'at_risk_users': at_risk_users
+                'at_risk_users': aggregates.at_risk_users(today)
             },
-            'engagement_metrics': self._calculate_institutional_engagement(),
-            'performance_distribution': self._calculate_performance_distribution(),
-            'subject_popularity': self._calculate_subject_popularity(),
-            'recommendations': self._generate_institutional_recommendations()
+            'engagement_metrics': aggregates.engagement_summary(),
+            'performance_distribution': aggregates.performance_distribution(),
+            'subject_popularity': aggregates.subject_popularity(),
+            'recommendations': self._generate_institutional_recommendations(today)
         }
     
-    def _assess_user_risk(self, user_id: str) -> str:
-        """Assess if user is at risk of dropping out"""
-        if user_id not in self.analytics_data:
-            return 'unknown'
-        
-        session_history = self.analytics_data[user_id].get('session_history', [])
-        if not session_history:
-            return 'high'
-        
-        # Check recent activity
-        last_session = datetime.fromisoformat(session_history[-1]['date'].replace('Z', '+00:00'))
-        days_inactive = (datetime.now() - last_session).days
-        
-        if days_inactive > 14:
-            return 'high'
-        elif days_inactive > 7:
-            return 'medium'
-        
-        # Check performance trend
-        if len(session_history) >= 5:
-            recent_accuracy = statistics.mean([s.get('accuracy', 0) for s in session_history[-5:]])
-            if recent_accuracy < 40:
-                return 'high'
-            elif recent_accuracy < 60:
-                return 'medium'
-        
-        return 'low'
-    
-    def _calculate_institutional_engagement(self) -> Dict:
-        """Calculate institutional engagement metrics"""
-        engagement_scores = []
-        for user_id, metrics in self.user_metrics.items():
-            if user_id in self.analytics_data:
-                session_history = self.analytics_data[user_id].get('session_history', [])
-                engagement = self._analyze_engagement_patterns(user_id, session_history)
-                engagement_scores.append(engagement.get('engagement_score', 0))
-        
-        if not engagement_scores:
-            return {'avg_engagement': 0, 'distribution': {}}
-        
-        avg_engagement = statistics.mean(engagement_scores)
-        
-        # Distribution
-        high_engagement = sum(1 for score in engagement_scores if score >= 70)
-        medium_engagement = sum(1 for score in engagement_scores if 40 <= score < 70)
-        low_engagement = sum(1 for score in engagement_scores if score < 40)
-        
-        return {
-            'avg_engagement': round(avg_engagement, 1),
-            'distribution': {
-                'high': high_engagement,
-                'medium': medium_engagement,
-                'low': low_engagement
-            }
-        }
-    
-    def _calculate_performance_distribution(self) -> Dict:
-        """Calculate performance distribution across users"""
-        accuracies = [metrics.get('avg_accuracy', 0) for metrics in self.user_metrics.values() if metrics.get('avg_accuracy', 0) > 0]
-        
-        if not accuracies:
-            return {'distribution': {}, 'percentiles': {}}
-        
-        # Performance bands
-        excellent = sum(1 for acc in accuracies if acc >= 85)
-        good = sum(1 for acc in accuracies if 70 <= acc < 85)
-        fair = sum(1 for acc in accuracies if 55 <= acc < 70)
-        needs_improvement = sum(1 for acc in accuracies if acc < 55)
-        
-        # Percentiles
-        percentiles = {
-            '25th': round(statistics.quantiles(accuracies, n=4)[0], 1),
-            '50th': round(statistics.median(accuracies), 1),
-            '75th': round(statistics.quantiles(accuracies, n=4)[2], 1),
-            '90th': round(statistics.quantiles(accuracies, n=10)[8], 1)
-        }
-        
-        return {
-            'distribution': {
-                'excellent': excellent,
-                'good': good,
-                'fair': fair,
-                'needs_improvement': needs_improvement
-            },
-            'percentiles': percentiles
-        }
-    
-    def _calculate_subject_popularity(self) -> List[Dict]:
-        """Calculate subject popularity across institution"""
-        subject_stats = defaultdict(lambda: {'users': 0, 'sessions': 0, 'avg_accuracy': []})
-        
-        for user_id, analytics in self.analytics_data.items():
-            session_history = analytics.get('session_history', [])
-            user_subjects = set()
-            
-            for session in session_history:
-                subject = session.get('subject')
-                if subject:
-                    subject_stats[subject]['sessions'] += 1
-                    subject_stats[subject]['avg_accuracy'].append(session.get('accuracy', 0))
-                    user_subjects.add(subject)
-            
-            for subject in user_subjects:
-                subject_stats[subject]['users'] += 1
-        
-        popularity_list = []
-        for subject, stats in subject_stats.items():
-            avg_accuracy = statistics.mean(stats['avg_accuracy']) if stats['avg_accuracy'] else 0
-            popularity_list.append({
-                'subject': subject,
-                'users': stats['users'],
-                'sessions': stats['sessions'],
-                'avg_accuracy': round(avg_accuracy, 1)
-            })
-        
-        popularity_list.sort(key=lambda x: x['sessions'], reverse=True)
-        return popularity_list[:10]  # Top 10 subjects
-    
-    def _generate_institutional_recommendations(self) -> List[str]:
+    def _generate_institutional_recommendations(self, today: date) -> List[str]:
         """Generate recommendations for institutional improvement"""
         recommendations = []
+        aggregates = self.institutional_aggregates
         
         # Analyze overall metrics
-        total_users = len(self.user_metrics)
+        total_users = aggregates.state['users']
         if total_users == 0:
             return ['No users to analyze']
         
-        active_rate = sum(1 for metrics in self.user_metrics.values() 
-                         if (datetime.now() - datetime.fromisoformat(metrics.get('last_updated', datetime.now().isoformat()))).days <= 7) / total_users
+        active_rate = aggregates.active_users(today) / total_users
         
         if active_rate < 0.3:
             recommendations.append('Low user engagement - consider implementing retention strategies')
         
-        at_risk_count = sum(1 for user_id in self.user_metrics.keys() if self._assess_user_risk(user_id) == 'high')
+        at_risk_count = aggregates.at_risk_users(today)
         if at_risk_count > total_users * 0.2:
             recommendations.append('High number of at-risk users - implement early intervention programs')
         
-        avg_accuracy = statistics.mean([metrics.get('avg_accuracy', 0) for metrics in self.user_metrics.values() if metrics.get('avg_accuracy', 0) > 0])
-        if avg_accuracy < 60:
+        avg_accuracy = aggregates.avg_accuracy()
+        if 0 < avg_accuracy < 60:
             recommendations.append('Consider providing additional learning support and resources')
         
         return recommendations
@@ -0,0 +1,253 @@
+"""
+Audit Log Store for NeuroPulse
+Append-only, segment-rotated security audit trail with time-bucketed indexes
+"""
+
+import fcntl
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+HOUR_SECONDS = 3600
+
+
+class AuditLogStore:
+    """Append-only JSON-lines audit log split into size-rotated segments.
+
+    Each worker process appends to its own segment so concurrent writers
+    never interleave lines. Two in-memory indexes are kept current on append:
+    a per-user, per-hour bucket of recent events and per-hour event-type
+    counters, so window queries only touch the buckets they cover. Before
+    answering a query the indexes pick up the lines other workers appended
+    to their segments, so every worker sees the whole log.
+    """
+
+    def __init__(self, directory: str = 'data/audit_logs', segment_max_bytes: int = 8 * 1024 * 1024,
+                 user_index_hours: int = 24, counter_retention_hours: int = 24 * 30,
+                 refresh_interval: float = 1.0):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.user_index_hours = user_index_hours
+        self.counter_retention_hours = counter_retention_hours
+        self.refresh_interval = refresh_interval  # seconds between scans for other workers' lines
+
+        self._lock = threading.Lock()
+        self._segment_path = None
+        self._segment_size = 0
+        self._segment_pid = None
+        self._user_hour_index = defaultdict(dict)  # user_id -> {hour_bucket: [log, ...]}
+        self._hourly_counts = {}  # hour_bucket -> Counter
+        self._last_pruned_hour = None
+        self._offsets = {}  # segment path -> bytes already indexed
+        self._last_refresh = 0.0
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._rebuild_indexes()
+
+    def _segment_files(self) -> List[str]:
+        names = [name for name in os.listdir(self.directory)
+                 if name.startswith('segment-') and name.endswith('.jsonl')]
+        return [os.path.join(self.directory, name) for name in sorted(names)]
+
+    def _open_new_segment(self):
+        pid = os.getpid()
+        self._segment_path = os.path.join(
+            self.directory, f"segment-{int(time.time() * 1000):015d}-{pid}.jsonl"
+        )
+        self._segment_size = 0
+        self._segment_pid = pid
+
+    @staticmethod
+    def _event_epoch(log: dict) -> float:
+        try:
+            return datetime.fromisoformat(log['timestamp']).timestamp()
+        except (KeyError, TypeError, ValueError):
+            return time.time()
+
+    def _index(self, log: dict, epoch: float):
+        hour = int(epoch // HOUR_SECONDS)
+
+        user_buckets = self._user_hour_index[log.get('user_id')]
+        user_buckets.setdefault(hour, []).append(log)
+
+        counts = self._hourly_counts.setdefault(hour, Counter())
+        counts['total_events'] += 1
+        counts[log.get('event_type')] += 1
+        if not log.get('success', True):
+            counts[f"failed_{log.get('event_type')}"] += 1
+
+        if hour != self._last_pruned_hour:
+            self._prune(hour)
+
+    def _prune(self, current_hour: int):
+        """Drop index buckets that fell out of their retention windows"""
+        user_cutoff = current_hour - self.user_index_hours
+        for user_id in list(self._user_hour_index):
+            buckets = self._user_hour_index[user_id]
+            for hour in [h for h in buckets if h < user_cutoff]:
+                del buckets[hour]
+            if not buckets:
+                del self._user_hour_index[user_id]
+
+        counter_cutoff = current_hour - self.counter_retention_hours
+        for hour in [h for h in self._hourly_counts if h < counter_cutoff]:
+            del self._hourly_counts[hour]
+
+        self._last_pruned_hour = current_hour
+
+    def _oldest_indexed(self) -> float:
+        return time.time() - max(self.user_index_hours, self.counter_retention_hours) * HOUR_SECONDS
+
+    def _read_new_lines(self, path: str, oldest: float):
+        """Index the complete lines appended to a segment since it was last read"""
+        offset = self._offsets.get(path, 0)
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        # A line another worker is still writing has no newline yet and is read next time
+        end = data.rfind(b'\n') + 1
+        self._offsets[path] = offset + end
+        for line in data[:end].splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                log = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn line from a crashed writer
+            epoch = self._event_epoch(log)
+            if epoch >= oldest:
+                self._index(log, epoch)
+
+    def _rebuild_indexes(self):
+        """Replay segments that can still hold events inside the retention windows"""
+        oldest = self._oldest_indexed()
+        for path in self._segment_files():
+            if os.path.getmtime(path) < oldest:
+                self._offsets[path] = os.path.getsize(path)
+                continue
+            self._read_new_lines(path, oldest)
+        self._prune(int(time.time() // HOUR_SECONDS))
+        self._last_refresh = time.time()
+
+    def _refresh(self):
+        """Index lines other workers appended since the last scan (call with the lock held)"""
+        now = time.time()
+        if now - self._last_refresh < self.refresh_interval:
+            return
+        self._last_refresh = now
+        oldest = self._oldest_indexed()
+        for path in self._segment_files():
+            try:
+                if os.path.getsize(path) > self._offsets.get(path, 0):
+                    self._read_new_lines(path, oldest)
+            except FileNotFoundError:
+                self._offsets.pop(path, None)
+
+    def is_empty(self) -> bool:
+        return not self._segment_files()
+
+    @contextmanager
+    def exclusive(self):
+        """File lock on the log held by one worker process at a time, for one-off jobs such as migrations"""
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def append(self, log: dict):
+        """Append one event - cost is proportional to the event, not the log history"""
+        line = json.dumps(log, default=str, separators=(',', ':')) + '\n'
+        data = line.encode()
+        epoch = self._event_epoch(log)
+
+        with self._lock:
+            if (self._segment_path is None or self._segment_pid != os.getpid()
+                    or self._segment_size + len(data) > self.segment_max_bytes):
+                self._open_new_segment()
+
+            with open(self._segment_path, 'ab') as f:
+                f.write(data)
+            self._segment_size += len(data)
+            self._offsets[self._segment_path] = self._segment_size
+
+            self._index(log, epoch)
+
+    def _scan_user_events(self, user_id: str, since: float, until: float) -> List[dict]:
+        """Read a user's events in [since, until) straight from the segments, oldest first"""
+        events = []
+        for path in self._segment_files():
+            try:
+                if os.path.getmtime(path) < since:
+                    continue  # last written before the window opened
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                continue
+            for line in data[:data.rfind(b'\n') + 1].splitlines():
+                try:
+                    log = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if log.get('user_id') != user_id:
+                    continue
+                epoch = self._event_epoch(log)
+                if since <= epoch < until:
+                    events.append((epoch, log))
+        events.sort(key=lambda item: item[0])
+        return [log for _, log in events]
+
+    def user_events(self, user_id: str, window_seconds: int) -> List[dict]:
+        """Events for one user within the trailing window, oldest first.
+
+        The per-user index covers the last user_index_hours; any older part
+        of the window is read from the segments.
+        """
+        now = time.time()
+        since = now - window_seconds
+        first_hour = int(since // HOUR_SECONDS)
+        last_hour = int(now // HOUR_SECONDS)
+        indexed_hour = last_hour - self.user_index_hours
+
+        events = []
+        if first_hour < indexed_hour:
+            events = self._scan_user_events(user_id, since, indexed_hour * HOUR_SECONDS)
+            first_hour = indexed_hour
+            since = indexed_hour * HOUR_SECONDS
+
+        with self._lock:
+            self._refresh()
+            buckets = self._user_hour_index.get(user_id, {})
+            for hour in range(first_hour, last_hour + 1):
+                for log in buckets.get(hour, ()):
+                    if hour > first_hour or self._event_epoch(log) >= since:
+                        events.append(log)
+        return events
+
+    def event_counts(self, window_seconds: int) -> Dict[str, int]:
+        """Aggregated event-type counts over the trailing window, at hour granularity"""
+        now = time.time()
+        first_hour = int((now - window_seconds) // HOUR_SECONDS)
+        last_hour = int(now // HOUR_SECONDS)
+
+        totals = Counter()
+        with self._lock:
+            self._refresh()
+            for hour, counts in self._hourly_counts.items():
+                if first_hour <= hour <= last_hour:
+                    totals.update(counts)
+        return dict(totals)
+
+    def count_user_events(self, user_id: str, window_seconds: int, event_type: Optional[str] = None,
+                          failed_only: bool = False) -> int:
+        """Number of a user's events of one type (and/or failed) within the trailing window"""
+        return sum(1 for log in self.user_events(user_id, window_seconds)
+                   if (event_type is None or log.get('event_type') == event_type)
+                   and not (failed_only and log.get('success', True)))
@@ -0,0 +1,406 @@
+"""
+Chat Delivery Hub for NeuroPulse
+Pushes chat messages, reactions and moderation events to subscribed connections
+"""
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """One connection's view of one chat room: a bounded queue of pending events.
+
+    The hub never waits on a subscriber. If the queue is full when an event
+    arrives, the subscriber is dropped: its backlog is discarded and a final
+    'dropped' event tells the client to reconnect and resume from the last
+    message it saw.
+    """
+
+    def __init__(self, room_id: str, queue_size: int):
+        self.room_id = room_id
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.last_sequence = 0
+        self.closed = False
+
+    def _deliver(self, event: Dict) -> bool:
+        """Queue an event without blocking; False if the subscriber is too slow"""
+        if self.closed or event['sequence'] <= self.last_sequence:
+            return True
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            return False
+        self.last_sequence = event['sequence']
+        return True
+
+    def _terminate(self, reason: str):
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait({'type': 'dropped', 'room_id': self.room_id, 'reason': reason})
+
+    async def get(self) -> Dict:
+        return await self.queue.get()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Dict:
+        if self.closed and self.queue.empty():
+            raise StopAsyncIteration
+        event = await self.queue.get()
+        if event['type'] == 'dropped':
+            raise StopAsyncIteration
+        return event
+
+
+class _RoomFeed:
+    """A room's shared event file as followed by one hub: open handle and unread partial line"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+        self.pending = b''
+
+
+class ChatDeliveryHub:
+    """Asyncio fan-out of chat events to per-room subscriber sets.
+
+    publish() may be called from any thread (the Flask request handlers call
+    it from ChatManager). Each event is serialized once, stamped with a
+    per-room sequence number and kept in a bounded replay buffer, then handed
+    to every subscriber of the room on the hub's event loop. Subscribers can
+    resume after a disconnect from the id of the last message they saw; if
+    it has left the replay buffer they get a 'resync' event and reload
+    history instead.
+    With an event_directory, every gunicorn worker's hub also appends its
+    events to a per-room file there, and tails the files of rooms it has
+    subscribers for, so a message sent through one worker reaches clients
+    streaming from any other. Sequence numbers stay per hub; clients resume
+    by message id, which is the same everywhere.
+    """
+
+    def __init__(self, queue_size: int = 256, replay_size: int = 500, event_directory: Optional[str] = None,
+                 poll_interval: float = 0.25, max_event_file_bytes: int = 1 << 20,
+                 max_streams: Optional[int] = None):
+        self.queue_size = queue_size
+        self.replay_size = replay_size
+        self.event_directory = event_directory
+        self.poll_interval = poll_interval  # seconds between reads of other workers' events
+        self.max_event_file_bytes = max_event_file_bytes  # size at which a room's event file is rotated
+        self.max_streams = max_streams  # open SSE responses allowed at once; None for no cap
+        if event_directory is not None:
+            os.makedirs(event_directory, exist_ok=True)
+
+        self._subscribers = {}      # room_id -> set of Subscription
+        self._replay = {}           # room_id -> deque of recent events
+        self._message_sequences = {}  # room_id -> {message_id: sequence} for messages in the replay
+        self._sequences = {}        # room_id -> last sequence number issued
+        self._lock = threading.Lock()
+        self._origin = uuid.uuid4().hex  # tags this hub's lines in the shared event files
+        self._feeds = {}            # room_id -> _RoomFeed, for rooms with local subscribers
+        self._open_streams = 0
+
+        self._loop = None
+        self._loop_thread_id = None
+        self._polling_loop = None
+        self.stats = {'published': 0, 'relayed': 0, 'delivered': 0, 'dropped_subscribers': 0,
+                      'rejected_streams': 0}
+
+    # Event loop
+
+    def attach_loop(self, loop: asyncio.AbstractEventLoop):
+        """Deliver on an event loop owned by the caller (e.g. an ASGI server)"""
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident() if loop.is_running() else None
+        self._start_polling(loop)
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        """Run the hub on its own background event loop, for use from WSGI threads"""
+        with self._lock:
+            if self._loop is not None and not self._loop.is_closed():
+                return self._loop
+            loop = asyncio.new_event_loop()
+            started = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                self._loop_thread_id = threading.get_ident()
+                loop.call_soon(started.set)
+                loop.run_forever()
+
+            threading.Thread(target=run, name='chat-delivery-hub', daemon=True).start()
+            started.wait()
+            self._loop = loop
+            self._start_polling(loop)
+            return loop
+
+    # Publishing
+
+    def publish(self, room_id: str, event_type: str, data: Dict, message_id: Optional[str] = None) -> Dict:
+        """Record an event in the room's replay buffer and fan it out to subscribers on every worker"""
+        payload = json.dumps(data, default=str, separators=(',', ':'))
+        with self._lock:
+            # Shared under the hub lock, so a room starting to be followed sees each event exactly once
+            if self.event_directory is not None:
+                self._share(room_id, event_type, payload, message_id)
+            event = self._stamp(room_id, event_type, payload, message_id)
+            self.stats['published'] += 1
+
+        loop = self._loop
+        if loop is None or loop.is_closed() or room_id not in self._subscribers:
+            return event
+        if threading.get_ident() == self._loop_thread_id:
+            self._fan_out(room_id, event)
+        else:
+            loop.call_soon_threadsafe(self._fan_out, room_id, event)
+        return event
+
+    def _stamp(self, room_id: str, event_type: str, payload: str, message_id: Optional[str]) -> Dict:
+        """Give an event the room's next sequence number and remember it (call with the lock held)"""
+        sequence = self._sequences.get(room_id, 0) + 1
+        self._sequences[room_id] = sequence
+        event = {
+            'sequence': sequence,
+            'room_id': room_id,
+            'type': event_type,
+            'message_id': message_id,
+            'data': payload
+        }
+        self._remember(room_id, event)
+        return event
+
+    def _remember(self, room_id: str, event: Dict):
+        replay = self._replay.get(room_id)
+        if replay is None:
+            replay = self._replay[room_id] = deque()
+            self._message_sequences[room_id] = {}
+        message_sequences = self._message_sequences[room_id]
+
+        replay.append(event)
+        if event['type'] == 'message':
+            message_sequences[event['message_id']] = event['sequence']
+        if len(replay) > self.replay_size:
+            evicted = replay.popleft()
+            if evicted['type'] == 'message':
+                message_sequences.pop(evicted['message_id'], None)
+
+    def _fan_out(self, room_id: str, event: Dict):
+        subscribers = self._subscribers.get(room_id)
+        if not subscribers:
+            return
+        slow = []
+        for subscription in subscribers:
+            if subscription._deliver(event):
+                self.stats['delivered'] += 1
+            else:
+                slow.append(subscription)
+        for subscription in slow:
+            self._drop(subscription, 'slow_consumer')
+
+    def _drop(self, subscription: Subscription, reason: str):
+        subscribers = self._subscribers.get(subscription.room_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.room_id]
+                self._unfollow(subscription.room_id)
+        if not subscription.closed:
+            subscription._terminate(reason)
+            if reason == 'slow_consumer':
+                self.stats['dropped_subscribers'] += 1
+                logger.info(f"Dropped slow chat subscriber on {subscription.room_id}")
+
+    # Subscribing
+
+    async def subscribe(self, room_id: str, last_message_id: Optional[str] = None) -> Subscription:
+        """Subscribe to a room on the running loop, replaying events after last_message_id"""
+        if self._loop is None:
+            self.attach_loop(asyncio.get_running_loop())
+
+        subscription = Subscription(room_id, self.queue_size)
+        with self._lock:
+            if self.event_directory is not None and room_id not in self._feeds:
+                self._follow(room_id)
+            backlog = []
+            if last_message_id is not None:
+                sequence = self._message_sequences.get(room_id, {}).get(last_message_id)
+                if sequence is None:
+                    backlog = [{'sequence': self._sequences.get(room_id, 0), 'room_id': room_id,
+                                'type': 'resync', 'message_id': None, 'data': '{}'}]
+                else:
+                    backlog = [event for event in self._replay[room_id] if event['sequence'] > sequence]
+            else:
+                subscription.last_sequence = self._sequences.get(room_id, 0)
+            self._subscribers.setdefault(room_id, set()).add(subscription)
+
+        for event in backlog:
+            if event['type'] == 'resync':
+                subscription.queue.put_nowait(event)
+                subscription.last_sequence = event['sequence']
+            elif not subscription._deliver(event):
+                self._drop(subscription, 'slow_consumer')
+                break
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Remove a subscription; call on the hub's loop when the connection closes"""
+        self._drop(subscription, 'closed')
+
+    def subscriber_count(self, room_id: Optional[str] = None) -> int:
+        if room_id is not None:
+            return len(self._subscribers.get(room_id, ()))
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    # Events shared between workers
+
+    def _event_path(self, room_id: str) -> str:
+        return os.path.join(self.event_directory, quote(room_id, safe='') + '.jsonl')
+
+    def _share(self, room_id: str, event_type: str, payload: str, message_id: Optional[str]):
+        """Append an event to the room's shared file for the hubs of other workers"""
+        path = self._event_path(room_id)
+        line = json.dumps({'origin': self._origin, 'type': event_type, 'message_id': message_id,
+                           'data': payload}, separators=(',', ':')) + '\n'
+        with open(path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    if os.path.getsize(path) >= self.max_event_file_bytes:
+                        # Followers finish the old file through the handle they hold open
+                        os.replace(path, path + '.1')
+                except FileNotFoundError:
+                    pass
+                with open(path, 'ab') as f:
+                    f.write(line.encode())
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read_feed(feed: _RoomFeed) -> List[Dict]:
+        """Complete lines appended to a followed file since the last read, across rotations"""
+        records = []
+        while True:
+            if feed.file is None:
+                try:
+                    feed.file = open(feed.path, 'rb')
+                except FileNotFoundError:
+                    return records
+            try:
+                rotated = os.stat(feed.path).st_ino != os.fstat(feed.file.fileno()).st_ino
+            except FileNotFoundError:
+                rotated = False
+            # Read after the check: once the file has been rotated nobody appends to it any more
+            lines = (feed.pending + feed.file.read()).split(b'\n')
+            feed.pending = lines.pop()
+            for line in lines:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    logger.warning(f"Skipped malformed chat event in {feed.path}")
+            if not rotated:
+                return records
+            feed.file.close()
+            feed.file, feed.pending = None, b''
+
+    def _follow(self, room_id: str):
+        """Start tailing a room's shared file, rebuilding its replay buffer from it (call with the lock held)"""
+        feed = self._feeds[room_id] = _RoomFeed(self._event_path(room_id))
+        self._replay.pop(room_id, None)
+        self._message_sequences.pop(room_id, None)
+        for record in self._read_feed(feed)[-self.replay_size:]:
+            self._stamp(room_id, record['type'], record['data'], record['message_id'])
+
+    def _unfollow(self, room_id: str):
+        with self._lock:
+            feed = self._feeds.pop(room_id, None)
+        if feed is not None and feed.file is not None:
+            feed.file.close()
+
+    def _start_polling(self, loop: asyncio.AbstractEventLoop):
+        if self.event_directory is not None and self._polling_loop is not loop:
+            self._polling_loop = loop
+            loop.call_soon_threadsafe(self._poll, loop)
+
+    def _poll(self, loop: asyncio.AbstractEventLoop):
+        """Deliver events other workers shared since the last poll; runs on the hub's loop"""
+        if loop is not self._polling_loop or loop.is_closed():
+            return
+        try:
+            relayed = []
+            with self._lock:
+                for room_id, feed in list(self._feeds.items()):
+                    for record in self._read_feed(feed):
+                        if record.get('origin') != self._origin:
+                            relayed.append(self._stamp(room_id, record['type'], record['data'],
+                                                       record['message_id']))
+                self.stats['relayed'] += len(relayed)
+            for event in relayed:
+                self._fan_out(event['room_id'], event)
+        except Exception:
+            logger.exception("Failed to read shared chat events")
+        finally:
+            loop.call_later(self.poll_interval, self._poll, loop)
+
+    # Server-Sent Events
+
+    @staticmethod
+    def format_sse(event: Dict) -> str:
+        """An event as an SSE frame; message events carry the message id as the SSE id"""
+        lines = []
+        if event['type'] == 'message' and event['message_id']:
+            lines.append(f"id: {event['message_id']}")
+        lines.append(f"event: {event['type']}")
+        lines.append(f"data: {event['data']}")
+        return '\n'.join(lines) + '\n\n'
+
+    def acquire_stream(self) -> bool:
+        """Reserve a slot for one SSE response; False once max_streams are open"""
+        with self._lock:
+            if self.max_streams is not None and self._open_streams >= self.max_streams:
+                self.stats['rejected_streams'] += 1
+                return False
+            self._open_streams += 1
+            return True
+
+    def release_stream(self):
+        """Free the slot of an SSE response that has been closed"""
+        with self._lock:
+            self._open_streams -= 1
+
+    def sse_stream(self, room_id: str, last_message_id: Optional[str] = None,
+                   keepalive: float = 15.0) -> Iterator[str]:
+        """Blocking SSE frame generator for a WSGI streaming response"""
+        loop = self.start()
+        subscription = asyncio.run_coroutine_threadsafe(self.subscribe(room_id, last_message_id), loop).result()
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                future = asyncio.run_coroutine_threadsafe(
+                    asyncio.wait_for(subscription.get(), keepalive), loop)
+                try:
+                    event = future.result()
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield self.format_sse(event)
+                if event['type'] == 'dropped':
+                    return
+        finally:
+            loop.call_soon_threadsafe(self.unsubscribe, subscription)
+
+
+# Initialize global chat delivery hub, shared across gunicorn workers through data/chat_events.
+# Streams are capped below the worker's thread count (gunicorn.conf.py) so regular requests keep threads.
+chat_delivery_hub = ChatDeliveryHub(event_directory='data/chat_events',
+                                    max_streams=int(os.environ.get('NEUROPULSE_MAX_STREAMS', '48')))
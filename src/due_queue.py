@@ -0,0 +1,85 @@
+"""
+Due Queue Index for NeuroPulse
+Per-user min-heaps of card review times used by the spaced repetition engines
+"""
+
+import heapq
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, Tuple
+
+
+def review_epoch(next_review) -> float:
+    """Convert a stored next_review value (ISO string or datetime) to an epoch float"""
+    if isinstance(next_review, datetime):
+        return next_review.timestamp()
+    return datetime.fromisoformat(next_review).timestamp()
+
+
+class DueQueueIndex:
+    """Min-heap of (next_review_epoch, card_id) per user.
+
+    Rescheduling pushes a new entry and leaves the old one in place; stale
+    entries are skipped on read and compacted away once they outnumber live
+    ones. Reading the due cards walks the heap in order without popping, so
+    the first k due cards cost O(k log k) regardless of collection size.
+    """
+
+    def __init__(self):
+        self._heaps = {}    # user_id -> [(epoch, card_id), ...]
+        self._current = {}  # user_id -> {card_id: epoch}
+        self._lock = threading.Lock()
+
+    def schedule(self, user_id: str, card_id: str, due_epoch: float):
+        """Insert or move a card to a new review time"""
+        with self._lock:
+            current = self._current.setdefault(user_id, {})
+            if current.get(card_id) == due_epoch:
+                return
+            current[card_id] = due_epoch
+            heap = self._heaps.setdefault(user_id, [])
+            heapq.heappush(heap, (due_epoch, card_id))
+            if len(heap) > 2 * len(current) + 64:
+                self._compact(user_id)
+
+    def remove(self, user_id: str, card_id: str):
+        with self._lock:
+            self._current.get(user_id, {}).pop(card_id, None)
+
+    def rebuild(self, user_id: str, entries: Dict[str, float]):
+        """Replace a user's queue from {card_id: epoch} in O(n)"""
+        with self._lock:
+            self._current[user_id] = dict(entries)
+            heap = [(epoch, card_id) for card_id, epoch in entries.items()]
+            heapq.heapify(heap)
+            self._heaps[user_id] = heap
+
+    def _compact(self, user_id: str):
+        current = self._current[user_id]
+        heap = [(epoch, card_id) for card_id, epoch in current.items()]
+        heapq.heapify(heap)
+        self._heaps[user_id] = heap
+
+    def iter_due(self, user_id: str, now_epoch: float) -> Iterator[Tuple[float, str]]:
+        """Yield (epoch, card_id) for cards due at or before now, most overdue first.
+
+        The queue must not be modified while the iterator is being consumed.
+        """
+        heap = self._heaps.get(user_id)
+        if not heap:
+            return
+        current = self._current.get(user_id, {})
+
+        frontier = [(heap[0], 0)]
+        while frontier:
+            (due_epoch, card_id), position = heapq.heappop(frontier)
+            if due_epoch > now_epoch:
+                return
+            if current.get(card_id) == due_epoch:
+                yield due_epoch, card_id
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+
+    def size(self, user_id: str) -> int:
+        return len(self._current.get(user_id, {}))
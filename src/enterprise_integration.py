@@ -3,9 +3,10 @@ Enterprise Integration & API Platform for NeuroPulse
 Provides SSO integration, API gateway, LRS compliance, and enterprise directory services
 """
 
-import json
 import os
 import uuid
+import atexit
+import threading
 import jwt
 import hashlib
 import base64
@@ -14,6 +15,9 @@ from typing import Dict, List, Optional
 from urllib.parse import urlencode
 import requests
 
+from record_store import record_store
+from rate_limiter import TokenBucketRateLimiter
+
 class EnterpriseIntegrationManager:
     def __init__(self):
         self.sso_configs_file = 'sso_configurations.json'
@@ -22,7 +26,15 @@ class EnterpriseIntegrationManager:
         self.directory_sync_file = 'directory_sync_data.json'
         self.lrs_records_file = 'learning_records_store.json'
         
+        # API gateway hot path: hash index, shared rate limiter and batched usage counters
+        self.rate_limiter = TokenBucketRateLimiter(period_seconds=3600)
+        self.usage_flush_interval = 30  # seconds
+        self._pending_usage = {}  # key_id -> [requests not yet persisted, last_used]
+        self._usage_flush_timer = None
+        self._usage_lock = threading.Lock()
+        
         self.load_data()
+        atexit.register(self.flush_api_key_usage)
     
     def load_data(self):
         """Load enterprise integration data"""
@@ -31,19 +43,23 @@ class EnterpriseIntegrationManager:
         self.oauth_tokens = self._load_json_file(self.oauth_tokens_file, {})
         self.directory_sync = self._load_json_file(self.directory_sync_file, {})
         self.lrs_records = self._load_json_file(self.lrs_records_file, {})
+        
+        self.api_key_index = {
+            key_data['api_key_hash']: key_id for key_id, key_data in self.api_keys.items()
+        }
     
     def _load_json_file(self, filename: str, default: dict) -> dict:
-        """Load JSON file with fallback to default"""
-        try:
-            with open(filename, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return default
+        """Load a collection from the shared record store with fallback to default"""
+        return record_store.load_collection(filename, default)
     
-    def _save_json_file(self, filename: str, data: dict):
-        """Save data to JSON file"""
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+    def _save_json_file(self, filename: str, data: dict, record_id: str = None):
+        """Persist one record when record_id is given, otherwise only the changed records"""
+        if record_id is None:
+            record_store.save_collection(filename, data)
+        elif record_id in data:
+            record_store.save_record(filename, record_id, data[record_id])
+        else:
+            record_store.delete_record(filename, record_id)
     
     def configure_sso_provider(self, institution_id: str, provider_config: dict) -> str:
         """Configure SSO provider for institution"""
@@ -65,7 +81,7 @@ class EnterpriseIntegrationManager:
         }
         
         self.sso_configs[config_id] = sso_config
-        self._save_json_file(self.sso_configs_file, self.sso_configs)
+        self._save_json_file(self.sso_configs_file, self.sso_configs, config_id)
         
         return config_id
     
@@ -160,7 +176,7 @@ class EnterpriseIntegrationManager:
             'expires_at': (datetime.now() + timedelta(minutes=10)).isoformat()
         }
         
-        self._save_json_file(self.oauth_tokens_file, self.oauth_tokens)
+        self._save_json_file(self.oauth_tokens_file, self.oauth_tokens, request_id)
         
         return {
             'redirect_url': config['configuration']['sso_url'],
@@ -184,7 +200,7 @@ class EnterpriseIntegrationManager:
             'expires_at': (datetime.now() + timedelta(minutes=10)).isoformat()
         }
         
-        self._save_json_file(self.oauth_tokens_file, self.oauth_tokens)
+        self._save_json_file(self.oauth_tokens_file, self.oauth_tokens, state)
         
         # Build authorization URL
         params = {
@@ -265,7 +281,7 @@ class EnterpriseIntegrationManager:
         
         # Clean up state
         del self.oauth_tokens[state]
-        self._save_json_file(self.oauth_tokens_file, self.oauth_tokens)
+        self._save_json_file(self.oauth_tokens_file, self.oauth_tokens, state)
         
         return {
             'success': True,
@@ -395,15 +411,14 @@ class EnterpriseIntegrationManager:
             'last_used': None,
             'usage_count': 0,
             'rate_limit': {
-                'requests_per_hour': 1000,
-                'current_usage': 0,
-                'reset_time': datetime.now().isoformat()
+                'requests_per_hour': 1000
             },
             'active': True
         }
         
         self.api_keys[api_key_id] = api_key_data
-        self._save_json_file(self.api_keys_file, self.api_keys)
+        self.api_key_index[api_key_data['api_key_hash']] = api_key_id
+        self._save_json_file(self.api_keys_file, self.api_keys, api_key_id)
         
         return api_key
     
@@ -416,41 +431,64 @@ class EnterpriseIntegrationManager:
         """Validate API key and return permissions"""
         api_key_hash = hashlib.sha256(api_key.encode()).hexdigest()
         
-        for key_id, key_data in self.api_keys.items():
-            if key_data['api_key_hash'] == api_key_hash and key_data['active']:
-                # Check rate limiting
-                if self._is_rate_limited(key_data):
-                    return {'error': 'Rate limit exceeded'}
-                
-                # Update usage
-                key_data['last_used'] = datetime.now().isoformat()
-                key_data['usage_count'] += 1
-                key_data['rate_limit']['current_usage'] += 1
-                
-                self._save_json_file(self.api_keys_file, self.api_keys)
-                
-                return {
-                    'valid': True,
-                    'user_id': key_data['user_id'],
-                    'institution_id': key_data['institution_id'],
-                    'permissions': key_data['permissions'],
-                    'rate_limit_remaining': key_data['rate_limit']['requests_per_hour'] - key_data['rate_limit']['current_usage']
-                }
+        key_id = self.api_key_index.get(api_key_hash)
+        key_data = self.api_keys.get(key_id) if key_id else None
+        if not key_data or not key_data['active']:
+            return {'valid': False, 'error': 'Invalid API key'}
+        
+        # Check rate limiting
+        allowed, remaining = self.rate_limiter.try_acquire(
+            key_id, key_data['rate_limit']['requests_per_hour']
+        )
+        if not allowed:
+            return {'error': 'Rate limit exceeded'}
         
-        return {'valid': False, 'error': 'Invalid API key'}
+        # Update usage in memory; counters are added to the stored key in batches
+        key_data['last_used'] = datetime.now().isoformat()
+        key_data['usage_count'] += 1
+        self._record_api_key_usage(key_id, key_data['last_used'])
+        
+        return {
+            'valid': True,
+            'user_id': key_data['user_id'],
+            'institution_id': key_data['institution_id'],
+            'permissions': key_data['permissions'],
+            'rate_limit_remaining': remaining
+        }
+    
+    def _record_api_key_usage(self, key_id: str, used_at: str):
+        """Count a request towards a key's usage; a timer persists the counts within the flush interval"""
+        with self._usage_lock:
+            pending = self._pending_usage.setdefault(key_id, [0, used_at])
+            pending[0] += 1
+            pending[1] = used_at
+            if self._usage_flush_timer is None:
+                self._usage_flush_timer = threading.Timer(self.usage_flush_interval, self.flush_api_key_usage)
+                self._usage_flush_timer.daemon = True
+                self._usage_flush_timer.start()
     
-    def _is_rate_limited(self, key_data: dict) -> bool:
-        """Check if API key is rate limited"""
-        rate_limit = key_data['rate_limit']
-        reset_time = datetime.fromisoformat(rate_limit['reset_time'])
-        
-        # Reset counter if hour has passed
-        if datetime.now() > reset_time + timedelta(hours=1):
-            rate_limit['current_usage'] = 0
-            rate_limit['reset_time'] = datetime.now().isoformat()
-            return False
-        
-        return rate_limit['current_usage'] >= rate_limit['requests_per_hour']
+    def flush_api_key_usage(self):
+        """Add the pending usage counts to the stored keys, so every worker's requests are counted"""
+        with self._usage_lock:
+            pending_usage, self._pending_usage = self._pending_usage, {}
+            self._usage_flush_timer = None
+        
+        for key_id, (requests_made, last_used) in pending_usage.items():
+            if key_id not in self.api_keys:
+                continue
+            
+            def add_usage(stored, key_id=key_id, requests_made=requests_made, last_used=last_used):
+                stored = stored or dict(self.api_keys[key_id], usage_count=0)
+                stored['usage_count'] = stored.get('usage_count', 0) + requests_made
+                stored['last_used'] = max(stored.get('last_used') or '', last_used)
+                return stored
+            
+            stored = record_store.update_record(self.api_keys_file, key_id, add_usage)
+            # Requests counted locally since the flush began stay on top of the stored total
+            with self._usage_lock:
+                unflushed = self._pending_usage.get(key_id, [0])[0]
+            self.api_keys[key_id]['usage_count'] = stored['usage_count'] + unflushed
+            self.api_keys[key_id]['last_used'] = max(stored['last_used'], self.api_keys[key_id]['last_used'] or '')
     
     def record_learning_activity(self, user_id: str, activity_data: dict) -> str:
         """Record learning activity in xAPI format for LRS compliance"""
@@ -493,7 +531,7 @@ class EnterpriseIntegrationManager:
         
         # Store the statement
         self.lrs_records[statement_id] = xapi_statement
-        self._save_json_file(self.lrs_records_file, self.lrs_records)
+        self._save_json_file(self.lrs_records_file, self.lrs_records, statement_id)
         
         return statement_id
     
@@ -546,7 +584,7 @@ class EnterpriseIntegrationManager:
         
         # Store sync result
         self.directory_sync[sync_id] = sync_result
-        self._save_json_file(self.directory_sync_file, self.directory_sync)
+        self._save_json_file(self.directory_sync_file, self.directory_sync, sync_id)
         
         return sync_result
     
@@ -0,0 +1,320 @@
+"""
+Event Store for NeuroPulse
+Columnar, append-only learning event storage partitioned by day
+"""
+
+import array
+import atexit
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+# Column kinds and their on-disk encodings
+FLOAT = 'float'    # float64 array, NaN when missing
+STRING = 'string'  # int32 codes into the part's string dictionary, -1 when missing
+JSON = 'json'      # one JSON document per line, for payloads that are rarely read
+
+_TYPECODES = {FLOAT: 'd', STRING: 'i'}
+
+logger = logging.getLogger(__name__)
+
+
+class ColumnarEventStore:
+    """Append-only event table stored column by column in per-day partitions.
+
+    Layout: <directory>/<YYYY-MM-DD>/part-<ms>-<pid>/<column>.col, plus a
+    strings.jsonl dictionary per part. Each process writes its own part so
+    rows never interleave. Appends are buffered and written in batches by a
+    background thread; queries open only the day partitions in range and only
+    the columns they ask for, and reuse what was already read from a part
+    since files only ever grow. Columns read are kept in an LRU cache bounded
+    by `cache_max_bytes`; columns of past days a query did not cover are
+    dropped after it.
+    """
+
+    def __init__(self, directory: str, columns: Dict[str, str], batch_size: int = 512,
+                 flush_interval: float = 2.0, cache_max_bytes: int = 64 * 1024 * 1024):
+        self.directory = directory
+        self.columns = dict(columns)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.cache_max_bytes = cache_max_bytes
+
+        self._buffer = []  # [(epoch, {column: value}), ...] not yet on disk
+        self._buffer_lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._flush_requested = threading.Event()
+        self._flusher = None
+        self._parts = {}  # day -> writer state for this process
+        self._cache = OrderedDict()  # (part_dir, column) -> (bytes_read, values), least recently used first
+        self._cache_bytes = 0  # file bytes behind the cached values
+        self._code_maps = {}  # part_dir -> {string: code} for the dictionary read so far
+
+        os.makedirs(self.directory, exist_ok=True)
+        atexit.register(self.flush)
+
+    # Writing
+
+    def append(self, row: Dict, timestamp: Optional[float] = None):
+        """Buffer one event; it is written with the next batch"""
+        epoch = timestamp if timestamp is not None else time.time()
+        with self._buffer_lock:
+            self._buffer.append((epoch, row))
+            pending = len(self._buffer)
+        self._ensure_flusher()
+        if pending >= self.batch_size:
+            self._flush_requested.set()
+
+    def _ensure_flusher(self):
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        self._flusher = threading.Thread(target=self._flush_loop, name='event-store-flush', daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            self._flush_requested.wait(self.flush_interval)
+            self._flush_requested.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                # Rows stay buffered and are retried on the next pass
+                logger.warning(f"Event store flush failed: {e}")
+
+    def flush(self):
+        """Write every buffered event to its day partition"""
+        with self._io_lock:
+            with self._buffer_lock:
+                pending, self._buffer = self._buffer, []
+            if not pending:
+                return
+
+            by_day = {}
+            for epoch, row in pending:
+                by_day.setdefault(self._day(epoch), []).append((epoch, row))
+
+            written = 0
+            try:
+                for day, rows in by_day.items():
+                    self._write_rows(day, rows)
+                    written += len(rows)
+            except OSError:
+                with self._buffer_lock:
+                    unwritten = [item for rows in list(by_day.values()) for item in rows]
+                    self._buffer = unwritten[written:] + self._buffer
+                raise
+
+    def _part(self, day: str) -> Dict:
+        part = self._parts.get(day)
+        if part is None or part['pid'] != os.getpid():
+            path = os.path.join(self.directory, day, f"part-{int(time.time() * 1000):015d}-{os.getpid()}")
+            os.makedirs(path, exist_ok=True)
+            part = {'pid': os.getpid(), 'path': path, 'codes': {}}
+            self._parts[day] = part
+        return part
+
+    def _write_rows(self, day: str, rows: List):
+        part = self._part(day)
+        codes = part['codes']
+        new_strings = []
+
+        encoded = {'ts': array.array('d', (epoch for epoch, _ in rows))}
+        payloads = {}
+        for column, kind in self.columns.items():
+            if kind == JSON:
+                payloads[column] = ''.join(
+                    json.dumps(row.get(column), default=str, separators=(',', ':')) + '\n' for _, row in rows
+                )
+                continue
+            values = array.array(_TYPECODES[kind])
+            for _, row in rows:
+                value = row.get(column)
+                if kind == FLOAT:
+                    values.append(float(value) if value is not None else math.nan)
+                elif value is None:
+                    values.append(-1)
+                else:
+                    value = str(value)
+                    code = codes.get(value)
+                    if code is None:
+                        code = codes[value] = len(codes)
+                        new_strings.append(value)
+                    values.append(code)
+            encoded[column] = values
+
+        # Dictionary first so every code a column refers to is already resolvable
+        if new_strings:
+            with open(os.path.join(part['path'], 'strings.jsonl'), 'a') as f:
+                f.write(''.join(json.dumps(s) + '\n' for s in new_strings))
+        for column, values in encoded.items():
+            with open(os.path.join(part['path'], f'{column}.col'), 'ab') as f:
+                values.tofile(f)
+        for column, text in payloads.items():
+            with open(os.path.join(part['path'], f'{column}.col'), 'a') as f:
+                f.write(text)
+
+    # Reading
+
+    @staticmethod
+    def _day(epoch: float) -> str:
+        return datetime.fromtimestamp(epoch).date().isoformat()
+
+    def _read(self, part_dir: str, column: str) -> list:
+        """Column values of a part, reading only bytes appended since the last call"""
+        kind = FLOAT if column == 'ts' else self.columns.get(column, STRING)
+        filename = 'strings.jsonl' if column == '#strings' else f'{column}.col'
+        path = os.path.join(part_dir, filename)
+        key = (part_dir, column)
+        offset, values = self._cache.get(key, (0, None))
+        if values is None:
+            values = [] if column == '#strings' or kind == JSON else array.array(_TYPECODES[kind])
+        else:
+            self._cache.move_to_end(key)
+
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return values
+        if size <= offset:
+            return values
+        previous_offset = offset
+
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(size - offset)
+        if column == '#strings' or kind == JSON:
+            complete = data[:data.rfind(b'\n') + 1]  # ignore a line still being written
+            values.extend(json.loads(line) for line in complete.decode().splitlines())
+            offset += len(complete)
+        else:
+            usable = len(data) - len(data) % values.itemsize
+            values.frombytes(data[:usable])
+            offset += usable
+        self._cache[key] = (offset, values)
+        self._cache_bytes += offset - previous_offset
+        self._evict(self.cache_max_bytes)
+        return values
+
+    def _uncache(self, key):
+        offset, _ = self._cache.pop(key)
+        self._cache_bytes -= offset
+        if key[1] == '#strings':
+            self._code_maps.pop(key[0], None)
+
+    def _evict(self, max_bytes: int):
+        """Drop least recently used columns until the cache fits in max_bytes"""
+        while self._cache_bytes > max_bytes and len(self._cache) > 1:
+            self._uncache(next(iter(self._cache)))
+
+    def _drop_sealed_outside(self, start: Optional[date], end: Optional[date]):
+        """Forget columns of past (no longer written) days outside a query's range"""
+        today = date.today().isoformat()
+        first = start.isoformat() if start else ''
+        last = end.isoformat() if end else '9999-12-31'
+        for key in list(self._cache):
+            day = os.path.basename(os.path.dirname(key[0]))
+            if day < today and not first <= day <= last:
+                self._uncache(key)
+
+    def _string_codes(self, part_dir: str, strings: list) -> Dict[str, int]:
+        code_map = self._code_maps.setdefault(part_dir, {})
+        for code in range(len(code_map), len(strings)):
+            code_map[strings[code]] = code
+        return code_map
+
+    def _scan_part(self, part_dir: str, columns: List[str], where: Dict) -> List[Dict]:
+        strings = None
+        if any(self.columns.get(c) == STRING for c in list(columns) + list(where)):
+            strings = self._read(part_dir, '#strings')
+
+        # Resolve filters to codes; a value missing from the dictionary rules out the whole part
+        code_filters = {}
+        for column, value in where.items():
+            if self.columns.get(column) == STRING:
+                code = self._string_codes(part_dir, strings).get(value)
+                if code is None:
+                    return []
+                code_filters[column] = code
+            else:
+                code_filters[column] = value
+
+        filter_values = {column: self._read(part_dir, column) for column in code_filters}
+        output_values = {column: self._read(part_dir, column) for column in columns}
+        row_count = min(len(values) for values in list(filter_values.values()) + list(output_values.values()))
+
+        rows = []
+        for i in range(row_count):
+            if any(filter_values[column][i] != expected for column, expected in code_filters.items()):
+                continue
+            row = {}
+            for column, values in output_values.items():
+                value = values[i]
+                kind = self.columns.get(column)
+                if kind == STRING:
+                    value = strings[value] if value >= 0 else None
+                elif kind == FLOAT and value != value:  # NaN marks a missing value
+                    value = None
+                row[column] = value
+            rows.append(row)
+        return rows
+
+    def _days(self, start: Optional[date], end: Optional[date]) -> List[str]:
+        first = start.isoformat() if start else ''
+        last = end.isoformat() if end else '9999-12-31'
+        return sorted(name for name in os.listdir(self.directory) if first <= name <= last)
+
+    def scan(self, columns: Iterable[str], start: Optional[date] = None, end: Optional[date] = None,
+             where: Optional[Dict] = None, newest_first: bool = False, limit: Optional[int] = None,
+             days: Optional[Iterable[str]] = None) -> List[Dict]:
+        """Rows (with 'ts') for the requested columns, filtered by equality on `where`.
+
+        Only day partitions between start and end are opened, and only the
+        listed `days` (YYYY-MM-DD) when given. With newest_first and a limit
+        the scan walks days backwards and stops as soon as enough rows were found.
+        """
+        columns = ['ts'] + [column for column in columns if column != 'ts']
+        where = where or {}
+
+        with self._io_lock:
+            with self._buffer_lock:
+                buffered = list(self._buffer)
+            buffered_by_day = {}
+            for epoch, row in buffered:
+                buffered_by_day.setdefault(self._day(epoch), []).append((epoch, row))
+
+            wanted = set(days) if days is not None else None
+            days = set(self._days(start, end))
+            days.update(day for day in buffered_by_day
+                        if (not start or day >= start.isoformat()) and (not end or day <= end.isoformat()))
+            if wanted is not None:
+                days &= wanted
+            self._drop_sealed_outside(start, end)
+
+            results = []
+            for day in sorted(days, reverse=newest_first):
+                day_rows = []
+                day_dir = os.path.join(self.directory, day)
+                if os.path.isdir(day_dir):
+                    for part in sorted(os.listdir(day_dir)):
+                        day_rows.extend(self._scan_part(os.path.join(day_dir, part), columns, where))
+                for epoch, row in buffered_by_day.get(day, ()):
+                    if all(row.get(column) == value for column, value in where.items()):
+                        day_rows.append(dict({column: row.get(column) for column in columns}, ts=epoch))
+
+                day_rows.sort(key=lambda r: r['ts'], reverse=newest_first)
+                results.extend(day_rows)
+                if limit is not None and len(results) >= limit:
+                    return results[:limit]
+            return results
+
+    def is_empty(self) -> bool:
+        with self._buffer_lock:
+            if self._buffer:
+                return False
+        return not os.listdir(self.directory)
@@ -3,12 +3,12 @@ Gamification & Motivation Engine for NeuroPulse
 Provides achievement trees, skill progression, leaderboards, virtual rewards, and social sharing
 """
 
-import json
-import os
 import uuid
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
+from record_store import record_store
+
 class GamificationEngine:
     def __init__(self):
         self.achievements_file = 'achievement_system.json'
@@ -28,15 +28,15 @@ class GamificationEngine:
         self.motivation_data = self._load_json_file(self.motivational_data_file, {})
     
     def _load_json_file(self, filename: str, default: dict) -> dict:
-        try:
-            with open(filename, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return default
+        return record_store.load_collection(filename, default)
     
-    def _save_json_file(self, filename: str, data: dict):
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+    def _save_json_file(self, filename: str, data: dict, record_id: str = None):
+        if record_id is None:
+            record_store.save_collection(filename, data)
+        elif record_id in data:
+            record_store.save_record(filename, record_id, data[record_id])
+        else:
+            record_store.delete_record(filename, record_id)
     
     def create_skill_progression_tree(self, subject_category: str, tree_config: dict) -> str:
         """Create skill progression tree for subject mastery"""
@@ -64,7 +64,7 @@ class GamificationEngine:
         skill_tree['progress_tracking']['total_nodes'] = len(skill_tree['skill_nodes'])
         
         self.skill_trees[tree_id] = skill_tree
-        self._save_json_file(self.skill_trees_file, self.skill_trees)
+        self._save_json_file(self.skill_trees_file, self.skill_trees, tree_id)
         
         return tree_id
     
@@ -145,74 +145,71 @@ class GamificationEngine:
                 'last_updated': datetime.now().isoformat()
             }
         
-        user_progress = self.motivation_data[user_progress_key]
-        
-        # Update progress for relevant nodes
-        subject_category = tree['subject_category']
-        topic = performance_data.get('topic', subject_category)
-        
-        # Find matching skill node
-        matching_node = None
-        for node in tree['skill_nodes']:
-            if topic.lower() in node['name'].lower() or subject_category in node['name'].lower():
-                matching_node = node
-                break
-        
-        if not matching_node:
-            matching_node = tree['skill_nodes'][0]  # Default to first node
-        
-        # Update node progress
-        node_id = matching_node['node_id']
-        if node_id not in user_progress['node_progress']:
-            user_progress['node_progress'][node_id] = {
-                'attempts': 0,
-                'total_questions': 0,
-                'correct_answers': 0,
-                'time_spent_minutes': 0,
-                'mastery_progress': 0
-            }
-        
-        node_progress = user_progress['node_progress'][node_id]
-        
-        # Update statistics
-        node_progress['attempts'] += 1
-        node_progress['total_questions'] += performance_data.get('questions_answered', 0)
-        node_progress['correct_answers'] += int(performance_data.get('questions_answered', 0) * 
-                                               performance_data.get('accuracy_rate', 0) / 100)
-        node_progress['time_spent_minutes'] += performance_data.get('time_spent_minutes', 0)
-        
-        # Calculate mastery progress
-        accuracy = (node_progress['correct_answers'] / max(1, node_progress['total_questions'])) * 100
-        questions_met = node_progress['total_questions'] >= matching_node['unlock_criteria']['questions_required']
-        accuracy_met = accuracy >= matching_node['unlock_criteria']['accuracy_threshold']
-        time_met = node_progress['time_spent_minutes'] >= (matching_node['unlock_criteria']['time_invested_hours'] * 60)
-        
-        # Update mastery progress
-        progress_factors = [
-            min(100, accuracy),
-            min(100, (node_progress['total_questions'] / matching_node['unlock_criteria']['questions_required']) * 100),
-            min(100, (node_progress['time_spent_minutes'] / (matching_node['unlock_criteria']['time_invested_hours'] * 60)) * 100)
-        ]
-        
-        node_progress['mastery_progress'] = sum(progress_factors) / 3
-        
-        # Check for node unlock
-        unlocked_new_node = False
-        if questions_met and accuracy_met and time_met and node_id not in user_progress['unlocked_nodes']:
-            user_progress['unlocked_nodes'].append(node_id)
-            user_progress['total_xp'] += matching_node['rewards']['xp_points']
-            unlocked_new_node = True
+        with record_store.editing(self.motivational_data_file, self.motivation_data, user_progress_key) as user_progress:
+            # Update progress for relevant nodes
+            subject_category = tree['subject_category']
+            topic = performance_data.get('topic', subject_category)
             
-            # Award badges and achievements
-            for badge in matching_node['rewards']['badges']:
-                if badge not in user_progress['achievements_earned']:
-                    user_progress['achievements_earned'].append(badge)
-        
-        # Update user level based on unlocked nodes
-        user_progress['current_level'] = self._calculate_user_level(user_progress, tree)
-        user_progress['last_updated'] = datetime.now().isoformat()
-        
-        self._save_json_file(self.motivational_data_file, self.motivation_data)
+            # Find matching skill node
+            matching_node = None
+            for node in tree['skill_nodes']:
+                if topic.lower() in node['name'].lower() or subject_category in node['name'].lower():
+                    matching_node = node
+                    break
+            
+            if not matching_node:
+                matching_node = tree['skill_nodes'][0]  # Default to first node
+            
+            # Update node progress
+            node_id = matching_node['node_id']
+            if node_id not in user_progress['node_progress']:
+                user_progress['node_progress'][node_id] = {
+                    'attempts': 0,
+                    'total_questions': 0,
+                    'correct_answers': 0,
+                    'time_spent_minutes': 0,
+                    'mastery_progress': 0
+                }
+            
+            node_progress = user_progress['node_progress'][node_id]
+            
+            # Update statistics
+            node_progress['attempts'] += 1
+            node_progress['total_questions'] += performance_data.get('questions_answered', 0)
+            node_progress['correct_answers'] += int(performance_data.get('questions_answered', 0) * 
+                                                   performance_data.get('accuracy_rate', 0) / 100)
+            node_progress['time_spent_minutes'] += performance_data.get('time_spent_minutes', 0)
+            
+            # Calculate mastery progress
+            accuracy = (node_progress['correct_answers'] / max(1, node_progress['total_questions'])) * 100
+            questions_met = node_progress['total_questions'] >= matching_node['unlock_criteria']['questions_required']
+            accuracy_met = accuracy >= matching_node['unlock_criteria']['accuracy_threshold']
+            time_met = node_progress['time_spent_minutes'] >= (matching_node['unlock_criteria']['time_invested_hours'] * 60)
+            
+            # Update mastery progress
+            progress_factors = [
+                min(100, accuracy),
+                min(100, (node_progress['total_questions'] / matching_node['unlock_criteria']['questions_required']) * 100),
+                min(100, (node_progress['time_spent_minutes'] / (matching_node['unlock_criteria']['time_invested_hours'] * 60)) * 100)
+            ]
+            
+            node_progress['mastery_progress'] = sum(progress_factors) / 3
+            
+            # Check for node unlock
+            unlocked_new_node = False
+            if questions_met and accuracy_met and time_met and node_id not in user_progress['unlocked_nodes']:
+                user_progress['unlocked_nodes'].append(node_id)
+                user_progress['total_xp'] += matching_node['rewards']['xp_points']
+                unlocked_new_node = True
+                
+                # Award badges and achievements
+                for badge in matching_node['rewards']['badges']:
+                    if badge not in user_progress['achievements_earned']:
+                        user_progress['achievements_earned'].append(badge)
+            
+            # Update user level based on unlocked nodes
+            user_progress['current_level'] = self._calculate_user_level(user_progress, tree)
+            user_progress['last_updated'] = datetime.now().isoformat()
         
         return {
             'progress_updated': True,
@@ -293,7 +290,7 @@ class GamificationEngine:
         }
         
         self.achievements[achievement_id] = achievement
-        self._save_json_file(self.achievements_file, self.achievements)
+        self._save_json_file(self.achievements_file, self.achievements, achievement_id)
         
         return achievement_id
     
@@ -349,59 +346,56 @@ class GamificationEngine:
     
     def _update_achievement_progress(self, user_id: str, achievement_id: str, activity: dict) -> dict:
         """Update achievement progress for user"""
-        achievement = self.achievements[achievement_id]
-        
-        # Find or create user progress entry
-        user_entry = None
-        for entry in achievement['earned_by']:
-            if entry['user_id'] == user_id:
-                user_entry = entry
-                break
-        
-        if not user_entry:
-            user_entry = {
-                'user_id': user_id,
-                'progress': 0,
-                'earned_at': None,
-                'progress_history': []
-            }
-            achievement['earned_by'].append(user_entry)
-        
-        # Update progress based on achievement type
-        criteria = achievement['criteria']
-        
-        if achievement['type'] == 'streak':
-            # Handle streak achievements
-            last_activity = user_entry['progress_history'][-1] if user_entry['progress_history'] else None
-            if last_activity and self._is_consecutive_day(last_activity['date'], activity.get('date', datetime.now().isoformat())):
-                user_entry['progress'] += 1
-            else:
-                user_entry['progress'] = 1
-        
-        elif achievement['type'] == 'milestone':
-            # Handle milestone achievements
-            user_entry['progress'] += activity.get('value', 1)
-        
-        elif achievement['type'] == 'mastery':
-            # Handle mastery achievements
-            user_entry['progress'] = max(user_entry['progress'], activity.get('accuracy_rate', 0))
-        
-        # Record progress history
-        user_entry['progress_history'].append({
-            'date': activity.get('date', datetime.now().isoformat()),
-            'value': activity.get('value', 1),
-            'activity_details': activity
-        })
-        
-        # Check if achievement is earned
-        achievement_earned = False
-        target_value = achievement['progress_tracking']['target_value']
-        
-        if user_entry['progress'] >= target_value and not user_entry['earned_at']:
-            user_entry['earned_at'] = datetime.now().isoformat()
-            achievement_earned = True
-        
-        self._save_json_file(self.achievements_file, self.achievements)
+        with record_store.editing(self.achievements_file, self.achievements, achievement_id) as achievement:
+            # Find or create user progress entry
+            user_entry = None
+            for entry in achievement['earned_by']:
+                if entry['user_id'] == user_id:
+                    user_entry = entry
+                    break
+            
+            if not user_entry:
+                user_entry = {
+                    'user_id': user_id,
+                    'progress': 0,
+                    'earned_at': None,
+                    'progress_history': []
+                }
+                achievement['earned_by'].append(user_entry)
+            
+            # Update progress based on achievement type
+            criteria = achievement['criteria']
+            
+            if achievement['type'] == 'streak':
+                # Handle streak achievements
+                last_activity = user_entry['progress_history'][-1] if user_entry['progress_history'] else None
+                if last_activity and self._is_consecutive_day(last_activity['date'], activity.get('date', datetime.now().isoformat())):
+                    user_entry['progress'] += 1
+                else:
+                    user_entry['progress'] = 1
+            
+            elif achievement['type'] == 'milestone':
+                # Handle milestone achievements
+                user_entry['progress'] += activity.get('value', 1)
+            
+            elif achievement['type'] == 'mastery':
+                # Handle mastery achievements
+                user_entry['progress'] = max(user_entry['progress'], activity.get('accuracy_rate', 0))
+            
+            # Record progress history
+            user_entry['progress_history'].append({
+                'date': activity.get('date', datetime.now().isoformat()),
+                'value': activity.get('value', 1),
+                'activity_details': activity
+            })
+            
+            # Check if achievement is earned
+            achievement_earned = False
+            target_value = achievement['progress_tracking']['target_value']
+            
+            if user_entry['progress'] >= target_value and not user_entry['earned_at']:
+                user_entry['earned_at'] = datetime.now().isoformat()
+                achievement_earned = True
         
         return {
             'achievement_earned': achievement_earned,
@@ -440,7 +434,7 @@ class GamificationEngine:
         }
         
         self.leaderboards[leaderboard_id] = leaderboard
-        self._save_json_file(self.leaderboards_file, self.leaderboards)
+        self._save_json_file(self.leaderboards_file, self.leaderboards, leaderboard_id)
         
         return leaderboard_id
     
@@ -482,10 +476,9 @@ class GamificationEngine:
         
         # Apply display limits
         max_rank = leaderboard['privacy_settings']['max_displayed_rank']
-        leaderboard['rankings'] = participant_scores[:max_rank]
-        leaderboard['last_updated'] = datetime.now().isoformat()
-        
-        self._save_json_file(self.leaderboards_file, self.leaderboards)
+        with record_store.editing(self.leaderboards_file, self.leaderboards, leaderboard_id) as leaderboard:
+            leaderboard['rankings'] = participant_scores[:max_rank]
+            leaderboard['last_updated'] = datetime.now().isoformat()
         
         return {
             'leaderboard_updated': True,
@@ -540,7 +533,7 @@ class GamificationEngine:
         }
         
         self.rewards[reward_id] = reward_system
-        self._save_json_file(self.rewards_file, self.rewards)
+        self._save_json_file(self.rewards_file, self.rewards, reward_id)
         
         return reward_id
     
@@ -549,22 +542,20 @@ class GamificationEngine:
         if reward_id not in self.rewards:
             return {'error': 'Reward not found'}
         
-        reward = self.rewards[reward_id]
-        
-        # Check if user already has this reward
-        if any(award['user_id'] == user_id for award in reward['awarded_to']):
-            return {'error': 'User already has this reward'}
-        
-        # Award the reward
-        award_entry = {
-            'user_id': user_id,
-            'awarded_at': datetime.now().isoformat(),
-            'context': context,
-            'shared_publicly': False
-        }
-        
-        reward['awarded_to'].append(award_entry)
-        self._save_json_file(self.rewards_file, self.rewards)
+        with record_store.editing(self.rewards_file, self.rewards, reward_id) as reward:
+            # Check if user already has this reward
+            if any(award['user_id'] == user_id for award in reward['awarded_to']):
+                return {'error': 'User already has this reward'}
+            
+            # Award the reward
+            award_entry = {
+                'user_id': user_id,
+                'awarded_at': datetime.now().isoformat(),
+                'context': context,
+                'shared_publicly': False
+            }
+            
+            reward['awarded_to'].append(award_entry)
         
         return {
             'reward_awarded': True,
@@ -0,0 +1,124 @@
+"""
+Group Formation for NeuroPulse
+Array-based partitioning of large cohorts into balanced, complementary or random groups
+"""
+
+import math
+import random
+from typing import List, Sequence
+
+# NumPy is optional: without it the same partitions are computed in pure Python
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+KMEANS_ITERATIONS = 10
+
+
+def group_count(participant_count: int, max_per_group: int) -> int:
+    """Fewest groups that keep every group within max_per_group"""
+    return max(1, math.ceil(participant_count / max(1, max_per_group)))
+
+
+def _snake_groups(order: Sequence[int], groups: int) -> List[int]:
+    """Group index per participant when dealing `order` back and forth across the groups"""
+    assignment = [0] * len(order)
+    for position, participant in enumerate(order):
+        round_number, offset = divmod(position, groups)
+        assignment[participant] = offset if round_number % 2 == 0 else groups - 1 - offset
+    return assignment
+
+
+def snake_draft(skills: Sequence[float], groups: int) -> List[int]:
+    """Group index per participant: strongest first, dealt in a snake so group skill totals stay even"""
+    if np is not None:
+        skills = np.asarray(skills, dtype=np.float64)
+        order = np.argsort(-skills, kind='stable')
+        positions = np.arange(len(skills))
+        round_number, offset = np.divmod(positions, groups)
+        dealt = np.where(round_number % 2 == 0, offset, groups - 1 - offset)
+        assignment = np.empty(len(skills), dtype=np.int64)
+        assignment[order] = dealt
+        return assignment.tolist()
+    order = sorted(range(len(skills)), key=lambda i: -skills[i])
+    return _snake_groups(order, groups)
+
+
+def _kmeans_numpy(features, clusters: int, seed: int):
+    rng = np.random.default_rng(seed)
+    centroids = features[rng.choice(len(features), clusters, replace=False)]
+    labels = np.zeros(len(features), dtype=np.int64)
+    for _ in range(KMEANS_ITERATIONS):
+        distances = ((features[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+        new_labels = distances.argmin(axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for cluster in range(clusters):
+            members = features[labels == cluster]
+            if len(members):
+                centroids[cluster] = members.mean(axis=0)
+    return labels
+
+
+def _kmeans_python(features: List[List[float]], clusters: int, seed: int) -> List[int]:
+    rng = random.Random(seed)
+    centroids = [list(features[i]) for i in rng.sample(range(len(features)), clusters)]
+    labels = [0] * len(features)
+    for _ in range(KMEANS_ITERATIONS):
+        new_labels = [
+            min(range(clusters), key=lambda c: sum((a - b) ** 2 for a, b in zip(point, centroids[c])))
+            for point in features
+        ]
+        if new_labels == labels:
+            break
+        labels = new_labels
+        sums = [[0.0] * len(features[0]) for _ in range(clusters)]
+        counts = [0] * clusters
+        for point, label in zip(features, labels):
+            counts[label] += 1
+            sums[label] = [s + v for s, v in zip(sums[label], point)]
+        for cluster in range(clusters):
+            if counts[cluster]:
+                centroids[cluster] = [s / counts[cluster] for s in sums[cluster]]
+    return labels
+
+
+def complementary_partition(features: Sequence[Sequence[float]], groups: int, seed: int = 0) -> List[int]:
+    """Group index per participant, mixing profiles inside each group.
+
+    Participants are clustered into as many profile clusters as a group
+    has seats (k-means on the feature vectors), then dealt cluster by
+    cluster across the groups, so each group draws from every cluster
+    instead of collecting similar learners.
+    """
+    n = len(features)
+    if n == 0:
+        return []
+    clusters = min(n, max(1, math.ceil(n / groups)))
+
+    if np is not None:
+        points = np.asarray(features, dtype=np.float64)
+        labels = _kmeans_numpy(points, clusters, seed)
+        order = np.lexsort((np.arange(n), labels))  # cluster by cluster, stable within a cluster
+        assignment = np.empty(n, dtype=np.int64)
+        assignment[order] = np.arange(n) % groups
+        return assignment.tolist()
+
+    labels = _kmeans_python([list(point) for point in features], clusters, seed)
+    order = sorted(range(n), key=lambda i: labels[i])
+    assignment = [0] * n
+    for position, participant in enumerate(order):
+        assignment[participant] = position % groups
+    return assignment
+
+
+def random_partition(participant_count: int, groups: int, seed: int = 0) -> List[int]:
+    """Group index per participant after a seeded shuffle"""
+    order = list(range(participant_count))
+    random.Random(seed).shuffle(order)
+    assignment = [0] * participant_count
+    for position, participant in enumerate(order):
+        assignment[participant] = position % groups
+    return assignment
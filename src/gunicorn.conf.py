@@ -0,0 +1,16 @@
+"""
+Gunicorn Configuration for NeuroPulse
+Worker settings picked up by `gunicorn main:app` when started from this directory
+"""
+
+import os
+
+# /api/chat/stream/<chat_room_id> keeps its request open for as long as the browser
+# listens, so every open chat holds a worker thread. Sync workers would be used up by a
+# few open chats; gthread workers serve requests from a thread pool and keep sending
+# heartbeats while streams are open. Chat events reach streams on other workers through
+# the shared files of the chat delivery hub. The hub caps open streams per worker
+# (NEUROPULSE_MAX_STREAMS, default 48) and answers 503 above it, so keep the cap below
+# the thread count to leave threads for regular requests.
+worker_class = os.environ.get('NEUROPULSE_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('NEUROPULSE_WORKER_THREADS', '64'))
@@ -3,12 +3,12 @@ Immersive Learning Technologies for NeuroPulse
 Provides VR/AR learning environments, 3D interactive simulations, and voice-activated interfaces
 """
 
-import json
-import os
 import uuid
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
+from record_store import record_store
+
 class ImmersiveLearningManager:
     def __init__(self):
         self.vr_environments_file = 'vr_learning_environments.json'
@@ -28,15 +28,15 @@ class ImmersiveLearningManager:
         self.immersive_analytics = self._load_json_file(self.immersive_analytics_file, {})
     
     def _load_json_file(self, filename: str, default: dict) -> dict:
-        try:
-            with open(filename, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return default
+        return record_store.load_collection(filename, default)
     
-    def _save_json_file(self, filename: str, data: dict):
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+    def _save_json_file(self, filename: str, data: dict, record_id: str = None):
+        if record_id is None:
+            record_store.save_collection(filename, data)
+        elif record_id in data:
+            record_store.save_record(filename, record_id, data[record_id])
+        else:
+            record_store.delete_record(filename, record_id)
     
     def create_vr_learning_environment(self, creator_id: str, environment_config: dict) -> str:
         """Create immersive VR learning environment"""
@@ -102,7 +102,7 @@ class ImmersiveLearningManager:
         }
         
         self.vr_environments[environment_id] = vr_environment
-        self._save_json_file(self.vr_environments_file, self.vr_environments)
+        self._save_json_file(self.vr_environments_file, self.vr_environments, environment_id)
         
         return environment_id
     
@@ -262,7 +262,7 @@ class ImmersiveLearningManager:
         }
         
         self.ar_experiences[experience_id] = ar_experience
-        self._save_json_file(self.ar_experiences_file, self.ar_experiences)
+        self._save_json_file(self.ar_experiences_file, self.ar_experiences, experience_id)
         
         return experience_id
     
@@ -409,7 +409,7 @@ class ImmersiveLearningManager:
         }
         
         self.simulations[simulation_id] = simulation
-        self._save_json_file(self.simulations_file, self.simulations)
+        self._save_json_file(self.simulations_file, self.simulations, simulation_id)
         
         return simulation_id
     
@@ -521,7 +521,7 @@ class ImmersiveLearningManager:
         }
         
         self.voice_interfaces[interface_id] = voice_interface
-        self._save_json_file(self.voice_interfaces_file, self.voice_interfaces)
+        self._save_json_file(self.voice_interfaces_file, self.voice_interfaces, interface_id)
         
         return interface_id
     
@@ -561,7 +561,7 @@ class ImmersiveLearningManager:
         }
         
         self.immersive_analytics[tracking_id] = session_tracking
-        self._save_json_file(self.immersive_analytics_file, self.immersive_analytics)
+        self._save_json_file(self.immersive_analytics_file, self.immersive_analytics, tracking_id)
         
         return tracking_id
     
@@ -0,0 +1,229 @@
+"""
+Institutional Aggregates for NeuroPulse
+Incrementally maintained counters, histograms and tallies behind institutional reports
+"""
+
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+ACCURACY_BUCKET_WIDTH = 0.5
+ACCURACY_BUCKETS = int(100 / ACCURACY_BUCKET_WIDTH) + 1  # last bucket holds exactly 100%
+
+
+class InstitutionalAggregates:
+    """Materialized institution-wide views kept current one user update at a time.
+
+    Each user contributes a small snapshot (engagement score, average
+    accuracy, subjects, last activity and session days). An update retracts
+    the user's previous snapshot and applies the new one, so every view is
+    exact at all times and reading it costs O(subjects + buckets + days)
+    instead of a pass over all users and their sessions. The state is a
+    plain dict so it can be persisted as a single record.
+
+    Writers record their updates in a delta() instead, which holds only the
+    counters they changed, and readers merge() stored deltas into the state.
+    """
+
+    def __init__(self, state: Optional[Dict] = None):
+        self.state = state or self.empty_state()
+
+    @classmethod
+    def delta(cls) -> 'InstitutionalAggregates':
+        """Empty aggregates collecting the changes made by some updates, sparse enough to store per event"""
+        aggregates = cls()
+        aggregates.state['engagement']['bands'] = defaultdict(int)
+        aggregates.state['accuracy']['histogram'] = defaultdict(int)
+        return aggregates
+
+    @staticmethod
+    def empty_state() -> Dict:
+        return {
+            'users': 0,
+            'total_sessions': 0,
+            'engagement': {'score_sum': 0.0, 'bands': {'high': 0, 'medium': 0, 'low': 0}},
+            'accuracy': {'sum': 0.0, 'users': 0, 'histogram': [0] * ACCURACY_BUCKETS},
+            'subjects': {},      # subject -> {'users', 'sessions', 'accuracy_sum'}
+            'active_days': {},   # YYYY-MM-DD -> users whose latest update was that day
+            'session_days': {}   # YYYY-MM-DD -> {'users', 'low_accuracy'} by latest session day
+        }
+
+    # Updates
+
+    def apply(self, before: Optional[Dict], after: Dict):
+        """Replace a user's previous contribution (None for a new user) with a new one"""
+        if before is not None:
+            self._contribute(before, -1)
+        self._contribute(after, 1)
+
+    def record_session(self, subject: Optional[str], accuracy: float):
+        """Count one completed session towards its subject tally"""
+        if not subject:
+            return
+        tally = self.state['subjects'].setdefault(subject, {'users': 0, 'sessions': 0, 'accuracy_sum': 0.0})
+        tally['sessions'] += 1
+        tally['accuracy_sum'] += accuracy
+
+    def _contribute(self, snapshot: Dict, sign: int):
+        state = self.state
+        state['users'] += sign
+        state['total_sessions'] += sign * snapshot['sessions']
+
+        engagement = state['engagement']
+        engagement['score_sum'] += sign * snapshot['engagement_score']
+        engagement['bands'][self._engagement_band(snapshot['engagement_score'])] += sign
+
+        accuracy = snapshot['accuracy']
+        if accuracy > 0:
+            state['accuracy']['sum'] += sign * accuracy
+            state['accuracy']['users'] += sign
+            state['accuracy']['histogram'][self._accuracy_bucket(accuracy)] += sign
+
+        for subject in snapshot['subjects']:
+            tally = state['subjects'].setdefault(subject, {'users': 0, 'sessions': 0, 'accuracy_sum': 0.0})
+            tally['users'] += sign
+
+        self._adjust_day(state['active_days'], snapshot['active_day'], sign)
+
+        session_day = snapshot['last_session_day']
+        if session_day is not None:
+            day = state['session_days'].setdefault(session_day, {'users': 0, 'low_accuracy': 0})
+            day['users'] += sign
+            day['low_accuracy'] += sign * int(snapshot['low_accuracy'])
+            if day['users'] == 0 and day['low_accuracy'] == 0:
+                del state['session_days'][session_day]
+
+    def merge(self, delta: Dict):
+        """Add the changes collected by a delta(), given its state as stored"""
+        state = self.state
+        state['users'] += delta['users']
+        state['total_sessions'] += delta['total_sessions']
+
+        engagement = state['engagement']
+        engagement['score_sum'] += delta['engagement']['score_sum']
+        for band, count in delta['engagement']['bands'].items():
+            engagement['bands'][band] += count
+
+        accuracy = state['accuracy']
+        accuracy['sum'] += delta['accuracy']['sum']
+        accuracy['users'] += delta['accuracy']['users']
+        for bucket, count in delta['accuracy']['histogram'].items():
+            accuracy['histogram'][int(bucket)] += count
+
+        for subject, changes in delta['subjects'].items():
+            tally = state['subjects'].setdefault(subject, {'users': 0, 'sessions': 0, 'accuracy_sum': 0.0})
+            for field, amount in changes.items():
+                tally[field] += amount
+
+        for day, count in delta['active_days'].items():
+            self._adjust_day(state['active_days'], day, count)
+
+        for session_day, changes in delta['session_days'].items():
+            day = state['session_days'].setdefault(session_day, {'users': 0, 'low_accuracy': 0})
+            day['users'] += changes['users']
+            day['low_accuracy'] += changes['low_accuracy']
+            if day['users'] == 0 and day['low_accuracy'] == 0:
+                del state['session_days'][session_day]
+
+    @staticmethod
+    def _adjust_day(days: Dict[str, int], day: str, amount: int):
+        days[day] = days.get(day, 0) + amount
+        if days[day] == 0:
+            del days[day]
+
+    @staticmethod
+    def _engagement_band(score: float) -> str:
+        if score >= 70:
+            return 'high'
+        if score >= 40:
+            return 'medium'
+        return 'low'
+
+    @staticmethod
+    def _accuracy_bucket(accuracy: float) -> int:
+        return min(max(int(accuracy / ACCURACY_BUCKET_WIDTH), 0), ACCURACY_BUCKETS - 1)
+
+    # Views
+
+    def avg_accuracy(self) -> float:
+        accuracy = self.state['accuracy']
+        return accuracy['sum'] / accuracy['users'] if accuracy['users'] > 0 else 0
+
+    def active_users(self, today: date, days: int = 7) -> int:
+        """Users whose latest update was within the last `days` days"""
+        cutoff = (today - timedelta(days=days)).isoformat()
+        return sum(count for day, count in self.state['active_days'].items() if day >= cutoff)
+
+    def at_risk_users(self, today: date, inactive_days: int = 14, recent_days: int = 7) -> int:
+        """Users rated high risk: no sessions, no session in over `inactive_days`, or a low recent
+        accuracy while still active within `recent_days` (in between they count as medium risk)"""
+        inactive_cutoff = (today - timedelta(days=inactive_days)).isoformat()
+        recent_cutoff = (today - timedelta(days=recent_days)).isoformat()
+        with_sessions = 0
+        at_risk = 0
+        for day, counts in self.state['session_days'].items():
+            with_sessions += counts['users']
+            if day < inactive_cutoff:
+                at_risk += counts['users']
+            elif day >= recent_cutoff:
+                at_risk += counts['low_accuracy']
+        return at_risk + self.state['users'] - with_sessions
+
+    def engagement_summary(self) -> Dict:
+        engagement = self.state['engagement']
+        if self.state['users'] <= 0:
+            return {'avg_engagement': 0, 'distribution': {}}
+        return {
+            'avg_engagement': round(engagement['score_sum'] / self.state['users'], 1),
+            'distribution': dict(engagement['bands'])
+        }
+
+    def _accuracy_quantile(self, fraction: float) -> float:
+        """Quantile of per-user average accuracy, interpolated within a histogram bucket"""
+        histogram = self.state['accuracy']['histogram']
+        total = self.state['accuracy']['users']
+        position = min(max(fraction * (total + 1), 1), total)
+        cumulative = 0
+        for bucket, count in enumerate(histogram):
+            if count and cumulative + count >= position:
+                value = (bucket + (position - cumulative) / count) * ACCURACY_BUCKET_WIDTH
+                return min(value, 100.0)
+            cumulative += count
+        return 0.0
+
+    def performance_distribution(self) -> Dict:
+        if self.state['accuracy']['users'] <= 0:
+            return {'distribution': {}, 'percentiles': {}}
+
+        histogram = self.state['accuracy']['histogram']
+
+        def band(low: float, high: float) -> int:
+            return sum(histogram[self._accuracy_bucket(low):self._accuracy_bucket(high)])
+
+        return {
+            'distribution': {
+                'excellent': band(85, 100) + histogram[-1],
+                'good': band(70, 85),
+                'fair': band(55, 70),
+                'needs_improvement': band(0, 55)
+            },
+            'percentiles': {
+                '25th': round(self._accuracy_quantile(0.25), 1),
+                '50th': round(self._accuracy_quantile(0.5), 1),
+                '75th': round(self._accuracy_quantile(0.75), 1),
+                '90th': round(self._accuracy_quantile(0.9), 1)
+            }
+        }
+
+    def subject_popularity(self, limit: int = 10) -> List[Dict]:
+        popularity_list = [
+            {
+                'subject': subject,
+                'users': tally['users'],
+                'sessions': tally['sessions'],
+                'avg_accuracy': round(tally['accuracy_sum'] / tally['sessions'], 1) if tally['sessions'] else 0
+            }
+            for subject, tally in self.state['subjects'].items()
+        ]
+        popularity_list.sort(key=lambda x: x['sessions'], reverse=True)
+        return popularity_list[:limit]
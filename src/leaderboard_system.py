@@ -3,13 +3,17 @@ Leaderboard and Social Learning System for NeuroPulse
 Implements per-topic and global rankings with ADHD-friendly gamification
 """
 
-import json
 import math
-from datetime import datetime, timedelta
+import time
+from datetime import date, datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from enum import Enum
 import logging
 
+from record_store import record_store
+from ranking_index import DecayedCounters, RankedBoard
+from similarity_index import SimilarityIndex
+
 logger = logging.getLogger(__name__)
 
 class LeaderboardType(Enum):
@@ -23,44 +27,65 @@ class LeaderboardType(Enum):
 class LeaderboardEngine:
     """Advanced leaderboard system with social learning features"""
     
+    # Period boards rank by XP earned inside the window, merged from per-day buckets
+    PERIOD_TIMEFRAMES = ['daily', 'weekly', 'monthly', 'rolling_7d']
+    RANKED_TIMEFRAMES = ['all_time', 'streak', 'accuracy']
+    TIMEFRAMES = PERIOD_TIMEFRAMES + RANKED_TIMEFRAMES
+    SCORE_RETENTION_DAYS = 62
+    PERIOD_SYNC_SECONDS = 15    # how stale period boards may get relative to other workers' scores
+    PERIOD_SYNC_OVERLAP = 60    # re-read window covering clock skew and transactions still committing
+    TRENDING_HALF_LIFE_DAYS = 7
+    
+    # Entry field each ranked board sorts by; subject entries carry subject_* fields
+    SCORE_KEYS = {
+        'global': {'all_time': 'points', 'streak': 'streak', 'accuracy': 'accuracy'},
+        'subject': {'all_time': 'subject_xp', 'streak': 'subject_streak', 'accuracy': 'subject_accuracy'}
+    }
+    
     def __init__(self):
         self.leaderboards = {}
         self.user_stats = {}
+        self.daily_scores = {}  # 'YYYY-MM-DD:user_id' -> {category: xp earned that day}
+        self._period_totals = {timeframe: {} for timeframe in self.PERIOD_TIMEFRAMES}  # -> {category: {user_id: xp}}
+        self._period_views = {}  # timeframe -> (first_day, last_day) its boards were built for
+        self._period_synced_at = 0.0  # epoch of the last read of day buckets from the store
         self.achievements = {}
         self.social_interactions = {}
+        self.similar_learners = SimilarityIndex()  # user_id -> MinHash of the subjects they study
+        self.subject_activity = {}  # subject -> {'sessions', 'learners', 'weight', 'updated'}
+        self.trending = DecayedCounters(self.TRENDING_HALF_LIFE_DAYS * 86400)
+        self.data_file = 'data/leaderboard_data.json'
         self.load_data()
     
     def load_data(self):
         """Load leaderboard and social data"""
-        try:
-            with open('data/leaderboard_data.json', 'r') as f:
-                data = json.load(f)
-                self.leaderboards = data.get('leaderboards', {})
-                self.user_stats = data.get('user_stats', {})
-                self.achievements = data.get('achievements', {})
-                self.social_interactions = data.get('social_interactions', {})
-        except FileNotFoundError:
-            self.leaderboards = {}
-            self.user_stats = {}
-            self.achievements = {}
-            self.social_interactions = {}
-            self._initialize_default_leaderboards()
+        self.user_stats = self._load_section('user_stats')
+        self.achievements = self._load_section('achievements')
+        self.social_interactions = self._load_section('social_interactions')
+        self._initialize_default_leaderboards()
+        self._rebuild_leaderboards()
+        self.similar_learners = SimilarityIndex()
+        for user_id, user_stats in self.user_stats.items():
+            self.similar_learners.update(user_id, user_stats.get('subjects', {}))
+        self._load_subject_activity()
+        self._period_views = {}
+        self._refresh_period_views()
     
     def save_data(self):
         """Save leaderboard and social data"""
-        import os
-        os.makedirs('data', exist_ok=True)
-        
-        data = {
-            'leaderboards': self.leaderboards,
-            'user_stats': self.user_stats,
-            'achievements': self.achievements,
-            'social_interactions': self.social_interactions,
-            'last_updated': datetime.now().isoformat()
-        }
-        
-        with open('data/leaderboard_data.json', 'w') as f:
-            json.dump(data, f, indent=2, default=str)
+        # Rankings are derived from user_stats and rebuilt on load, so they are not persisted;
+        # daily score buckets are written one record at a time by _record_period_score
+        self._save_section('user_stats', self.user_stats)
+        self._save_section('achievements', self.achievements)
+        self._save_section('social_interactions', self.social_interactions)
+    
+    def _load_section(self, section: str) -> dict:
+        """Load one section of the legacy data file as a record store collection"""
+        return record_store.load_collection(f'{self.data_file}#{section}', {}, self.data_file, section)
+    
+    def _save_section(self, section: str, data: dict):
+        """Persist only the changed records of one section"""
+        record_store.save_collection(f'{self.data_file}#{section}', data)
     
     def _initialize_default_leaderboards(self):
         """Initialize default leaderboard categories"""
@@ -71,14 +96,182 @@ class LeaderboardEngine:
         ]
         
         for category in categories:
-            self.leaderboards[category] = {
-                'daily': [],
-                'weekly': [],
-                'monthly': [],
-                'all_time': [],
-                'streak': [],
-                'accuracy': []
-            }
+            self._get_category_boards(category)
+    
+    def _get_category_boards(self, category: str) -> Dict[str, RankedBoard]:
+        """Get or create the ranked boards of one category"""
+        if category not in self.leaderboards:
+            self.leaderboards[category] = {timeframe: RankedBoard() for timeframe in self.TIMEFRAMES}
+        return self.leaderboards[category]
+    
+    def _rebuild_leaderboards(self):
+        """Rebuild the all-time, streak and accuracy boards from user_stats - O(n log n)"""
+        for user_id, user_stats in self.user_stats.items():
+            self._update_leaderboard_category('global', self._build_user_entry(user_id), self.RANKED_TIMEFRAMES)
+            for subject in user_stats.get('subjects', {}):
+                self._update_leaderboard_category(subject, self._build_subject_entry(user_id, subject),
+                                                  self.RANKED_TIMEFRAMES)
+    
+    def _load_subject_activity(self):
+        """Restore the decayed per-subject session counters behind trending subjects"""
+        self.subject_activity = self._load_section('subject_activity')
+        if not self.subject_activity and self.user_stats:
+            # First run with existing users: count each subject's sessions as of its last activity
+            now = datetime.now()
+            decay = math.log(2) / (self.TRENDING_HALF_LIFE_DAYS * 86400)
+            for user_stats in self.user_stats.values():
+                for subject, stats in user_stats.get('subjects', {}).items():
+                    last_active = datetime.fromisoformat(stats.get('last_active', user_stats['last_active']))
+                    weight = stats['sessions'] * math.exp(-decay * max(0.0, (now - last_active).total_seconds()))
+                    activity = self.subject_activity.setdefault(
+                        subject, {'sessions': 0, 'learners': 0, 'weight': 0.0, 'updated': now.timestamp()})
+                    activity['sessions'] += stats['sessions']
+                    activity['learners'] += 1
+                    activity['weight'] += weight
+            record_store.save_records(f'{self.data_file}#subject_activity', self.subject_activity)
+        self.trending.restore({subject: (activity['weight'], activity['updated'])
+                               for subject, activity in self.subject_activity.items()})
+    
+    def _record_subject_activity(self, subject: str, new_learner: bool):
+        """Count one session towards a subject's trending score - O(1) apart from the record write"""
+        now = datetime.now().timestamp()
+        
+        def add_session(activity):
+            elapsed = max(0.0, now - activity['updated'])
+            activity['sessions'] += 1
+            activity['learners'] += int(new_learner)
+            activity['weight'] = activity['weight'] * math.exp(-self.trending.rate * elapsed) + 1.0
+            activity['updated'] = max(now, activity['updated'])
+            return activity
+        
+        # Decay and increment the stored counters in one transaction so sessions other
+        # workers counted are kept, then take the merged value as the local one
+        activity = record_store.update_record(
+            f'{self.data_file}#subject_activity', subject, add_session,
+            default={'sessions': 0, 'learners': 0, 'weight': 0.0, 'updated': now})
+        self.subject_activity[subject] = activity
+        self.trending.set(subject, activity['weight'], activity['updated'])
+    
+    def _score_keys(self, category: str) -> Dict[str, str]:
+        return self.SCORE_KEYS['global' if category == 'global' else 'subject']
+    
+    def _period_range(self, timeframe: str, today: date) -> Tuple[date, date]:
+        """First and last day covered by a period board"""
+        if timeframe == 'daily':
+            return today, today
+        if timeframe == 'weekly':
+            week_start = today - timedelta(days=today.weekday())
+            return week_start, week_start + timedelta(days=6)
+        if timeframe == 'monthly':
+            return today.replace(day=1), today
+        return today - timedelta(days=6), today  # rolling_7d
+    
+    def _refresh_period_views(self):
+        """Re-merge period boards whose window moved and pick up other workers' recent scores"""
+        today = date.today()
+        stale = [timeframe for timeframe in self.PERIOD_TIMEFRAMES
+                 if self._period_views.get(timeframe) != self._period_range(timeframe, today)]
+        if not stale:
+            if time.time() - self._period_synced_at >= self.PERIOD_SYNC_SECONDS:
+                self._sync_daily_scores()
+            return
+        
+        # Reload so buckets written by other workers are included, then drop expired days
+        self._period_synced_at = time.time()
+        self.daily_scores = self._load_section('daily_scores')
+        self._prune_daily_scores(today)
+        
+        for timeframe in stale:
+            first_day, last_day = self._period_range(timeframe, today)
+            first_key, last_key = first_day.isoformat(), last_day.isoformat()
+            
+            totals = {}
+            for record_key, scores in self.daily_scores.items():
+                day, user_id = record_key[:10], record_key[11:]
+                if first_key <= day <= last_key:
+                    for category, xp in scores.items():
+                        category_totals = totals.setdefault(category, {})
+                        category_totals[user_id] = category_totals.get(user_id, 0) + xp
+            self._period_totals[timeframe] = totals
+            
+            for boards in self.leaderboards.values():
+                boards[timeframe].clear()
+            for category, category_totals in totals.items():
+                board = self._get_category_boards(category)[timeframe]
+                for user_id, xp in category_totals.items():
+                    entry = self._build_category_entry(user_id, category)
+                    if entry is not None:
+                        board.upsert(user_id, xp, dict(entry, period_xp=xp))
+            
+            self._period_views[timeframe] = (first_day, last_day)
+    
+    def _sync_daily_scores(self):
+        """Apply day buckets other workers wrote since the last sync - cost follows the changes, not the history"""
+        since = self._period_synced_at - self.PERIOD_SYNC_OVERLAP
+        self._period_synced_at = time.time()
+        changed = {record_key: scores
+                   for record_key, scores in record_store.load_changed(f'{self.data_file}#daily_scores', since).items()
+                   if self.daily_scores.get(record_key) != scores}
+        if not changed:
+            return
+        
+        # Scores come with stats the other worker saved; refresh those users before re-ranking them
+        user_ids = {record_key[11:] for record_key in changed}
+        for user_id, user_stats in record_store.load_records(f'{self.data_file}#user_stats', user_ids).items():
+            self.user_stats[user_id] = user_stats
+            self.similar_learners.update(user_id, user_stats.get('subjects', {}))
+            self._update_leaderboard_category('global', self._build_user_entry(user_id), self.RANKED_TIMEFRAMES)
+            for subject in user_stats.get('subjects', {}):
+                self._update_leaderboard_category(subject, self._build_subject_entry(user_id, subject),
+                                                  self.RANKED_TIMEFRAMES)
+        
+        for record_key, scores in changed.items():
+            self._apply_day_bucket(record_key, scores)
+    
+    def _apply_day_bucket(self, record_key: str, scores: Dict[str, int]):
+        """Replace one day bucket, moving its difference into every period board covering that day"""
+        previous = self.daily_scores.get(record_key, {})
+        self.daily_scores[record_key] = scores
+        day, user_id = record_key[:10], record_key[11:]
+        
+        for category in set(scores) | set(previous):
+            delta = scores.get(category, 0) - previous.get(category, 0)
+            if not delta:
+                continue
+            entry = self._build_category_entry(user_id, category)
+            for timeframe, (first_day, last_day) in self._period_views.items():
+                if not first_day.isoformat() <= day <= last_day.isoformat():
+                    continue
+                category_totals = self._period_totals[timeframe].setdefault(category, {})
+                period_xp = category_totals.get(user_id, 0) + delta
+                category_totals[user_id] = period_xp
+                if entry is not None:
+                    self._get_category_boards(category)[timeframe].upsert(
+                        user_id, period_xp, dict(entry, period_xp=period_xp))
+    
+    def _prune_daily_scores(self, today: date):
+        """Delete day buckets older than every period window"""
+        cutoff = (today - timedelta(days=self.SCORE_RETENTION_DAYS)).isoformat()
+        expired = [record_key for record_key in self.daily_scores if record_key[:10] < cutoff]
+        for record_key in expired:
+            del self.daily_scores[record_key]
+        if expired:
+            record_store.save_records(f'{self.data_file}#daily_scores', {}, deleted=expired)
+    
+    def _record_period_score(self, user_id: str, subject: str, xp_earned: int):
+        """Add XP to today's bucket and to the running period totals"""
+        self._refresh_period_views()
+        
+        def add_xp(scores):
+            for category in {'global', subject}:
+                scores[category] = scores.get(category, 0) + xp_earned
+            return scores
+        
+        # The increment runs inside one store transaction, so XP that other workers add
+        # to the same user's bucket is kept; the stored result may include theirs too
+        record_key = f"{date.today().isoformat()}:{user_id}"
+        scores = record_store.update_record(f'{self.data_file}#daily_scores', record_key, add_xp, default={})
+        self._apply_day_bucket(record_key, scores)
     
     def update_user_performance(self, user_id: str, username: str, subject: str, 
                               session_data: Dict) -> Dict:
@@ -101,72 +294,74 @@ class LeaderboardEngine:
                 'level': 1
             }
         
-        user_stats = self.user_stats[user_id]
-        
-        # Update username in case it changed
-        user_stats['username'] = username
-        
-        # Initialize subject stats if needed
-        if subject not in user_stats['subjects']:
-            user_stats['subjects'][subject] = {
-                'sessions': 0,
-                'questions': 0,
-                'correct': 0,
-                'streak': 0,
-                'level': 1,
-                'xp': 0,
-                'best_accuracy': 0,
-                'total_time': 0
-            }
-        
-        subject_stats = user_stats['subjects'][subject]
-        
-        # Extract session performance
-        questions_answered = len(session_data.get('questions', []))
-        correct_answers = session_data.get('correct_answers', 0)
-        session_accuracy = (correct_answers / questions_answered * 100) if questions_answered > 0 else 0
-        confidence_ratings = session_data.get('confidence_ratings', [])
-        avg_confidence = sum(r.get('confidence', 3) for r in confidence_ratings) / len(confidence_ratings) if confidence_ratings else 3
-        
-        # Update global stats
-        user_stats['total_sessions'] += 1
-        user_stats['total_questions'] += questions_answered
-        user_stats['total_correct'] += correct_answers
-        user_stats['last_active'] = datetime.now().isoformat()
-        
-        # Update streak
-        if session_accuracy >= 70:  # 70% threshold for streak continuation
-            user_stats['current_streak'] += 1
-            subject_stats['streak'] += 1
-            if user_stats['current_streak'] > user_stats['longest_streak']:
-                user_stats['longest_streak'] = user_stats['current_streak']
-        else:
-            user_stats['current_streak'] = 0
-            subject_stats['streak'] = 0
-        
-        # Update subject stats
-        subject_stats['sessions'] += 1
-        subject_stats['questions'] += questions_answered
-        subject_stats['correct'] += correct_answers
-        if session_accuracy > subject_stats['best_accuracy']:
-            subject_stats['best_accuracy'] = session_accuracy
-        
-        # Calculate XP and points
-        xp_earned = self._calculate_xp(session_data, session_accuracy, avg_confidence)
-        subject_stats['xp'] += xp_earned
-        user_stats['points'] += xp_earned
-        
-        # Update level based on XP
-        subject_stats['level'] = self._calculate_level(subject_stats['xp'])
-        user_stats['level'] = self._calculate_level(user_stats['points'])
-        
-        # Update leaderboards
-        self._update_leaderboard_rankings(user_id, subject, session_data, session_accuracy)
-        
-        # Check for new achievements
-        new_achievements = self._check_achievements(user_id, subject, session_data, session_accuracy)
-        
-        self.save_data()
+        with record_store.editing(f'{self.data_file}#user_stats', self.user_stats, user_id) as user_stats:
+            # Update username in case it changed
+            user_stats['username'] = username
+            
+            # Initialize subject stats if needed
+            new_learner = subject not in user_stats['subjects']
+            if new_learner:
+                user_stats['subjects'][subject] = {
+                    'sessions': 0,
+                    'questions': 0,
+                    'correct': 0,
+                    'streak': 0,
+                    'level': 1,
+                    'xp': 0,
+                    'best_accuracy': 0,
+                    'total_time': 0
+                }
+                self.similar_learners.update(user_id, user_stats['subjects'])
+            
+            subject_stats = user_stats['subjects'][subject]
+            
+            # Extract session performance
+            questions_answered = len(session_data.get('questions', []))
+            correct_answers = session_data.get('correct_answers', 0)
+            session_accuracy = (correct_answers / questions_answered * 100) if questions_answered > 0 else 0
+            confidence_ratings = session_data.get('confidence_ratings', [])
+            avg_confidence = sum(r.get('confidence', 3) for r in confidence_ratings) / len(confidence_ratings) if confidence_ratings else 3
+            
+            # Update global stats
+            user_stats['total_sessions'] += 1
+            user_stats['total_questions'] += questions_answered
+            user_stats['total_correct'] += correct_answers
+            user_stats['last_active'] = datetime.now().isoformat()
+            subject_stats['last_active'] = user_stats['last_active']
+            
+            # Update streak
+            if session_accuracy >= 70:  # 70% threshold for streak continuation
+                user_stats['current_streak'] += 1
+                subject_stats['streak'] += 1
+                if user_stats['current_streak'] > user_stats['longest_streak']:
+                    user_stats['longest_streak'] = user_stats['current_streak']
+            else:
+                user_stats['current_streak'] = 0
+                subject_stats['streak'] = 0
+            
+            # Update subject stats
+            subject_stats['sessions'] += 1
+            subject_stats['questions'] += questions_answered
+            subject_stats['correct'] += correct_answers
+            if session_accuracy > subject_stats['best_accuracy']:
+                subject_stats['best_accuracy'] = session_accuracy
+            
+            # Calculate XP and points
+            xp_earned = self._calculate_xp(session_data, session_accuracy, avg_confidence)
+            subject_stats['xp'] += xp_earned
+            user_stats['points'] += xp_earned
+            
+            # Update level based on XP
+            subject_stats['level'] = self._calculate_level(subject_stats['xp'])
+            user_stats['level'] = self._calculate_level(user_stats['points'])
+            
+            # Update leaderboards
+            self._record_period_score(user_id, subject, xp_earned)
+            self._record_subject_activity(subject, new_learner)
+            self._update_leaderboard_rankings(user_id, subject, session_data, session_accuracy)
+            
+            # Check for new achievements
+            new_achievements = self._check_achievements(user_id, subject, session_data, session_accuracy)
         
         return {
             'xp_earned': xp_earned,
@@ -210,10 +405,27 @@ class LeaderboardEngine:
     
     def _update_leaderboard_rankings(self, user_id: str, subject: str, session_data: Dict, accuracy: float):
         """Update all relevant leaderboard rankings"""
-        user_stats = self.user_stats[user_id]
+        # Update global leaderboards
+        self._update_leaderboard_category('global', self._build_user_entry(user_id))
         
-        # Prepare user entry
-        user_entry = {
+        # Update subject-specific leaderboards
+        if subject in self.user_stats[user_id]['subjects']:
+            self._update_leaderboard_category(subject, self._build_subject_entry(user_id, subject))
+    
+    def _build_category_entry(self, user_id: str, category: str) -> Optional[Dict]:
+        """Leaderboard entry for a user in a category, or None if they have no stats there"""
+        if user_id not in self.user_stats:
+            return None
+        if category == 'global':
+            return self._build_user_entry(user_id)
+        if category not in self.user_stats[user_id].get('subjects', {}):
+            return None
+        return self._build_subject_entry(user_id, category)
+    
+    def _build_user_entry(self, user_id: str) -> Dict:
+        """Global leaderboard entry for a user"""
+        user_stats = self.user_stats[user_id]
+        return {
             'user_id': user_id,
             'username': user_stats['username'],
             'points': user_stats['points'],
@@ -221,90 +433,37 @@ class LeaderboardEngine:
             'accuracy': (user_stats['total_correct'] / user_stats['total_questions'] * 100) if user_stats['total_questions'] > 0 else 0,
             'streak': user_stats['current_streak'],
             'sessions': user_stats['total_sessions'],
-            'last_updated': datetime.now().isoformat()
+            'last_updated': user_stats['last_active']
         }
-        
-        # Update global leaderboards
-        self._update_leaderboard_category('global', user_entry)
-        
-        # Update subject-specific leaderboards
-        if subject in user_stats['subjects']:
-            subject_stats = user_stats['subjects'][subject]
-            subject_entry = {
-                'user_id': user_id,
-                'username': user_stats['username'],
-                'subject_xp': subject_stats['xp'],
-                'subject_level': subject_stats['level'],
-                'subject_accuracy': (subject_stats['correct'] / subject_stats['questions'] * 100) if subject_stats['questions'] > 0 else 0,
-                'subject_streak': subject_stats['streak'],
-                'subject_sessions': subject_stats['sessions'],
-                'last_updated': datetime.now().isoformat()
-            }
-            self._update_leaderboard_category(subject, subject_entry)
-    
-    def _update_leaderboard_category(self, category: str, user_entry: Dict):
-        """Update a specific leaderboard category"""
-        if category not in self.leaderboards:
-            self.leaderboards[category] = {
-                'daily': [], 'weekly': [], 'monthly': [], 'all_time': [], 'streak': [], 'accuracy': []
-            }
-        
-        leaderboard = self.leaderboards[category]
-        
-        # Update all-time leaderboard
-        self._update_ranking_list(leaderboard['all_time'], user_entry, 'points', 100)
-        
-        # Update streak leaderboard
-        self._update_ranking_list(leaderboard['streak'], user_entry, 'streak', 50)
-        
-        # Update accuracy leaderboard
-        self._update_ranking_list(leaderboard['accuracy'], user_entry, 'accuracy', 50)
-        
-        # Update time-based leaderboards (daily, weekly, monthly)
-        self._update_time_based_leaderboards(category, user_entry)
     
-    def _update_ranking_list(self, ranking_list: List[Dict], user_entry: Dict, sort_key: str, max_size: int):
-        """Update a ranking list with proper sorting"""
-        # Remove existing entry for this user
-        ranking_list[:] = [entry for entry in ranking_list if entry['user_id'] != user_entry['user_id']]
-        
-        # Add new entry
-        ranking_list.append(user_entry)
-        
-        # Sort by the specified key (descending)
-        ranking_list.sort(key=lambda x: x.get(sort_key, 0), reverse=True)
-        
-        # Trim to max size
-        ranking_list[:] = ranking_list[:max_size]
+    def _build_subject_entry(self, user_id: str, subject: str) -> Dict:
+        """Subject leaderboard entry for a user"""
+        user_stats = self.user_stats[user_id]
+        subject_stats = user_stats['subjects'][subject]
+        return {
+            'user_id': user_id,
+            'username': user_stats['username'],
+            'subject_xp': subject_stats['xp'],
+            'subject_level': subject_stats['level'],
+            'subject_accuracy': (subject_stats['correct'] / subject_stats['questions'] * 100) if subject_stats['questions'] > 0 else 0,
+            'subject_streak': subject_stats['streak'],
+            'subject_sessions': subject_stats['sessions'],
+            'last_updated': subject_stats.get('last_active', user_stats['last_active'])
+        }
     
-    def _update_time_based_leaderboards(self, category: str, user_entry: Dict):
-        """Update time-based leaderboards (daily, weekly, monthly)"""
-        now = datetime.now()
-        
-        # Daily leaderboard (resets daily)
-        daily_key = now.strftime('%Y-%m-%d')
-        if not hasattr(self, '_daily_reset') or self._daily_reset != daily_key:
-            self.leaderboards[category]['daily'] = []
-            self._daily_reset = daily_key
-        
-        self._update_ranking_list(self.leaderboards[category]['daily'], user_entry, 'points', 50)
-        
-        # Weekly leaderboard (resets weekly)
-        week_start = now - timedelta(days=now.weekday())
-        weekly_key = week_start.strftime('%Y-%W')
-        if not hasattr(self, '_weekly_reset') or self._weekly_reset != weekly_key:
-            self.leaderboards[category]['weekly'] = []
-            self._weekly_reset = weekly_key
-        
-        self._update_ranking_list(self.leaderboards[category]['weekly'], user_entry, 'points', 50)
-        
-        # Monthly leaderboard (resets monthly)
-        monthly_key = now.strftime('%Y-%m')
-        if not hasattr(self, '_monthly_reset') or self._monthly_reset != monthly_key:
-            self.leaderboards[category]['monthly'] = []
-            self._monthly_reset = monthly_key
-        
-        self._update_ranking_list(self.leaderboards[category]['monthly'], user_entry, 'points', 50)
+    def _update_leaderboard_category(self, category: str, user_entry: Dict, timeframes: List[str] = None):
+        """Upsert a user into the boards of a category - O(log n) per board"""
+        boards = self._get_category_boards(category)
+        score_keys = self._score_keys(category)
+        user_id = user_entry['user_id']
+        
+        for timeframe in timeframes or self.TIMEFRAMES:
+            if timeframe in score_keys:
+                boards[timeframe].upsert(user_id, user_entry.get(score_keys[timeframe], 0), user_entry)
+                continue
+            period_xp = self._period_totals[timeframe].get(category, {}).get(user_id)
+            if period_xp is not None:
+                boards[timeframe].upsert(user_id, period_xp, dict(user_entry, period_xp=period_xp))
     
     def _check_achievements(self, user_id: str, subject: str, session_data: Dict, accuracy: float) -> List[Dict]:
         """Check and award new achievements"""
@@ -370,21 +529,21 @@ class LeaderboardEngine:
     
     def get_leaderboard(self, category: str = 'global', timeframe: str = 'all_time', limit: int = 50) -> Dict:
         """Get leaderboard data for display"""
+        self._refresh_period_views()
+        
         if category not in self.leaderboards:
             return {'rankings': [], 'total_users': 0, 'category': category, 'timeframe': timeframe}
         
         if timeframe not in self.leaderboards[category]:
             timeframe = 'all_time'
         
-        rankings = self.leaderboards[category][timeframe][:limit]
-        
-        # Add rank numbers
-        for i, entry in enumerate(rankings):
-            entry['rank'] = i + 1
+        board = self.leaderboards[category][timeframe]
+        rankings = [dict(entry, rank=rank) for rank, entry in board.top(limit)]
         
         return {
             'rankings': rankings,
             'total_users': len(self.user_stats),
+            'ranked_users': len(board),
             'category': category,
             'timeframe': timeframe,
             'last_updated': datetime.now().isoformat()
@@ -392,18 +551,33 @@ class LeaderboardEngine:
     
     def _get_user_position(self, user_id: str, subject: str = 'global') -> Dict:
         """Get user's position in various leaderboards"""
-        positions = {}
+        self._refresh_period_views()
         
-        if subject in self.leaderboards:
-            for timeframe, rankings in self.leaderboards[subject].items():
-                for i, entry in enumerate(rankings):
-                    if entry['user_id'] == user_id:
-                        positions[timeframe] = i + 1
-                        break
-                else:
-                    positions[timeframe] = None
+        if subject not in self.leaderboards:
+            return {}
         
-        return positions
+        return {timeframe: board.rank(user_id) for timeframe, board in self.leaderboards[subject].items()}
+    
+    def get_users_around(self, user_id: str, category: str = 'global', timeframe: str = 'all_time',
+                         radius: int = 5) -> Dict:
+        """Get the users ranked just above and below a user"""
+        self._refresh_period_views()
+        
+        if category not in self.leaderboards:
+            return {'rankings': [], 'user_rank': None, 'category': category, 'timeframe': timeframe}
+        
+        if timeframe not in self.leaderboards[category]:
+            timeframe = 'all_time'
+        
+        board = self.leaderboards[category][timeframe]
+        
+        return {
+            'rankings': [dict(entry, rank=rank) for rank, entry in board.around(user_id, radius)],
+            'user_rank': board.rank(user_id),
+            'ranked_users': len(board),
+            'category': category,
+            'timeframe': timeframe
+        }
     
     def get_user_analytics(self, user_id: str) -> Dict:
         """Get comprehensive analytics for a user"""
@@ -482,55 +656,33 @@ class LeaderboardEngine:
         user_subjects = set(self.user_stats[user_id].get('subjects', {}).keys())
         similar_users = []
         
-        for other_id, other_stats in self.user_stats.items():
-            if other_id == user_id:
-                continue
-            
-            other_subjects = set(other_stats.get('subjects', {}).keys())
-            
-            # Calculate similarity based on shared subjects
-            if user_subjects and other_subjects:
-                similarity = len(user_subjects.intersection(other_subjects)) / len(user_subjects.union(other_subjects))
-                
-                if similarity > 0.3:  # At least 30% similarity
-                    similar_users.append({
-                        'user_id': other_id,
-                        'username': other_stats['username'],
-                        'level': other_stats['level'],
-                        'shared_subjects': list(user_subjects.intersection(other_subjects)),
-                        'similarity': round(similarity, 2)
-                    })
-        
-        # Sort by similarity
-        similar_users.sort(key=lambda x: x['similarity'], reverse=True)
-        return similar_users[:limit]
+        # Candidates come from the users sharing a MinHash band, then rank by exact Jaccard
+        for other_id, similarity in self.similar_learners.query(user_subjects, limit, threshold=0.3,
+                                                                 exclude=user_id):
+            other_stats = self.user_stats[other_id]
+            similar_users.append({
+                'user_id': other_id,
+                'username': other_stats['username'],
+                'level': other_stats['level'],
+                'shared_subjects': list(user_subjects.intersection(other_stats['subjects'])),
+                'similarity': round(similarity, 2)
+            })
+        
+        return similar_users
     
     def _get_trending_subjects(self, limit: int = 5) -> List[Dict]:
-        """Get currently trending subjects"""
-        subject_activity = {}
-        
-        # Count recent activity per subject
-        for user_stats in self.user_stats.values():
-            for subject, stats in user_stats.get('subjects', {}).items():
-                if subject not in subject_activity:
-                    subject_activity[subject] = {'sessions': 0, 'users': 0}
-                
-                subject_activity[subject]['sessions'] += stats['sessions']
-                subject_activity[subject]['users'] += 1
-        
-        # Calculate trending score
+        """Get currently trending subjects: sessions decayed with a one-week half-life"""
         trending = []
-        for subject, activity in subject_activity.items():
-            trending_score = activity['sessions'] * math.log(activity['users'] + 1)
+        for subject, activity_score in self.trending.top(limit, datetime.now().timestamp()):
+            activity = self.subject_activity[subject]
             trending.append({
                 'subject': subject,
-                'activity_score': trending_score,
+                'activity_score': round(activity_score, 2),
                 'total_sessions': activity['sessions'],
-                'active_users': activity['users']
+                'active_users': activity['learners']
             })
         
-        trending.sort(key=lambda x: x['activity_score'], reverse=True)
-        return trending[:limit]
+        return trending
     
     def _get_study_group_recommendations(self, user_id: str) -> List[Dict]:
         """Get study group recommendations"""
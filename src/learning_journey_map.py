@@ -3,13 +3,14 @@ Interactive Learning Journey Map for NeuroPulse
 Visual progress tracking with milestone-based learning paths
 """
 
-import json
 import math
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple, Any
 from enum import Enum
 import logging
 
+from record_store import record_store
+
 logger = logging.getLogger(__name__)
 
 class MilestoneType(Enum):
@@ -35,42 +36,33 @@ class LearningJourneyEngine:
         self.learning_paths = {}
         self.progress_tracking = {}
         self.subject_hierarchies = {}
+        self.data_file = 'data/learning_journey_data.json'
         self.load_data()
         self.initialize_subject_hierarchies()
     
     def load_data(self):
         """Load learning journey data from storage"""
-        try:
-            with open('data/learning_journey_data.json', 'r') as f:
-                data = json.load(f)
-                self.journey_maps = data.get('journey_maps', {})
-                self.milestones = data.get('milestones', {})
-                self.learning_paths = data.get('learning_paths', {})
-                self.progress_tracking = data.get('progress_tracking', {})
-                self.subject_hierarchies = data.get('subject_hierarchies', {})
-        except FileNotFoundError:
-            self.journey_maps = {}
-            self.milestones = {}
-            self.learning_paths = {}
-            self.progress_tracking = {}
-            self.subject_hierarchies = {}
+        self.journey_maps = self._load_section('journey_maps')
+        self.milestones = self._load_section('milestones')
+        self.learning_paths = self._load_section('learning_paths')
+        self.progress_tracking = self._load_section('progress_tracking')
+        self.subject_hierarchies = self._load_section('subject_hierarchies')
     
     def save_data(self):
         """Save learning journey data to storage"""
-        import os
-        os.makedirs('data', exist_ok=True)
-        
-        data = {
-            'journey_maps': self.journey_maps,
-            'milestones': self.milestones,
-            'learning_paths': self.learning_paths,
-            'progress_tracking': self.progress_tracking,
-            'subject_hierarchies': self.subject_hierarchies,
-            'last_updated': datetime.now().isoformat()
-        }
-        
-        with open('data/learning_journey_data.json', 'w') as f:
-            json.dump(data, f, indent=2, default=str)
+        self._save_section('journey_maps', self.journey_maps)
+        self._save_section('milestones', self.milestones)
+        self._save_section('learning_paths', self.learning_paths)
+        self._save_section('progress_tracking', self.progress_tracking)
+        self._save_section('subject_hierarchies', self.subject_hierarchies)
+    
+    def _load_section(self, section: str) -> dict:
+        """Load one section of the legacy data file as a record store collection"""
+        return record_store.load_collection(f'{self.data_file}#{section}', {}, self.data_file, section)
+    
+    def _save_section(self, section: str, data: dict):
+        """Persist only the changed records of one section"""
+        record_store.save_collection(f'{self.data_file}#{section}', data)
     
     def initialize_subject_hierarchies(self):
         """Initialize comprehensive subject learning hierarchies"""
@@ -3,13 +3,13 @@ Learning Management System Integration for NeuroPulse
 Provides enterprise-grade course management, assignment tracking, and institutional features
 """
 
-import json
-import os
 import uuid
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from enum import Enum
 
+from record_store import record_store
+
 class CourseStatus(Enum):
     DRAFT = "draft"
     PUBLISHED = "published" 
@@ -48,19 +48,60 @@ class LMSManager:
         self.gradebook = self._load_json_file(self.gradebook_file, {})
         self.institutions = self._load_json_file(self.institutions_file, {})
         self.learning_paths = self._load_json_file(self.learning_paths_file, {})
+        self._build_indexes()
+    
+    def _build_indexes(self):
+        """Build lookup indexes over courses, enrollments, gradebook and submissions"""
+        self.institution_courses = {}   # institution_id -> {course_id}
+        self.course_enrollments = {}    # course_id -> {enrollment_id}
+        self.student_gradebook = {}     # student_id -> {gradebook_key}
+        self.student_last_submission = {}  # student_id -> latest submitted_at (ISO)
+        # Bumped on every enrollment, submission and grade change so report caches can tell they are stale
+        self.data_version = 0
+        
+        for course_id, course in self.courses.items():
+            self.institution_courses.setdefault(course.get('institution_id'), set()).add(course_id)
+        for enrollment_id, enrollment in self.enrollments.items():
+            self.course_enrollments.setdefault(enrollment['course_id'], set()).add(enrollment_id)
+        for gradebook_key, entry in self.gradebook.items():
+            self.student_gradebook.setdefault(entry['student_id'], set()).add(gradebook_key)
+        for assignment in self.assignments.values():
+            for submission in assignment.get('submissions', {}).values():
+                self._index_submission(submission)
+    
+    def _index_submission(self, submission: dict):
+        student_id = submission['student_id']
+        if submission['submitted_at'] > self.student_last_submission.get(student_id, ''):
+            self.student_last_submission[student_id] = submission['submitted_at']
+    
+    def get_course_enrollments(self, course_id: str, status: str = 'active') -> List[dict]:
+        """Enrollments of a course, optionally filtered by status"""
+        enrollments = (self.enrollments[eid] for eid in self.course_enrollments.get(course_id, ()))
+        return [e for e in enrollments if status is None or e['status'] == status]
+    
+    def get_institution_student_ids(self, institution_id: str) -> set:
+        """Students with an active enrollment in any course of an institution"""
+        student_ids = set()
+        for course_id in self.institution_courses.get(institution_id, ()):
+            student_ids.update(e['student_id'] for e in self.get_course_enrollments(course_id))
+        return student_ids
+    
+    def get_student_gradebook_entries(self, student_id: str) -> List[dict]:
+        """Gradebook entries of a student across all courses"""
+        return [self.gradebook[key] for key in self.student_gradebook.get(student_id, ())]
     
     def _load_json_file(self, filename: str, default: dict) -> dict:
-        """Load JSON file with fallback to default"""
-        try:
-            with open(filename, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return default
+        """Load a collection from the shared record store with fallback to default"""
+        return record_store.load_collection(filename, default)
     
-    def _save_json_file(self, filename: str, data: dict):
-        """Save data to JSON file"""
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+    def _save_json_file(self, filename: str, data: dict, record_id: str = None):
+        """Persist one record when record_id is given, otherwise only the changed records"""
+        if record_id is None:
+            record_store.save_collection(filename, data)
+        elif record_id in data:
+            record_store.save_record(filename, record_id, data[record_id])
+        else:
+            record_store.delete_record(filename, record_id)
     
     def create_institution(self, admin_id: str, institution_data: dict) -> str:
         """Create new educational institution"""
@@ -88,7 +129,7 @@ class LMSManager:
         }
         
         self.institutions[institution_id] = institution
-        self._save_json_file(self.institutions_file, self.institutions)
+        self._save_json_file(self.institutions_file, self.institutions, institution_id)
         
         return institution_id
     
@@ -128,7 +169,8 @@ class LMSManager:
         }
         
         self.courses[course_id] = course
-        self._save_json_file(self.courses_file, self.courses)
+        self.institution_courses.setdefault(course['institution_id'], set()).add(course_id)
+        self._save_json_file(self.courses_file, self.courses, course_id)
         
         return course_id
     
@@ -154,8 +196,8 @@ class LMSManager:
             'available_until': module_data.get('available_until')
         }
         
-        self.courses[course_id]['course_modules'].append(module)
-        self._save_json_file(self.courses_file, self.courses)
+        with record_store.editing(self.courses_file, self.courses, course_id) as course:
+            course['course_modules'].append(module)
         
         return module_id
     
@@ -194,7 +236,7 @@ class LMSManager:
         }
         
         self.assignments[assignment_id] = assignment
-        self._save_json_file(self.assignments_file, self.assignments)
+        self._save_json_file(self.assignments_file, self.assignments, assignment_id)
         
         return assignment_id
     
@@ -206,8 +248,7 @@ class LMSManager:
         course = self.courses[course_id]
         
         # Check enrollment limits
-        current_enrollments = len([e for e in self.enrollments.values() 
-                                 if e['course_id'] == course_id and e['status'] == 'active'])
+        current_enrollments = len(self.get_course_enrollments(course_id))
         
         if current_enrollments >= course['max_students']:
             return False
@@ -231,7 +272,9 @@ class LMSManager:
         }
         
         self.enrollments[enrollment_id] = enrollment
-        self._save_json_file(self.enrollments_file, self.enrollments)
+        self.course_enrollments.setdefault(course_id, set()).add(enrollment_id)
+        self.data_version += 1
+        self._save_json_file(self.enrollments_file, self.enrollments, enrollment_id)
         
         return True
     
@@ -240,46 +283,47 @@ class LMSManager:
         if assignment_id not in self.assignments:
             return None
         
-        assignment = self.assignments[assignment_id]
-        submission_id = str(uuid.uuid4())
-        
-        # Check if student is enrolled in course
-        course_enrollment = self._get_student_enrollment(assignment['course_id'], student_id)
-        if not course_enrollment:
-            return None
-        
-        # Check attempt limits
-        existing_submissions = [s for s in assignment['submissions'].values() 
-                              if s['student_id'] == student_id]
-        
-        if len(existing_submissions) >= assignment['attempts_allowed']:
-            return None
-        
-        submission = {
-            'id': submission_id,
-            'assignment_id': assignment_id,
-            'student_id': student_id,
-            'attempt_number': len(existing_submissions) + 1,
-            'submitted_at': datetime.now().isoformat(),
-            'answers': submission_data.get('answers', {}),
-            'time_spent_minutes': submission_data.get('time_spent_minutes', 0),
-            'score': None,
-            'percentage': None,
-            'feedback': '',
-            'graded': False,
-            'graded_at': None,
-            'graded_by': None,
-            'late_submission': self._is_late_submission(assignment),
-            'plagiarism_check': submission_data.get('plagiarism_check', {}),
-            'auto_graded': False
-        }
-        
-        # Auto-grade if enabled and it's a quiz
-        if assignment['auto_grade'] and assignment['type'] == AssignmentType.QUIZ.value:
-            submission = self._auto_grade_submission(assignment, submission)
-        
-        assignment['submissions'][submission_id] = submission
-        self._save_json_file(self.assignments_file, self.assignments)
+        with record_store.editing(self.assignments_file, self.assignments, assignment_id) as assignment:
+            submission_id = str(uuid.uuid4())
+            
+            # Check if student is enrolled in course
+            course_enrollment = self._get_student_enrollment(assignment['course_id'], student_id)
+            if not course_enrollment:
+                return None
+            
+            # Check attempt limits
+            existing_submissions = [s for s in assignment['submissions'].values() 
+                                  if s['student_id'] == student_id]
+            
+            if len(existing_submissions) >= assignment['attempts_allowed']:
+                return None
+            
+            submission = {
+                'id': submission_id,
+                'assignment_id': assignment_id,
+                'student_id': student_id,
+                'attempt_number': len(existing_submissions) + 1,
+                'submitted_at': datetime.now().isoformat(),
+                'answers': submission_data.get('answers', {}),
+                'time_spent_minutes': submission_data.get('time_spent_minutes', 0),
+                'score': None,
+                'percentage': None,
+                'feedback': '',
+                'graded': False,
+                'graded_at': None,
+                'graded_by': None,
+                'late_submission': self._is_late_submission(assignment),
+                'plagiarism_check': submission_data.get('plagiarism_check', {}),
+                'auto_graded': False
+            }
+            
+            # Auto-grade if enabled and it's a quiz
+            if assignment['auto_grade'] and assignment['type'] == AssignmentType.QUIZ.value:
+                submission = self._auto_grade_submission(assignment, submission)
+            
+            assignment['submissions'][submission_id] = submission
+            self._index_submission(submission)
+            self.data_version += 1
         
         # Update gradebook
         self._update_gradebook(assignment['course_id'], student_id, assignment_id, submission)
@@ -351,20 +395,21 @@ class LMSManager:
                 'letter_grade': None,
                 'last_updated': datetime.now().isoformat()
             }
-        
-        # Update assignment grade
-        self.gradebook[gradebook_key]['assignments'][assignment_id] = {
-            'score': submission.get('score'),
-            'percentage': submission.get('percentage'),
-            'submission_id': submission['id'],
-            'submitted_at': submission['submitted_at'],
-            'late': submission['late_submission']
-        }
-        
-        # Recalculate overall grade
-        self._calculate_overall_grade(course_id, student_id)
-        
-        self._save_json_file(self.gradebook_file, self.gradebook)
+            self.student_gradebook.setdefault(student_id, set()).add(gradebook_key)
+        
+        with record_store.editing(self.gradebook_file, self.gradebook, gradebook_key):
+            # Update assignment grade
+            self.gradebook[gradebook_key]['assignments'][assignment_id] = {
+                'score': submission.get('score'),
+                'percentage': submission.get('percentage'),
+                'submission_id': submission['id'],
+                'submitted_at': submission['submitted_at'],
+                'late': submission['late_submission']
+            }
+            
+            # Recalculate overall grade
+            self._calculate_overall_grade(course_id, student_id)
+            self.data_version += 1
     
     def _calculate_overall_grade(self, course_id: str, student_id: str):
         """Calculate student's overall course grade"""
@@ -453,7 +498,7 @@ class LMSManager:
         }
         
         self.learning_paths[path_id] = learning_path
-        self._save_json_file(self.learning_paths_file, self.learning_paths)
+        self._save_json_file(self.learning_paths_file, self.learning_paths, path_id)
         
         return path_id
     
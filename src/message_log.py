@@ -0,0 +1,418 @@
+"""
+Message Log for NeuroPulse
+Per-room append-only segment logs with an in-memory ring of recent messages
+"""
+
+import fcntl
+import json
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+
+class _RoomLog:
+    """Open state of one room: absolute message positions, segment range and the recent ring"""
+
+    def __init__(self, directory: str, ring_size: int):
+        self.directory = directory
+        self.total = 0            # messages ever appended; positions are 0..total-1
+        self.first_segment = 0    # oldest segment still on disk
+        self.ring = deque(maxlen=ring_size)  # (position, message), oldest first
+        self.ring_positions = {}  # message_id -> position, for messages in the ring
+        self.id_positions = None  # message_id -> position for every retained message, built on first lookup
+        self.id_order = deque()   # retained message ids in position order, starting at id_start
+        self.id_start = 0
+        self.offsets = {}         # segment -> bytes of it already read, for segments the ring covers
+
+
+class SegmentedMessageLog:
+    """Append-only message history per room, split into fixed-size JSON-lines segments.
+
+    Message at absolute position p lives in segment p // segment_size, so a
+    send is one line appended to one file. Edits (reactions, moderation) are
+    appended as patch lines to the segment holding the message and applied
+    when the segment is read. The newest messages are kept in a bounded ring
+    so recent history never touches disk; older pages are read lazily.
+    Retention drops whole segments once they fall out of the window.
+    Several workers can share a room: writes take a per-room file lock and
+    first read what other workers appended, so positions come from the
+    files themselves, and reads pick up new lines the same way.
+    A message-id -> position index, built on the first lookup and kept
+    current on append, turns id lookups and id-anchored pages into a
+    dictionary hit plus at most one segment read.
+    """
+
+    def __init__(self, directory: str = 'data/chat_logs', segment_size: int = 100,
+                 retention: int = 1000, ring_size: int = 200):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.retention = retention
+        self.ring_size = ring_size
+        self._rooms = {}
+        self._lock = threading.RLock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    # Room state
+
+    def _room_directory(self, room_id: str) -> str:
+        return os.path.join(self.directory, quote(room_id, safe=''))
+
+    def _segment_path(self, room: _RoomLog, segment: int) -> str:
+        return os.path.join(room.directory, f'{segment:010d}.jsonl')
+
+    def _room(self, room_id: str) -> _RoomLog:
+        room = self._rooms.get(room_id)
+        if room is not None:
+            self._sync(room)
+            return room
+
+        room = _RoomLog(self._room_directory(room_id), self.ring_size)
+        segments = []
+        if os.path.isdir(room.directory):
+            segments = sorted(int(name.split('.')[0]) for name in os.listdir(room.directory)
+                              if name.endswith('.jsonl'))
+        if segments:
+            # Start far enough back for the ring to fill, then read forward like any other sync
+            room.first_segment = segments[0]
+            ring_segments = -(-self.ring_size // self.segment_size)
+            room.total = max(segments[0], segments[-1] - ring_segments) * self.segment_size
+        self._sync(room)
+
+        self._rooms[room_id] = room
+        return room
+
+    def _sync(self, room: _RoomLog):
+        """Read lines appended (by any worker) to the segments the ring covers since the last sync"""
+        ring_start = room.ring[0][0] if room.ring else room.total
+        segment = ring_start // self.segment_size
+        for stale in [s for s in room.offsets if s < segment]:
+            del room.offsets[stale]
+
+        while True:
+            path = self._segment_path(room, segment)
+            offset = room.offsets.get(segment, 0)
+            try:
+                grown = os.path.getsize(path) > offset
+            except FileNotFoundError:
+                later = self._oldest_segment_after(room, segment)
+                if later is None:
+                    return
+                # Another worker dropped this segment for retention: resume at the oldest one left
+                self._restart_at(room, later)
+                segment = later
+                continue
+            if grown:
+                records, consumed = self._read_lines(path, offset)
+                room.offsets[segment] = offset + consumed
+                for record in records:
+                    if 'patch' in record:
+                        position = room.ring_positions.get(record['patch'])
+                        if position is not None:
+                            room.ring[position - room.ring[0][0]][1].update(record['fields'])
+                    else:
+                        self._add(room, record)
+            # Only a full segment can be followed by another one
+            if room.total < (segment + 1) * self.segment_size:
+                return
+            segment += 1
+
+    def _oldest_segment_after(self, room: _RoomLog, segment: int) -> Optional[int]:
+        try:
+            names = os.listdir(room.directory)
+        except FileNotFoundError:
+            return None
+        later = [int(name.split('.')[0]) for name in names
+                 if name.endswith('.jsonl') and int(name.split('.')[0]) > segment]
+        return min(later) if later else None
+
+    def _restart_at(self, room: _RoomLog, segment: int):
+        """Forget everything before `segment`; only full segments are ever dropped, so it starts a position"""
+        room.total = segment * self.segment_size
+        room.first_segment = segment
+        room.ring.clear()
+        room.ring_positions.clear()
+        room.offsets.clear()
+        room.id_positions = None
+        room.id_order.clear()
+        room.id_start = room.total
+
+    def _add(self, room: _RoomLog, message: dict) -> int:
+        position = room.total
+        room.total += 1
+        self._push_ring(room, position, message)
+        if room.id_positions is not None:
+            room.id_positions[message['id']] = position
+            room.id_order.append(message['id'])
+        return position
+
+    @contextmanager
+    def _write_lock(self, room: _RoomLog):
+        """Per-room lock shared by every worker process, held while appending to the room's segments"""
+        os.makedirs(room.directory, exist_ok=True)
+        with open(os.path.join(room.directory, '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._sync(room)
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _push_ring(self, room: _RoomLog, position: int, message: dict):
+        if len(room.ring) == room.ring.maxlen:
+            _, evicted = room.ring[0]
+            room.ring_positions.pop(evicted['id'], None)
+        room.ring.append((position, message))
+        room.ring_positions[message['id']] = position
+
+    @staticmethod
+    def _read_lines(path: str, offset: int = 0) -> Tuple[List[dict], int]:
+        """Records of the complete lines from offset on, and the bytes they span"""
+        try:
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], 0
+        consumed = data.rfind(b'\n') + 1  # a line still being written is read next time
+        records = []
+        for line in data[:consumed].splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # torn line from a crashed writer
+        return records, consumed
+
+    def _read_segment(self, room: _RoomLog, segment: int) -> List[Tuple[int, dict]]:
+        """(position, message) pairs of one segment with its patch lines applied"""
+        messages = []
+        by_id = {}
+        for record in self._read_lines(self._segment_path(room, segment))[0]:
+            if 'patch' in record:
+                target = by_id.get(record['patch'])
+                if target is not None:
+                    target.update(record['fields'])
+                continue
+            by_id[record['id']] = record
+            messages.append(record)
+
+        first_position = segment * self.segment_size
+        return [(first_position + i, message) for i, message in enumerate(messages)]
+
+    def _append_line(self, room: _RoomLog, segment: int, record: dict):
+        """Append one line under the room's write lock, so it ends exactly where the last sync stopped"""
+        data = (json.dumps(record, default=str, separators=(',', ':')) + '\n').encode()
+        with open(self._segment_path(room, segment), 'ab') as f:
+            f.write(data)
+        if segment in room.offsets or segment * self.segment_size >= (room.ring[0][0] if room.ring else room.total):
+            room.offsets[segment] = room.offsets.get(segment, 0) + len(data)
+
+    def _retained_start(self, room: _RoomLog) -> int:
+        return max(room.first_segment * self.segment_size, room.total - self.retention)
+
+    # Public API
+
+    def append(self, room_id: str, message: dict) -> int:
+        """Append a message - one line written to the room's current segment; returns its position"""
+        with self._lock:
+            room = self._room(room_id)
+            with self._write_lock(room):
+                self._append_line(room, room.total // self.segment_size, message)
+                position = self._add(room, message)
+
+            if position % self.segment_size == 0:
+                self._drop_expired_segments(room)
+            self._trim_id_index(room)
+            return position
+
+    def _drop_expired_segments(self, room: _RoomLog):
+        """Delete segments whose messages are all outside the retention window"""
+        cutoff = room.total - self.retention
+        while (room.first_segment + 1) * self.segment_size <= cutoff:
+            try:
+                os.remove(self._segment_path(room, room.first_segment))
+            except FileNotFoundError:
+                pass
+            room.first_segment += 1
+
+    def _ensure_id_index(self, room: _RoomLog):
+        if room.id_positions is not None:
+            return
+        room.id_start = self._retained_start(room)
+        messages = self._range(room, room.id_start, room.total) if room.total else []
+        room.id_order = deque(message['id'] for message in messages)
+        room.id_positions = {message_id: room.id_start + i for i, message_id in enumerate(room.id_order)}
+
+    def _trim_id_index(self, room: _RoomLog):
+        """Forget ids of messages that fell out of the retention window"""
+        if room.id_positions is None:
+            return
+        retained_start = self._retained_start(room)
+        while room.id_start < retained_start and room.id_order:
+            message_id = room.id_order.popleft()
+            if room.id_positions.get(message_id) == room.id_start:
+                del room.id_positions[message_id]
+            room.id_start += 1
+
+    def count(self, room_id: str) -> int:
+        """Number of retained messages in a room"""
+        with self._lock:
+            room = self._room(room_id)
+            return room.total - self._retained_start(room)
+
+    def _range(self, room: _RoomLog, start: int, end: int) -> List[dict]:
+        """Messages at positions [start, end), from the ring when possible"""
+        ring_start = room.ring[0][0] if room.ring else room.total
+        disk_end = min(end, ring_start)
+
+        messages = []
+        if start < disk_end:
+            for segment in range(start // self.segment_size, (disk_end - 1) // self.segment_size + 1):
+                messages.extend(message for position, message in self._read_segment(room, segment)
+                                if start <= position < disk_end)
+        if end > ring_start:
+            messages.extend(message for position, message in room.ring if start <= position < end)
+        return messages
+
+    def history(self, room_id: str, limit: int = 50, offset: int = 0) -> List[dict]:
+        """Up to `limit` messages ending `offset` messages before the newest, oldest first"""
+        with self._lock:
+            room = self._room(room_id)
+            end = room.total - offset
+            start = max(self._retained_start(room), end - limit)
+            if end <= start:
+                return []
+            return self._range(room, start, end)
+
+    def iter_messages(self, room_id: str) -> Iterator[dict]:
+        """Every retained message of a room, oldest first"""
+        with self._lock:
+            room = self._room(room_id)
+            messages = self._range(room, self._retained_start(room), room.total) if room.total else []
+        return iter(messages)
+
+    def iter_entries(self, room_id: str) -> Iterator[Tuple[int, dict]]:
+        """(position, message) pairs of every retained message of a room, oldest first"""
+        with self._lock:
+            room = self._room(room_id)
+            start = self._retained_start(room)
+            messages = self._range(room, start, room.total) if room.total else []
+        return zip(range(start, start + len(messages)), messages)
+
+    def entries_from(self, room_id: str, start: int) -> List[Tuple[int, dict]]:
+        """(position, message) pairs of the retained messages at positions >= start, oldest first"""
+        with self._lock:
+            room = self._room(room_id)
+            start = max(start, self._retained_start(room))
+            if start >= room.total:
+                return []
+            return list(zip(range(start, room.total), self._range(room, start, room.total)))
+
+    def get_many(self, room_id: str, positions: List[int]) -> Dict[int, dict]:
+        """Retained messages at the given positions, reading each needed segment once"""
+        with self._lock:
+            room = self._room(room_id)
+            ring_start = room.ring[0][0] if room.ring else room.total
+            retained_start = self._retained_start(room)
+            found = {}
+            segments = set()
+            for position in positions:
+                if position >= ring_start and position < room.total:
+                    found[position] = room.ring[position - ring_start][1]
+                elif retained_start <= position < ring_start:
+                    segments.add(position // self.segment_size)
+            wanted = set(positions)
+            for segment in sorted(segments):
+                for position, message in self._read_segment(room, segment):
+                    if position in wanted and position < ring_start:
+                        found[position] = message
+            return found
+
+    def _position(self, room: _RoomLog, message_id: str) -> Optional[int]:
+        position = room.ring_positions.get(message_id)
+        if position is not None:
+            return position
+        self._ensure_id_index(room)
+        position = room.id_positions.get(message_id)
+        if position is None or position < self._retained_start(room):
+            return None
+        return position
+
+    def _locate(self, room: _RoomLog, message_id: str) -> Optional[Tuple[int, dict]]:
+        position = self._position(room, message_id)
+        if position is None:
+            return None
+        ring_start = room.ring[0][0] if room.ring else room.total
+        if position >= ring_start:
+            return position, room.ring[position - ring_start][1]
+        entries = self._read_segment(room, position // self.segment_size)
+        offset = position % self.segment_size
+        if offset < len(entries) and entries[offset][1]['id'] == message_id:
+            return entries[offset]
+        return next((entry for entry in entries if entry[1]['id'] == message_id), None)
+
+    def position_of(self, room_id: str, message_id: str) -> Optional[int]:
+        """Absolute position of a retained message, or None"""
+        with self._lock:
+            return self._position(self._room(room_id), message_id)
+
+    def page(self, room_id: str, limit: int = 50, before: Optional[str] = None,
+             after: Optional[str] = None) -> Optional[List[dict]]:
+        """Up to `limit` messages, oldest first, anchored on a message id cursor.
+
+        With `before`, the messages just older than that message; with
+        `after`, the messages just newer; with neither, the newest page.
+        Returns None when the cursor message is unknown or expired.
+        """
+        with self._lock:
+            room = self._room(room_id)
+            retained_start = self._retained_start(room)
+            if after is not None:
+                anchor = self._position(room, after)
+                if anchor is None:
+                    return None
+                start, end = anchor + 1, min(room.total, anchor + 1 + limit)
+            else:
+                end = room.total
+                if before is not None:
+                    end = self._position(room, before)
+                    if end is None:
+                        return None
+                start = max(retained_start, end - limit)
+            if end <= start:
+                return []
+            return self._range(room, start, end)
+
+    def find(self, room_id: str, message_id: str) -> Optional[dict]:
+        """A retained message by id: a ring lookup, or one read of the segment holding it"""
+        with self._lock:
+            located = self._locate(self._room(room_id), message_id)
+            return located[1] if located else None
+
+    def update(self, room_id: str, message_id: str, fields: Dict) -> Optional[dict]:
+        """Set fields on a message by appending a patch line to its segment"""
+        with self._lock:
+            room = self._room(room_id)
+            with self._write_lock(room):
+                located = self._locate(room, message_id)
+                if located is None:
+                    return None
+                position, message = located
+                message.update(fields)
+                self._append_line(room, position // self.segment_size, {'patch': message_id, 'fields': fields})
+            return message
+
+    @contextmanager
+    def exclusive(self):
+        """File lock on the whole log held by one worker process at a time, for one-off jobs such as migrations"""
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
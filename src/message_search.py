@@ -0,0 +1,211 @@
+"""
+Message Search for NeuroPulse
+Incrementally maintained inverted index over chat messages with prefix and ranked, paginated queries
+"""
+
+import bisect
+import heapq
+import math
+import re
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+_TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+MAX_TOKEN_LENGTH = 64
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens of a text"""
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if len(token) <= MAX_TOKEN_LENGTH]
+
+
+class MessageSearchIndex:
+    """Token -> posting lists of message documents, split by room.
+
+    Every indexed message gets an increasing document id, so each
+    (token, room) posting list is sorted by recency for free. A query only
+    walks the posting lists of its own tokens in the rooms it may see,
+    intersecting from the rarest token, and ranks hits with BM25 (every
+    token counted once per message) with recency breaking ties. The last
+    query token also matches as a prefix, expanded through a sorted
+    vocabulary. Rooms are indexed from their log the first time they are
+    searched and kept current by add/remove afterwards; next_position()
+    tells the caller where in the room's log to resume adding.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    MAX_PREFIX_EXPANSIONS = 64
+
+    def __init__(self):
+        self._postings = {}    # token -> {room_id: [doc_id, ...]} ascending
+        self._terms = []       # sorted vocabulary, for prefix expansion
+        self._docs = {}        # doc_id -> (room_id, message_id, position, tokens)
+        self._doc_ids = {}     # message_id -> doc_id
+        self._room_docs = {}   # room_id -> deque of doc_ids in position order
+        self._room_next = {}   # room_id -> log position after the last message seen
+        self._next_doc = 0
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # Maintenance
+
+    def has_room(self, room_id: str) -> bool:
+        return room_id in self._room_docs
+
+    def next_position(self, room_id: str) -> int:
+        """Log position after the last message of the room that was offered to the index"""
+        return self._room_next.get(room_id, 0)
+
+    def index_room(self, room_id: str, entries: Iterable[Tuple[int, dict]]):
+        """Index a room's existing (position, message) pairs, oldest first"""
+        with self._lock:
+            if room_id in self._room_docs:
+                return
+            self._room_docs[room_id] = deque()
+            self._room_next[room_id] = 0
+            for position, message in entries:
+                self._add(room_id, message, position)
+
+    def add(self, room_id: str, message: dict, position: int):
+        """Index one new message of an indexed room; non-text messages are not searchable"""
+        with self._lock:
+            if room_id in self._room_docs:
+                self._add(room_id, message, position)
+
+    def _add(self, room_id: str, message: dict, position: int):
+        self._room_next[room_id] = max(self._room_next[room_id], position + 1)
+        if message.get('type') != 'text' or message['id'] in self._doc_ids:
+            return
+        tokens = tuple(dict.fromkeys(tokenize(message.get('content', ''))))
+        if not tokens:
+            return
+
+        doc_id = self._next_doc
+        self._next_doc += 1
+        self._docs[doc_id] = (room_id, message['id'], position, tokens)
+        self._doc_ids[message['id']] = doc_id
+        self._room_docs[room_id].append(doc_id)
+        self._total_length += len(tokens)
+
+        for token in tokens:
+            rooms = self._postings.get(token)
+            if rooms is None:
+                rooms = self._postings[token] = {}
+                bisect.insort(self._terms, token)
+            rooms.setdefault(room_id, []).append(doc_id)
+
+    def remove(self, message_id: str) -> bool:
+        """Drop a message from the index (deleted by moderation or expired)"""
+        with self._lock:
+            doc_id = self._doc_ids.pop(message_id, None)
+            if doc_id is None:
+                return False
+            room_id, _, _, tokens = self._docs.pop(doc_id)
+            self._total_length -= len(tokens)
+
+            for token in tokens:
+                rooms = self._postings[token]
+                postings = rooms[room_id]
+                i = bisect.bisect_left(postings, doc_id)
+                if i < len(postings) and postings[i] == doc_id:
+                    del postings[i]
+                if not postings:
+                    del rooms[room_id]
+                if not rooms:
+                    del self._postings[token]
+                    del self._terms[bisect.bisect_left(self._terms, token)]
+            return True
+
+    def prune_room(self, room_id: str, retained_start: int):
+        """Drop a room's messages at positions before retained_start"""
+        with self._lock:
+            room_docs = self._room_docs.get(room_id)
+            while room_docs:
+                doc = self._docs.get(room_docs[0])
+                if doc is not None and doc[2] >= retained_start:
+                    break
+                room_docs.popleft()
+                if doc is not None:
+                    self.remove(doc[1])
+
+    # Queries
+
+    def _expand(self, token: str, prefix: bool) -> List[str]:
+        if not prefix:
+            return [token] if token in self._postings else []
+        start = bisect.bisect_left(self._terms, token)
+        end = bisect.bisect_left(self._terms, token + '\uffff', start)
+        return self._terms[start:min(end, start + self.MAX_PREFIX_EXPANSIONS)]
+
+    def _idf(self, term: str) -> float:
+        doc_freq = sum(len(postings) for postings in self._postings[term].values())
+        return math.log(1 + (len(self._docs) - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def search(self, query: str, room_ids: Iterable[str], limit: int = 20,
+               offset: int = 0) -> Tuple[List[Tuple[float, str, str, int]], int]:
+        """Best-first page of (score, room_id, message_id, position) matching every query
+        token, plus the total number of matches. The last token matches as a prefix
+        unless the query ends with whitespace."""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return [], 0
+        prefix_last = not query[-1:].isspace()
+
+        with self._lock:
+            # Per query token: the terms it matches and their weights
+            token_terms = []
+            for i, token in enumerate(tokens):
+                terms = self._expand(token, prefix_last and i == len(tokens) - 1)
+                if not terms:
+                    return [], 0
+                token_terms.append({term: self._idf(term) for term in terms})
+
+            average_length = self._total_length / len(self._docs)
+            matches = []
+            for room_id in dict.fromkeys(room_ids):
+                scores = self._match_room(room_id, token_terms)
+                for doc_id, idf_sum in scores.items():
+                    length = len(self._docs[doc_id][3])
+                    norm = self.K1 * (1 - self.B + self.B * length / average_length)
+                    matches.append((idf_sum * (self.K1 + 1) / (1 + norm), doc_id))
+
+            page = heapq.nlargest(offset + limit, matches)[offset:] if limit > 0 else []
+            return [(score,) + self._docs[doc_id][:3] for score, doc_id in page], len(matches)
+
+    def _match_room(self, room_id: str, token_terms: List[Dict[str, float]]) -> Dict[int, float]:
+        """doc_id -> summed idf for documents of one room containing every query token"""
+        sized = []
+        for terms in token_terms:
+            lists = [(self._postings[term].get(room_id, ()), idf) for term, idf in terms.items()]
+            size = sum(len(postings) for postings, _ in lists)
+            if size == 0:
+                return {}
+            sized.append((size, lists))
+        sized.sort(key=lambda item: item[0])
+
+        # Rarest token first; later tokens only probe the surviving candidates
+        scores = {}
+        for postings, idf in sized[0][1]:
+            for doc_id in postings:
+                if idf > scores.get(doc_id, 0.0):
+                    scores[doc_id] = idf
+        for _, lists in sized[1:]:
+            narrowed = {}
+            for doc_id, score in scores.items():
+                best = 0.0
+                for postings, idf in lists:
+                    if idf > best:
+                        i = bisect.bisect_left(postings, doc_id)
+                        if i < len(postings) and postings[i] == doc_id:
+                            best = idf
+                if best > 0.0:
+                    narrowed[doc_id] = score + best
+            scores = narrowed
+            if not scores:
+                break
+        return scores
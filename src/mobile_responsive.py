@@ -3,11 +3,11 @@ Mobile-Responsive Optimization for NeuroPulse Enterprise
 Provides adaptive layouts, touch-friendly interfaces, and mobile-specific features
 """
 
-import json
-import os
 from datetime import datetime
 from typing import Dict, List, Optional
 
+from record_store import record_store
+
 class MobileOptimizationManager:
     def __init__(self):
         self.device_analytics_file = 'device_analytics_data.json'
@@ -23,17 +23,17 @@ class MobileOptimizationManager:
         self.responsive_config = self._load_json_file(self.responsive_config_file, self._get_default_config())
     
     def _load_json_file(self, filename: str, default: dict) -> dict:
-        """Load JSON file with fallback to default"""
-        try:
-            with open(filename, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return default
-    
-    def _save_json_file(self, filename: str, data: dict):
-        """Save data to JSON file"""
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+        """Load a collection from the shared record store with fallback to default"""
+        return record_store.load_collection(filename, default)
+    
+    def _save_json_file(self, filename: str, data: dict, record_id: str = None):
+        """Persist one record when record_id is given, otherwise only the changed records"""
+        if record_id is None:
+            record_store.save_collection(filename, data)
+        elif record_id in data:
+            record_store.save_record(filename, record_id, data[record_id])
+        else:
+            record_store.delete_record(filename, record_id)
     
     def _get_default_config(self) -> dict:
         """Get default responsive configuration"""
@@ -98,7 +98,7 @@ class MobileOptimizationManager:
         }
         
         self.mobile_sessions[session_id] = device_session
-        self._save_json_file(self.mobile_sessions_file, self.mobile_sessions)
+        self._save_json_file(self.mobile_sessions_file, self.mobile_sessions, session_id)
         
         # Update device analytics
         self._update_device_analytics(device_info, session_data)
@@ -125,24 +125,22 @@ class MobileOptimizationManager:
                 }
             }
         
-        device_stats = self.device_analytics[device_type]
-        device_stats['total_sessions'] += 1
-        
-        # Track screen sizes
-        screen_key = f"{device_info.get('screen_width', 0)}x{device_info.get('screen_height', 0)}"
-        device_stats['common_screen_sizes'][screen_key] = device_stats['common_screen_sizes'].get(screen_key, 0) + 1
-        
-        # Update performance metrics
-        load_time = session_data.get('loading_performance', {}).get('page_load_time', 0)
-        if load_time > 0:
-            current_avg = device_stats['performance_metrics']['average_load_time']
-            sessions = device_stats['total_sessions']
-            device_stats['performance_metrics']['average_load_time'] = (current_avg * (sessions - 1) + load_time) / sessions
-        
-        # Convert set to list for JSON serialization
-        device_stats['total_users'] = list(device_stats['total_users'])
-        
-        self._save_json_file(self.device_analytics_file, self.device_analytics)
+        with record_store.editing(self.device_analytics_file, self.device_analytics, device_type) as device_stats:
+            device_stats['total_sessions'] += 1
+            
+            # Track screen sizes
+            screen_key = f"{device_info.get('screen_width', 0)}x{device_info.get('screen_height', 0)}"
+            device_stats['common_screen_sizes'][screen_key] = device_stats['common_screen_sizes'].get(screen_key, 0) + 1
+            
+            # Update performance metrics
+            load_time = session_data.get('loading_performance', {}).get('page_load_time', 0)
+            if load_time > 0:
+                current_avg = device_stats['performance_metrics']['average_load_time']
+                sessions = device_stats['total_sessions']
+                device_stats['performance_metrics']['average_load_time'] = (current_avg * (sessions - 1) + load_time) / sessions
+            
+            # Convert set to list for JSON serialization
+            device_stats['total_users'] = list(device_stats['total_users'])
     
     def get_responsive_css(self, device_type: str = None) -> str:
         """Generate responsive CSS based on device analytics"""
@@ -3,13 +3,13 @@ Comprehensive Onboarding Experience System for NeuroPulse
 Provides interactive tours, personalized setup, and guided feature discovery
 """
 
-import json
-import os
 import uuid
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 import random
 
+from record_store import record_store
+
 class OnboardingSystem:
     def __init__(self):
         self.onboarding_progress_file = 'onboarding_progress.json'
@@ -283,15 +283,15 @@ class OnboardingSystem:
         self.feature_discovery = self._load_json_file(self.feature_discovery_file, {})
     
     def _load_json_file(self, filename: str, default: dict) -> dict:
-        try:
-            with open(filename, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return default
+        return record_store.load_collection(filename, default)
     
-    def _save_json_file(self, filename: str, data: dict):
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+    def _save_json_file(self, filename: str, data: dict, record_id: str = None):
+        if record_id is None:
+            record_store.save_collection(filename, data)
+        elif record_id in data:
+            record_store.save_record(filename, record_id, data[record_id])
+        else:
+            record_store.delete_record(filename, record_id)
     
     def initialize_user_onboarding(self, user_id: str, user_data: dict = None) -> dict:
         """Initialize onboarding process for new user"""
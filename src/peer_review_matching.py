@@ -0,0 +1,166 @@
+"""
+Peer Review Matching for NeuroPulse
+Load-balanced reviewer assignment from a vectorized reviewer/submission match-score matrix
+"""
+
+import heapq
+import random
+from typing import Hashable, List, Optional, Sequence
+
+# NumPy is optional: without it the score rows are computed in pure Python
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+CANDIDATES_PER_REVIEW = 4  # best-scoring reviewers kept per submission slot before balancing
+ROW_BLOCK = 512            # submissions scored per block, bounding memory to ROW_BLOCK x n
+MATCHING_PASSES = 10       # later passes only score the submissions and reviewers left over
+
+
+def match_score(submission_complexity: float, submission_structure: float,
+                reviewer_complexity: float, reviewer_structure: float) -> float:
+    """Similar complexity for meaningful reviews, different structure for diverse perspectives"""
+    return ((10 - abs(submission_complexity - reviewer_complexity))
+            + abs(submission_structure - reviewer_structure) * 0.5)
+
+
+def _candidates_numpy(complexity, structure, owner, rows: List[int], columns: List[int],
+                      candidate_count: int, rng) -> List[List[int]]:
+    rows = np.asarray(rows)
+    columns = np.asarray(columns)
+    candidate_count = min(candidate_count, len(columns))
+    candidates = []
+    for start in range(0, len(rows), ROW_BLOCK):
+        block = rows[start:start + ROW_BLOCK]
+        scores = (10 - np.abs(complexity[block, None] - complexity[None, columns])
+                  + 0.5 * np.abs(structure[block, None] - structure[None, columns]))
+        scores += rng.random(scores.shape) * 1e-6  # random tie-breaking so ties do not pile onto low indexes
+        scores[owner[block][:, None] == columns[None, :]] = -np.inf  # no self-review
+        best = np.argpartition(-scores, candidate_count - 1, axis=1)[:, :candidate_count]
+        order = np.argsort(-np.take_along_axis(scores, best, axis=1), axis=1)
+        candidates.extend(columns[np.take_along_axis(best, order, axis=1)].tolist())
+    return candidates
+
+
+def _candidates_python(complexity, structure, owner, rows: List[int], columns: List[int],
+                       candidate_count: int, rng) -> List[List[int]]:
+    candidates = []
+    for i in rows:
+        c, s = complexity[i], structure[i]
+        scored = ((match_score(c, s, complexity[j], structure[j]) + rng.random() * 1e-6, j)
+                  for j in columns if j != owner[i])
+        candidates.append([j for _, j in heapq.nlargest(candidate_count, scored)])
+    return candidates
+
+
+def assign_reviewers(complexity: Sequence[float], structure: Sequence[float],
+                     reviews_per_submission: int, seed: int = 0,
+                     candidates_per_review: Optional[int] = None,
+                     authors: Optional[Sequence[Hashable]] = None) -> List[List[int]]:
+    """Reviewer indexes for each submission (index i is both submission i and its author).
+
+    With `authors`, submissions by the same author share one reviewer: the
+    author's first submission stands for them, and none of their
+    submissions is assigned to them. Every submission gets
+    min(reviews_per_submission, reviewer count - 1) distinct reviewers and
+    every reviewer ends up with an even share of the reviews, give or take
+    one. Matching runs in a few passes: each
+    pass scores the submissions still short of reviewers against the
+    reviewers that still have capacity, keeps only the best few candidates
+    per submission, and grants them round by round so no submission takes
+    all the strong reviewers. Slots left after the passes go to the
+    least-loaded eligible reviewers.
+    """
+    n = len(complexity)
+    owner = list(range(n))  # submission -> index of the submission standing for its author
+    if authors is not None:
+        first = {}
+        owner = [first.setdefault(author, i) for i, author in enumerate(authors)]
+    reviewers = sorted(set(owner))
+    if len(reviewers) < 2:
+        return [[] for _ in range(n)]
+    k = min(reviews_per_submission, len(reviewers) - 1)
+    # Reviews per reviewer: matching fills everyone up to the even share rounded down,
+    # the leftover slots then go to reviewers below the share rounded up
+    share, capacity = n * k // len(reviewers), -(-n * k // len(reviewers))
+    per_review = candidates_per_review or CANDIDATES_PER_REVIEW
+
+    if np is not None:
+        complexity = np.asarray(complexity, dtype=np.float64)
+        structure = np.asarray(structure, dtype=np.float64)
+        scored_owner = np.asarray(owner)
+        rng = np.random.default_rng(seed)
+        find_candidates = _candidates_numpy
+    else:
+        scored_owner = owner
+        rng = random.Random(seed)
+        find_candidates = _candidates_python
+
+    assigned = [[] for _ in range(n)]
+    load = [0] * n
+    rows = list(range(n))
+    for _ in range(MATCHING_PASSES):
+        rows = [i for i in rows if len(assigned[i]) < k]
+        columns = [j for j in reviewers if load[j] < share]
+        if not rows or not columns:
+            break
+        candidates = find_candidates(complexity, structure, scored_owner, rows, columns, k * per_review, rng)
+        granted = 0
+        for rank in range(max(len(c) for c in candidates)):
+            for i, row_candidates in zip(rows, candidates):
+                if len(assigned[i]) < k and rank < len(row_candidates):
+                    j = row_candidates[rank]
+                    if j != owner[i] and load[j] < share and j not in assigned[i]:
+                        assigned[i].append(j)
+                        load[j] += 1
+                        granted += 1
+        if not granted:
+            break
+
+    _fill_remaining(assigned, load, k, capacity, owner, reviewers, random.Random(seed))
+    return assigned
+
+
+def _fill_remaining(assigned: List[List[int]], load: List[int], k: int, capacity: int,
+                    owner: List[int], reviewers: List[int], rng: random.Random):
+    """Give every short submission reviewers with spare capacity, overloading by one only when stuck"""
+    spare = [j for j in reviewers for _ in range(capacity - load[j])]
+    rng.shuffle(spare)
+    for i in range(len(assigned)):
+        deferred = []
+        while len(assigned[i]) < k:
+            if spare:
+                j = spare.pop()
+                if j == owner[i] or j in assigned[i]:
+                    deferred.append(j)
+                    continue
+                assigned[i].append(j)
+                load[j] += 1
+                continue
+
+            # Only ineligible spare slots are left: trade one for a reviewer of another
+            # submission, or else overload the least-loaded eligible reviewer by one
+            for index, j in enumerate(deferred):
+                if _swap_in(assigned, owner, i, j):
+                    load[j] += 1
+                    del deferred[index]
+                    break
+            else:
+                j = min((j for j in reviewers if j != owner[i] and j not in assigned[i]), key=load.__getitem__)
+                assigned[i].append(j)
+                load[j] += 1
+        spare.extend(deferred)
+
+
+def _swap_in(assigned: List[List[int]], owner: List[int], i: int, j: int) -> bool:
+    """Hand reviewer j a review from another submission and move that review's reviewer to submission i"""
+    for t, reviewers in enumerate(assigned):
+        if t == i or owner[t] == j or j in reviewers:
+            continue
+        for position, r in enumerate(reviewers):
+            if r != owner[i] and r not in assigned[i]:
+                reviewers[position] = j
+                assigned[i].append(r)
+                return True
+    return False
@@ -0,0 +1,428 @@
+"""
+Performance Benchmarks for NeuroPulse
+Compares the indexed and batched code paths against the per-item paths they replace
+
+Usage (from the src directory):
+    python performance_benchmarks.py              # run every benchmark
+    python performance_benchmarks.py batch_rescheduling message_search
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+
+def _timed(func, *args, **kwargs):
+    """Run func once and return (seconds, result)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def _report(name: str, items: int, seconds: float, unit: str = 'items'):
+    rate = items / seconds if seconds > 0 else float('inf')
+    print(f"  {name:<40} {seconds * 1000:>10.2f} ms  {rate:>14,.0f} {unit}/s")
+
+
+def benchmark_batch_rescheduling(card_count: int = 20000, review_count: int = 500):
+    """SM-2+ interval maths and bulk review write-back vs the per-card path"""
+    from spaced_repetition_engine import SpacedRepetitionEngine, np
+
+    engine = SpacedRepetitionEngine()
+    rng = random.Random(42)
+    intervals = [rng.randint(1, 120) for _ in range(card_count)]
+    eases = [round(rng.uniform(1.3, 3.5), 2) for _ in range(card_count)]
+    repetitions = [rng.randint(0, 10) for _ in range(card_count)]
+    qualities = [rng.randint(0, 5) for _ in range(card_count)]
+    difficulties = [rng.randint(1, 5) for _ in range(card_count)]
+
+    print(f"batch_rescheduling ({card_count} cards, numpy={'yes' if np is not None else 'no'})")
+
+    def per_card():
+        return [
+            engine._calculate_next_interval(
+                {'interval': intervals[i], 'ease_factor': eases[i], 'repetitions': repetitions[i]},
+                qualities[i], difficulties[i]
+            )
+            for i in range(card_count)
+        ]
+
+    seconds, _ = _timed(per_card)
+    _report('per-card _calculate_next_interval', card_count, seconds, 'cards')
+    seconds, _ = _timed(engine.calculate_next_intervals_batch,
+                        intervals, eases, repetitions, qualities, difficulties, seed=42)
+    _report('calculate_next_intervals_batch', card_count, seconds, 'cards')
+
+    # End-to-end: each review_card call persists the reviewed card's record
+    for path in ('per_card', 'batch'):
+        user_id = f'bench_{path}'
+        card_ids = [engine.create_learning_card(user_id, {'question': f'q{i}', 'answer': 'a'})
+                    for i in range(review_count)]
+        reviews = [{'card_id': card_id, 'quality_response': rng.randint(0, 5),
+                    'response_time': 5.0, 'difficulty_felt': 3} for card_id in card_ids]
+        if path == 'per_card':
+            seconds, _ = _timed(lambda: [
+                engine.review_card(user_id, r['card_id'], r['quality_response'], r['response_time'])
+                for r in reviews
+            ])
+            _report(f'review_card x{review_count}', review_count, seconds, 'reviews')
+        else:
+            seconds, _ = _timed(engine.review_cards_batch, user_id, reviews)
+            _report(f'review_cards_batch ({review_count})', review_count, seconds, 'reviews')
+
+
+def benchmark_message_search(message_count: int = 100000, room_count: int = 200, query_count: int = 50):
+    """Inverted-index chat search vs a substring scan over the same messages"""
+    from message_search import MessageSearchIndex
+
+    rng = random.Random(42)
+    vocabulary = [f'term{i}' for i in range(20000)]
+    weights = [1.0 / (i + 1) for i in range(len(vocabulary))]  # Zipf-like word frequencies
+    room_ids = [f'room_{i}' for i in range(room_count)]
+    messages = []
+    for i in range(message_count):
+        words = rng.choices(vocabulary, weights, k=rng.randint(3, 15))
+        messages.append((room_ids[i % room_count], i // room_count,
+                         {'id': f'm{i}', 'type': 'text', 'content': ' '.join(words)}))
+
+    print(f"message_search ({message_count} messages, {room_count} rooms)")
+
+    index = MessageSearchIndex()
+    for room_id in room_ids:
+        index.index_room(room_id, ())
+
+    def build():
+        for room_id, position, message in messages:
+            index.add(room_id, message, position)
+
+    seconds, _ = _timed(build)
+    _report('index add', message_count, seconds, 'messages')
+
+    user_rooms = rng.sample(room_ids, 20)
+    queries = [' '.join(rng.choices(vocabulary[50:2000], k=2)) for _ in range(query_count)]
+
+    def scan():
+        rooms = set(user_rooms)
+        for query in queries:
+            query_words = query.split()
+            [m for room_id, _, m in messages
+             if room_id in rooms and all(w in m['content'] for w in query_words)]
+
+    seconds, _ = _timed(scan)
+    _report('substring scan (20 rooms)', query_count, seconds, 'queries')
+    seconds, _ = _timed(lambda: [index.search(query, user_rooms, 20) for query in queries])
+    _report('index search (20 rooms)', query_count, seconds, 'queries')
+    seconds, _ = _timed(lambda: [index.search(query[:-1], user_rooms, 20) for query in queries])
+    _report('index prefix search (20 rooms)', query_count, seconds, 'queries')
+
+
+def benchmark_chat_fanout(client_count: int = 5000, room_count: int = 50, message_count: int = 2000,
+                          stalled_clients: int = 50):
+    """Push delivery to thousands of simulated subscribers, including stalled ones"""
+    import asyncio
+    from chat_delivery import ChatDeliveryHub
+
+    print(f"chat_fanout ({client_count} clients, {room_count} rooms, {message_count} messages)")
+    hub = ChatDeliveryHub(queue_size=16)
+    room_ids = [f'room_{i}' for i in range(room_count)]
+    received = [0]
+    latencies = []
+    published_at = {}
+
+    async def client(index: int, subscription):
+        if index < stalled_clients:
+            return  # never reads: must be dropped, not block the others
+        async for event in subscription:
+            received[0] += 1
+            if index % 100 == 0:
+                latencies.append(time.perf_counter() - published_at[(event['room_id'], event['sequence'])])
+
+    async def run():
+        subscriptions = [await hub.subscribe(room_ids[i % room_count]) for i in range(client_count)]
+        tasks = [asyncio.create_task(client(i, sub)) for i, sub in enumerate(subscriptions)]
+
+        start = time.perf_counter()
+        for n in range(message_count):
+            room_id = room_ids[n % room_count]
+            event = hub.publish(room_id, 'message', {'id': f'm{n}', 'content': f'message {n}'}, f'm{n}')
+            published_at[(room_id, event['sequence'])] = time.perf_counter()
+            if n % 10 == 9:
+                await asyncio.sleep(0)  # let consumers drain between bursts
+        while received[0] < hub.stats['delivered'] - stalled_clients * hub.queue_size:
+            await asyncio.sleep(0.001)
+        seconds = time.perf_counter() - start
+
+        for subscription in subscriptions:
+            hub.unsubscribe(subscription)
+        await asyncio.gather(*tasks)
+        _report('publish + fan-out', hub.stats['delivered'], seconds, 'deliveries')
+        print(f"  dropped stalled subscribers: {hub.stats['dropped_subscribers']} of {stalled_clients}")
+        if latencies:
+            latencies.sort()
+            print(f"  delivery latency p50 {latencies[len(latencies) // 2] * 1000:.2f} ms, "
+                  f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+
+        # Reconnect mid-stream: replay everything after the last seen message
+        last_seen = f'm{message_count - room_count * 5}'
+        resumed = await hub.subscribe(room_ids[(message_count - room_count * 5) % room_count], last_seen)
+        print(f"  resume from {last_seen}: {resumed.queue.qsize()} events replayed")
+
+    asyncio.run(run())
+
+
+def benchmark_peer_review_assignment(sizes=(500, 1000, 5000), reviews_per_submission: int = 3,
+                                     greedy_limit: int = 1000):
+    """Load-balanced reviewer matching vs the per-submission sort it replaces"""
+    from peer_review_matching import assign_reviewers, match_score, np
+
+    print(f"peer_review_assignment (k={reviews_per_submission}, numpy={'yes' if np is not None else 'no'})")
+    rng = random.Random(42)
+
+    def greedy(complexity, structure):
+        # Previous approach: sort every other submission for each submission, take the first k
+        n = len(complexity)
+        result = []
+        for i in range(n):
+            others = [j for j in range(n) if j != i]
+            others.sort(key=lambda j: match_score(complexity[i], structure[i], complexity[j], structure[j]),
+                        reverse=True)
+            result.append(others[:reviews_per_submission])
+        return result
+
+    def describe(assigned, complexity, structure):
+        load = [0] * len(assigned)
+        scores = []
+        for i, reviewers in enumerate(assigned):
+            for j in reviewers:
+                load[j] += 1
+                scores.append(match_score(complexity[i], structure[i], complexity[j], structure[j]))
+        return f"load {min(load)}-{max(load)}, mean match {sum(scores) / len(scores):.2f}"
+
+    for n in sizes:
+        complexity = [rng.randint(0, 10) for _ in range(n)]
+        structure = [rng.randint(0, 12) for _ in range(n)]
+        if n <= greedy_limit:
+            seconds, assigned = _timed(greedy, complexity, structure)
+            _report(f'greedy sort n={n}', n, seconds, 'submissions')
+            print(f"    {describe(assigned, complexity, structure)}")
+        seconds, assigned = _timed(assign_reviewers, complexity, structure, reviews_per_submission, 42)
+        _report(f'assign_reviewers n={n}', n, seconds, 'submissions')
+        print(f"    {describe(assigned, complexity, structure)}")
+
+
+def benchmark_group_formation(sizes=(100, 1000, 10000, 50000), group_size: int = 6):
+    """Balanced, complementary and random partitions of growing cohorts"""
+    import statistics
+    from group_formation import complementary_partition, group_count, np, random_partition, snake_draft
+
+    print(f"group_formation (group size {group_size}, numpy={'yes' if np is not None else 'no'})")
+    rng = random.Random(42)
+    styles = ['visual', 'auditory', 'kinesthetic', 'reading_writing']
+
+    def group_means(assignment, skills, groups):
+        totals = [0.0] * groups
+        counts = [0] * groups
+        for group, skill in zip(assignment, skills):
+            totals[group] += skill
+            counts[group] += 1
+        return [t / c for t, c in zip(totals, counts) if c]
+
+    for n in sizes:
+        skills = [rng.gauss(70, 15) for _ in range(n)]
+        participant_styles = [rng.choice(styles) for _ in range(n)]
+        features = [[1.0 if style == s else 0.0 for s in styles] + [skill / 100]
+                    for style, skill in zip(participant_styles, skills)]
+        groups = group_count(n, group_size)
+
+        seconds, assignment = _timed(snake_draft, skills, groups)
+        _report(f'snake_draft n={n}', n, seconds, 'participants')
+        print(f"    group mean skill stdev {statistics.pstdev(group_means(assignment, skills, groups)):.2f} "
+              f"(random: {statistics.pstdev(group_means(random_partition(n, groups, 1), skills, groups)):.2f})")
+
+        seconds, assignment = _timed(complementary_partition, features, groups, 42)
+        _report(f'complementary_partition n={n}', n, seconds, 'participants')
+        mixes = {}
+        for group, style in zip(assignment, participant_styles):
+            mixes.setdefault(group, set()).add(style)
+        random_mixes = {}
+        for group, style in zip(random_partition(n, groups, 1), participant_styles):
+            random_mixes.setdefault(group, set()).add(style)
+        print(f"    distinct styles per group {statistics.mean(len(m) for m in mixes.values()):.2f} "
+              f"(random: {statistics.mean(len(m) for m in random_mixes.values()):.2f})")
+
+        seconds, _ = _timed(random_partition, n, groups, 42)
+        _report(f'random_partition n={n}', n, seconds, 'participants')
+
+
+def benchmark_voice_commands(custom_commands: int = 2000, utterances: int = 5000):
+    """Indexed, cached voice command matching vs scoring every command per utterance"""
+    import re
+    from voice_navigation_system import COMMAND_PATTERNS, VoiceNavigationEngine
+
+    engine = VoiceNavigationEngine()
+    rng = random.Random(42)
+    vocabulary = [f'word{i}' for i in range(3000)] + ['learn', 'answer', 'option', 'confidence', 'b', '3']
+    for i in range(custom_commands):
+        engine.register_command(' '.join(rng.sample(vocabulary, rng.randint(2, 4))),
+                                {'action': 'custom', 'description': f'Custom command {i}'})
+    phrases = list(engine.commands)
+    distinct = []
+    for _ in range(utterances // 5):
+        words = rng.choice(phrases).split() + rng.sample(vocabulary, rng.randint(0, 2))
+        distinct.append(engine._clean_voice_input(' '.join(words)))
+    inputs = [rng.choice(distinct) for _ in range(utterances)]  # users repeat a small set of commands
+
+    print(f"voice_commands ({len(engine.commands)} commands, {utterances} utterances)")
+
+    def linear(text):
+        # Previous approach: Jaccard against every command, then each pattern compiled on the fly
+        if text in engine.commands:
+            return text
+        text_words = set(text.split())
+        best, best_score = None, 0
+        for command in engine.commands:
+            command_words = set(command.split())
+            score = len(text_words & command_words) / len(text_words | command_words)
+            if score > best_score and score >= 0.7:
+                best, best_score = command, score
+        if best:
+            return best
+        for pattern, template in COMMAND_PATTERNS:
+            match = re.search(pattern, text)
+            if match and template.format(match.group(1).lower()) in engine.commands:
+                return template.format(match.group(1).lower())
+        return None
+
+    seconds, _ = _timed(lambda: [linear(text) for text in inputs])
+    _report('linear scan', utterances, seconds, 'utterances')
+    seconds, _ = _timed(lambda: [engine._match_uncached(text) for text in inputs])
+    _report('token index + combined regex', utterances, seconds, 'utterances')
+    seconds, _ = _timed(lambda: [engine._find_command_match(text) for text in inputs])
+    _report('with LRU cache', utterances, seconds, 'utterances')
+
+
+def benchmark_similar_learners(learner_count: int = 50000, query_count: int = 200, limit: int = 10):
+    """MinHash/LSH similar-learner lookups vs an exact Jaccard scan: latency and recall"""
+    from similarity_index import SimilarityIndex
+
+    rng = random.Random(42)
+    subjects = [f'subject{i}' for i in range(400)]
+    tracks = [rng.sample(subjects, 6) for _ in range(500)]  # learners cluster around shared curricula
+    index = SimilarityIndex()
+    profiles = []
+    for i in range(learner_count):
+        track = rng.choice(tracks)
+        profile = rng.sample(track, rng.randint(2, 6)) + rng.sample(subjects, rng.randint(0, 2))
+        profiles.append(profile)
+
+    print(f"similar_learners ({learner_count} learners, {query_count} queries, top {limit} above 0.3)")
+    seconds, _ = _timed(lambda: [index.update(f'user{i}', profile) for i, profile in enumerate(profiles)])
+    _report('index build', learner_count, seconds, 'learners')
+
+    queries = [f'user{rng.randrange(learner_count)}' for _ in range(query_count)]
+    seconds, exact = _timed(lambda: [index.exact_query(index.features[user_id], limit, 0.3, exclude=user_id)
+                                     for user_id in queries])
+    _report('exact scan', query_count, seconds, 'queries')
+    seconds, approximate = _timed(lambda: [index.query(index.features[user_id], limit, 0.3, exclude=user_id)
+                                           for user_id in queries])
+    _report('lsh', query_count, seconds, 'queries')
+
+    # Recall against exact similarity values, so ties at the cut-off do not count as misses
+    found = expected = 0
+    for exact_results, approximate_results in zip(exact, approximate):
+        expected_scores = sorted((score for _, score in exact_results), reverse=True)
+        approximate_scores = sorted((score for _, score in approximate_results), reverse=True)
+        expected += len(expected_scores)
+        found += sum(1 for want, got in zip(expected_scores, approximate_scores) if got >= want - 1e-9)
+    print(f"    recall@{limit}: {found / max(expected, 1):.3f}")
+
+
+def benchmark_video_heartbeats(session_count: int = 5, participants_per_session: int = 200,
+                               ping_count: int = 20000):
+    """Sustainable engagement pings per second: batched ingestion vs a write per ping"""
+    from datetime import datetime, timedelta
+    from record_store import record_store
+    from video_sessions import VideoSessionManager
+
+    manager = VideoSessionManager()
+    rng = random.Random(42)
+    start = (datetime.now() + timedelta(hours=1)).isoformat()
+    session_ids = []
+    for s in range(session_count):
+        session_id = manager.create_study_session(f'host{s}', {'title': f'Session {s}', 'scheduled_start': start,
+                                                               'max_participants': participants_per_session + 1})
+        for p in range(participants_per_session):
+            manager.join_session(session_id, f'user{s}_{p}')
+        manager.start_session(session_id, f'host{s}')
+        session_ids.append(session_id)
+
+    pings = []
+    for _ in range(ping_count):
+        s = rng.randrange(session_count)
+        activity = {'speaking_time': rng.randint(0, 5)}
+        if rng.random() < 0.1:
+            activity['questions_asked'] = 1
+        if rng.random() < 0.05:
+            activity['camera_enabled'] = rng.random() < 0.5
+        pings.append((session_ids[s], f'user{s}_{rng.randrange(participants_per_session)}', activity))
+
+    print(f"video_heartbeats ({session_count} sessions x {participants_per_session} participants, {ping_count} pings)")
+
+    def write_per_ping(batch):
+        # Previous path: apply the ping, recompute the score, rewrite the session's participants record
+        for session_id, user_id, activity in batch:
+            participant = manager.participants[session_id][user_id]
+            participant['speaking_time'] += activity['speaking_time']
+            participant['questions_asked'] += activity.get('questions_asked', 0)
+            if 'camera_enabled' in activity:
+                participant['camera_enabled'] = activity['camera_enabled']
+            participant['engagement_score'] = manager._calculate_engagement_score(participant)
+            record_store.save_record(manager.participants_file, session_id, manager.participants[session_id])
+
+    sample = pings[:max(1, ping_count // 20)]  # the per-ping path is slow; time a slice of the pings
+    seconds, _ = _timed(write_per_ping, sample)
+    _report('write per ping', len(sample), seconds, 'pings')
+
+    def batched(batch):
+        for session_id, user_id, activity in batch:
+            manager.update_participant_activity(session_id, user_id, activity)
+        manager.flush_participant_activity()
+
+    seconds, _ = _timed(batched, pings)
+    _report(f'batched (flush every {manager.activity_flush_interval}s)', ping_count, seconds, 'pings')
+
+
+BENCHMARKS = {
+    'batch_rescheduling': benchmark_batch_rescheduling,
+    'message_search': benchmark_message_search,
+    'chat_fanout': benchmark_chat_fanout,
+    'peer_review_assignment': benchmark_peer_review_assignment,
+    'group_formation': benchmark_group_formation,
+    'voice_commands': benchmark_voice_commands,
+    'similar_learners': benchmark_similar_learners,
+    'video_heartbeats': benchmark_video_heartbeats,
+}
+
+
+def main(names=None):
+    # Managers persist relative to the working directory: keep benchmark data out of the real store
+    workdir = tempfile.mkdtemp(prefix='neuropulse_bench_')
+    os.chdir(workdir)
+    os.environ['NEUROPULSE_RECORD_STORE'] = os.path.join(workdir, 'data', 'records.db')
+
+    for name in names or BENCHMARKS:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}")
+            continue
+        BENCHMARKS[name]()
+        print()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -3,14 +3,14 @@ Performance & Scalability Optimization for NeuroPulse
 Provides CDN integration, database optimization, caching, load balancing, and performance monitoring
 """
 
-import json
-import os
 import uuid
 import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import statistics
 
+from record_store import record_store
+
 class PerformanceOptimizationManager:
     def __init__(self):
         self.performance_metrics_file = 'performance_metrics.json'
@@ -30,15 +30,15 @@ class PerformanceOptimizationManager:
         self.monitoring_alerts = self._load_json_file(self.monitoring_alerts_file, {})
     
     def _load_json_file(self, filename: str, default: dict) -> dict:
-        try:
-            with open(filename, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return default
+        return record_store.load_collection(filename, default)
     
-    def _save_json_file(self, filename: str, data: dict):
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+    def _save_json_file(self, filename: str, data: dict, record_id: str = None):
+        if record_id is None:
+            record_store.save_collection(filename, data)
+        elif record_id in data:
+            record_store.save_record(filename, record_id, data[record_id])
+        else:
+            record_store.delete_record(filename, record_id)
     
     def configure_cdn_integration(self, cdn_config: dict) -> str:
         """Configure Content Delivery Network integration"""
@@ -99,7 +99,7 @@ class PerformanceOptimizationManager:
         }
         
         self.cdn_config[config_id] = cdn_configuration
-        self._save_json_file(self.cdn_config_file, self.cdn_config)
+        self._save_json_file(self.cdn_config_file, self.cdn_config, config_id)
         
         return config_id
     
@@ -165,7 +165,7 @@ class PerformanceOptimizationManager:
         }
         
         self.database_optimization[optimization_id] = db_optimization
-        self._save_json_file(self.database_optimization_file, self.database_optimization)
+        self._save_json_file(self.database_optimization_file, self.database_optimization, optimization_id)
         
         return optimization_id
     
@@ -239,7 +239,7 @@ class PerformanceOptimizationManager:
         }
         
         self.cache_management[cache_id] = caching_system
-        self._save_json_file(self.cache_management_file, self.cache_management)
+        self._save_json_file(self.cache_management_file, self.cache_management, cache_id)
         
         return cache_id
     
@@ -324,7 +324,7 @@ class PerformanceOptimizationManager:
         }
         
         self.monitoring_alerts[monitoring_id] = monitoring_system
-        self._save_json_file(self.monitoring_alerts_file, self.monitoring_alerts)
+        self._save_json_file(self.monitoring_alerts_file, self.monitoring_alerts, monitoring_id)
         
         return monitoring_id
     
@@ -345,7 +345,7 @@ class PerformanceOptimizationManager:
         }
         
         self.performance_metrics[metric_id] = performance_metric
-        self._save_json_file(self.performance_metrics_file, self.performance_metrics)
+        self._save_json_file(self.performance_metrics_file, self.performance_metrics, metric_id)
         
         # Check for performance issues
         self._analyze_performance_trends(metric_type, metric_data)
@@ -503,7 +503,7 @@ class PerformanceOptimizationManager:
             self.database_optimization['load_balancers'] = {}
         
         self.database_optimization['load_balancers'][lb_config_id] = load_balancer
-        self._save_json_file(self.database_optimization_file, self.database_optimization)
+        self._save_json_file(self.database_optimization_file, self.database_optimization, 'load_balancers')
         
         return lb_config_id
     
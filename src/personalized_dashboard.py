@@ -2,14 +2,14 @@
 Personalized Dashboard with Mood-Based Themes and Learning Energy Visualization
 """
 
-import json
-import os
 import uuid
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import math
 import random
 
+from record_store import record_store
+
 class PersonalizedDashboard:
     def __init__(self):
         self.user_preferences_file = 'user_dashboard_preferences.json'
@@ -94,18 +94,26 @@ class PersonalizedDashboard:
         self.theme_customizations = self._load_json_file(self.theme_customizations_file, {})
     
     def _load_json_file(self, filename: str, default: dict) -> dict:
-        try:
-            with open(filename, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return default
+        return record_store.load_collection(filename, default)
     
-    def _save_json_file(self, filename: str, data: dict):
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+    def _save_json_file(self, filename: str, data: dict, record_id: str = None):
+        if record_id is None:
+            record_store.save_collection(filename, data)
+        elif record_id in data:
+            record_store.save_record(filename, record_id, data[record_id])
+        else:
+            record_store.delete_record(filename, record_id)
     
     def initialize_user_dashboard(self, user_id: str, initial_preferences: dict = None) -> dict:
         """Initialize personalized dashboard for user"""
+        # Pick up a dashboard another worker set up; only records created here are written
+        collections = ((self.user_preferences_file, self.user_preferences), (self.mood_data_file, self.mood_data),
+                       (self.learning_energy_file, self.learning_energy))
+        for filename, data in collections:
+            if user_id not in data:
+                data.update(record_store.load_records(filename, [user_id]))
+        created = [filename for filename, data in collections if user_id not in data]
+        
         if user_id not in self.user_preferences:
             self.user_preferences[user_id] = {
                 'current_theme': 'focused',
@@ -150,9 +158,9 @@ class PersonalizedDashboard:
                 'energy_predictions': {}
             }
         
-        self._save_json_file(self.user_preferences_file, self.user_preferences)
-        self._save_json_file(self.mood_data_file, self.mood_data)
-        self._save_json_file(self.learning_energy_file, self.learning_energy)
+        for filename, data in collections:
+            if filename in created:
+                self._save_json_file(filename, data, user_id)
         
         return self.get_dashboard_config(user_id)
     
@@ -160,31 +168,31 @@ class PersonalizedDashboard:
         """Update user's current mood and adjust theme accordingly"""
         self.initialize_user_dashboard(user_id)
         
-        # Record mood data
-        mood_entry = {
-            'timestamp': datetime.now().isoformat(),
-            'mood': mood,
-            'context': context or {},
-            'previous_mood': self.mood_data[user_id]['current_mood']
-        }
-        
-        self.mood_data[user_id]['current_mood'] = mood
-        self.mood_data[user_id]['mood_history'].append(mood_entry)
-        self.mood_data[user_id]['last_mood_check'] = datetime.now().isoformat()
-        
-        # Update theme based on mood if auto-detection is enabled
-        if self.user_preferences[user_id]['auto_theme_detection']:
-            new_theme = self._select_theme_for_mood(mood, user_id)
-            self.user_preferences[user_id]['current_theme'] = new_theme
-        
-        # Analyze mood patterns
-        self._analyze_mood_patterns(user_id)
-        
-        # Update energy based on mood
-        self._update_energy_from_mood(user_id, mood, context)
-        
-        self._save_json_file(self.mood_data_file, self.mood_data)
-        self._save_json_file(self.user_preferences_file, self.user_preferences)
+        with record_store.editing(self.mood_data_file, self.mood_data, user_id), \
+                record_store.editing(self.user_preferences_file, self.user_preferences, user_id), \
+                record_store.editing(self.learning_energy_file, self.learning_energy, user_id):
+            # Record mood data
+            mood_entry = {
+                'timestamp': datetime.now().isoformat(),
+                'mood': mood,
+                'context': context or {},
+                'previous_mood': self.mood_data[user_id]['current_mood']
+            }
+            
+            self.mood_data[user_id]['current_mood'] = mood
+            self.mood_data[user_id]['mood_history'].append(mood_entry)
+            self.mood_data[user_id]['last_mood_check'] = datetime.now().isoformat()
+            
+            # Update theme based on mood if auto-detection is enabled
+            if self.user_preferences[user_id]['auto_theme_detection']:
+                new_theme = self._select_theme_for_mood(mood, user_id)
+                self.user_preferences[user_id]['current_theme'] = new_theme
+            
+            # Analyze mood patterns
+            self._analyze_mood_patterns(user_id)
+            
+            # Update energy based on mood
+            self._update_energy_from_mood(user_id, mood, context)
         
         return {
             'mood_updated': True,
@@ -279,24 +287,23 @@ class PersonalizedDashboard:
         # Clamp energy level between 0-100
         energy_level = max(0, min(100, energy_level))
         
-        # Record energy data
-        energy_entry = {
-            'timestamp': datetime.now().isoformat(),
-            'energy_level': energy_level,
-            'factors': factors or {},
-            'previous_energy': self.learning_energy[user_id]['current_energy']
-        }
-        
-        self.learning_energy[user_id]['current_energy'] = energy_level
-        self.learning_energy[user_id]['energy_history'].append(energy_entry)
-        
-        # Analyze energy patterns
-        self._analyze_energy_patterns(user_id)
-        
-        # Generate energy insights
-        insights = self._generate_energy_insights(user_id, energy_level)
-        
-        self._save_json_file(self.learning_energy_file, self.learning_energy)
+        with record_store.editing(self.learning_energy_file, self.learning_energy, user_id):
+            # Record energy data
+            energy_entry = {
+                'timestamp': datetime.now().isoformat(),
+                'energy_level': energy_level,
+                'factors': factors or {},
+                'previous_energy': self.learning_energy[user_id]['current_energy']
+            }
+            
+            self.learning_energy[user_id]['current_energy'] = energy_level
+            self.learning_energy[user_id]['energy_history'].append(energy_entry)
+            
+            # Analyze energy patterns
+            self._analyze_energy_patterns(user_id)
+            
+            # Generate energy insights
+            insights = self._generate_energy_insights(user_id, energy_level)
         
         return {
             'energy_updated': True,
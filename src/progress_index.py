@@ -0,0 +1,140 @@
+"""
+Progress Index for NeuroPulse
+Per-topic learner progress with sorted metric arrays for ranks, percentiles and leaderboards
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+RANKING_METRICS = ('accuracy', 'streak', 'time', 'questions')
+
+
+def metric_value(progress: Dict, metric: str) -> float:
+    """Score of one progress record on a leaderboard metric"""
+    if metric == 'accuracy':
+        return progress['correct_answers'] / max(progress['total_questions_answered'], 1)
+    if metric == 'streak':
+        return progress['learning_streak']
+    if metric == 'time':
+        return progress['time_invested_minutes']
+    if metric == 'questions':
+        return progress['total_questions_answered']
+    return 0
+
+
+class TopicRanking:
+    """Progress of every learner in one (category, topic).
+
+    Each metric keeps two parallel arrays sorted best-first: (-score,
+    user_id) keys, used to find and move one learner's entry, and the
+    negated scores alone, used to count learners above or below a score
+    with bisect. Per-level accuracy and question totals are kept as
+    running sums for the peer averages.
+    """
+
+    def __init__(self):
+        self.members = {}  # user_id -> progress record
+        self._scores = {}  # user_id -> {metric: score} as currently indexed
+        self._keys = {metric: [] for metric in RANKING_METRICS}
+        self._values = {metric: [] for metric in RANKING_METRICS}
+        self._levels = {}  # level -> [learners, accuracy sum, questions sum]
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self.members
+
+    def update(self, user_id: str, progress: Dict):
+        """Index a learner's progress, replacing whatever was indexed for them before"""
+        self.remove(user_id)
+        scores = {metric: metric_value(progress, metric) for metric in RANKING_METRICS}
+        for metric, score in scores.items():
+            keys = self._keys[metric]
+            index = bisect_left(keys, (-score, user_id))
+            keys.insert(index, (-score, user_id))
+            self._values[metric].insert(index, -score)
+        level = self._levels.setdefault(progress['level'], [0, 0.0, 0])
+        level[0] += 1
+        level[1] += scores['accuracy']
+        level[2] += scores['questions']
+        self.members[user_id] = progress
+        self._scores[user_id] = dict(scores, level=progress['level'])
+
+    def remove(self, user_id: str):
+        scores = self._scores.pop(user_id, None)
+        if scores is None:
+            return
+        del self.members[user_id]
+        for metric in RANKING_METRICS:
+            index = bisect_left(self._keys[metric], (-scores[metric], user_id))
+            del self._keys[metric][index]
+            del self._values[metric][index]
+        level = self._levels[scores['level']]
+        level[0] -= 1
+        level[1] -= scores['accuracy']
+        level[2] -= scores['questions']
+        if not level[0]:
+            del self._levels[scores['level']]
+
+    def count_above(self, metric: str, score: float) -> int:
+        """Learners scoring strictly more than score"""
+        return bisect_left(self._values[metric], -score)
+
+    def count_below(self, metric: str, score: float) -> int:
+        """Learners scoring strictly less than score"""
+        values = self._values[metric]
+        return len(values) - bisect_right(values, -score)
+
+    def top(self, metric: str, limit: int, exclude: Optional[str] = None) -> List[Tuple[str, float]]:
+        """(user_id, score) for the best `limit` learners on a metric; ties go to the lower user id"""
+        leaders = []
+        for negated, user_id in self._keys[metric]:
+            if len(leaders) == limit:
+                break
+            if user_id != exclude:
+                leaders.append((user_id, -negated))
+        return leaders
+
+    def totals(self, level: Optional[str] = None, exclude: Optional[str] = None) -> Tuple[int, float, int]:
+        """(learners, accuracy sum, questions sum) for a level or the whole topic, leaving out `exclude`"""
+        if level is None:
+            count, accuracy, questions = 0, 0.0, 0
+            for level_count, level_accuracy, level_questions in self._levels.values():
+                count += level_count
+                accuracy += level_accuracy
+                questions += level_questions
+        else:
+            count, accuracy, questions = self._levels.get(level, (0, 0.0, 0))
+        scores = self._scores.get(exclude)
+        if scores is not None and (level is None or scores['level'] == level):
+            count -= 1
+            accuracy -= scores['accuracy']
+            questions -= scores['questions']
+        return count, accuracy, questions
+
+
+class ProgressIndex:
+    """(category, topic) -> TopicRanking, plus the topics each learner has progress in"""
+
+    def __init__(self):
+        self.topics = {}       # (category, topic) -> TopicRanking
+        self.user_topics = {}  # user_id -> set of (category, topic)
+
+    def build(self, entries: Iterable[Tuple[str, str, str, Dict]]):
+        """Index (user_id, category, topic, progress) entries from scratch"""
+        self.topics = {}
+        self.user_topics = {}
+        for user_id, category, topic, progress in entries:
+            self.update(user_id, category, topic, progress)
+
+    def update(self, user_id: str, category: str, topic: str, progress: Dict):
+        key = (category, topic)
+        ranking = self.topics.get(key)
+        if ranking is None:
+            ranking = self.topics[key] = TopicRanking()
+        ranking.update(user_id, progress)
+        self.user_topics.setdefault(user_id, set()).add(key)
+
+    def topic(self, category: str, topic: str) -> Optional[TopicRanking]:
+        return self.topics.get((category, topic))
@@ -0,0 +1,291 @@
+"""
+Ranking Index for NeuroPulse
+Order-statistic structures behind leaderboards: O(log n) upserts, rank lookups and windows
+"""
+
+import heapq
+import math
+import random
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class _SkipNode:
+    __slots__ = ('key', 'value', 'next', 'width')
+
+    def __init__(self, key, value, levels: int):
+        self.key = key
+        self.value = value
+        self.next = [None] * levels
+        self.width = [1] * levels
+
+
+class IndexableSkipList:
+    """Sorted sequence of (key, value) pairs with O(log n) insert, remove, rank and select.
+
+    Each forward link also stores how many positions it skips, so the index of
+    a key is the sum of widths crossed while searching for it.
+    """
+
+    MAX_LEVELS = 32
+
+    def __init__(self, seed: Optional[int] = None):
+        self._rng = random.Random(seed)
+        self._head = _SkipNode(None, None, self.MAX_LEVELS)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _random_level(self) -> int:
+        return min(self.MAX_LEVELS, 1 - int(math.log2(1.0 - self._rng.random())))
+
+    def insert(self, key, value=None):
+        chain = [None] * self.MAX_LEVELS
+        steps_at_level = [0] * self.MAX_LEVELS
+        node = self._head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        levels = self._random_level()
+        new_node = _SkipNode(key, value, levels)
+        steps = 0
+        for level in range(levels):
+            prev = chain[level]
+            new_node.next[level] = prev.next[level]
+            prev.next[level] = new_node
+            new_node.width[level] = prev.width[level] - steps
+            prev.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, self.MAX_LEVELS):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key):
+        chain = [None] * self.MAX_LEVELS
+        node = self._head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+
+        levels = len(target.next)
+        for level in range(levels):
+            prev = chain[level]
+            prev.width[level] += target.width[level] - 1
+            prev.next[level] = target.next[level]
+        for level in range(levels, self.MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self._size -= 1
+
+    def index(self, key) -> int:
+        """0-based position of key; raises KeyError if absent"""
+        position = 0
+        node = self._head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        target = node.next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+        return position
+
+    def _node_at(self, index: int) -> _SkipNode:
+        node = self._head
+        index += 1
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.width[level] <= index:
+                index -= node.width[level]
+                node = node.next[level]
+        return node
+
+    def iter_from(self, index: int) -> Iterator[Tuple[object, object]]:
+        """Iterate (key, value) pairs in order starting at a 0-based position"""
+        if index < 0:
+            index = 0
+        if index >= self._size:
+            return
+        node = self._node_at(index)
+        while node is not None:
+            yield node.key, node.value
+            node = node.next[0]
+
+
+class RankedBoard:
+    """Leaderboard of members ordered by score (highest first, ties by member id).
+
+    Every member is kept, so any member has an exact rank and windows around
+    them can be read without a full sort.
+    """
+
+    def __init__(self):
+        self._index = IndexableSkipList()
+        self._members = {}  # member_id -> (key, entry)
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def __contains__(self, member_id) -> bool:
+        return member_id in self._members
+
+    @staticmethod
+    def _key(member_id, score: float) -> tuple:
+        return (-score, str(member_id))
+
+    def upsert(self, member_id, score: float, entry: Optional[Dict] = None):
+        """Insert or move a member - O(log n)"""
+        existing = self._members.get(member_id)
+        key = self._key(member_id, score)
+        if existing is not None:
+            if existing[0] == key:
+                self._members[member_id] = (key, entry)
+                return
+            self._index.remove(existing[0])
+        self._index.insert(key, member_id)
+        self._members[member_id] = (key, entry)
+
+    def remove(self, member_id):
+        existing = self._members.pop(member_id, None)
+        if existing is not None:
+            self._index.remove(existing[0])
+
+    def clear(self):
+        self._index = IndexableSkipList()
+        self._members = {}
+
+    def score(self, member_id) -> Optional[float]:
+        existing = self._members.get(member_id)
+        return -existing[0][0] if existing is not None else None
+
+    def entry(self, member_id) -> Optional[Dict]:
+        existing = self._members.get(member_id)
+        return existing[1] if existing is not None else None
+
+    def rank(self, member_id) -> Optional[int]:
+        """1-based rank of a member, or None if not on the board"""
+        existing = self._members.get(member_id)
+        if existing is None:
+            return None
+        return self._index.index(existing[0]) + 1
+
+    def page(self, start_rank: int = 1, count: int = 50) -> List[Tuple[int, Dict]]:
+        """(rank, entry) pairs for count members starting at start_rank"""
+        results = []
+        rank = max(1, start_rank)
+        for _, member_id in self._index.iter_from(rank - 1):
+            if len(results) >= count:
+                break
+            results.append((rank, self._members[member_id][1]))
+            rank += 1
+        return results
+
+    def top(self, count: int) -> List[Tuple[int, Dict]]:
+        return self.page(1, count)
+
+    def around(self, member_id, radius: int = 5) -> List[Tuple[int, Dict]]:
+        """(rank, entry) pairs for the members ranked within radius of member_id"""
+        rank = self.rank(member_id)
+        if rank is None:
+            return []
+        start = max(1, rank - radius)
+        return self.page(start, rank + radius - start + 1)
+
+
+class DecayedCounters:
+    """Exponentially decaying per-key counters with a maintained top set.
+
+    Counts use forward decay: an amount added at time t is stored scaled by
+    e^(rate * (t - landmark)), so one update touches one counter and the
+    shared decay is applied only when a value is read. Stored values never
+    go down, so a key can only enter the top set when it is itself updated;
+    the top set is a min-heap of at most top_size keys (with stale entries
+    skipped lazily) and reading it never looks at the other keys.
+    """
+
+    REBASE_EXPONENT = 200.0  # move the landmark before the scale factors overflow
+
+    def __init__(self, half_life: float, top_size: int = 20):
+        self.rate = math.log(2) / half_life
+        self.top_size = top_size
+        self._landmark = None
+        self._values = {}  # key -> value scaled to the landmark
+        self._top = {}     # key -> scaled value, for the keys in the top set
+        self._heap = []    # (scaled value, key) over _top, possibly with stale entries
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def _scale(self, now: float) -> float:
+        if self._landmark is None:
+            self._landmark = now
+        exponent = self.rate * (now - self._landmark)
+        if exponent > self.REBASE_EXPONENT:
+            self._rebase(now)
+            exponent = 0.0
+        return math.exp(exponent)
+
+    def _rebase(self, now: float):
+        factor = math.exp(-self.rate * (now - self._landmark))
+        self._landmark = now
+        self._values = {key: value * factor for key, value in self._values.items()}
+        self._rebuild_top()
+
+    def _rebuild_top(self):
+        self._top = dict(heapq.nlargest(self.top_size, self._values.items(), key=lambda item: item[1]))
+        self._heap = [(value, key) for key, value in self._top.items()]
+        heapq.heapify(self._heap)
+
+    def _offer(self, key, value: float):
+        """Put an updated key into the top set if it now belongs there"""
+        if key not in self._top:
+            if len(self._top) >= self.top_size:
+                while self._heap[0][0] != self._top.get(self._heap[0][1]):
+                    heapq.heappop(self._heap)
+                if value <= self._heap[0][0]:
+                    return
+                del self._top[heapq.heappop(self._heap)[1]]
+        self._top[key] = value
+        heapq.heappush(self._heap, (value, key))
+        if len(self._heap) > 4 * self.top_size:
+            self._heap = [(v, k) for k, v in self._top.items()]
+            heapq.heapify(self._heap)
+
+    def add(self, key, amount: float, now: float) -> float:
+        """Add amount to a key at time now - O(log top_size); returns the key's decayed value"""
+        scale = self._scale(now)
+        value = self._values.get(key, 0.0) + amount * scale
+        self._values[key] = value
+        self._offer(key, value)
+        return value / scale
+
+    def set(self, key, value: float, measured_at: float):
+        """Replace one key's counter with a decayed value measured at time measured_at"""
+        scaled = value * self._scale(measured_at)
+        self._values[key] = scaled
+        self._offer(key, scaled)
+
+    def restore(self, values: Dict[object, Tuple[float, float]]):
+        """Load key -> (decayed value, time it was measured at), replacing all counters"""
+        self._landmark = None
+        self._values = {}
+        if values:
+            self._landmark = max(measured_at for _, measured_at in values.values())
+            self._values = {key: value * math.exp(self.rate * (measured_at - self._landmark))
+                            for key, (value, measured_at) in values.items()}
+        self._rebuild_top()
+
+    def value(self, key, now: float) -> float:
+        return self._values.get(key, 0.0) / self._scale(now)
+
+    def top(self, count: int, now: float) -> List[Tuple[object, float]]:
+        """(key, decayed value) of the highest keys, at most top_size of them"""
+        scale = self._scale(now)
+        leaders = sorted(self._top.items(), key=lambda item: item[1], reverse=True)[:count]
+        return [(key, value / scale) for key, value in leaders]
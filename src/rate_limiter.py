@@ -0,0 +1,78 @@
+"""
+Rate Limiting for NeuroPulse
+Token buckets shared by every worker for API gateway request throttling
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+
+class TokenBucketRateLimiter:
+    """Token bucket per key: a burst of `capacity` requests refilled evenly over `period_seconds`.
+
+    Buckets are rows of a SQLite (WAL) table next to the record store, and
+    each check refills and takes a token inside one write transaction, so
+    all gunicorn workers draw from the same bucket and a key gets exactly
+    its configured quota however many workers serve it.
+    """
+
+    def __init__(self, period_seconds: int = 3600, db_path: Optional[str] = None):
+        self.period_seconds = period_seconds
+        self.db_path = db_path or os.environ.get('NEUROPULSE_RECORD_STORE', 'data/neuropulse_records.db')
+        self._local = threading.local()
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS rate_limit_buckets ('
+            'bucket_key TEXT PRIMARY KEY, tokens REAL NOT NULL, refilled_at REAL NOT NULL)'
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn = conn
+        return conn
+
+    def _refilled(self, conn: sqlite3.Connection, key: str, capacity: int, now: float) -> float:
+        row = conn.execute('SELECT tokens, refilled_at FROM rate_limit_buckets WHERE bucket_key = ?',
+                           (key,)).fetchone()
+        if row is None:
+            return float(capacity)
+        tokens, refilled_at = row
+        refill_rate = capacity / self.period_seconds
+        return min(float(capacity), tokens + max(0.0, now - refilled_at) * refill_rate)
+
+    def try_acquire(self, key: str, capacity: int, now: Optional[float] = None) -> Tuple[bool, int]:
+        """Take one token if available; returns (allowed, tokens remaining)"""
+        now = now if now is not None else time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            tokens = self._refilled(conn, key, capacity, now)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute('INSERT OR REPLACE INTO rate_limit_buckets (bucket_key, tokens, refilled_at) '
+                         'VALUES (?, ?, ?)', (key, tokens, now))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, int(tokens) if allowed else 0
+
+    def remaining(self, key: str, capacity: int, now: Optional[float] = None) -> int:
+        """Tokens currently available for key"""
+        now = now if now is not None else time.time()
+        return int(self._refilled(self._connection(), key, capacity, now))
+
+    def reset(self, key: str):
+        self._connection().execute('DELETE FROM rate_limit_buckets WHERE bucket_key = ?', (key,))
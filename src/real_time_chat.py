@@ -3,38 +3,65 @@ Real-time Chat System for NeuroPulse Social Learning
 Handles study group discussions, challenge chat, and peer messaging
 """
 
-import json
-import os
 import uuid
 from datetime import datetime
 from typing import Dict, List, Optional
 
+from record_store import record_store
+from message_log import SegmentedMessageLog
+from message_search import MessageSearchIndex
+from chat_delivery import chat_delivery_hub
+
 class ChatManager:
     def __init__(self):
         self.chat_rooms_file = 'chat_rooms_data.json'
         self.messages_file = 'chat_messages_data.json'
         self.user_connections_file = 'user_connections_data.json'
+        self.message_log_directory = 'data/chat_logs'
         
         self.load_data()
     
     def load_data(self):
         """Load chat data"""
         self.chat_rooms = self._load_json_file(self.chat_rooms_file, {})
-        self.messages = self._load_json_file(self.messages_file, {})
         self.user_connections = self._load_json_file(self.user_connections_file, {})
+        self._build_membership_index()
+        self.message_log = SegmentedMessageLog(self.message_log_directory)
+        self.search_index = MessageSearchIndex()
+        self._migrate_legacy_messages()
+    
+    def _build_membership_index(self):
+        """user_id -> ids of the chat rooms the user participates in"""
+        self.user_rooms = {}
+        for chat_room_id, chat_room in self.chat_rooms.items():
+            for user_id in chat_room['participants']:
+                self.user_rooms.setdefault(user_id, set()).add(chat_room_id)
+    
+    def _migrate_legacy_messages(self):
+        """Move message lists from the legacy messages collection into the per-room logs"""
+        if not self._load_json_file(self.messages_file, {}):
+            return
+        # Workers start together; re-read under the lock so a room moved by another worker is skipped
+        with self.message_log.exclusive():
+            legacy_messages = self._load_json_file(self.messages_file, {})
+            for chat_room_id, messages in legacy_messages.items():
+                if self.message_log.count(chat_room_id) == 0:
+                    for message in messages:
+                        self.message_log.append(chat_room_id, message)
+                self._save_json_file(self.messages_file, {}, chat_room_id)
     
     def _load_json_file(self, filename: str, default: dict) -> dict:
-        """Load JSON file with fallback to default"""
-        try:
-            with open(filename, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return default
+        """Load a collection from the shared record store with fallback to default"""
+        return record_store.load_collection(filename, default)
     
-    def _save_json_file(self, filename: str, data: dict):
-        """Save data to JSON file"""
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+    def _save_json_file(self, filename: str, data: dict, record_id: str = None):
+        """Persist one record when record_id is given, otherwise only the changed records"""
+        if record_id is None:
+            record_store.save_collection(filename, data)
+        elif record_id in data:
+            record_store.save_record(filename, record_id, data[record_id])
+        else:
+            record_store.delete_record(filename, record_id)
     
     def create_chat_room(self, room_type: str, room_id: str, room_name: str, participants: List[str]) -> str:
         """Create a new chat room for study groups or challenges"""
@@ -56,14 +83,16 @@ class ChatManager:
             }
         }
         
-        self.chat_rooms[chat_room_id] = chat_room
+        previous = self.chat_rooms.get(chat_room_id)
+        if previous is not None:
+            for user_id in previous['participants']:
+                self.user_rooms.get(user_id, set()).discard(chat_room_id)
         
-        # Initialize message history for this room
-        if chat_room_id not in self.messages:
-            self.messages[chat_room_id] = []
+        self.chat_rooms[chat_room_id] = chat_room
+        for user_id in participants:
+            self.user_rooms.setdefault(user_id, set()).add(chat_room_id)
         
-        self._save_json_file(self.chat_rooms_file, self.chat_rooms)
-        self._save_json_file(self.messages_file, self.messages)
+        self._save_json_file(self.chat_rooms_file, self.chat_rooms, chat_room_id)
         
         return chat_room_id
     
@@ -72,14 +101,16 @@ class ChatManager:
         if chat_room_id not in self.chat_rooms:
             return False
         
-        chat_room = self.chat_rooms[chat_room_id]
-        if user_id not in chat_room['participants']:
-            chat_room['participants'].append(user_id)
+        with record_store.editing(self.chat_rooms_file, self.chat_rooms, chat_room_id) as chat_room:
+            joined = user_id not in chat_room['participants']
+            if joined:
+                chat_room['participants'].append(user_id)
+        
+        if joined:
+            self.user_rooms.setdefault(user_id, set()).add(chat_room_id)
             
             # Add system message about user joining
             self.send_message(chat_room_id, 'system', f"User {user_id[:8]} joined the chat", 'system')
-            
-            self._save_json_file(self.chat_rooms_file, self.chat_rooms)
         
         return True
     
@@ -111,78 +142,80 @@ class ChatManager:
             'reply_to': None
         }
         
-        # Add message to room history
-        if chat_room_id not in self.messages:
-            self.messages[chat_room_id] = []
+        # Append to the room's message log (the log keeps the last 1000 messages per room)
+        self.message_log.append(chat_room_id, message)
         
-        self.messages[chat_room_id].append(message)
+        # Keep the search index in step with the log once the room has been indexed
+        if self.search_index.has_room(chat_room_id):
+            self._catch_up_search_index(chat_room_id)
         
-        # Update room statistics
-        chat_room['message_count'] += 1
-        chat_room['last_activity'] = datetime.now().isoformat()
-        
-        # Keep only last 1000 messages per room
-        if len(self.messages[chat_room_id]) > 1000:
-            self.messages[chat_room_id] = self.messages[chat_room_id][-1000:]
+        # Push to connected clients
+        chat_delivery_hub.publish(chat_room_id, 'message', message, message_id)
         
-        self._save_json_file(self.chat_rooms_file, self.chat_rooms)
-        self._save_json_file(self.messages_file, self.messages)
+        # Update room statistics
+        with record_store.editing(self.chat_rooms_file, self.chat_rooms, chat_room_id) as chat_room:
+            chat_room['message_count'] += 1
+            chat_room['last_activity'] = datetime.now().isoformat()
         
         return message
     
-    def get_chat_history(self, chat_room_id: str, limit: int = 50, offset: int = 0) -> List[dict]:
-        """Get chat history for a room"""
-        if chat_room_id not in self.messages:
+    def get_chat_history(self, chat_room_id: str, limit: int = 50, offset: int = 0,
+                         before: Optional[str] = None, after: Optional[str] = None) -> Optional[List[dict]]:
+        """Get chat history for a room; `before`/`after` page from a message id cursor instead of an offset.
+
+        Returns None when the cursor message is unknown or has expired from the log.
+        """
+        if chat_room_id not in self.chat_rooms:
             return []
         
-        messages = self.messages[chat_room_id]
-        start_idx = max(0, len(messages) - limit - offset)
-        end_idx = len(messages) - offset if offset > 0 else len(messages)
-        
-        return messages[start_idx:end_idx]
+        if before is not None or after is not None:
+            return self.message_log.page(chat_room_id, limit, before, after)
+        return self.message_log.history(chat_room_id, limit, offset)
     
     def add_reaction(self, chat_room_id: str, message_id: str, user_id: str, reaction: str) -> bool:
         """Add reaction to a message"""
-        if chat_room_id not in self.messages:
+        if chat_room_id not in self.chat_rooms:
             return False
         
-        for message in self.messages[chat_room_id]:
-            if message['id'] == message_id:
-                if reaction not in message['reactions']:
-                    message['reactions'][reaction] = []
-                
-                if user_id not in message['reactions'][reaction]:
-                    message['reactions'][reaction].append(user_id)
-                else:
-                    # Remove reaction if already exists (toggle)
-                    message['reactions'][reaction].remove(user_id)
-                    if not message['reactions'][reaction]:
-                        del message['reactions'][reaction]
-                
-                self._save_json_file(self.messages_file, self.messages)
-                return True
+        message = self.message_log.find(chat_room_id, message_id)
+        if message is None:
+            return False
+        
+        reactions = message['reactions']
+        if reaction not in reactions:
+            reactions[reaction] = []
         
-        return False
+        if user_id not in reactions[reaction]:
+            reactions[reaction].append(user_id)
+        else:
+            # Remove reaction if already exists (toggle)
+            reactions[reaction].remove(user_id)
+            if not reactions[reaction]:
+                del reactions[reaction]
+        
+        self.message_log.update(chat_room_id, message_id, {'reactions': reactions})
+        chat_delivery_hub.publish(chat_room_id, 'reaction', {'message_id': message_id, 'reactions': reactions})
+        return True
     
     def get_user_chat_rooms(self, user_id: str) -> List[dict]:
         """Get all chat rooms user is part of"""
         user_rooms = []
         
-        for chat_room_id, chat_room in self.chat_rooms.items():
-            if user_id in chat_room['participants']:
-                room_info = chat_room.copy()
-                
-                # Add recent message preview
-                recent_messages = self.get_chat_history(chat_room_id, limit=1)
-                if recent_messages:
-                    room_info['last_message'] = recent_messages[-1]
-                else:
-                    room_info['last_message'] = None
-                
-                # Add unread count (simplified - in real app would track user's last read timestamp)
-                room_info['unread_count'] = 0
-                
-                user_rooms.append(room_info)
+        for chat_room_id in self.user_rooms.get(user_id, ()):
+            chat_room = self.chat_rooms[chat_room_id]
+            room_info = chat_room.copy()
+            
+            # Add recent message preview
+            recent_messages = self.get_chat_history(chat_room_id, limit=1)
+            if recent_messages:
+                room_info['last_message'] = recent_messages[-1]
+            else:
+                room_info['last_message'] = None
+            
+            # Add unread count (simplified - in real app would track user's last read timestamp)
+            room_info['unread_count'] = 0
+            
+            user_rooms.append(room_info)
         
         # Sort by last activity
         user_rooms.sort(key=lambda x: x['last_activity'], reverse=True)
@@ -205,50 +238,100 @@ class ChatManager:
         return dm_room_id
     
     def search_messages(self, chat_room_id: str, query: str, limit: int = 20) -> List[dict]:
-        """Search messages in a chat room"""
-        if chat_room_id not in self.messages:
+        """Search messages in a chat room, best matches first"""
+        if chat_room_id not in self.chat_rooms:
             return []
         
-        query_lower = query.lower()
-        matching_messages = []
+        return self._search([chat_room_id], query, limit, 0)['results']
+    
+    def search_user_messages(self, user_id: str, query: str, limit: int = 20, offset: int = 0) -> dict:
+        """Search messages across every chat room the user participates in, one page at a time"""
+        room_ids = sorted(self.user_rooms.get(user_id, ()))
+        return self._search(room_ids, query, limit, offset)
+    
+    def _catch_up_search_index(self, chat_room_id: str):
+        """Index the messages any worker appended to the room's log since the index last saw it"""
+        if not self.search_index.has_room(chat_room_id):
+            self.search_index.index_room(chat_room_id, self.message_log.iter_entries(chat_room_id))
+            return
+        for position, message in self.message_log.entries_from(chat_room_id,
+                                                                self.search_index.next_position(chat_room_id)):
+            self.search_index.add(chat_room_id, message, position)
+        self.search_index.prune_room(chat_room_id, self.search_index.next_position(chat_room_id)
+                                     - self.message_log.count(chat_room_id))
+    
+    def _search(self, room_ids: List[str], query: str, limit: int, offset: int) -> dict:
+        """Ranked page of indexed text messages matching every query token"""
+        for chat_room_id in room_ids:
+            self._catch_up_search_index(chat_room_id)
         
-        for message in self.messages[chat_room_id]:
-            if (query_lower in message['content'].lower() and 
-                message['type'] == 'text' and
-                len(matching_messages) < limit):
-                matching_messages.append(message)
+        while True:
+            hits, total = self.search_index.search(query, room_ids, limit, offset)
+            
+            # Fetch the page's messages, one batch per room
+            positions_by_room = {}
+            for _, chat_room_id, _, position in hits:
+                positions_by_room.setdefault(chat_room_id, []).append(position)
+            messages_by_room = {chat_room_id: self.message_log.get_many(chat_room_id, positions)
+                                for chat_room_id, positions in positions_by_room.items()}
+            
+            results = []
+            stale = []
+            for score, chat_room_id, message_id, position in hits:
+                message = messages_by_room[chat_room_id].get(position)
+                if message is None or message['id'] != message_id or message['type'] != 'text':
+                    stale.append(message_id)  # expired, or moderated through another worker
+                else:
+                    results.append(dict(message, relevance=round(score, 4)))
+            if not stale:
+                break
+            # Drop what the log no longer holds as searchable text and rank the page again
+            for message_id in stale:
+                self.search_index.remove(message_id)
         
-        return matching_messages
+        return {
+            'query': query,
+            'results': results,
+            'total': total,
+            'offset': offset,
+            'limit': limit
+        }
     
     def moderate_message(self, chat_room_id: str, message_id: str, action: str, moderator_id: str) -> bool:
         """Moderate a message (delete, flag, etc.)"""
-        if chat_room_id not in self.messages:
+        if chat_room_id not in self.chat_rooms:
             return False
         
-        for i, message in enumerate(self.messages[chat_room_id]):
-            if message['id'] == message_id:
-                if action == 'delete':
-                    message['content'] = '[Message deleted by moderator]'
-                    message['type'] = 'moderated'
-                    message['moderated_by'] = moderator_id
-                    message['moderated_at'] = datetime.now().isoformat()
-                elif action == 'flag':
-                    message['flagged'] = True
-                    message['flagged_by'] = moderator_id
-                    message['flagged_at'] = datetime.now().isoformat()
-                
-                self._save_json_file(self.messages_file, self.messages)
-                return True
+        changes = {}
+        if action == 'delete':
+            changes = {
+                'content': '[Message deleted by moderator]',
+                'type': 'moderated',
+                'moderated_by': moderator_id,
+                'moderated_at': datetime.now().isoformat()
+            }
+        elif action == 'flag':
+            changes = {
+                'flagged': True,
+                'flagged_by': moderator_id,
+                'flagged_at': datetime.now().isoformat()
+            }
+        
+        if self.message_log.update(chat_room_id, message_id, changes) is None:
+            return False
         
-        return False
+        if action == 'delete':
+            self.search_index.remove(message_id)
+        chat_delivery_hub.publish(chat_room_id, 'moderation', dict(changes, message_id=message_id, action=action))
+        return True
     
     def get_chat_analytics(self, chat_room_id: str) -> dict:
         """Get analytics for a chat room"""
-        if chat_room_id not in self.chat_rooms or chat_room_id not in self.messages:
+        if chat_room_id not in self.chat_rooms:
             return {}
         
         chat_room = self.chat_rooms[chat_room_id]
-        messages = self.messages[chat_room_id]
+        messages = list(self.message_log.iter_messages(chat_room_id))
         
         # Calculate user activity
         user_activity = {}
@@ -0,0 +1,277 @@
+"""
+Record Store for NeuroPulse
+Transactional key/value storage shared by every JSON-backed manager
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Optional
+
+
+class RecordStore:
+    """SQLite (WAL) backed store holding one row per top-level record.
+
+    Managers keep working on plain dicts in memory; persisting a mutation
+    writes only the records that changed, inside a single transaction, so
+    concurrent gunicorn workers never clobber each other's files.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.environ.get('NEUROPULSE_RECORD_STORE', 'data/neuropulse_records.db')
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        self._snapshots = {}  # collection -> {key: serialized value}
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS records ('
+            'collection TEXT NOT NULL, record_key TEXT NOT NULL, value TEXT NOT NULL, '
+            'updated_at REAL NOT NULL, PRIMARY KEY (collection, record_key))'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS records_by_update ON records (collection, updated_at)')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS collections ('
+            'name TEXT PRIMARY KEY, created_at REAL NOT NULL)'
+        )
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets readers run alongside a writer"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _serialize(value) -> str:
+        return json.dumps(value, default=str, separators=(',', ':'))
+
+    def _is_registered(self, conn: sqlite3.Connection, collection: str) -> bool:
+        row = conn.execute('SELECT 1 FROM collections WHERE name = ?', (collection,)).fetchone()
+        return row is not None
+
+    def _register(self, conn: sqlite3.Connection, collection: str):
+        conn.execute('INSERT OR IGNORE INTO collections (name, created_at) VALUES (?, ?)',
+                     (collection, time.time()))
+
+    def _import_legacy_file(self, conn: sqlite3.Connection, collection: str,
+                            legacy_file: str, legacy_section: Optional[str]) -> bool:
+        """Migrate a pre-existing JSON file into the store (first load only)"""
+        try:
+            with open(legacy_file, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+
+        if legacy_section is not None:
+            data = data.get(legacy_section, {}) if isinstance(data, dict) else {}
+        if not isinstance(data, dict):
+            return False
+
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if not self._is_registered(conn, collection):
+                conn.executemany(
+                    'INSERT OR REPLACE INTO records (collection, record_key, value, updated_at) '
+                    'VALUES (?, ?, ?, ?)',
+                    [(collection, str(key), self._serialize(value), now) for key, value in data.items()]
+                )
+                self._register(conn, collection)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return True
+
+    def load_collection(self, collection: str, default: dict, legacy_file: Optional[str] = None,
+                        legacy_section: Optional[str] = None) -> dict:
+        """Load every record of a collection, falling back to default when it was never saved"""
+        conn = self._connection()
+        with self._lock:
+            if not self._is_registered(conn, collection):
+                if not self._import_legacy_file(conn, collection, legacy_file or collection, legacy_section):
+                    self._snapshots[collection] = {}
+                    return default
+
+            rows = conn.execute(
+                'SELECT record_key, value FROM records WHERE collection = ?', (collection,)
+            ).fetchall()
+            self._snapshots[collection] = {key: value for key, value in rows}
+            return {key: json.loads(value) for key, value in rows}
+
+    def save_record(self, collection: str, key: str, value):
+        """Upsert a single record - cost is proportional to the record, not the collection"""
+        self.save_records(collection, {key: value})
+
+    def save_records(self, collection: str, records: Dict[str, object], deleted: Iterable[str] = ()):
+        """Upsert and delete a batch of records atomically"""
+        serialized = {str(key): self._serialize(value) for key, value in records.items()}
+        self._write(collection, serialized, [str(key) for key in deleted])
+
+    def _write(self, collection: str, serialized: Dict[str, str], deleted: list):
+        if not serialized and not deleted:
+            return
+
+        now = time.time()
+        conn = self._connection()
+        with self._lock:
+            nested = getattr(self._local, 'txn', None) is not None
+            if not nested:
+                conn.execute('BEGIN IMMEDIATE')
+            try:
+                if serialized:
+                    conn.executemany(
+                        'INSERT OR REPLACE INTO records (collection, record_key, value, updated_at) '
+                        'VALUES (?, ?, ?, ?)',
+                        [(collection, key, value, now) for key, value in serialized.items()]
+                    )
+                if deleted:
+                    conn.executemany(
+                        'DELETE FROM records WHERE collection = ? AND record_key = ?',
+                        [(collection, key) for key in deleted]
+                    )
+                self._register(conn, collection)
+                if not nested:
+                    conn.execute('COMMIT')
+            except Exception:
+                if not nested:
+                    conn.execute('ROLLBACK')
+                raise
+
+            snapshot = self._snapshots.setdefault(collection, {})
+            snapshot.update(serialized)
+            for key in deleted:
+                snapshot.pop(key, None)
+
+    @contextmanager
+    def transaction(self):
+        """Write transaction for read-modify-write across several records.
+
+        Reads made through the yielded RecordTransaction happen under the
+        database write lock, so concurrent workers' transactions are applied
+        one after another instead of overwriting each other; every put is
+        committed together on exit, or none of them on error. Transactions
+        and writes started inside one join it.
+        """
+        outer = getattr(self._local, 'txn', None)
+        if outer is not None:
+            yield outer
+            return
+        conn = self._connection()
+        with self._lock:
+            conn.execute('BEGIN IMMEDIATE')
+            txn = self._local.txn = RecordTransaction(self, conn)
+            try:
+                yield txn
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            finally:
+                self._local.txn = None
+            for collection, serialized in txn.written.items():
+                self._snapshots.setdefault(collection, {}).update(serialized)
+
+    @contextmanager
+    def editing(self, collection: str, data: dict, key: str):
+        """Change one record in place without losing other workers' changes to it.
+
+        data[key] is replaced by the stored value (read under the write
+        lock), yielded for the caller to modify, and stored on exit, all
+        in one transaction.
+        """
+        with self.transaction() as txn:
+            value = txn.get(collection, key, data.get(key))
+            data[key] = value
+            yield value
+            txn.put(collection, key, value)
+
+    def update_record(self, collection: str, key: str, mutate: Callable[[object], object], default=None):
+        """Read-modify-write one record in a transaction; `mutate` gets the stored value
+        (or `default`) and returns the value to store, which is also returned"""
+        with self.transaction() as txn:
+            value = mutate(txn.get(collection, key, default))
+            txn.put(collection, key, value)
+        return value
+
+    def load_records(self, collection: str, keys: Iterable[str]) -> dict:
+        """Current stored values of some records of a collection; missing keys are left out"""
+        keys = [str(key) for key in keys]
+        conn = self._connection()
+        values = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = conn.execute(
+                f"SELECT record_key, value FROM records WHERE collection = ? "
+                f"AND record_key IN ({','.join('?' * len(chunk))})", (collection, *chunk)
+            ).fetchall()
+            values.update((key, json.loads(value)) for key, value in rows)
+        return values
+
+    def load_changed(self, collection: str, since: float) -> dict:
+        """Records of a collection written at or after `since` (epoch seconds), by any worker"""
+        rows = self._connection().execute(
+            'SELECT record_key, value FROM records WHERE collection = ? AND updated_at >= ?', (collection, since)
+        ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def delete_record(self, collection: str, key: str):
+        """Remove a single record"""
+        self.save_records(collection, {}, deleted=[key])
+
+    def save_collection(self, collection: str, data: dict):
+        """Persist a whole in-memory collection, writing only records that changed since the last save"""
+        with self._lock:
+            snapshot = self._snapshots.get(collection, {})
+            changed = {}
+            seen = set()
+            for key, value in data.items():
+                key = str(key)
+                seen.add(key)
+                serialized = self._serialize(value)
+                if snapshot.get(key) != serialized:
+                    changed[key] = serialized
+            deleted = [key for key in snapshot if key not in seen]
+
+            self._write(collection, changed, deleted)
+
+
+class RecordTransaction:
+    """Reads and writes of one RecordStore.transaction()"""
+
+    def __init__(self, store: RecordStore, conn: sqlite3.Connection):
+        self._store = store
+        self._conn = conn
+        self.written = {}  # collection -> {key: serialized value}
+
+    def get(self, collection: str, key: str, default=None):
+        row = self._conn.execute('SELECT value FROM records WHERE collection = ? AND record_key = ?',
+                                 (collection, str(key))).fetchone()
+        return json.loads(row[0]) if row is not None else default
+
+    def put(self, collection: str, key: str, value):
+        serialized = self._store._serialize(value)
+        self._conn.execute(
+            'INSERT OR REPLACE INTO records (collection, record_key, value, updated_at) VALUES (?, ?, ?, ?)',
+            (collection, str(key), serialized, time.time())
+        )
+        if collection not in self.written:
+            self._store._register(self._conn, collection)
+        self.written.setdefault(collection, {})[str(key)] = serialized
+
+
+# Shared store used by all managers
+record_store = RecordStore()
@@ -3,11 +3,12 @@ Social Learning Routes for NeuroPulse
 Handles collaborative challenges, study groups, peer comparison, and social features
 """
 
-from flask import render_template, request, jsonify, session, redirect, url_for
+from flask import render_template, request, jsonify, session, redirect, url_for, Response, stream_with_context
 from app import app
 from social_learning import social_manager
 from subject_manager import subject_manager
 from real_time_chat import chat_manager
+from chat_delivery import chat_delivery_hub
 from video_sessions import video_manager
 from analytics_dashboard import analytics_manager
 from lms_integration import lms_manager
@@ -24,6 +25,10 @@ from performance_optimization import performance_manager
 from immersive_technologies import immersive_manager
 import uuid
 
+# Bounds on client-requested chat search pages
+MAX_SEARCH_LIMIT = 100
+MAX_SEARCH_OFFSET = 1000
+
 @app.route('/social')
 def social_dashboard():
     """Main social learning dashboard"""
@@ -104,7 +109,8 @@ def challenge_details(challenge_id):
     if challenge_id not in social_manager.challenges:
         return "Challenge not found", 404
     
-    challenge = social_manager.challenges[challenge_id]
+    challenge = dict(social_manager.challenges[challenge_id],
+                     leaderboard=social_manager.get_challenge_leaderboard(challenge_id))
     user_id = session.get('user_id')
     
     # Check if user is participant
@@ -293,11 +299,7 @@ def update_challenge_progress():
     if success:
         # Get updated leaderboard position
         challenge = social_manager.challenges[challenge_id]
-        user_position = None
-        for i, entry in enumerate(challenge['leaderboard']):
-            if entry['user_id'] == user_id:
-                user_position = i + 1
-                break
+        user_position = social_manager.get_challenge_rank(challenge_id, user_id)
         
         return jsonify({
             'success': True,
@@ -440,10 +442,60 @@ def get_chat_history(chat_room_id):
     
     limit = request.args.get('limit', 50, type=int)
     offset = request.args.get('offset', 0, type=int)
-    
-    messages = chat_manager.get_chat_history(chat_room_id, limit, offset)
-    
-    return jsonify({'messages': messages})
+    before = request.args.get('before')
+    after = request.args.get('after')
+    
+    messages = chat_manager.get_chat_history(chat_room_id, limit, offset, before, after)
+    if messages is None:
+        # The client should reload the newest page instead of paging from this cursor
+        return jsonify({'error': 'Cursor message not found or expired', 'cursor_expired': True}), 410
+    
+    # Cursor for the next page in the direction being read: the oldest message id of
+    # this one when paging back, the newest when paging forward with `after`
+    full_page = bool(messages) and len(messages) == limit
+    if after is not None:
+        return jsonify({
+            'messages': messages,
+            'next_after': messages[-1]['id'] if full_page else None
+        })
+    return jsonify({
+        'messages': messages,
+        'next_before': messages[0]['id'] if full_page else None
+    })
+
+@app.route('/api/chat/stream/<chat_room_id>')
+def stream_chat_events(chat_room_id):
+    """Server-Sent Events stream of new messages, reactions and moderation in a chat room.
+
+    The response holds its worker thread until the client disconnects; serve it
+    from threaded workers (gunicorn.conf.py selects gthread), not sync workers.
+    Each worker keeps at most chat_delivery_hub.max_streams of them open and
+    answers 503 beyond that, so the browser's EventSource retries later.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'User session required'}), 400
+
+    if chat_room_id not in chat_manager.chat_rooms:
+        return jsonify({'error': 'Chat room not found'}), 404
+
+    if user_id not in chat_manager.chat_rooms[chat_room_id]['participants']:
+        return jsonify({'error': 'Access denied'}), 403
+
+    # Browsers resend the last SSE id (a message id) when they reconnect
+    last_message_id = request.headers.get('Last-Event-ID') or request.args.get('last_message_id')
+
+    if not chat_delivery_hub.acquire_stream():
+        return jsonify({'error': 'Too many open chat streams, retry shortly'}), 503, {'Retry-After': '5'}
+
+    response = Response(
+        stream_with_context(chat_delivery_hub.sse_stream(chat_room_id, last_message_id)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Runs when the server closes the response, including streams that never started
+    response.call_on_close(chat_delivery_hub.release_stream)
+    return response
 
 @app.route('/api/chat/react', methods=['POST'])
 def react_to_message():
@@ -489,16 +541,17 @@ def create_direct_message():
     })
 
 @app.route('/api/chat/search/<chat_room_id>')
-def search_chat_messages():
+def search_chat_messages(chat_room_id):
     """Search messages in a chat room"""
     user_id = session.get('user_id')
     if not user_id:
         return jsonify({'error': 'User session required'}), 400
     
-    query = request.args.get('q', '').strip()
-    limit = request.args.get('limit', 20, type=int)
+    # Trailing whitespace is significant: it turns off prefix matching of the last term
+    query = request.args.get('q', '').lstrip()
+    limit = min(max(request.args.get('limit', 20, type=int), 1), MAX_SEARCH_LIMIT)
     
-    if not query:
+    if not query.strip():
         return jsonify({'error': 'Search query required'}), 400
     
     if chat_room_id not in chat_manager.chat_rooms:
@@ -509,9 +562,26 @@ def search_chat_messages():
         return jsonify({'error': 'Access denied'}), 403
     
     results = chat_manager.search_messages(chat_room_id, query, limit)
-    
+
     return jsonify({'results': results})
 
+@app.route('/api/chat/search')
+def search_user_chat_messages():
+    """Search messages across all of the user's chat rooms"""
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'User session required'}), 400
+
+    # Trailing whitespace is significant: it turns off prefix matching of the last term
+    query = request.args.get('q', '').lstrip()
+    limit = min(max(request.args.get('limit', 20, type=int), 1), MAX_SEARCH_LIMIT)
+    offset = min(max(request.args.get('offset', 0, type=int), 0), MAX_SEARCH_OFFSET)
+
+    if not query.strip():
+        return jsonify({'error': 'Search query required'}), 400
+
+    return jsonify(chat_manager.search_user_messages(user_id, query, limit, offset))
+
 # Auto-create chat rooms for study groups and challenges
 @app.route('/api/social/auto-create-chat', methods=['POST'])
 def auto_create_chat_room():
@@ -595,11 +665,10 @@ def video_session_details(session_id):
     if not user_id:
         return redirect(url_for('social_dashboard'))
     
-    if session_id not in video_manager.sessions:
+    session_data = video_manager.get_session(session_id)
+    if session_data is None:
         return "Session not found", 404
     
-    session_data = video_manager.sessions[session_id]
-    
     return render_template('video_session_details.html',
                          session=session_data,
                          user_id=user_id)
@@ -635,6 +704,20 @@ def start_video_session(session_id):
     else:
         return jsonify({'error': 'Unable to start session'}), 400
 
+@app.route('/api/video-sessions/<session_id>/update', methods=['POST'])
+def update_video_session(session_id):
+    """Edit a scheduled video session (host only)"""
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'User session required'}), 400
+    
+    result = video_manager.update_session(session_id, user_id, request.get_json() or {})
+    
+    if 'error' in result:
+        return jsonify(result), 400
+    
+    return jsonify(result)
+
 @app.route('/api/video-sessions/<session_id>/end', methods=['POST'])
 def end_video_session(session_id):
     """End a video session (host only)"""
@@ -230,15 +230,10 @@ def user_profile():
     
     # Get all user progress across subjects
     all_progress = {}
-    for user_key, progress in subject_manager.user_progress.items():
-        if user_key.startswith(user_id):
-            parts = user_key.split('_')
-            if len(parts) >= 3:
-                category = parts[1]
-                topic = parts[2]
-                if category not in all_progress:
-                    all_progress[category] = {}
-                all_progress[category][topic] = progress
+    for category, topic in subject_manager.get_user_topics(user_id):
+        if category not in all_progress:
+            all_progress[category] = {}
+        all_progress[category][topic] = subject_manager.get_user_progress(user_id, category, topic)
     
     return render_template('user_profile.html', 
                          user_progress=all_progress,
@@ -3,7 +3,6 @@ Advanced Security & Compliance for NeuroPulse
 Provides FERPA/GDPR compliance, data encryption, audit trails, and role-based access control
 """
 
-import json
 import os
 import uuid
 import hashlib
@@ -12,6 +11,9 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import base64
 
+from record_store import record_store
+from audit_log_store import AuditLogStore
+
 class SecurityComplianceManager:
     def __init__(self):
         self.audit_logs_file = 'security_audit_logs.json'
@@ -19,27 +21,37 @@ class SecurityComplianceManager:
         self.access_controls_file = 'rbac_access_controls.json'
         self.data_protection_file = 'data_protection_policies.json'
         self.consent_management_file = 'user_consent_records.json'
+        self.audit_log_directory = 'data/audit_logs'
+        self.detection_window_seconds = 3600  # trailing window of suspicious-pattern detection
         
         self.load_data()
     
     def load_data(self):
         """Load security and compliance data"""
-        self.audit_logs = self._load_json_file(self.audit_logs_file, {})
+        self.audit_log = AuditLogStore(self.audit_log_directory)
+        if self.audit_log.is_empty():
+            # One-time migration of the legacy whole-file audit log, by whichever worker gets the
+            # lock first; the others find the log no longer empty once they hold it
+            with self.audit_log.exclusive():
+                if self.audit_log.is_empty():
+                    legacy_logs = self._load_json_file(self.audit_logs_file, {})
+                    for log in sorted(legacy_logs.values(), key=lambda log: log['timestamp']):
+                        self.audit_log.append(log)
         self.compliance_records = self._load_json_file(self.compliance_records_file, {})
         self.access_controls = self._load_json_file(self.access_controls_file, {})
         self.data_protection = self._load_json_file(self.data_protection_file, {})
         self.consent_records = self._load_json_file(self.consent_management_file, {})
     
     def _load_json_file(self, filename: str, default: dict) -> dict:
-        try:
-            with open(filename, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return default
+        return record_store.load_collection(filename, default)
     
-    def _save_json_file(self, filename: str, data: dict):
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+    def _save_json_file(self, filename: str, data: dict, record_id: str = None):
+        if record_id is None:
+            record_store.save_collection(filename, data)
+        elif record_id in data:
+            record_store.save_record(filename, record_id, data[record_id])
+        else:
+            record_store.delete_record(filename, record_id)
     
     def implement_ferpa_compliance(self, institution_id: str, config: dict) -> str:
         """Implement FERPA compliance framework"""
@@ -78,7 +90,7 @@ class SecurityComplianceManager:
         }
         
         self.compliance_records[compliance_id] = ferpa_framework
-        self._save_json_file(self.compliance_records_file, self.compliance_records)
+        self._save_json_file(self.compliance_records_file, self.compliance_records, compliance_id)
         
         return compliance_id
     
@@ -127,7 +139,7 @@ class SecurityComplianceManager:
         }
         
         self.compliance_records[compliance_id] = gdpr_framework
-        self._save_json_file(self.compliance_records_file, self.compliance_records)
+        self._save_json_file(self.compliance_records_file, self.compliance_records, compliance_id)
         
         return compliance_id
     
@@ -225,7 +237,7 @@ class SecurityComplianceManager:
         }
         
         self.access_controls[rbac_id] = rbac_system
-        self._save_json_file(self.access_controls_file, self.access_controls)
+        self._save_json_file(self.access_controls_file, self.access_controls, rbac_id)
         
         return rbac_id
     
@@ -362,14 +374,17 @@ class SecurityComplianceManager:
             'additional_context': details.get('context', {})
         }
         
-        self.audit_logs[log_id] = security_log
-        self._save_json_file(self.audit_logs_file, self.audit_logs)
+        self.audit_log.append(security_log)
         
         # Check for suspicious patterns
         self._analyze_security_patterns(user_id, event_type)
         
         return log_id
     
+    def get_recent_security_events(self, user_id: str, hours: int = 1) -> List[dict]:
+        """Get a user's audit events from the trailing time window"""
+        return self.audit_log.user_events(user_id, hours * 3600)
+    
     def _log_access_attempt(self, user_id: str, permission: str, authorized: bool, context: dict = None):
         """Log access attempt for audit purposes"""
         self.log_security_event(
@@ -386,25 +401,24 @@ class SecurityComplianceManager:
     
     def _analyze_security_patterns(self, user_id: str, event_type: str):
         """Analyze security events for suspicious patterns"""
-        # Get recent events for user
-        recent_events = [
-            log for log in self.audit_logs.values()
-            if log['user_id'] == user_id and 
-            datetime.now() - datetime.fromisoformat(log['timestamp']) < timedelta(hours=1)
-        ]
+        # Counted from the shared audit log, so restarts and other workers' events are included
+        if event_type == 'login_failure':
+            failure_count = self.audit_log.count_user_events(user_id, self.detection_window_seconds,
+                                                             event_type='login_failure')
+            if failure_count > 5:
+                self._trigger_security_alert('multiple_failed_logins', user_id, {
+                    'failure_count': failure_count,
+                    'time_window': '1_hour'
+                })
         
-        # Check for suspicious patterns
-        if event_type == 'login_failure' and len([e for e in recent_events if e['event_type'] == 'login_failure']) > 5:
-            self._trigger_security_alert('multiple_failed_logins', user_id, {
-                'failure_count': len([e for e in recent_events if e['event_type'] == 'login_failure']),
-                'time_window': '1_hour'
-            })
-        
-        if event_type == 'access_attempt' and len([e for e in recent_events if not e['success']]) > 10:
-            self._trigger_security_alert('excessive_access_denials', user_id, {
-                'denial_count': len([e for e in recent_events if not e['success']]),
-                'time_window': '1_hour'
-            })
+        if event_type == 'access_attempt':
+            denial_count = self.audit_log.count_user_events(user_id, self.detection_window_seconds,
+                                                            failed_only=True)
+            if denial_count > 10:
+                self._trigger_security_alert('excessive_access_denials', user_id, {
+                    'denial_count': denial_count,
+                    'time_window': '1_hour'
+                })
     
     def _trigger_security_alert(self, alert_type: str, user_id: str, details: dict):
         """Trigger security alert for suspicious activity"""
@@ -459,7 +473,7 @@ class SecurityComplianceManager:
         }
         
         self.consent_records[consent_id] = consent_record
-        self._save_json_file(self.consent_management_file, self.consent_records)
+        self._save_json_file(self.consent_management_file, self.consent_records, consent_id)
         
         # Update data processing activities
         self._update_data_processing_for_consent(user_id, consent_type, consent_given)
@@ -542,16 +556,13 @@ class SecurityComplianceManager:
     
     def _analyze_audit_logs(self, institution_id: str) -> dict:
         """Analyze audit logs for compliance metrics"""
-        recent_logs = [
-            log for log in self.audit_logs.values()
-            if datetime.now() - datetime.fromisoformat(log['timestamp']) < timedelta(days=30)
-        ]
+        recent_counts = self.audit_log.event_counts(int(timedelta(days=30).total_seconds()))
         
         return {
-            'total_events': len(recent_logs),
-            'failed_access_attempts': len([log for log in recent_logs if log['event_type'] == 'access_attempt' and not log['success']]),
-            'security_alerts': len([log for log in recent_logs if log['event_type'] == 'security_alert']),
-            'data_breaches': len([log for log in recent_logs if log['event_type'] == 'data_breach']),
+            'total_events': recent_counts.get('total_events', 0),
+            'failed_access_attempts': recent_counts.get('failed_access_attempt', 0),
+            'security_alerts': recent_counts.get('security_alert', 0),
+            'data_breaches': recent_counts.get('data_breach', 0),
             'audit_completeness': 95.5  # Would be calculated based on expected vs actual logs
         }
     
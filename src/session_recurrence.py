@@ -0,0 +1,86 @@
+"""
+Session Recurrence for NeuroPulse
+RRULE-like recurrence rules whose occurrences are computed on demand instead of stored
+"""
+
+import calendar
+from datetime import datetime, timedelta
+from typing import Dict, Iterator
+
+FREQUENCIES = ('daily', 'weekly', 'monthly')
+
+
+def add_months(moment: datetime, months: int) -> datetime:
+    """Same day and time `months` later, clamped to the last day of shorter months"""
+    month_index = moment.month - 1 + months
+    year, month = moment.year + month_index // 12, month_index % 12 + 1
+    return moment.replace(year=year, month=month, day=min(moment.day, calendar.monthrange(year, month)[1]))
+
+
+class RecurrenceRule:
+    """Every `interval` days, weeks or calendar months from `start` until `until` (inclusive).
+
+    Occurrence n is computed directly from n, so any window can be
+    expanded without walking the occurrences before it.
+    """
+
+    def __init__(self, frequency: str, interval: int, start: datetime, until: datetime):
+        if frequency not in FREQUENCIES:
+            raise ValueError(f"Unsupported frequency: {frequency}")
+        if interval < 1:
+            raise ValueError("interval must be at least 1")
+        self.frequency = frequency
+        self.interval = interval
+        self.start = start
+        self.until = until
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'RecurrenceRule':
+        return cls(data['frequency'], int(data.get('interval', 1)),
+                   datetime.fromisoformat(data['start_date']), datetime.fromisoformat(data['end_date']))
+
+    def to_dict(self) -> Dict:
+        return {
+            'frequency': self.frequency,
+            'interval': self.interval,
+            'start_date': self.start.isoformat(),
+            'end_date': self.until.isoformat()
+        }
+
+    def _step(self) -> timedelta:
+        return timedelta(days=self.interval) if self.frequency == 'daily' else timedelta(weeks=self.interval)
+
+    def occurrence(self, n: int) -> datetime:
+        if self.frequency == 'monthly':
+            return add_months(self.start, n * self.interval)
+        return self.start + n * self._step()
+
+    def _index_at_or_after(self, moment: datetime) -> int:
+        """Index of the first occurrence at or after moment"""
+        if moment <= self.start:
+            return 0
+        if self.frequency == 'monthly':
+            months = (moment.year - self.start.year) * 12 + moment.month - self.start.month
+            n = max(0, months // self.interval - 1)
+            while self.occurrence(n) < moment:
+                n += 1
+            return n
+        steps, remainder = divmod(moment - self.start, self._step())
+        return steps + (1 if remainder else 0)
+
+    def between(self, after: datetime, until: datetime) -> Iterator[datetime]:
+        """Occurrences in (after, until], earliest first"""
+        until = min(until, self.until)
+        n = self._index_at_or_after(after)
+        moment = self.occurrence(n)
+        if moment == after:
+            n += 1
+            moment = self.occurrence(n)
+        while moment <= until:
+            yield moment
+            n += 1
+            moment = self.occurrence(n)
+
+    def includes(self, moment: datetime) -> bool:
+        """Whether moment is one of the rule's occurrences"""
+        return self.start <= moment <= self.until and self.occurrence(self._index_at_or_after(moment)) == moment
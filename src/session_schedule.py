@@ -0,0 +1,88 @@
+"""
+Session Schedule for NeuroPulse
+Time-ordered index of scheduled video sessions, overall and per participant and subject
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+_ALL = ('all',)
+
+
+def start_epoch(scheduled_start) -> Optional[float]:
+    """Epoch seconds of an ISO start time, or None when missing or malformed"""
+    if not scheduled_start:
+        return None
+    try:
+        return datetime.fromisoformat(scheduled_start).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class SessionSchedule:
+    """Scheduled sessions in sorted (start epoch, session id) lists.
+
+    One list holds every scheduled session and further lists hold the
+    sessions of each participant and of each subject category, so a window
+    such as "the next 7 days for user X in subject Y" is two bisects on the
+    shorter of the two lists plus a membership check per hit.
+    """
+
+    def __init__(self):
+        self._starts = {}  # session_id -> start epoch
+        self._keys = {}    # session_id -> index keys it is filed under
+        self._lists = {_ALL: []}  # index key -> sorted [(start epoch, session_id)]
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._starts
+
+    def _file(self, key: tuple, session_id: str):
+        insort(self._lists.setdefault(key, []), (self._starts[session_id], session_id))
+        self._keys[session_id].add(key)
+
+    def add(self, session_id: str, start: float, user_ids: Iterable[str] = (), subject: Optional[str] = None):
+        """Index a scheduled session, replacing any previous entry"""
+        self.remove(session_id)
+        self._starts[session_id] = start
+        self._keys[session_id] = set()
+        self._file(_ALL, session_id)
+        for user_id in user_ids:
+            self._file(('user', user_id), session_id)
+        if subject is not None:
+            self._file(('subject', subject), session_id)
+
+    def add_user(self, session_id: str, user_id: str):
+        """Add a participant to an indexed session"""
+        if session_id in self._starts and ('user', user_id) not in self._keys[session_id]:
+            self._file(('user', user_id), session_id)
+
+    def remove(self, session_id: str):
+        start = self._starts.pop(session_id, None)
+        if start is None:
+            return
+        for key in self._keys.pop(session_id):
+            entries = self._lists[key]
+            del entries[bisect_left(entries, (start, session_id))]
+            if not entries and key != _ALL:
+                del self._lists[key]
+
+    def window(self, start: float, end: float, user_id: Optional[str] = None,
+               subject: Optional[str] = None) -> List[Tuple[float, str]]:
+        """(start epoch, session_id) of sessions starting in (start, end], earliest first"""
+        keys = [key for key in (('user', user_id) if user_id else None,
+                                ('subject', subject) if subject else None) if key]
+        if not keys:
+            keys = [_ALL]
+        lists = [self._lists.get(key, []) for key in keys]
+        shortest = min(range(len(keys)), key=lambda i: len(lists[i]))
+        entries = lists[shortest]
+        others = [key for i, key in enumerate(keys) if i != shortest]
+        # Both bounds sort after every (epoch, id) entry at that epoch: `start` is exclusive, `end` inclusive
+        low = bisect_right(entries, (start, '\U0010ffff'))
+        high = bisect_right(entries, (end, '\U0010ffff'))
+        return [(epoch, session_id) for epoch, session_id in entries[low:high]
+                if all(key in self._keys[session_id] for key in others)]
@@ -0,0 +1,133 @@
+"""
+Similarity Index for NeuroPulse
+MinHash signatures with locality-sensitive hashing for finding learners who study similar things
+"""
+
+import hashlib
+import heapq
+import random
+from typing import Iterable, List, Optional, Tuple
+
+_PRIME = (1 << 61) - 1  # Mersenne prime modulus of the permutation hashes
+
+SIGNATURE_SIZE = 64  # MinHash values per learner
+BANDS = 32           # 2 values per band: a pair with Jaccard 0.3 shares a band with probability ~0.95
+CANDIDATE_FACTOR = 20  # most-colliding candidates verified with exact Jaccard per result wanted
+
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'big')
+
+
+def jaccard(first: frozenset, second: frozenset) -> float:
+    if not first or not second:
+        return 0.0
+    shared = len(first & second)
+    return shared / (len(first) + len(second) - shared)
+
+
+class SimilarityIndex:
+    """Learners indexed by the MinHash signature of their feature set.
+
+    Features are short strings such as subject names, optionally suffixed
+    with a skill level. The signature is split into bands; learners whose
+    signatures agree on a whole band share a bucket, and two sets agree on
+    a band with probability Jaccard ** rows, so a query only looks at the
+    learners in its own buckets. The learners colliding on the most bands
+    are then ranked by their exact Jaccard similarity.
+    """
+
+    def __init__(self, signature_size: int = SIGNATURE_SIZE, bands: int = BANDS, seed: int = 1):
+        if signature_size % bands:
+            raise ValueError("signature_size must be a multiple of bands")
+        rng = random.Random(seed)
+        self.rows = signature_size // bands
+        self._permutations = [(rng.randrange(1, _PRIME), rng.randrange(_PRIME)) for _ in range(signature_size)]
+        self._buckets = [{} for _ in range(bands)]  # band -> band key -> set of item ids
+        self.features = {}  # item id -> frozenset of features
+        self._band_keys = {}  # item id -> band keys it is filed under
+        self._feature_signatures = {}  # feature -> its permuted hashes
+
+    def __len__(self) -> int:
+        return len(self.features)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self.features
+
+    def _feature_signature(self, feature: str) -> tuple:
+        signature = self._feature_signatures.get(feature)
+        if signature is None:
+            h = _feature_hash(feature)
+            signature = tuple((a * h + b) % _PRIME for a, b in self._permutations)
+            self._feature_signatures[feature] = signature
+        return signature
+
+    def _band_keys_of(self, features: frozenset) -> List[tuple]:
+        # A set's MinHash is the element-wise minimum of its features' (cached) permuted hashes
+        signature = list(map(min, zip(*(self._feature_signature(feature) for feature in features))))
+        rows = self.rows
+        return [tuple(signature[start:start + rows]) for start in range(0, len(signature), rows)]
+
+    def update(self, item_id: str, features: Iterable[str]):
+        """Index an item's features, replacing its previous ones; an empty set removes it"""
+        features = frozenset(features)
+        if self.features.get(item_id) == features:
+            return
+        self.remove(item_id)
+        if not features:
+            return
+        band_keys = self._band_keys_of(features)
+        for buckets, key in zip(self._buckets, band_keys):
+            buckets.setdefault(key, set()).add(item_id)
+        self.features[item_id] = features
+        self._band_keys[item_id] = band_keys
+
+    def remove(self, item_id: str):
+        band_keys = self._band_keys.pop(item_id, None)
+        if band_keys is None:
+            return
+        del self.features[item_id]
+        for buckets, key in zip(self._buckets, band_keys):
+            bucket = buckets[key]
+            bucket.discard(item_id)
+            if not bucket:
+                del buckets[key]
+
+    def query(self, features: Iterable[str], limit: int = 10, threshold: float = 0.0,
+              exclude: Optional[str] = None) -> List[Tuple[str, float]]:
+        """(item id, Jaccard similarity) of up to `limit` similar items, most similar first.
+
+        Approximate: an item sharing no band with the query is never seen,
+        however similar it is. Only items above `threshold` are returned.
+        """
+        features = frozenset(features)
+        if not features or limit <= 0:
+            return []
+        band_keys = self._band_keys.get(exclude) if self.features.get(exclude) == features else None
+        if band_keys is None:
+            band_keys = self._band_keys_of(features)
+
+        collisions = {}
+        for buckets, key in zip(self._buckets, band_keys):
+            for item_id in buckets.get(key, ()):
+                collisions[item_id] = collisions.get(item_id, 0) + 1
+        collisions.pop(exclude, None)
+
+        candidates = collisions
+        if len(candidates) > limit * CANDIDATE_FACTOR:
+            candidates = heapq.nlargest(limit * CANDIDATE_FACTOR, collisions, key=collisions.__getitem__)
+        scored = []
+        for item_id in candidates:
+            similarity = jaccard(features, self.features[item_id])
+            if similarity > threshold:
+                scored.append((-similarity, item_id))
+        return [(item_id, -negated) for negated, item_id in heapq.nsmallest(limit, scored)]
+
+    def exact_query(self, features: Iterable[str], limit: int = 10, threshold: float = 0.0,
+                    exclude: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Same as query, by scoring every indexed item"""
+        features = frozenset(features)
+        scored = [(-jaccard(features, other), item_id)
+                  for item_id, other in self.features.items() if item_id != exclude]
+        return [(item_id, -negated) for negated, item_id in heapq.nsmallest(limit, scored)
+                if -negated > threshold]
@@ -3,12 +3,15 @@ Social Learning Features for NeuroPulse
 Handles peer comparison, collaborative challenges, study groups, and community features
 """
 
-import json
-import os
+import atexit
+import threading
 import uuid
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
+from ranking_index import RankedBoard
+from record_store import record_store
+
 class SocialLearningManager:
     def __init__(self):
         self.challenges_file = 'challenges_data.json'
@@ -16,7 +19,15 @@ class SocialLearningManager:
         self.social_progress_file = 'social_progress_data.json'
         self.achievements_file = 'social_achievements_data.json'
         
+        # Challenge progress hot path: per-challenge ranked boards and batched writes
+        self.challenge_boards = {}  # challenge_id -> RankedBoard of participant entries
+        self.challenge_flush_interval = 5  # seconds
+        self._pending_progress = {}  # (challenge_id, user_id) -> [questions, correct, best streak] not yet stored
+        self._challenge_flush_timer = None
+        self._challenge_lock = threading.Lock()
+        
         self.load_data()
+        atexit.register(self.flush_challenges)
     
     def load_data(self):
         """Load all social learning data"""
@@ -24,19 +35,27 @@ class SocialLearningManager:
         self.study_groups = self._load_json_file(self.study_groups_file, {})
         self.social_progress = self._load_json_file(self.social_progress_file, {})
         self.achievements = self._load_json_file(self.achievements_file, {})
+        
+        self.challenge_boards = {}
+        for challenge_id, challenge in self.challenges.items():
+            challenge.pop('leaderboard', None)  # older records stored a sorted copy of the board
+            board = self.challenge_boards[challenge_id] = RankedBoard()
+            for user_id, participant in challenge['participants'].items():
+                entry = self._challenge_entry(user_id, participant)
+                board.upsert(user_id, entry['score'], entry)
     
     def _load_json_file(self, filename: str, default: dict) -> dict:
-        """Load JSON file with fallback to default"""
-        try:
-            with open(filename, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return default
+        """Load a collection from the shared record store with fallback to default"""
+        return record_store.load_collection(filename, default)
     
-    def _save_json_file(self, filename: str, data: dict):
-        """Save data to JSON file"""
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+    def _save_json_file(self, filename: str, data: dict, record_id: str = None):
+        """Persist one record when record_id is given, otherwise only the changed records"""
+        if record_id is None:
+            record_store.save_collection(filename, data)
+        elif record_id in data:
+            record_store.save_record(filename, record_id, data[record_id])
+        else:
+            record_store.delete_record(filename, record_id)
     
     def create_challenge(self, creator_id: str, challenge_data: dict) -> str:
         """Create a new collaborative challenge"""
@@ -59,14 +78,14 @@ class SocialLearningManager:
             'end_time': challenge_data.get('end_time'),
             'status': 'active',
             'participants': {},
-            'leaderboard': [],
             'collaboration_type': challenge_data.get('collaboration_type', 'competitive'), # competitive, collaborative, team-based
             'rules': challenge_data.get('rules', []),
             'discussion_enabled': challenge_data.get('discussion_enabled', True)
         }
         
         self.challenges[challenge_id] = challenge
-        self._save_json_file(self.challenges_file, self.challenges)
+        self.challenge_boards[challenge_id] = RankedBoard()
+        self._save_json_file(self.challenges_file, self.challenges, challenge_id)
         
         return challenge_id
     
@@ -75,29 +94,30 @@ class SocialLearningManager:
         if challenge_id not in self.challenges:
             return False
         
-        challenge = self.challenges[challenge_id]
-        
-        # Check if challenge is still active and has space
-        if (challenge['status'] != 'active' or 
-            len(challenge['participants']) >= challenge['max_participants']):
-            return False
-        
-        # Add participant
-        challenge['participants'][user_id] = {
-            'user_id': user_id,
-            'user_name': user_name or f"User_{user_id[:8]}",
-            'joined_at': datetime.now().isoformat(),
-            'progress': {
-                'questions_answered': 0,
-                'correct_answers': 0,
-                'completion_time': None,
-                'accuracy_rate': 0.0,
-                'streak_count': 0
-            },
-            'status': 'active'
-        }
+        with record_store.editing(self.challenges_file, self.challenges, challenge_id) as challenge:
+            # Check if challenge is still active and has space
+            if (challenge['status'] != 'active' or 
+                len(challenge['participants']) >= challenge['max_participants']):
+                return False
+            
+            # Add participant
+            challenge['participants'][user_id] = {
+                'user_id': user_id,
+                'user_name': user_name or f"User_{user_id[:8]}",
+                'joined_at': datetime.now().isoformat(),
+                'progress': {
+                    'questions_answered': 0,
+                    'correct_answers': 0,
+                    'completion_time': None,
+                    'accuracy_rate': 0.0,
+                    'streak_count': 0
+                },
+                'status': 'active'
+            }
         
-        self._save_json_file(self.challenges_file, self.challenges)
+        with self._challenge_lock:
+            entry = self._challenge_entry(user_id, challenge['participants'][user_id])
+            self.challenge_boards[challenge_id].upsert(user_id, entry['score'], entry)
         return True
     
     def update_challenge_progress(self, challenge_id: str, user_id: str, session_data: dict):
@@ -110,56 +130,119 @@ class SocialLearningManager:
             return False
         
         participant = challenge['participants'][user_id]
+        questions = session_data.get('questions_answered', 0)
+        correct = session_data.get('correct_answers', 0)
+        streak = session_data.get('streak_count', 0)
+        self._apply_progress(challenge, participant, questions, correct, streak)
+        
+        # Move the participant on the leaderboard and queue the change for the next batched write,
+        # which a timer makes within challenge_flush_interval even if no more progress arrives
+        with self._challenge_lock:
+            entry = self._challenge_entry(user_id, participant)
+            self.challenge_boards[challenge_id].upsert(user_id, entry['score'], entry)
+            pending = self._pending_progress.setdefault((challenge_id, user_id), [0, 0, 0])
+            pending[0] += questions
+            pending[1] += correct
+            pending[2] = max(pending[2], streak)
+            if self._challenge_flush_timer is None:
+                self._challenge_flush_timer = threading.Timer(self.challenge_flush_interval, self.flush_challenges)
+                self._challenge_flush_timer.daemon = True
+                self._challenge_flush_timer.start()
+        return True
+    
+    @staticmethod
+    def _apply_progress(challenge: dict, participant: dict, questions: int, correct: int, streak: int):
         progress = participant['progress']
         
         # Update progress
-        progress['questions_answered'] += session_data.get('questions_answered', 0)
-        progress['correct_answers'] += session_data.get('correct_answers', 0)
+        progress['questions_answered'] += questions
+        progress['correct_answers'] += correct
         progress['accuracy_rate'] = progress['correct_answers'] / max(progress['questions_answered'], 1)
-        progress['streak_count'] = max(progress['streak_count'], session_data.get('streak_count', 0))
+        progress['streak_count'] = max(progress['streak_count'], streak)
         
         # Check if challenge is completed
-        if progress['questions_answered'] >= challenge['question_count']:
+        if progress['questions_answered'] >= challenge['question_count'] and participant['status'] != 'completed':
             progress['completion_time'] = datetime.now().isoformat()
             participant['status'] = 'completed'
-        
-        # Update leaderboard
-        self._update_challenge_leaderboard(challenge_id)
-        
-        self._save_json_file(self.challenges_file, self.challenges)
-        return True
     
-    def _update_challenge_leaderboard(self, challenge_id: str):
-        """Update challenge leaderboard based on current progress"""
-        challenge = self.challenges[challenge_id]
+    def flush_challenges(self):
+        """Add the progress made since the last flush to the stored challenges, in one transaction.
+        
+        Only the increments are written, onto the stored records, so progress
+        and joins recorded by other workers are kept.
+        """
+        with self._challenge_lock:
+            pending_progress = self._pending_progress
+            self._pending_progress = {}
+            if self._challenge_flush_timer is not None:
+                self._challenge_flush_timer.cancel()
+                self._challenge_flush_timer = None
+        if not pending_progress:
+            return
+        
+        by_challenge = {}
+        for (challenge_id, user_id), increments in pending_progress.items():
+            by_challenge.setdefault(challenge_id, {})[user_id] = increments
+        
+        stored = {}
+        with record_store.transaction() as txn:
+            for challenge_id, increments_by_user in by_challenge.items():
+                challenge = txn.get(self.challenges_file, challenge_id)
+                if challenge is None:
+                    continue
+                for user_id, (questions, correct, streak) in increments_by_user.items():
+                    participant = challenge['participants'].get(user_id)
+                    if participant is not None:
+                        self._apply_progress(challenge, participant, questions, correct, streak)
+                txn.put(self.challenges_file, challenge_id, challenge)
+                stored[challenge_id] = challenge
+        
+        # Take the merged records, other workers' progress included, as this worker's copy
+        with self._challenge_lock:
+            for challenge_id, challenge in stored.items():
+                self.challenges[challenge_id] = challenge
+                board = self.challenge_boards.setdefault(challenge_id, RankedBoard())
+                for user_id, participant in challenge['participants'].items():
+                    entry = self._challenge_entry(user_id, participant)
+                    board.upsert(user_id, entry['score'], entry)
+    
+    def _challenge_entry(self, user_id: str, participant: dict) -> dict:
+        """Leaderboard entry of a participant, scored on accuracy, completion and streak"""
+        progress = participant['progress']
         
-        # Create leaderboard entries
-        leaderboard = []
-        for user_id, participant in challenge['participants'].items():
-            progress = participant['progress']
+        score = 0
+        if progress['questions_answered'] > 0:
+            accuracy_score = progress['accuracy_rate'] * 100
+            speed_bonus = 10 if participant['status'] == 'completed' else 0
+            streak_bonus = min(progress['streak_count'] * 2, 20)
             
-            # Calculate score based on accuracy, speed, and completion
-            score = 0
-            if progress['questions_answered'] > 0:
-                accuracy_score = progress['accuracy_rate'] * 100
-                speed_bonus = 10 if participant['status'] == 'completed' else 0
-                streak_bonus = min(progress['streak_count'] * 2, 20)
-                
-                score = accuracy_score + speed_bonus + streak_bonus
-            
-            leaderboard.append({
-                'user_id': user_id,
-                'user_name': participant['user_name'],
-                'score': round(score, 2),
-                'accuracy': round(progress['accuracy_rate'] * 100, 1),
-                'questions_answered': progress['questions_answered'],
-                'status': participant['status'],
-                'completion_time': progress.get('completion_time')
-            })
-        
-        # Sort by score descending
-        leaderboard.sort(key=lambda x: x['score'], reverse=True)
-        challenge['leaderboard'] = leaderboard
+            score = accuracy_score + speed_bonus + streak_bonus
+        
+        return {
+            'user_id': user_id,
+            'user_name': participant['user_name'],
+            'score': round(score, 2),
+            'accuracy': round(progress['accuracy_rate'] * 100, 1),
+            'questions_answered': progress['questions_answered'],
+            'status': participant['status'],
+            'completion_time': progress.get('completion_time')
+        }
+    
+    def get_challenge_leaderboard(self, challenge_id: str, limit: int = 50, start_rank: int = 1) -> List[dict]:
+        """One page of a challenge leaderboard, best score first"""
+        board = self.challenge_boards.get(challenge_id)
+        if board is None:
+            return []
+        with self._challenge_lock:
+            return [dict(entry, rank=rank) for rank, entry in board.page(start_rank, limit)]
+    
+    def get_challenge_rank(self, challenge_id: str, user_id: str) -> Optional[int]:
+        """1-based leaderboard position of a participant - O(log n)"""
+        board = self.challenge_boards.get(challenge_id)
+        if board is None:
+            return None
+        with self._challenge_lock:
+            return board.rank(user_id)
     
     def get_active_challenges(self, subject_category: str = None) -> List[dict]:
         """Get list of active challenges, optionally filtered by subject"""
@@ -213,7 +296,7 @@ class SocialLearningManager:
         }
         
         self.study_groups[group_id] = study_group
-        self._save_json_file(self.study_groups_file, self.study_groups)
+        self._save_json_file(self.study_groups_file, self.study_groups, group_id)
         
         return group_id
     
@@ -222,24 +305,21 @@ class SocialLearningManager:
         if group_id not in self.study_groups:
             return False
         
-        group = self.study_groups[group_id]
-        
-        # Check if group has space and user isn't already a member
-        if (len(group['members']) >= group['max_members'] or 
-            user_id in group['members']):
-            return False
-        
-        # Add member
-        group['members'][user_id] = {
-            'user_id': user_id,
-            'user_name': user_name or f"User_{user_id[:8]}",
-            'role': 'member',
-            'joined_at': datetime.now().isoformat(),
-            'contribution_score': 0,
-            'sessions_attended': 0
-        }
-        
-        self._save_json_file(self.study_groups_file, self.study_groups)
+        with record_store.editing(self.study_groups_file, self.study_groups, group_id) as group:
+            # Check if group has space and user isn't already a member
+            if (len(group['members']) >= group['max_members'] or 
+                user_id in group['members']):
+                return False
+            
+            # Add member
+            group['members'][user_id] = {
+                'user_id': user_id,
+                'user_name': user_name or f"User_{user_id[:8]}",
+                'role': 'member',
+                'joined_at': datetime.now().isoformat(),
+                'contribution_score': 0,
+                'sessions_attended': 0
+            }
         return True
     
     def get_peer_comparison(self, user_id: str, subject_category: str, topic: str) -> dict:
@@ -249,34 +329,20 @@ class SocialLearningManager:
         # Get user's progress
         user_progress = subject_manager.get_user_progress(user_id, subject_category, topic)
         
-        # Get all users' progress for this topic
-        all_progress = []
-        for user_key, progress in subject_manager.user_progress.items():
-            if f"_{subject_category}_{topic}" in user_key and not user_key.startswith(user_id):
-                other_user_id = user_key.split('_')[0]
-                all_progress.append({
-                    'user_id': other_user_id,
-                    'accuracy': progress['correct_answers'] / max(progress['total_questions_answered'], 1),
-                    'total_questions': progress['total_questions_answered'],
-                    'learning_streak': progress['learning_streak'],
-                    'level': progress['level'],
-                    'badges_count': len(progress['badges_earned']),
-                    'time_invested': progress['time_invested_minutes']
-                })
-        
-        if not all_progress:
+        ranking = subject_manager.progress_index.topic(subject_category, topic)
+        peer_count = len(ranking) - (user_id in ranking) if ranking else 0
+        if not peer_count:
             return {'message': 'No peer data available yet'}
         
-        # Calculate percentiles
+        # Rank and percentile by bisecting the topic's sorted accuracy array
         user_accuracy = user_progress['correct_answers'] / max(user_progress['total_questions_answered'], 1)
-        accuracies = [p['accuracy'] for p in all_progress]
+        better_count = ranking.count_below('accuracy', user_accuracy)
+        ahead_count = ranking.count_above('accuracy', user_accuracy)
+        percentile = (better_count / peer_count) * 100
         
-        # User's percentile ranking
-        better_count = sum(1 for acc in accuracies if user_accuracy > acc)
-        percentile = (better_count / len(accuracies)) * 100 if accuracies else 50
-        
-        # Find similar level peers
-        similar_peers = [p for p in all_progress if p['level'] == user_progress['level']]
+        # Running totals for peers at the user's level
+        similar_count, similar_accuracy, similar_questions = ranking.totals(user_progress['level'], exclude=user_id)
+        similar_avg_accuracy = similar_accuracy / similar_count if similar_count else 0
         
         return {
             'user_stats': {
@@ -288,36 +354,52 @@ class SocialLearningManager:
             },
             'peer_ranking': {
                 'percentile': round(percentile, 1),
-                'rank': better_count + 1,
-                'total_users': len(all_progress) + 1
+                'rank': ahead_count + 1,
+                'total_users': peer_count + 1
             },
             'similar_level_comparison': {
-                'avg_accuracy': round(sum(p['accuracy'] for p in similar_peers) / len(similar_peers) * 100, 1) if similar_peers else 0,
-                'avg_questions': round(sum(p['total_questions'] for p in similar_peers) / len(similar_peers), 1) if similar_peers else 0,
-                'user_vs_avg': 'above' if user_accuracy > (sum(p['accuracy'] for p in similar_peers) / len(similar_peers) if similar_peers else 0) else 'below'
+                'avg_accuracy': round(similar_avg_accuracy * 100, 1),
+                'avg_questions': round(similar_questions / similar_count, 1) if similar_count else 0,
+                'user_vs_avg': 'above' if user_accuracy > similar_avg_accuracy else 'below'
             },
-            'top_performers': sorted(all_progress, key=lambda x: x['accuracy'], reverse=True)[:5],
-            'learning_insights': self._generate_learning_insights(user_progress, all_progress)
+            'top_performers': [
+                self._peer_summary(peer_id, ranking.members[peer_id])
+                for peer_id, _ in ranking.top('accuracy', 5, exclude=user_id)
+            ],
+            'learning_insights': self._generate_learning_insights(user_progress, ranking, user_id)
+        }
+    
+    def _peer_summary(self, user_id: str, progress: dict) -> dict:
+        """Public progress figures of one peer"""
+        return {
+            'user_id': user_id,
+            'accuracy': progress['correct_answers'] / max(progress['total_questions_answered'], 1),
+            'total_questions': progress['total_questions_answered'],
+            'learning_streak': progress['learning_streak'],
+            'level': progress['level'],
+            'badges_count': len(progress['badges_earned']),
+            'time_invested': progress['time_invested_minutes']
         }
     
-    def _generate_learning_insights(self, user_progress: dict, peer_data: List[dict]) -> List[str]:
+    def _generate_learning_insights(self, user_progress: dict, ranking, user_id: str) -> List[str]:
         """Generate personalized learning insights based on peer comparison"""
         insights = []
         
+        peer_count, accuracy_sum, questions_sum = ranking.totals(exclude=user_id)
         user_accuracy = user_progress['correct_answers'] / max(user_progress['total_questions_answered'], 1)
-        avg_peer_accuracy = sum(p['accuracy'] for p in peer_data) / len(peer_data) if peer_data else 0
+        avg_peer_accuracy = accuracy_sum / peer_count if peer_count else 0
         
         if user_accuracy > avg_peer_accuracy * 1.1:
             insights.append("You're performing above average! Consider challenging yourself with harder difficulty levels.")
         elif user_accuracy < avg_peer_accuracy * 0.9:
             insights.append("Focus on understanding concepts deeply rather than speed. Quality over quantity!")
         
-        avg_questions = sum(p['total_questions'] for p in peer_data) / len(peer_data) if peer_data else 0
+        avg_questions = questions_sum / peer_count if peer_count else 0
         if user_progress['total_questions_answered'] < avg_questions * 0.7:
             insights.append("More practice could help! Peers at your level typically answer more questions.")
         
-        high_streak_peers = [p for p in peer_data if p['learning_streak'] > user_progress['learning_streak'] * 1.5]
-        if high_streak_peers:
+        top_streak = ranking.top('streak', 1, exclude=user_id)
+        if top_streak and top_streak[0][1] > user_progress['learning_streak'] * 1.5:
             insights.append("Building a consistent daily practice routine could boost your progress significantly.")
         
         return insights
@@ -393,17 +475,24 @@ class SocialLearningManager:
         user_progress = subject_manager.get_user_progress(user_id, subject_category, topic)
         potential_partners = []
         
+        ranking = subject_manager.progress_index.topic(subject_category, topic)
+        if ranking is None:
+            return []
+        user_accuracy = user_progress['correct_answers'] / max(user_progress['total_questions_answered'], 1)
+        
+        # Cross-topic discovery: learners whose whole topic/level profile is most similar, from
+        # the MinHash index. It only orders partners, the candidates come from the exact scan below
+        features = subject_manager.get_learner_features(user_id)
+        features.add(subject_manager.learner_feature(subject_category, topic, user_progress['level']))
+        user_topics = {feature.rsplit(':', 1)[0] for feature in features}
+        profile_similarity = dict(subject_manager.learner_index.query(features, limit=50, exclude=user_id))
+        
         # Find users with similar level and recent activity
-        for user_key, progress in subject_manager.user_progress.items():
-            if (f"_{subject_category}_{topic}" in user_key and 
-                not user_key.startswith(user_id) and
-                progress['level'] == user_progress['level']):
-                
-                other_user_id = user_key.split('_')[0]
+        for other_user_id, progress in ranking.members.items():
+            if other_user_id != user_id and progress['level'] == user_progress['level']:
                 
                 # Calculate compatibility score
-                accuracy_diff = abs(progress['correct_answers'] / max(progress['total_questions_answered'], 1) - 
-                                  user_progress['correct_answers'] / max(user_progress['total_questions_answered'], 1))
+                accuracy_diff = abs(progress['correct_answers'] / max(progress['total_questions_answered'], 1) - user_accuracy)
                 
                 compatibility_score = max(0, 100 - (accuracy_diff * 100))
                 
@@ -412,11 +501,18 @@ class SocialLearningManager:
                         'user_id': other_user_id,
                         'compatibility_score': round(compatibility_score, 1),
                         'level': progress['level'],
-                        'shared_interests': [topic],  # Could be expanded
                         'activity_level': 'active' if progress.get('last_session') else 'moderate'
                     })
         
-        return sorted(potential_partners, key=lambda x: x['compatibility_score'], reverse=True)[:10]
+        partners = sorted(potential_partners, reverse=True,
+                          key=lambda x: (x['compatibility_score'], profile_similarity.get(x['user_id'], 0.0)))[:10]
+        for partner in partners:
+            # Every partner studies this topic; the profile adds the other topics both study
+            other_topics = {feature.rsplit(':', 1)[0]
+                            for feature in subject_manager.learner_index.features.get(partner['user_id'], ())}
+            other_topics.add(f'{subject_category}/{topic}')
+            partner['shared_interests'] = sorted(path.split('/', 1)[1] for path in user_topics & other_topics)
+        return partners
 
 # Initialize global social learning manager
 social_manager = SocialLearningManager()
\ No newline at end of file
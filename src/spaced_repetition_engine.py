@@ -3,13 +3,21 @@ Spaced Repetition Engine for NeuroPulse
 Implements advanced spaced repetition algorithms for optimal learning retention
 """
 
-import json
-import os
 import uuid
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import math
 import random
+import heapq
+
+from record_store import record_store
+from due_queue import DueQueueIndex, review_epoch
+
+# NumPy is optional: batch rescheduling falls back to the per-card formula without it
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 class SpacedRepetitionEngine:
     def __init__(self):
@@ -29,20 +37,62 @@ class SpacedRepetitionEngine:
     
     def load_data(self):
         """Load spaced repetition data"""
-        self.user_cards = self._load_json_file(self.user_cards_file, {})
+        self.user_cards = self._load_user_cards()
         self.learning_schedules = self._load_json_file(self.learning_schedules_file, {})
         self.retention_analytics = self._load_json_file(self.retention_analytics_file, {})
+        
+        # Per-user queue of cards ordered by next review time
+        self.due_queue = DueQueueIndex()
+        for user_id, cards in self.user_cards.items():
+            self.due_queue.rebuild(user_id, {
+                card_id: review_epoch(card['spaced_repetition']['next_review'])
+                for card_id, card in cards.items()
+            })
+    
+    def _load_user_cards(self) -> dict:
+        """user_id -> {card_id: card} from one stored record per card.
+        
+        Records holding a whole user's card map (the old layout) are split
+        into per-card records on first load.
+        """
+        user_cards = {}
+        legacy = {}
+        for key, value in self._load_json_file(self.user_cards_file, {}).items():
+            if 'spaced_repetition' in value:
+                user_id, card_id = key.rsplit(':', 1)
+                user_cards.setdefault(user_id, {})[card_id] = value
+            else:
+                legacy[key] = value
+        
+        if legacy:
+            migrated = {}
+            for user_id, cards in legacy.items():
+                for card_id, card in cards.items():
+                    user_cards.setdefault(user_id, {})[card_id] = card
+                    migrated[self._card_key(user_id, card_id)] = card
+            record_store.save_records(self.user_cards_file, migrated, deleted=legacy)
+        return user_cards
+    
+    @staticmethod
+    def _card_key(user_id: str, card_id: str) -> str:
+        return f"{user_id}:{card_id}"
+    
+    def _save_cards(self, user_id: str, card_ids):
+        """Write just the given cards of a user, one record each"""
+        cards = self.user_cards[user_id]
+        record_store.save_records(self.user_cards_file,
+                                  {self._card_key(user_id, card_id): cards[card_id] for card_id in card_ids})
     
     def _load_json_file(self, filename: str, default: dict) -> dict:
-        try:
-            with open(filename, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return default
+        return record_store.load_collection(filename, default)
     
-    def _save_json_file(self, filename: str, data: dict):
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+    def _save_json_file(self, filename: str, data: dict, record_id: str = None):
+        if record_id is None:
+            record_store.save_collection(filename, data)
+        elif record_id in data:
+            record_store.save_record(filename, record_id, data[record_id])
+        else:
+            record_store.delete_record(filename, record_id)
     
     def create_learning_card(self, user_id: str, content: dict) -> str:
         """Create a new learning card for spaced repetition"""
@@ -87,7 +137,9 @@ class SpacedRepetitionEngine:
             self.user_cards[user_id] = {}
         
         self.user_cards[user_id][card_id] = learning_card
-        self._save_json_file(self.user_cards_file, self.user_cards)
+        self.due_queue.schedule(user_id, card_id,
+                                review_epoch(learning_card['spaced_repetition']['next_review']))
+        self._save_cards(user_id, [card_id])
         
         return card_id
     
@@ -103,12 +155,41 @@ class SpacedRepetitionEngine:
             return {'error': 'Card not found'}
         
         card = self.user_cards[user_id][card_id]
+        
+        # Calculate new interval and ease factor using modified SM-2+ algorithm
+        next_interval, new_ease_factor = self._calculate_next_interval(
+            card['spaced_repetition'], quality_response, difficulty_felt
+        )
+        review_record = self._apply_review(user_id, card, quality_response, response_time, difficulty_felt,
+                                           next_interval, new_ease_factor, datetime.now())
+        sr_data = card['spaced_repetition']
+        performance = card['performance_metrics']
+        
+        self._save_cards(user_id, [card_id])
+        
+        # Update retention analytics
+        self._update_retention_analytics(user_id, card, review_record)
+        
+        return {
+            'success': True,
+            'next_review_date': sr_data['next_review'],
+            'next_interval_days': next_interval,
+            'ease_factor': new_ease_factor,
+            'graduation_stage': sr_data['graduation_stage'],
+            'retention_strength': performance['retention_strength'],
+            'performance_trend': self._calculate_performance_trend(card)
+        }
+    
+    def _apply_review(self, user_id: str, card: dict, quality_response: int, response_time: float,
+                      difficulty_felt: int, next_interval: int, new_ease_factor: float, now: datetime) -> dict:
+        """Update a card's state for one review with an already computed SM-2+ step; returns the review record"""
         sr_data = card['spaced_repetition']
         performance = card['performance_metrics']
+        now_iso = now.isoformat()
         
         # Record review
         review_record = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': now_iso,
             'quality': quality_response,
             'response_time': response_time,
             'difficulty_felt': difficulty_felt,
@@ -125,19 +206,16 @@ class SpacedRepetitionEngine:
         total_time = performance['average_response_time'] * (performance['total_reviews'] - 1) + response_time
         performance['average_response_time'] = total_time / performance['total_reviews']
         
-        # Calculate new interval and ease factor using modified SM-2+ algorithm
-        next_interval, new_ease_factor = self._calculate_next_interval(
-            sr_data, quality_response, difficulty_felt
-        )
-        
         # Update spaced repetition data
         sr_data['ease_factor'] = new_ease_factor
         sr_data['interval'] = next_interval
         sr_data['repetitions'] += 1
         sr_data['quality_responses'].append(quality_response)
-        sr_data['last_reviewed'] = datetime.now().isoformat()
-        sr_data['next_review'] = (datetime.now() + timedelta(days=next_interval)).isoformat()
+        sr_data['last_reviewed'] = now_iso
+        next_review = now + timedelta(days=next_interval)
+        sr_data['next_review'] = next_review.isoformat()
         sr_data['total_study_time'] += response_time
+        self.due_queue.schedule(user_id, card['card_id'], next_review.timestamp())
         
         # Handle lapses (quality < 3)
         if quality_response < 3:
@@ -151,29 +229,13 @@ class SpacedRepetitionEngine:
         # Calculate retention metrics
         self._update_retention_metrics(card, review_record)
         
-        card['updated_at'] = datetime.now().isoformat()
+        card['updated_at'] = now_iso
         
         # Store review record
-        if 'review_history' not in card:
-            card['review_history'] = []
-        card['review_history'].append(review_record)
-        
-        self._save_json_file(self.user_cards_file, self.user_cards)
-        
-        # Update retention analytics
-        self._update_retention_analytics(user_id, card, review_record)
-        
-        return {
-            'success': True,
-            'next_review_date': sr_data['next_review'],
-            'next_interval_days': next_interval,
-            'ease_factor': new_ease_factor,
-            'graduation_stage': sr_data['graduation_stage'],
-            'retention_strength': performance['retention_strength'],
-            'performance_trend': self._calculate_performance_trend(card)
-        }
+        card.setdefault('review_history', []).append(review_record)
+        return review_record
     
-    def _calculate_next_interval(self, sr_data: dict, quality: int, difficulty: int) -> tuple:
+    def _calculate_next_interval(self, sr_data: dict, quality: int, difficulty: int, rng=random) -> tuple:
         """Calculate next review interval using enhanced SM-2+ algorithm"""
         current_ease = sr_data['ease_factor']
         current_interval = sr_data['interval']
@@ -205,11 +267,124 @@ class SpacedRepetitionEngine:
         new_interval = max(1, min(self.maximum_interval, new_interval))
         
         # Add randomization for natural spacing (±10%)
-        randomization = random.uniform(0.9, 1.1)
+        randomization = rng.uniform(0.9, 1.1)
         new_interval = int(new_interval * randomization)
         
         return new_interval, round(new_ease, 2)
     
+    def calculate_next_intervals_batch(self, intervals, ease_factors, repetitions, qualities,
+                                       difficulties=None, seed: Optional[int] = None) -> tuple:
+        """
+        Vectorized SM-2+ step over arrays of card state (same rules as _calculate_next_interval)
+        Returns (new_intervals, new_ease_factors) as lists
+        """
+        count = len(intervals)
+        if difficulties is None:
+            difficulties = [3] * count
+        
+        if np is None:
+            rng = random.Random(seed)
+            results = [
+                self._calculate_next_interval(
+                    {'ease_factor': ease_factors[i], 'interval': intervals[i], 'repetitions': repetitions[i]},
+                    qualities[i], difficulties[i], rng
+                )
+                for i in range(count)
+            ]
+            return [r[0] for r in results], [r[1] for r in results]
+        
+        interval = np.asarray(intervals, dtype=np.float64)
+        ease = np.asarray(ease_factors, dtype=np.float64)
+        reps = np.asarray(repetitions, dtype=np.int64)
+        quality = np.asarray(qualities, dtype=np.float64)
+        difficulty = np.asarray(difficulties, dtype=np.float64)
+        
+        failed = quality < 3
+        
+        # Successful recall: first, second and mature repetitions
+        success_interval = np.where(
+            reps == 0, 1.0,
+            np.where(reps == 1, float(self.graduation_interval),
+                     interval * (ease + (6 - difficulty) / 10))
+        )
+        success_ease = np.clip(ease + 0.1 * (quality - 3), self.minimum_ease, self.maximum_ease)
+        
+        # Failed recall: shrink interval and ease
+        failed_interval = np.maximum(1.0, interval * 0.2)
+        failed_ease = np.maximum(self.minimum_ease, ease - 0.2)
+        
+        new_interval = np.where(failed, failed_interval, success_interval)
+        new_ease = np.where(failed, failed_ease, success_ease)
+        
+        # Apply interval limits and ±10% randomization
+        new_interval = np.clip(new_interval, 1, self.maximum_interval)
+        rng = np.random.default_rng(seed)
+        new_interval = (new_interval * rng.uniform(0.9, 1.1, count)).astype(np.int64)
+        
+        return new_interval.tolist(), np.round(new_ease, 2).tolist()
+    
+    def review_cards_batch(self, user_id: str, reviews: List[dict], seed: Optional[int] = None) -> dict:
+        """
+        Apply many reviews for one user in a single pass and a single write
+        reviews: [{'card_id', 'quality_response', 'response_time', 'difficulty_felt'}, ...]
+        """
+        user_cards = self.user_cards.get(user_id, {})
+        reviews = [r for r in reviews if r['card_id'] in user_cards]
+        if not reviews:
+            return {'success': True, 'reviewed': 0, 'results': {}}
+        
+        # A card reviewed k times is stepped in k successive rounds, so each review
+        # of it starts from the state the previous one left behind
+        rounds = []
+        occurrences = {}
+        for review in reviews:
+            round_index = occurrences.get(review['card_id'], 0)
+            occurrences[review['card_id']] = round_index + 1
+            if round_index == len(rounds):
+                rounds.append([])
+            rounds[round_index].append(review)
+        
+        now = datetime.now()
+        results = {}
+        reviewed_cards = []
+        review_records = []
+        
+        for round_index, round_reviews in enumerate(rounds):
+            cards = [user_cards[r['card_id']] for r in round_reviews]
+            new_intervals, new_eases = self.calculate_next_intervals_batch(
+                [c['spaced_repetition']['interval'] for c in cards],
+                [c['spaced_repetition']['ease_factor'] for c in cards],
+                [c['spaced_repetition']['repetitions'] for c in cards],
+                [r['quality_response'] for r in round_reviews],
+                [r.get('difficulty_felt', 3) for r in round_reviews],
+                seed=None if seed is None else seed + round_index
+            )
+            
+            for review, card, next_interval, new_ease in zip(round_reviews, cards, new_intervals, new_eases):
+                review_records.append(self._apply_review(
+                    user_id, card, review['quality_response'], review.get('response_time', 0),
+                    review.get('difficulty_felt', 3), next_interval, new_ease, now
+                ))
+                reviewed_cards.append(card)
+                
+                # A card reviewed more than once reports its final state
+                sr_data = card['spaced_repetition']
+                results[card['card_id']] = {
+                    'next_review_date': sr_data['next_review'],
+                    'next_interval_days': next_interval,
+                    'ease_factor': new_ease,
+                    'graduation_stage': sr_data['graduation_stage']
+                }
+        
+        self._save_cards(user_id, results)
+        
+        self.retention_analytics.setdefault(user_id, self._new_retention_analytics())
+        with record_store.editing(self.retention_analytics_file, self.retention_analytics, user_id):
+            for card, review_record in zip(reviewed_cards, review_records):
+                self._update_retention_analytics(user_id, card, review_record, save=False)
+        
+        return {'success': True, 'reviewed': len(review_records), 'results': results}
+    
     def _update_retention_metrics(self, card: dict, review_record: dict):
         """Update advanced retention metrics"""
         performance = card['performance_metrics']
@@ -298,31 +473,40 @@ class SpacedRepetitionEngine:
         if user_id not in self.user_cards:
             return []
         
-        due_cards = []
-        current_time = datetime.now()
+        if limit <= 0:
+            return []
         
-        for card_id, card in self.user_cards[user_id].items():
-            next_review = datetime.fromisoformat(card['spaced_repetition']['next_review'])
+        user_cards = self.user_cards[user_id]
+        now_epoch = datetime.now().timestamp()
+        best = []  # min-heap of (priority_score, sequence, entry) holding the top `limit`
+        
+        # Walk the due queue most-overdue first. Priority is overdue_hours scaled by
+        # (1 - retention_strength) <= 1, so once a card's overdue_hours cannot beat
+        # the current top-`limit` floor, no later (less overdue) card can either.
+        for sequence, (due_epoch, card_id) in enumerate(self.due_queue.iter_due(user_id, now_epoch)):
+            overdue_hours = (now_epoch - due_epoch) / 3600
+            if len(best) >= limit and overdue_hours <= best[0][0]:
+                break
             
-            if next_review <= current_time:
-                # Calculate priority score
-                overdue_hours = (current_time - next_review).total_seconds() / 3600
-                retention_strength = card['performance_metrics']['retention_strength']
-                
-                # Higher priority for overdue cards with low retention
-                priority_score = overdue_hours * (1 - retention_strength)
-                
-                due_cards.append({
-                    'card_id': card_id,
-                    'card': card,
-                    'priority_score': priority_score,
-                    'overdue_hours': max(0, overdue_hours)
-                })
+            card = user_cards[card_id]
+            retention_strength = card['performance_metrics']['retention_strength']
+            
+            # Higher priority for overdue cards with low retention
+            priority_score = overdue_hours * (1 - retention_strength)
+            
+            entry = {
+                'card_id': card_id,
+                'card': card,
+                'priority_score': priority_score,
+                'overdue_hours': max(0, overdue_hours)
+            }
+            if len(best) < limit:
+                heapq.heappush(best, (priority_score, -sequence, entry))
+            elif priority_score > best[0][0]:
+                heapq.heapreplace(best, (priority_score, -sequence, entry))
         
         # Sort by priority score (highest first)
-        due_cards.sort(key=lambda x: x['priority_score'], reverse=True)
-        
-        return due_cards[:limit]
+        return [entry for _, _, entry in sorted(best, key=lambda x: (x[0], x[1]), reverse=True)]
     
     def generate_optimal_study_schedule(self, user_id: str, study_time_minutes: int = 30,
                                       preferred_times: List[str] = None) -> dict:
@@ -373,7 +557,7 @@ class SpacedRepetitionEngine:
         }
         
         self.learning_schedules[schedule_id] = study_schedule
-        self._save_json_file(self.learning_schedules_file, self.learning_schedules)
+        self._save_json_file(self.learning_schedules_file, self.learning_schedules, schedule_id)
         
         return study_schedule
     
@@ -461,17 +645,24 @@ class SpacedRepetitionEngine:
         
         return round(total_efficiency / day_count, 3) if day_count > 0 else 0
     
-    def _update_retention_analytics(self, user_id: str, card: dict, review_record: dict):
+    @staticmethod
+    def _new_retention_analytics() -> dict:
+        return {
+            'total_reviews': 0,
+            'total_cards': 0,
+            'average_retention': 0,
+            'subject_performance': {},
+            'study_patterns': {},
+            'optimization_suggestions': []
+        }
+    
+    def _update_retention_analytics(self, user_id: str, card: dict, review_record: dict, save: bool = True):
         """Update retention analytics for insights and optimization"""
-        if user_id not in self.retention_analytics:
-            self.retention_analytics[user_id] = {
-                'total_reviews': 0,
-                'total_cards': 0,
-                'average_retention': 0,
-                'subject_performance': {},
-                'study_patterns': {},
-                'optimization_suggestions': []
-            }
+        self.retention_analytics.setdefault(user_id, self._new_retention_analytics())
+        if save:
+            with record_store.editing(self.retention_analytics_file, self.retention_analytics, user_id):
+                self._update_retention_analytics(user_id, card, review_record, save=False)
+            return
         
         analytics = self.retention_analytics[user_id]
         analytics['total_reviews'] += 1
@@ -491,8 +682,6 @@ class SpacedRepetitionEngine:
         # Update average quality for subject
         total_quality = subject_data['avg_quality'] * (subject_data['reviews'] - 1) + review_record['quality']
         subject_data['avg_quality'] = total_quality / subject_data['reviews']
-        
-        self._save_json_file(self.retention_analytics_file, self.retention_analytics)
     
     def get_retention_insights(self, user_id: str) -> dict:
         """Generate comprehensive retention insights and recommendations"""
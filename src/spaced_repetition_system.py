@@ -3,13 +3,16 @@ Spaced Repetition System for NeuroPulse
 Implements SM-2+ algorithm with ADHD-optimized scheduling
 """
 
-import json
 import math
+import heapq
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from enum import Enum
 import logging
 
+from record_store import record_store
+from due_queue import DueQueueIndex, review_epoch
+
 logger = logging.getLogger(__name__)
 
 class ReviewDifficulty(Enum):
@@ -24,35 +27,33 @@ class ReviewDifficulty(Enum):
 class SpacedRepetitionEngine:
     """Advanced spaced repetition system with ADHD optimizations"""
     
+    # Largest combined multiplier applied by _calculate_card_priority (phase x failures)
+    MAX_PRIORITY_BOOST = 2 * 1.5
+    
     def __init__(self):
         self.cards = {}  # card_id -> card_data
         self.user_progress = {}  # user_id -> progress_data
+        self.cards_file = 'data/spaced_repetition_cards.json'
+        self.user_progress_file = 'data/user_sr_progress.json'
         self.load_data()
     
     def load_data(self):
         """Load spaced repetition data from storage"""
-        try:
-            with open('data/spaced_repetition_cards.json', 'r') as f:
-                self.cards = json.load(f)
-        except FileNotFoundError:
-            self.cards = {}
-        
-        try:
-            with open('data/user_sr_progress.json', 'r') as f:
-                self.user_progress = json.load(f)
-        except FileNotFoundError:
-            self.user_progress = {}
+        self.cards = record_store.load_collection(self.cards_file, {})
+        self.user_progress = record_store.load_collection(self.user_progress_file, {})
+        
+        # Per-user queue of cards ordered by next review time
+        self.due_queue = DueQueueIndex()
+        for user_id, progress in self.user_progress.items():
+            self.due_queue.rebuild(user_id, {
+                card_id: review_epoch(card_progress['next_review'])
+                for card_id, card_progress in progress.items()
+            })
     
     def save_data(self):
-        """Save spaced repetition data to storage"""
-        import os
-        os.makedirs('data', exist_ok=True)
-        
-        with open('data/spaced_repetition_cards.json', 'w') as f:
-            json.dump(self.cards, f, indent=2, default=str)
-        
-        with open('data/user_sr_progress.json', 'w') as f:
-            json.dump(self.user_progress, f, indent=2, default=str)
+        """Save spaced repetition data to storage (only changed records are written)"""
+        record_store.save_collection(self.cards_file, self.cards)
+        record_store.save_collection(self.user_progress_file, self.user_progress)
     
     def create_card(self, card_id: str, subject: str, question: str, 
                    answer: str, explanation: str = "", tags: List[str] = None) -> Dict:
@@ -71,7 +72,7 @@ class SpacedRepetitionEngine:
         }
         
         self.cards[card_id] = card
-        self.save_data()
+        record_store.save_record(self.cards_file, card_id, card)
         return card
     
     def initialize_user_card(self, user_id: str, card_id: str) -> Dict:
@@ -94,6 +95,8 @@ class SpacedRepetitionEngine:
                     'difficulty_perception': [],  # User's perceived difficulty over time
                 }
             }
+            self.due_queue.schedule(user_id, card_id,
+                                    review_epoch(self.user_progress[user_id][card_id]['next_review']))
         
         return self.user_progress[user_id][card_id]
     
@@ -101,78 +104,80 @@ class SpacedRepetitionEngine:
                       energy_level: int = 5, time_of_day: int = 12) -> Dict:
         """Process a review response using enhanced SM-2+ algorithm"""
         
-        # Initialize if needed
-        self.initialize_user_card(user_id, card_id)
-        card_progress = self.user_progress[user_id][card_id]
-        
-        # Record the review
-        review_record = {
-            'date': datetime.now().isoformat(),
-            'difficulty': difficulty.value,
-            'energy_level': energy_level,
-            'time_of_day': time_of_day,
-            'interval_before': card_progress['interval']
-        }
-        
-        # Update review history
-        card_progress['review_history'].append(review_record)
-        card_progress['last_review'] = datetime.now().isoformat()
-        
-        # Track ADHD-specific data
-        card_progress['adhd_adjustments']['energy_correlation'].append({
-            'energy': energy_level,
-            'performance': difficulty.value,
-            'time': time_of_day
-        })
-        
-        card_progress['adhd_adjustments']['difficulty_perception'].append(difficulty.value)
-        
-        # Apply SM-2+ algorithm with ADHD modifications
-        if difficulty.value >= 3:  # Correct response
-            card_progress['repetitions'] += 1
+        self.user_progress.setdefault(user_id, {})
+        with record_store.editing(self.user_progress_file, self.user_progress, user_id):
+            # Initialize if needed
+            self.initialize_user_card(user_id, card_id)
+            card_progress = self.user_progress[user_id][card_id]
             
-            if card_progress['repetitions'] == 1:
-                card_progress['interval'] = 1
-            elif card_progress['repetitions'] == 2:
-                card_progress['interval'] = 6
-            else:
-                # SM-2 formula with ADHD energy adjustment
-                energy_multiplier = self._calculate_energy_multiplier(user_id, card_id)
-                new_interval = card_progress['interval'] * card_progress['easiness_factor'] * energy_multiplier
-                card_progress['interval'] = max(1, round(new_interval))
+            # Record the review
+            review_record = {
+                'date': datetime.now().isoformat(),
+                'difficulty': difficulty.value,
+                'energy_level': energy_level,
+                'time_of_day': time_of_day,
+                'interval_before': card_progress['interval']
+            }
             
-            # Update easiness factor
-            q = difficulty.value
-            ef = card_progress['easiness_factor']
-            new_ef = ef + (0.1 - (5 - q) * (0.08 + (5 - q) * 0.02))
-            card_progress['easiness_factor'] = max(1.3, new_ef)
+            # Update review history
+            card_progress['review_history'].append(review_record)
+            card_progress['last_review'] = datetime.now().isoformat()
             
-            # Update learning phase
-            if card_progress['repetitions'] >= 3 and card_progress['interval'] >= 21:
-                card_progress['learning_phase'] = 'mature'
-            elif card_progress['repetitions'] >= 1:
-                card_progress['learning_phase'] = 'review'
+            # Track ADHD-specific data
+            card_progress['adhd_adjustments']['energy_correlation'].append({
+                'energy': energy_level,
+                'performance': difficulty.value,
+                'time': time_of_day
+            })
             
-        else:  # Incorrect response
-            card_progress['repetitions'] = 0
-            card_progress['interval'] = 1
-            card_progress['learning_phase'] = 'learning'
+            card_progress['adhd_adjustments']['difficulty_perception'].append(difficulty.value)
             
-            # Reduce easiness factor for very poor performance
-            if difficulty.value <= 1:
-                card_progress['easiness_factor'] = max(1.3, card_progress['easiness_factor'] - 0.2)
-        
-        # Calculate next review date with ADHD considerations
-        next_review = self._calculate_next_review_date(user_id, card_id, card_progress)
-        card_progress['next_review'] = next_review.isoformat()
-        
-        # Update card statistics
-        if card_id in self.cards:
-            self.cards[card_id]['total_reviews'] += 1
-            if difficulty.value >= 3:
-                self.cards[card_id]['successful_reviews'] += 1
-        
-        self.save_data()
+            # Apply SM-2+ algorithm with ADHD modifications
+            if difficulty.value >= 3:  # Correct response
+                card_progress['repetitions'] += 1
+                
+                if card_progress['repetitions'] == 1:
+                    card_progress['interval'] = 1
+                elif card_progress['repetitions'] == 2:
+                    card_progress['interval'] = 6
+                else:
+                    # SM-2 formula with ADHD energy adjustment
+                    energy_multiplier = self._calculate_energy_multiplier(user_id, card_id)
+                    new_interval = card_progress['interval'] * card_progress['easiness_factor'] * energy_multiplier
+                    card_progress['interval'] = max(1, round(new_interval))
+                
+                # Update easiness factor
+                q = difficulty.value
+                ef = card_progress['easiness_factor']
+                new_ef = ef + (0.1 - (5 - q) * (0.08 + (5 - q) * 0.02))
+                card_progress['easiness_factor'] = max(1.3, new_ef)
+                
+                # Update learning phase
+                if card_progress['repetitions'] >= 3 and card_progress['interval'] >= 21:
+                    card_progress['learning_phase'] = 'mature'
+                elif card_progress['repetitions'] >= 1:
+                    card_progress['learning_phase'] = 'review'
+                
+            else:  # Incorrect response
+                card_progress['repetitions'] = 0
+                card_progress['interval'] = 1
+                card_progress['learning_phase'] = 'learning'
+                
+                # Reduce easiness factor for very poor performance
+                if difficulty.value <= 1:
+                    card_progress['easiness_factor'] = max(1.3, card_progress['easiness_factor'] - 0.2)
+            
+            # Calculate next review date with ADHD considerations
+            next_review = self._calculate_next_review_date(user_id, card_id, card_progress)
+            card_progress['next_review'] = next_review.isoformat()
+            self.due_queue.schedule(user_id, card_id, next_review.timestamp())
+            
+            # Update card statistics
+            if card_id in self.cards:
+                with record_store.editing(self.cards_file, self.cards, card_id) as card:
+                    card['total_reviews'] += 1
+                    if difficulty.value >= 3:
+                        card['successful_reviews'] += 1
         
         return {
             'next_review': next_review,
@@ -238,30 +243,48 @@ class SpacedRepetitionEngine:
         if user_id not in self.user_progress:
             return []
         
-        now = datetime.now()
-        due_cards = []
+        if limit <= 0:
+            return []
         
-        for card_id, progress in self.user_progress[user_id].items():
-            next_review = datetime.fromisoformat(progress['next_review'])
-            if next_review <= now:
-                if card_id in self.cards:
-                    card_data = self.cards[card_id].copy()
-                    card_data['progress'] = progress
-                    card_data['priority'] = self._calculate_card_priority(progress, now)
-                    due_cards.append(card_data)
+        user_progress = self.user_progress[user_id]
+        now_epoch = datetime.now().timestamp()
+        best = []  # min-heap of (priority, sequence, card_data) holding the top `limit`
+        
+        # Walk the due queue most-overdue first. The phase and failure boosts multiply
+        # the overdue base by at most MAX_PRIORITY_BOOST, so once a card's boosted base
+        # cannot beat the current top-`limit` floor, no less overdue card can either.
+        for sequence, (due_epoch, card_id) in enumerate(self.due_queue.iter_due(user_id, now_epoch)):
+            base_priority = self._overdue_base_priority(due_epoch, now_epoch)
+            if len(best) >= limit and base_priority * self.MAX_PRIORITY_BOOST <= best[0][0]:
+                break
+            if card_id not in self.cards:
+                continue
+            
+            progress = user_progress[card_id]
+            priority = self._calculate_card_priority(progress, due_epoch, now_epoch)
+            if len(best) >= limit and priority <= best[0][0]:
+                continue
+            
+            card_data = self.cards[card_id].copy()
+            card_data['progress'] = progress
+            card_data['priority'] = priority
+            if len(best) < limit:
+                heapq.heappush(best, (priority, -sequence, card_data))
+            else:
+                heapq.heapreplace(best, (priority, -sequence, card_data))
         
         # Sort by priority (highest first)
-        due_cards.sort(key=lambda x: x['priority'], reverse=True)
-        
-        return due_cards[:limit]
+        return [card_data for _, _, card_data in sorted(best, key=lambda x: (x[0], x[1]), reverse=True)]
+    
+    def _overdue_base_priority(self, due_epoch: float, now_epoch: float) -> float:
+        """Priority from overdue whole days alone, before ADHD boosts"""
+        days_overdue = int((now_epoch - due_epoch) // 86400)
+        return max(0, days_overdue + 1)
     
-    def _calculate_card_priority(self, progress: Dict, now: datetime) -> float:
+    def _calculate_card_priority(self, progress: Dict, due_epoch: float, now_epoch: float) -> float:
         """Calculate review priority with ADHD considerations"""
-        next_review = datetime.fromisoformat(progress['next_review'])
-        days_overdue = (now - next_review).days
-        
         # Base priority on how overdue the card is
-        priority = max(0, days_overdue + 1)
+        priority = self._overdue_base_priority(due_epoch, now_epoch)
         
         # Boost priority for cards in learning phase
         if progress['learning_phase'] in ['new', 'learning']:
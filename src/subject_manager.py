@@ -3,10 +3,12 @@ Universal Subject Management System for NeuroPulse
 Handles dynamic subject creation, progression tracking, and adaptive learning paths
 """
 
-import json
-import os
 from datetime import datetime, timedelta
 
+from progress_index import ProgressIndex, RANKING_METRICS
+from record_store import record_store
+from similarity_index import SimilarityIndex
+
 class SubjectManager:
     def __init__(self):
         self.subjects_file = 'subjects_data.json'
@@ -16,30 +18,50 @@ class SubjectManager:
     
     def load_subjects(self):
         """Load available subjects or create default structure"""
-        try:
-            with open(self.subjects_file, 'r') as f:
-                self.subjects = json.load(f)
-        except FileNotFoundError:
+        self.subjects = record_store.load_collection(self.subjects_file, None)
+        if self.subjects is None:
             self.subjects = self.create_default_subjects()
             self.save_subjects()
     
     def load_user_progress(self):
         """Load user progress data"""
-        try:
-            with open(self.user_progress_file, 'r') as f:
-                self.user_progress = json.load(f)
-        except FileNotFoundError:
-            self.user_progress = {}
+        self.user_progress = record_store.load_collection(self.user_progress_file, {})
+        self.progress_index = ProgressIndex()
+        self.progress_index.build(
+            self._split_progress_key(user_key) + (progress,)
+            for user_key, progress in self.user_progress.items()
+        )
+        self.learner_index = SimilarityIndex()  # user_id -> MinHash of their topic:level features
+        for user_id in self.progress_index.user_topics:
+            self.learner_index.update(user_id, self.get_learner_features(user_id))
+    
+    def _split_progress_key(self, user_key):
+        """Recover (user_id, category, topic) from a "{user_id}_{category}_{topic}" progress key"""
+        # Categories and topics may contain underscores themselves, so match the longest known suffix
+        best = None
+        for category, subject in self.subjects.items():
+            for topic in subject.get('topics', {}):
+                suffix = f"_{category}_{topic}"
+                if user_key.endswith(suffix) and len(user_key) > len(suffix):
+                    if best is None or len(suffix) > len(best[0]):
+                        best = (suffix, category, topic)
+        if best is not None:
+            suffix, category, topic = best
+            return user_key[:-len(suffix)], category, topic
+        # Topic no longer listed: assume the user id is the part before the first underscore
+        user_id, category, topic = (user_key.split('_', 2) + ['', ''])[:3]
+        return user_id, category, topic
     
     def save_subjects(self):
-        """Save subjects to file"""
-        with open(self.subjects_file, 'w') as f:
-            json.dump(self.subjects, f, indent=2)
+        """Save subjects to the record store"""
+        record_store.save_collection(self.subjects_file, self.subjects)
     
-    def save_user_progress(self):
-        """Save user progress to file"""
-        with open(self.user_progress_file, 'w') as f:
-            json.dump(self.user_progress, f, indent=2)
+    def save_user_progress(self, progress_key: str = None):
+        """Save user progress - a single record when progress_key is given"""
+        if progress_key is None:
+            record_store.save_collection(self.user_progress_file, self.user_progress)
+        else:
+            record_store.save_record(self.user_progress_file, progress_key, self.user_progress[progress_key])
     
     def create_default_subjects(self):
         """Create comprehensive subject categories"""
@@ -245,29 +267,29 @@ class SubjectManager:
     def update_user_progress(self, user_id, category, topic, session_data):
         """Update user progress after a learning session"""
         user_key = f"{user_id}_{category}_{topic}"
-        progress = self.get_user_progress(user_id, category, topic)
-        
-        # Update session data
-        progress['total_questions_answered'] += session_data.get('questions_answered', 0)
-        progress['correct_answers'] += session_data.get('correct_answers', 0)
-        progress['time_invested_minutes'] += session_data.get('session_time_minutes', 0)
-        progress['last_session'] = datetime.now().isoformat()
-        
-        # Calculate accuracy
-        accuracy = progress['correct_answers'] / max(progress['total_questions_answered'], 1)
-        
-        # Update learning streak
-        if session_data.get('session_completed', False):
-            progress['learning_streak'] += 1
-        
-        # Check for level progression
-        progress = self.check_level_progression(progress, accuracy)
-        
-        # Check for new badges
-        progress = self.check_badge_eligibility(progress, category, topic)
-        
-        self.user_progress[user_key] = progress
-        self.save_user_progress()
+        self.user_progress[user_key] = self.get_user_progress(user_id, category, topic)
+        with record_store.editing(self.user_progress_file, self.user_progress, user_key) as progress:
+            # Update session data
+            progress['total_questions_answered'] += session_data.get('questions_answered', 0)
+            progress['correct_answers'] += session_data.get('correct_answers', 0)
+            progress['time_invested_minutes'] += session_data.get('session_time_minutes', 0)
+            progress['last_session'] = datetime.now().isoformat()
+            
+            # Calculate accuracy
+            accuracy = progress['correct_answers'] / max(progress['total_questions_answered'], 1)
+            
+            # Update learning streak
+            if session_data.get('session_completed', False):
+                progress['learning_streak'] += 1
+            
+            # Check for level progression
+            progress = self.check_level_progression(progress, accuracy)
+            
+            # Check for new badges
+            progress = self.check_badge_eligibility(progress, category, topic)
+            
+            self.progress_index.update(user_id, category, topic, progress)
+            self.learner_index.update(user_id, self.get_learner_features(user_id))
         
         return progress
     
@@ -323,31 +345,36 @@ class SubjectManager:
     
     def get_leaderboard(self, category, topic, metric='accuracy'):
         """Generate leaderboard for a specific topic"""
-        topic_users = []
+        ranking = self.progress_index.topic(category, topic)
+        if ranking is None:
+            return []
         
-        for user_key, progress in self.user_progress.items():
-            if f"_{category}_{topic}" in user_key:
-                user_id = user_key.split('_')[0]
-                
-                if metric == 'accuracy':
-                    score = progress['correct_answers'] / max(progress['total_questions_answered'], 1)
-                elif metric == 'streak':
-                    score = progress['learning_streak']
-                elif metric == 'time':
-                    score = progress['time_invested_minutes']
-                elif metric == 'questions':
-                    score = progress['total_questions_answered']
-                else:
-                    score = 0
-                
-                topic_users.append({
-                    'user_id': user_id,
-                    'score': score,
-                    'level': progress['level'],
-                    'badges': len(progress['badges_earned'])
-                })
+        if metric in RANKING_METRICS:
+            leaders = ranking.top(metric, 10)
+        else:
+            leaders = [(user_id, 0) for user_id in list(ranking.members)[:10]]
         
-        return sorted(topic_users, key=lambda x: x['score'], reverse=True)[:10]
+        return [{
+            'user_id': user_id,
+            'score': score,
+            'level': ranking.members[user_id]['level'],
+            'badges': len(ranking.members[user_id]['badges_earned'])
+        } for user_id, score in leaders]
+    
+    def get_user_topics(self, user_id):
+        """(category, topic) pairs the user has progress in"""
+        return sorted(self.progress_index.user_topics.get(user_id, ()))
+    
+    def get_learner_features(self, user_id):
+        """Similarity features of a learner: every topic they study, tagged with their level in it"""
+        return {
+            self.learner_feature(category, topic, self.progress_index.topic(category, topic).members[user_id]['level'])
+            for category, topic in self.progress_index.user_topics.get(user_id, ())
+        }
+    
+    @staticmethod
+    def learner_feature(category, topic, level):
+        return f"{category}/{topic}:{level}"
     
     def generate_learning_path(self, category, topic, user_level):
         """Generate adaptive learning path based on user level"""
@@ -3,44 +3,142 @@ Video Study Sessions for NeuroPulse Social Learning
 Handles virtual study rooms, screen sharing, and collaborative video learning
 """
 
-import json
-import os
+import atexit
+import threading
+import time
 import uuid
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from datetime import datetime
+from itertools import chain
+from typing import Dict, Iterator, List, Optional
+
+from record_store import record_store
+from session_recurrence import RecurrenceRule
+from session_schedule import SessionSchedule, start_epoch
+
+OCCURRENCE_FORMAT = '%Y%m%dT%H%M%S'  # "{series_id}:{start}" names an occurrence of a recurring series
+ACTIVITY_TOTAL_FIELDS = ('engagement_score', 'speaking_time', 'questions_asked', 'resources_shared')
+ACTIVITY_COUNTER_FIELDS = ('speaking_time', 'questions_asked', 'resources_shared')
+ACTIVITY_FLAG_FIELDS = ('camera_enabled', 'microphone_enabled', 'screen_sharing')
+
+
+def _engagement_level(score: float) -> str:
+    if score >= 70:
+        return 'high'
+    return 'medium' if score >= 40 else 'low'
 
 class VideoSessionManager:
+    EDITABLE_FIELDS = ['title', 'description', 'scheduled_start', 'duration_minutes', 'max_participants',
+                       'requires_approval', 'session_materials', 'learning_objectives', 'prerequisites', 'tags']
+    
     def __init__(self):
         self.sessions_file = 'video_sessions_data.json'
         self.recordings_file = 'session_recordings_data.json'
         self.participants_file = 'session_participants_data.json'
+        self.archive_file = 'video_sessions_archive.json'
+        self.series_file = 'video_session_series.json'
+        
+        # Heartbeat hot path: in-memory activity with running totals, persisted in batches
+        self.activity_flush_interval = 5  # seconds
+        self._activity_totals = {}  # session_id -> running engagement totals of its participants
+        self._pending_activity = {}  # (session_id, user_id) -> heartbeat changes not yet stored
+        self._last_activity_flush = time.time()
+        self._activity_lock = threading.Lock()
         
         self.load_data()
+        atexit.register(self.flush_participant_activity)
     
     def load_data(self):
         """Load video session data"""
         self.sessions = self._load_json_file(self.sessions_file, {})
+        self.archived_sessions = self._load_json_file(self.archive_file, {})
+        self.series = self._load_json_file(self.series_file, {})
+        self._rules = {series_id: RecurrenceRule.from_dict(series['recurrence'])
+                       for series_id, series in self.series.items()}
+        self.series_schedule = SessionSchedule()  # series filed under their next occurrence
+        now = time.time()
+        for series_id in self.series:
+            self._schedule_series(series_id, now)
         self.recordings = self._load_json_file(self.recordings_file, {})
         self.participants = self._load_json_file(self.participants_file, {})
+        
+        # Completed sessions live in the archive, keeping the hot map to scheduled and active ones
+        finished = {session_id: session for session_id, session in self.sessions.items()
+                    if session['status'] == 'completed'}
+        if finished:
+            record_store.save_records(self.archive_file, finished)
+            record_store.save_records(self.sessions_file, {}, deleted=list(finished))
+            for session_id, session in finished.items():
+                del self.sessions[session_id]
+                self.archived_sessions[session_id] = session
+        
+        self.schedule = SessionSchedule()
+        for session in self.sessions.values():
+            self._schedule_session(session)
+        
+        self.user_history = {}  # user_id -> archived session ids, oldest first
+        for session in sorted(self.archived_sessions.values(), key=self._history_key):
+            self._add_to_history(session)
+    
+    def _schedule_session(self, session: dict):
+        """Put a scheduled session in the time-ordered index"""
+        start = start_epoch(session.get('scheduled_start'))
+        if session['status'] == 'scheduled' and start is not None:
+            self.schedule.add(session['id'], start, session['participants'], session.get('subject_category'))
+        else:
+            self.schedule.remove(session['id'])
+    
+    @staticmethod
+    def _history_key(session: dict) -> str:
+        return session.get('ended_at', session['created_at'])
+    
+    def _add_to_history(self, session: dict):
+        for user_id in session['participants']:
+            self.user_history.setdefault(user_id, []).append(session['id'])
+    
+    def _archive_session(self, session_id: str):
+        """Move a finished session from the hot map to the archive"""
+        session = self.sessions.pop(session_id)
+        self.schedule.remove(session_id)
+        self.archived_sessions[session_id] = session
+        self._add_to_history(session)
+        self._save_json_file(self.archive_file, self.archived_sessions, session_id)
+        self._save_json_file(self.sessions_file, self.sessions, session_id)
+    
+    def get_session(self, session_id: str) -> Optional[dict]:
+        """A session record, live or archived, or an unmaterialized occurrence of a recurring series"""
+        session = self.sessions.get(session_id) or self.archived_sessions.get(session_id)
+        if session is None:
+            occurrence = self._parse_occurrence(session_id)
+            if occurrence is not None:
+                session = self._occurrence_session(*occurrence)
+        return session
+    
+    def all_sessions(self) -> Iterator[dict]:
+        """Every session record, live ones first"""
+        return chain(self.sessions.values(), self.archived_sessions.values())
     
     def _load_json_file(self, filename: str, default: dict) -> dict:
-        """Load JSON file with fallback to default"""
-        try:
-            with open(filename, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return default
+        """Load a collection from the shared record store with fallback to default"""
+        return record_store.load_collection(filename, default)
     
-    def _save_json_file(self, filename: str, data: dict):
-        """Save data to JSON file"""
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+    def _save_json_file(self, filename: str, data: dict, record_id: str = None):
+        """Persist one record when record_id is given, otherwise only the changed records"""
+        if record_id is None:
+            record_store.save_collection(filename, data)
+        elif record_id in data:
+            record_store.save_record(filename, record_id, data[record_id])
+        else:
+            record_store.delete_record(filename, record_id)
     
     def create_study_session(self, host_id: str, session_data: dict) -> str:
         """Create a new video study session"""
         session_id = str(uuid.uuid4())
-        
-        session = {
+        self._store_new_session(self._build_session(session_id, host_id, session_data))
+        return session_id
+    
+    def _build_session(self, session_id: str, host_id: str, session_data: dict) -> dict:
+        """Session record for new session data, not yet stored"""
+        return {
             'id': session_id,
             'host_id': host_id,
             'title': session_data.get('title'),
@@ -66,8 +164,12 @@ class VideoSessionManager:
             'prerequisites': session_data.get('prerequisites', []),
             'tags': session_data.get('tags', [])
         }
-        
+    
+    def _store_new_session(self, session: dict):
+        """Add a built session to the hot map, the schedule and the store"""
+        session_id, host_id = session['id'], session['host_id']
         self.sessions[session_id] = session
+        self._schedule_session(session)
         self.participants[session_id] = {
             host_id: {
                 'user_id': host_id,
@@ -81,56 +183,52 @@ class VideoSessionManager:
             }
         }
         
-        self._save_json_file(self.sessions_file, self.sessions)
-        self._save_json_file(self.participants_file, self.participants)
-        
-        return session_id
+        self._save_json_file(self.sessions_file, self.sessions, session_id)
+        self._save_json_file(self.participants_file, self.participants, session_id)
     
     def join_session(self, session_id: str, user_id: str, user_name: str = None) -> dict:
         """Join a video study session"""
-        if session_id not in self.sessions:
+        if self._live_session(session_id) is None:
             return {'error': 'Session not found'}
         
-        session = self.sessions[session_id]
-        
-        # Check session capacity
-        if len(session['participants']) >= session['max_participants']:
-            if session['requires_approval']:
-                session['waiting_room'].append({
-                    'user_id': user_id,
-                    'user_name': user_name or f"Learner_{user_id[:8]}",
-                    'requested_at': datetime.now().isoformat()
-                })
-                self._save_json_file(self.sessions_file, self.sessions)
-                return {'status': 'waiting_room', 'message': 'Added to waiting room'}
-            else:
-                return {'error': 'Session is full'}
-        
-        # Add participant
-        if user_id not in session['participants']:
-            session['participants'].append(user_id)
-        
-        # Initialize participant data
-        if session_id not in self.participants:
-            self.participants[session_id] = {}
-        
-        self.participants[session_id][user_id] = {
-            'user_id': user_id,
-            'user_name': user_name or f"Learner_{user_id[:8]}",
-            'role': 'participant',
-            'joined_at': datetime.now().isoformat(),
-            'left_at': None,
-            'speaking_time': 0,
-            'questions_asked': 0,
-            'resources_shared': 0,
-            'engagement_score': 0,
-            'camera_enabled': True,
-            'microphone_enabled': True,
-            'screen_sharing': False
-        }
-        
-        self._save_json_file(self.sessions_file, self.sessions)
-        self._save_json_file(self.participants_file, self.participants)
+        with record_store.transaction():
+            with record_store.editing(self.sessions_file, self.sessions, session_id) as session:
+                # Check session capacity
+                if len(session['participants']) >= session['max_participants']:
+                    if not session['requires_approval']:
+                        return {'error': 'Session is full'}
+                    session['waiting_room'].append({
+                        'user_id': user_id,
+                        'user_name': user_name or f"Learner_{user_id[:8]}",
+                        'requested_at': datetime.now().isoformat()
+                    })
+                    return {'status': 'waiting_room', 'message': 'Added to waiting room'}
+                
+                # Add participant
+                if user_id not in session['participants']:
+                    session['participants'].append(user_id)
+                    self.schedule.add_user(session_id, user_id)
+            
+            # Initialize participant data
+            self.participants.setdefault(session_id, {})
+            with record_store.editing(self.participants_file, self.participants, session_id) as participants:
+                with self._activity_lock:
+                    self._activity_totals.pop(session_id, None)  # recounted on the next heartbeat
+                    self._pending_activity.pop((session_id, user_id), None)  # a rejoin starts afresh
+                    participants[user_id] = {
+                        'user_id': user_id,
+                        'user_name': user_name or f"Learner_{user_id[:8]}",
+                        'role': 'participant',
+                        'joined_at': datetime.now().isoformat(),
+                        'left_at': None,
+                        'speaking_time': 0,
+                        'questions_asked': 0,
+                        'resources_shared': 0,
+                        'engagement_score': 0,
+                        'camera_enabled': True,
+                        'microphone_enabled': True,
+                        'screen_sharing': False
+                    }
         
         return {
             'status': 'joined',
@@ -140,109 +238,218 @@ class VideoSessionManager:
     
     def start_session(self, session_id: str, host_id: str) -> bool:
         """Start a scheduled video session"""
-        if session_id not in self.sessions:
+        session = self._live_session(session_id)
+        if session is None:
             return False
         
-        session = self.sessions[session_id]
-        
         if session['host_id'] != host_id:
             return False
         
-        session['status'] = 'active'
-        session['actual_start'] = datetime.now().isoformat()
-        
-        # Initialize recording if enabled
-        if session['recording_enabled']:
-            self.recordings[session_id] = {
-                'session_id': session_id,
-                'recording_url': f"https://recordings.neuropulse.app/{session_id}",
-                'started_at': datetime.now().isoformat(),
-                'duration': 0,
-                'file_size': 0,
-                'status': 'recording'
-            }
-            self._save_json_file(self.recordings_file, self.recordings)
-        
-        self._save_json_file(self.sessions_file, self.sessions)
+        with record_store.editing(self.sessions_file, self.sessions, session_id) as session:
+            session['status'] = 'active'
+            session['actual_start'] = datetime.now().isoformat()
+            self.schedule.remove(session_id)
+            
+            # Initialize recording if enabled
+            if session['recording_enabled']:
+                self.recordings[session_id] = {
+                    'session_id': session_id,
+                    'recording_url': f"https://recordings.neuropulse.app/{session_id}",
+                    'started_at': datetime.now().isoformat(),
+                    'duration': 0,
+                    'file_size': 0,
+                    'status': 'recording'
+                }
+                self._save_json_file(self.recordings_file, self.recordings, session_id)
         return True
     
+    def update_session(self, session_id: str, host_id: str, updates: dict) -> dict:
+        """Edit the details of a scheduled session (host only)"""
+        session = self._live_session(session_id)
+        if session is None:
+            return {'error': 'Session not found'}
+        
+        if session['host_id'] != host_id:
+            return {'error': 'Only host can edit session'}
+        
+        with record_store.editing(self.sessions_file, self.sessions, session_id) as session:
+            if session['status'] != 'scheduled':
+                return {'error': 'Only scheduled sessions can be edited'}
+            
+            for field in self.EDITABLE_FIELDS:
+                if field in updates:
+                    session[field] = updates[field]
+            
+            self._schedule_session(session)
+        return {'success': True, 'session': session}
+    
     def end_session(self, session_id: str, host_id: str) -> dict:
         """End an active video session"""
         if session_id not in self.sessions:
             return {'error': 'Session not found'}
         
-        session = self.sessions[session_id]
-        
-        if session['host_id'] != host_id:
+        if self.sessions[session_id]['host_id'] != host_id:
             return {'error': 'Only host can end session'}
         
-        session['status'] = 'completed'
-        session['ended_at'] = datetime.now().isoformat()
-        
-        # Calculate actual duration
-        if 'actual_start' in session:
-            start_time = datetime.fromisoformat(session['actual_start'])
-            end_time = datetime.now()
-            session['actual_duration'] = int((end_time - start_time).total_seconds() / 60)
-        
-        # Finalize recording
-        if session_id in self.recordings:
-            recording = self.recordings[session_id]
-            recording['status'] = 'completed'
-            recording['ended_at'] = datetime.now().isoformat()
-            if 'started_at' in recording:
-                start_time = datetime.fromisoformat(recording['started_at'])
+        with record_store.transaction() as txn:
+            session = txn.get(self.sessions_file, session_id)
+            if session is None:
+                # Already ended and archived by another worker
+                self.sessions.pop(session_id, None)
+                self.schedule.remove(session_id)
+                return {'error': 'Session not found'}
+            self.sessions[session_id] = session
+            
+            session['status'] = 'completed'
+            session['ended_at'] = datetime.now().isoformat()
+            
+            # Calculate actual duration
+            if 'actual_start' in session:
+                start_time = datetime.fromisoformat(session['actual_start'])
                 end_time = datetime.now()
-                recording['duration'] = int((end_time - start_time).total_seconds())
+                session['actual_duration'] = int((end_time - start_time).total_seconds() / 60)
             
-            self._save_json_file(self.recordings_file, self.recordings)
-        
-        # Update participant data
-        if session_id in self.participants:
-            for participant in self.participants[session_id].values():
-                if participant['left_at'] is None:
-                    participant['left_at'] = datetime.now().isoformat()
-        
-        # Calculate session analytics
-        session_analytics = self._calculate_session_analytics(session_id)
-        session['analytics'] = session_analytics
-        
-        self._save_json_file(self.sessions_file, self.sessions)
-        self._save_json_file(self.participants_file, self.participants)
+            # Finalize recording
+            recording = txn.get(self.recordings_file, session_id)
+            if recording is not None:
+                recording['status'] = 'completed'
+                recording['ended_at'] = datetime.now().isoformat()
+                if 'started_at' in recording:
+                    start_time = datetime.fromisoformat(recording['started_at'])
+                    end_time = datetime.now()
+                    recording['duration'] = int((end_time - start_time).total_seconds())
+                
+                self.recordings[session_id] = recording
+                txn.put(self.recordings_file, session_id, recording)
+            
+            # Update participant data, including heartbeats not flushed yet
+            participants = txn.get(self.participants_file, session_id)
+            if participants is not None:
+                with self._activity_lock:
+                    for key in [key for key in self._pending_activity if key[0] == session_id]:
+                        activity = self._pending_activity.pop(key)
+                        if key[1] in participants:
+                            self._apply_activity(participants[key[1]], activity)
+                    for participant in participants.values():
+                        if participant['left_at'] is None:
+                            participant['left_at'] = datetime.now().isoformat()
+                    self.participants[session_id] = participants
+                    self._activity_totals.pop(session_id, None)
+                txn.put(self.participants_file, session_id, participants)
+            
+            # Calculate session analytics
+            session_analytics = self._calculate_session_analytics(session_id)
+            session['analytics'] = session_analytics
+            
+            self._archive_session(session_id)
+        self._activity_totals.pop(session_id, None)
         
         return {'success': True, 'analytics': session_analytics}
     
     def update_participant_activity(self, session_id: str, user_id: str, activity_data: dict):
-        """Update participant activity during session"""
-        if session_id not in self.participants or user_id not in self.participants[session_id]:
-            return False
-        
-        participant = self.participants[session_id][user_id]
-        
-        # Update activity metrics
-        if 'speaking_time' in activity_data:
-            participant['speaking_time'] += activity_data['speaking_time']
-        
-        if 'questions_asked' in activity_data:
-            participant['questions_asked'] += activity_data['questions_asked']
-        
-        if 'resources_shared' in activity_data:
-            participant['resources_shared'] += activity_data['resources_shared']
-        
-        if 'camera_enabled' in activity_data:
-            participant['camera_enabled'] = activity_data['camera_enabled']
-        
-        if 'microphone_enabled' in activity_data:
-            participant['microphone_enabled'] = activity_data['microphone_enabled']
-        
-        if 'screen_sharing' in activity_data:
-            participant['screen_sharing'] = activity_data['screen_sharing']
+        """Apply one engagement heartbeat in memory; activity is persisted by the next batched flush"""
+        with self._activity_lock:
+            if session_id not in self.participants or user_id not in self.participants[session_id]:
+                return False
+            
+            participant = self.participants[session_id][user_id]
+            totals = self._session_activity_totals(session_id)
+            self._count_participant(totals, participant, -1)
+            self._apply_activity(participant, activity_data)
+            self._count_participant(totals, participant, 1)
+            
+            # Keep the change, not the result, so the flush adds it to what other workers stored
+            pending = self._pending_activity.setdefault((session_id, user_id), {})
+            for field, value in activity_data.items():
+                if field in ACTIVITY_COUNTER_FIELDS:
+                    pending[field] = pending.get(field, 0) + value
+                elif field in ACTIVITY_FLAG_FIELDS:
+                    pending[field] = value
+            flush_due = time.time() - self._last_activity_flush >= self.activity_flush_interval
+        
+        if flush_due:
+            self.flush_participant_activity()
+        return True
+    
+    def _apply_activity(self, participant: dict, activity_data: dict):
+        """Add a heartbeat's counters to a participant, take its flags and rescore it"""
+        for field in ACTIVITY_COUNTER_FIELDS:
+            if field in activity_data:
+                participant[field] += activity_data[field]
+        for field in ACTIVITY_FLAG_FIELDS:
+            if field in activity_data:
+                participant[field] = activity_data[field]
         
-        # Calculate engagement score
         participant['engagement_score'] = self._calculate_engagement_score(participant)
-        
-        self._save_json_file(self.participants_file, self.participants)
-        return True
+    
+    def flush_participant_activity(self):
+        """Add the heartbeats since the last flush to the stored participants in one transaction"""
+        with self._activity_lock:
+            pending = self._pending_activity
+            self._pending_activity = {}
+            self._last_activity_flush = time.time()
+        if not pending:
+            return
+        
+        stored = {}
+        with record_store.transaction() as txn:
+            for (session_id, user_id), activity in pending.items():
+                if session_id not in stored:
+                    stored[session_id] = txn.get(self.participants_file, session_id)
+                participants = stored[session_id]
+                if participants is not None and user_id in participants:
+                    self._apply_activity(participants[user_id], activity)
+            for session_id, participants in stored.items():
+                if participants is not None:
+                    txn.put(self.participants_file, session_id, participants)
+        
+        # Pick up other workers' activity; heartbeats that arrived during the write stay on top
+        with self._activity_lock:
+            for (session_id, user_id), activity in self._pending_activity.items():
+                participants = stored.get(session_id)
+                if participants is not None and user_id in participants:
+                    self._apply_activity(participants[user_id], activity)
+            for session_id, participants in stored.items():
+                if participants is not None and session_id in self.participants:
+                    self.participants[session_id] = participants
+                    self._activity_totals.pop(session_id, None)
+    
+    def _session_activity_totals(self, session_id: str) -> dict:
+        """Running engagement totals of a session's participants, counted once and then kept up to date"""
+        totals = self._activity_totals.get(session_id)
+        if totals is None:
+            totals = dict.fromkeys(('participants', 'high', 'medium', 'low') + ACTIVITY_TOTAL_FIELDS, 0)
+            for participant in self.participants.get(session_id, {}).values():
+                self._count_participant(totals, participant, 1)
+            self._activity_totals[session_id] = totals
+        return totals
+    
+    @staticmethod
+    def _count_participant(totals: dict, participant: dict, sign: int):
+        totals['participants'] += sign
+        for field in ACTIVITY_TOTAL_FIELDS:
+            totals[field] += sign * participant[field]
+        totals[_engagement_level(participant['engagement_score'])] += sign
+    
+    def get_session_engagement(self, session_id: str) -> dict:
+        """Live engagement summary of a session from the running totals - O(1)"""
+        with self._activity_lock:
+            if session_id not in self.participants:
+                return {}
+            totals = dict(self._session_activity_totals(session_id))
+        return self._engagement_summary(totals)
+    
+    @staticmethod
+    def _engagement_summary(totals: dict) -> dict:
+        count = totals['participants']
+        return {
+            'total_participants': count,
+            'average_engagement_score': round(totals['engagement_score'] / count, 1) if count else 0,
+            'total_speaking_time': totals['speaking_time'],
+            'total_questions_asked': totals['questions_asked'],
+            'total_resources_shared': totals['resources_shared'],
+            'engagement_levels': {level: totals[level] for level in ('high', 'medium', 'low')}
+        }
     
     def _calculate_engagement_score(self, participant: dict) -> float:
         """Calculate engagement score for a participant"""
@@ -267,55 +474,44 @@ class VideoSessionManager:
         score = speaking_score + questions_score + resources_score + media_score
         return round(score, 1)
     
-    def get_upcoming_sessions(self, user_id: str = None, subject_category: str = None) -> List[dict]:
-        """Get upcoming video sessions"""
+    def get_upcoming_sessions(self, user_id: str = None, subject_category: str = None, days: int = 7) -> List[dict]:
+        """Get video sessions starting within the next `days` days, soonest first"""
         upcoming_sessions = []
-        current_time = datetime.now()
+        now = datetime.now().timestamp()
+        
+        window_end = now + days * 86400
+        matches = [(start, self.sessions[session_id])
+                   for start, session_id in self.schedule.window(now, window_end, user_id, subject_category)]
+        matches.extend(self._expand_series(now, window_end, user_id, subject_category))
+        matches.sort(key=lambda match: match[0])
+        
+        for start, session in matches:
+            session_info = session.copy()
+            session_info['spots_available'] = session['max_participants'] - len(session['participants'])
+            session_info['time_until_start'] = int((start - now) / 60)
+            upcoming_sessions.append(session_info)
         
-        for session_id, session in self.sessions.items():
-            if session['status'] == 'scheduled':
-                scheduled_time = datetime.fromisoformat(session['scheduled_start'])
-                
-                # Filter by user participation
-                if user_id and user_id not in session['participants']:
-                    continue
-                
-                # Filter by subject
-                if subject_category and session['subject_category'] != subject_category:
-                    continue
-                
-                # Only include sessions starting within next 7 days
-                if scheduled_time > current_time and scheduled_time <= current_time + timedelta(days=7):
-                    session_info = session.copy()
-                    session_info['spots_available'] = session['max_participants'] - len(session['participants'])
-                    session_info['time_until_start'] = int((scheduled_time - current_time).total_seconds() / 60)
-                    upcoming_sessions.append(session_info)
-        
-        # Sort by scheduled start time
-        upcoming_sessions.sort(key=lambda x: x['scheduled_start'])
         return upcoming_sessions
     
     def get_session_history(self, user_id: str, limit: int = 20) -> List[dict]:
         """Get user's session history"""
         user_sessions = []
         
-        for session_id, session in self.sessions.items():
-            if user_id in session['participants'] and session['status'] == 'completed':
-                session_info = session.copy()
-                
-                # Add user-specific data
-                if session_id in self.participants and user_id in self.participants[session_id]:
-                    session_info['user_participation'] = self.participants[session_id][user_id]
-                
-                # Add recording info
-                if session_id in self.recordings:
-                    session_info['recording'] = self.recordings[session_id]
-                
-                user_sessions.append(session_info)
+        # Archived sessions are appended in the order they ended, so the newest are at the end
+        for session_id in reversed(self.user_history.get(user_id, [])[-limit:]):
+            session_info = self.archived_sessions[session_id].copy()
+            
+            # Add user-specific data
+            if session_id in self.participants and user_id in self.participants[session_id]:
+                session_info['user_participation'] = self.participants[session_id][user_id]
+            
+            # Add recording info
+            if session_id in self.recordings:
+                session_info['recording'] = self.recordings[session_id]
+            
+            user_sessions.append(session_info)
         
-        # Sort by most recent first
-        user_sessions.sort(key=lambda x: x.get('ended_at', x['created_at']), reverse=True)
-        return user_sessions[:limit]
+        return user_sessions
     
     def _calculate_session_analytics(self, session_id: str) -> dict:
         """Calculate comprehensive session analytics"""
@@ -325,51 +521,33 @@ class VideoSessionManager:
         session = self.sessions[session_id]
         participants = self.participants[session_id]
         
-        # Basic metrics
-        total_participants = len(participants)
-        avg_engagement = sum(p['engagement_score'] for p in participants.values()) / total_participants if total_participants > 0 else 0
+        # Sums and engagement levels come from the running totals kept by the heartbeats
+        with self._activity_lock:
+            totals = dict(self._session_activity_totals(session_id))
+        analytics = self._engagement_summary(totals)
         
         # Speaking time distribution
-        total_speaking_time = sum(p['speaking_time'] for p in participants.values())
+        total_speaking_time = analytics['total_speaking_time']
         speaking_distribution = {}
         for user_id, participant in participants.items():
             speaking_percentage = (participant['speaking_time'] / total_speaking_time * 100) if total_speaking_time > 0 else 0
             speaking_distribution[user_id] = round(speaking_percentage, 1)
         
-        # Participation metrics
-        questions_total = sum(p['questions_asked'] for p in participants.values())
-        resources_total = sum(p['resources_shared'] for p in participants.values())
-        
-        # Engagement levels
-        high_engagement = len([p for p in participants.values() if p['engagement_score'] >= 70])
-        medium_engagement = len([p for p in participants.values() if 40 <= p['engagement_score'] < 70])
-        low_engagement = len([p for p in participants.values() if p['engagement_score'] < 40])
-        
-        return {
-            'total_participants': total_participants,
-            'average_engagement_score': round(avg_engagement, 1),
-            'total_speaking_time': total_speaking_time,
-            'speaking_distribution': speaking_distribution,
-            'total_questions_asked': questions_total,
-            'total_resources_shared': resources_total,
-            'engagement_levels': {
-                'high': high_engagement,
-                'medium': medium_engagement,
-                'low': low_engagement
-            },
-            'session_quality_score': self._calculate_session_quality(session, participants)
-        }
+        analytics['speaking_distribution'] = speaking_distribution
+        analytics['session_quality_score'] = self._calculate_session_quality(session, totals)
+        return analytics
     
-    def _calculate_session_quality(self, session: dict, participants: dict) -> float:
+    def _calculate_session_quality(self, session: dict, totals: dict) -> float:
         """Calculate overall session quality score"""
         score = 0
+        participant_count = totals['participants']
         
         # Participation rate (participants vs max capacity)
-        participation_rate = len(participants) / session['max_participants']
+        participation_rate = participant_count / session['max_participants']
         score += participation_rate * 25
         
         # Average engagement
-        avg_engagement = sum(p['engagement_score'] for p in participants.values()) / len(participants) if participants else 0
+        avg_engagement = totals['engagement_score'] / participant_count if participant_count else 0
         score += (avg_engagement / 100) * 35
         
         # Duration factor (did session run close to planned duration?)
@@ -379,41 +557,113 @@ class VideoSessionManager:
         score += duration_factor * 20
         
         # Interaction factor (questions, resources shared)
-        interaction_score = min((sum(p['questions_asked'] for p in participants.values()) + 
-                               sum(p['resources_shared'] for p in participants.values())) / len(participants) * 5, 20)
+        interactions = totals['questions_asked'] + totals['resources_shared']
+        interaction_score = min(interactions / participant_count * 5, 20) if participant_count else 0
         score += interaction_score
         
         return round(score, 1)
     
-    def schedule_recurring_session(self, host_id: str, session_template: dict, recurrence_data: dict) -> List[str]:
-        """Schedule recurring video sessions"""
-        session_ids = []
-        
-        start_date = datetime.fromisoformat(recurrence_data['start_date'])
-        end_date = datetime.fromisoformat(recurrence_data['end_date'])
-        frequency = recurrence_data['frequency']  # daily, weekly, monthly
-        interval = recurrence_data.get('interval', 1)  # every N days/weeks/months
-        
-        current_date = start_date
+    def schedule_recurring_session(self, host_id: str, session_template: dict, recurrence_data: dict) -> str:
+        """Schedule a recurring video session as a single rule; returns the series id.
+        
+        Occurrences are expanded on demand (see get_upcoming_sessions) and
+        only become session records, with id "{series_id}:{start}", when
+        someone joins, starts or edits them.
+        """
+        rule = RecurrenceRule.from_dict(recurrence_data)
+        series_id = str(uuid.uuid4())
+        
+        self.series[series_id] = {
+            'id': series_id,
+            'host_id': host_id,
+            'template': dict(session_template),
+            'recurrence': rule.to_dict(),
+            'created_at': datetime.now().isoformat(),
+            'materialized': []
+        }
+        self._rules[series_id] = rule
+        self._schedule_series(series_id, time.time())
+        self._save_json_file(self.series_file, self.series, series_id)
         
-        while current_date <= end_date:
-            session_data = session_template.copy()
-            session_data['scheduled_start'] = current_date.isoformat()
-            session_data['title'] = f"{session_template['title']} - {current_date.strftime('%Y-%m-%d')}"
-            
-            session_id = self.create_study_session(host_id, session_data)
-            session_ids.append(session_id)
-            
-            # Calculate next occurrence
-            if frequency == 'daily':
-                current_date += timedelta(days=interval)
-            elif frequency == 'weekly':
-                current_date += timedelta(weeks=interval)
-            elif frequency == 'monthly':
-                # Approximate monthly increment
-                current_date += timedelta(days=30 * interval)
-        
-        return session_ids
+        return series_id
+    
+    def _schedule_series(self, series_id: str, after: float):
+        """File a series under its first occurrence after `after`, or drop it once the rule has ended"""
+        rule = self._rules[series_id]
+        series = self.series[series_id]
+        next_start = next(rule.between(datetime.fromtimestamp(after, rule.start.tzinfo), rule.until), None)
+        if next_start is None:
+            self.series_schedule.remove(series_id)
+        else:
+            self.series_schedule.add(series_id, next_start.timestamp(), [series['host_id']],
+                                     series['template'].get('subject_category'))
+    
+    def _occurrence_session(self, series_id: str, start: datetime) -> dict:
+        """Session record of one occurrence of a series, built from its template"""
+        series = self.series[series_id]
+        template = series['template']
+        session_data = dict(template, scheduled_start=start.isoformat(),
+                            title=f"{template['title']} - {start.strftime('%Y-%m-%d')}")
+        session = self._build_session(f"{series_id}:{start.strftime(OCCURRENCE_FORMAT)}",
+                                      series['host_id'], session_data)
+        session['series_id'] = series_id
+        session['created_at'] = series['created_at']
+        return session
+    
+    def _parse_occurrence(self, session_id: str):
+        """(series_id, start) for the id of a valid, not yet materialized occurrence, else None"""
+        series_id, _, stamp = session_id.partition(':')
+        rule = self._rules.get(series_id)
+        if rule is None or session_id in self.series[series_id]['materialized']:
+            return None
+        try:
+            start = datetime.strptime(stamp, OCCURRENCE_FORMAT).replace(tzinfo=rule.start.tzinfo)
+        except ValueError:
+            return None
+        return (series_id, start) if rule.includes(start) else None
+    
+    def _live_session(self, session_id: str) -> Optional[dict]:
+        """A session from the hot map, materializing a series occurrence on first use"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            occurrence = self._parse_occurrence(session_id)
+            if occurrence is not None:
+                with record_store.editing(self.series_file, self.series, occurrence[0]) as series:
+                    if session_id in series['materialized']:
+                        # Materialized by another worker since this one loaded the series
+                        session = record_store.load_records(self.sessions_file, [session_id]).get(session_id)
+                        if session is not None:
+                            self.sessions[session_id] = session
+                            self._schedule_session(session)
+                            self.participants.update(record_store.load_records(self.participants_file, [session_id]))
+                    else:
+                        session = self._occurrence_session(*occurrence)
+                        series['materialized'].append(session_id)
+                        self._store_new_session(session)
+        return session
+    
+    def _expand_series(self, window_start: float, window_end: float, user_id: str = None,
+                       subject_category: str = None) -> List[tuple]:
+        """(start epoch, session) for unmaterialized series occurrences starting in the window"""
+        # Move series whose filed occurrence has passed on to their next one; each
+        # occurrence is passed over once, so this stays proportional to elapsed occurrences
+        for _, series_id in self.series_schedule.window(float('-inf'), window_start):
+            self._schedule_series(series_id, window_start)
+        
+        # Only series with an occurrence in the window, filed under their host
+        # (an unmaterialized occurrence has only its host as participant) and subject
+        occurrences = []
+        for _, series_id in self.series_schedule.window(window_start, window_end, user_id, subject_category):
+            series = self.series[series_id]
+            rule = self._rules[series_id]
+            materialized = set(series['materialized'])
+            after = datetime.fromtimestamp(window_start, rule.start.tzinfo)
+            until = datetime.fromtimestamp(window_end, rule.start.tzinfo)
+            for start in rule.between(after, until):
+                session = self._occurrence_session(series_id, start)
+                if session['id'] not in materialized:
+                    occurrences.append((start.timestamp(), session))
+        return occurrences
 
 # Initialize global video session manager
 video_manager = VideoSessionManager()
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""
+Voice Command Matcher for NeuroPulse
+Compiled command matching: token index for fuzzy matches, one combined regex, LRU-cached results
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+_MISSING = object()
+
+
+class CommandMatcher:
+    """Matches cleaned utterances to registered command phrases.
+
+    Phrases are tokenized once when registered and indexed token -> phrases,
+    so a fuzzy (Jaccard) match only scores phrases sharing a word with the
+    input. Flexible patterns are compiled into a single regex of optional
+    lookaheads, which reports every pattern's first match in one pass.
+    Results for recent inputs are kept in a bounded LRU cache that is
+    cleared whenever the command set changes.
+    """
+
+    def __init__(self, patterns: Sequence[Tuple[str, str]] = (), cache_size: int = 2048):
+        self.cache_size = cache_size
+        self._tokens = {}   # phrase -> frozenset of its words
+        self._order = {}    # phrase -> registration order, the tie-breaker between equal scores
+        self._index = {}    # word -> set of phrases containing it
+        self._next_order = 0
+        self._cache = OrderedDict()
+        self._generation = 0  # bumped whenever the command set changes
+        self._lock = threading.Lock()
+        self._compile_patterns(patterns)
+
+    # Commands
+
+    def add(self, phrase: str):
+        with self._lock:
+            if phrase in self._tokens:
+                return
+            tokens = frozenset(phrase.split())
+            self._tokens[phrase] = tokens
+            self._order[phrase] = self._next_order
+            self._next_order += 1
+            for token in tokens:
+                self._index.setdefault(token, set()).add(phrase)
+            self._invalidate()
+
+    def remove(self, phrase: str):
+        with self._lock:
+            tokens = self._tokens.pop(phrase, None)
+            if tokens is None:
+                return
+            del self._order[phrase]
+            for token in tokens:
+                phrases = self._index[token]
+                phrases.discard(phrase)
+                if not phrases:
+                    del self._index[token]
+            self._invalidate()
+
+    def _invalidate(self):
+        self._cache.clear()
+        self._generation += 1
+
+    def __contains__(self, phrase: str) -> bool:
+        return phrase in self._tokens
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    # Patterns
+
+    def _compile_patterns(self, patterns: Sequence[Tuple[str, str]]):
+        """One regex whose i-th optional lookahead captures pattern i's first match"""
+        self._templates = []
+        self._parameter_groups = []
+        parts = []
+        group = 0
+        for i, (pattern, template) in enumerate(patterns):
+            group += 1  # the wrapping named group
+            self._parameter_groups.append(group + 1)  # the pattern's own first group
+            group += re.compile(pattern).groups
+            self._templates.append(template)
+            parts.append(f'(?=.*?(?P<p{i}>{pattern}))?')
+        self._pattern = re.compile(''.join(parts)) if parts else None
+
+    def pattern_matches(self, text: str) -> List[Tuple[str, str]]:
+        """(template, parameter) for every pattern found in the text, in pattern order"""
+        if self._pattern is None:
+            return []
+        match = self._pattern.match(text)
+        return [
+            (template, match.group(group).lower())
+            for i, (template, group) in enumerate(zip(self._templates, self._parameter_groups))
+            if match.group(f'p{i}') is not None
+        ]
+
+    # Matching
+
+    def similarity_scores(self, text: str) -> Dict[str, float]:
+        """Jaccard similarity of the text to every phrase sharing at least one word with it"""
+        input_tokens = set(text.split())
+        overlap = {}
+        for token in input_tokens:
+            for phrase in self._index.get(token, ()):
+                overlap[phrase] = overlap.get(phrase, 0) + 1
+        return {
+            phrase: shared / (len(input_tokens) + len(self._tokens[phrase]) - shared)
+            for phrase, shared in overlap.items()
+        }
+
+    def best_match(self, text: str, threshold: float) -> Optional[str]:
+        """Highest-similarity phrase at or above threshold; earlier-registered phrases win ties"""
+        best = None
+        best_key = None
+        for phrase, score in self.similarity_scores(text).items():
+            if score >= threshold:
+                key = (score, -self._order[phrase])
+                if best_key is None or key > best_key:
+                    best, best_key = phrase, key
+        return best
+
+    def suggestions(self, text: str, threshold: float, limit: int = 3) -> List[str]:
+        scored = [(score, -self._order[phrase], phrase)
+                  for phrase, score in self.similarity_scores(text).items() if score >= threshold]
+        scored.sort(reverse=True)
+        return [phrase for _, _, phrase in scored[:limit]]
+
+    def cached(self, text: str, compute: Callable[[str], Optional[str]]) -> Optional[str]:
+        """compute(text), memoized in the LRU cache until the command set changes"""
+        with self._lock:
+            result = self._cache.get(text, _MISSING)
+            if result is not _MISSING:
+                self._cache.move_to_end(text)
+                return result
+            generation = self._generation
+        result = compute(text)
+        with self._lock:
+            if generation != self._generation:
+                return result  # commands changed meanwhile; do not cache a possibly stale answer
+            self._cache[text] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
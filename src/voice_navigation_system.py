@@ -3,14 +3,43 @@ Voice Navigation System for NeuroPulse
 ADHD-optimized voice commands for hands-free learning
 """
 
-import json
 import re
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple, Any
 import logging
 
+from record_store import record_store
+from voice_command_matcher import CommandMatcher
+
 logger = logging.getLogger(__name__)
 
+# Flexible command patterns, tried in order: (regex, command template filled with the first group)
+COMMAND_PATTERNS = [
+    (r'learn\s+(\w+)', 'learn {}'),
+    (r'start\s+(\w+)', 'learn {}'),
+    (r'study\s+(\w+)', 'learn {}'),
+    (r'answer\s+([abcd]|\d)', 'answer {}'),
+    (r'option\s+([abcd]|\d)', 'answer {}'),
+    (r'confidence\s+(\d)', 'set_confidence_{}'),
+    (r'difficulty\s+(\w+)', '{} level'),
+    (r'(\d+)\s+questions?', '{}_question_session'),
+]
+
+SUBJECT_COMMANDS = {
+    'python': 'learn python',
+    'electrical': 'learn electrical',
+    'finance': 'learn finance',
+    'data': 'learn data analysis',
+    'math': 'learn math',
+    'chemistry': 'learn chemistry',
+    'physics': 'learn physics',
+    'botany': 'learn botany'
+}
+
+# Voice recognition filler removed before matching
+_ARTIFACTS = re.compile(r'\b(?:um|uh|er|ah|please|can you|could you|would you)\b')
+_WHITESPACE = re.compile(r'\s+')
+
 class VoiceNavigationEngine:
     """Advanced voice navigation with 50+ ADHD-friendly commands"""
     
@@ -19,36 +48,30 @@ class VoiceNavigationEngine:
         self.user_voice_data = {}
         self.command_history = {}
         self.voice_preferences = {}
+        self.data_file = 'data/voice_navigation_data.json'
+        self.matcher = CommandMatcher(COMMAND_PATTERNS)
         self.initialize_commands()
         self.load_data()
     
     def load_data(self):
         """Load voice navigation data"""
-        try:
-            with open('data/voice_navigation_data.json', 'r') as f:
-                data = json.load(f)
-                self.user_voice_data = data.get('user_data', {})
-                self.command_history = data.get('command_history', {})
-                self.voice_preferences = data.get('preferences', {})
-        except FileNotFoundError:
-            self.user_voice_data = {}
-            self.command_history = {}
-            self.voice_preferences = {}
+        self.user_voice_data = self._load_section('user_data')
+        self.command_history = self._load_section('command_history')
+        self.voice_preferences = self._load_section('preferences')
     
     def save_data(self):
         """Save voice navigation data"""
-        import os
-        os.makedirs('data', exist_ok=True)
-        
-        data = {
-            'user_data': self.user_voice_data,
-            'command_history': self.command_history,
-            'preferences': self.voice_preferences,
-            'last_updated': datetime.now().isoformat()
-        }
-        
-        with open('data/voice_navigation_data.json', 'w') as f:
-            json.dump(data, f, indent=2, default=str)
+        self._save_section('user_data', self.user_voice_data)
+        self._save_section('command_history', self.command_history)
+        self._save_section('preferences', self.voice_preferences)
+    
+    def _load_section(self, section: str) -> dict:
+        """Load one section of the legacy data file as a record store collection"""
+        return record_store.load_collection(f'{self.data_file}#{section}', {}, self.data_file, section)
+    
+    def _save_section(self, section: str, data: dict):
+        """Persist only the changed records of one section"""
+        record_store.save_collection(f'{self.data_file}#{section}', data)
     
     def initialize_commands(self):
         """Initialize all voice commands with ADHD-friendly patterns"""
@@ -163,6 +186,22 @@ class VoiceNavigationEngine:
             'practice mode': {'action': 'enter_practice_mode', 'description': 'Enter practice mode'},
             'test mode': {'action': 'enter_test_mode', 'description': 'Enter assessment mode'},
         })
+        
+        # Tokenize and index every phrase once
+        for command in self.commands:
+            self.matcher.add(command)
+    
+    def register_command(self, phrase: str, command_data: Dict):
+        """Add or replace a (custom) voice command"""
+        phrase = self._clean_voice_input(phrase)
+        self.commands[phrase] = command_data
+        self.matcher.add(phrase)
+    
+    def unregister_command(self, phrase: str):
+        """Remove a voice command, given the phrase as it was registered"""
+        phrase = self._clean_voice_input(phrase)
+        if self.commands.pop(phrase, None) is not None:
+            self.matcher.remove(phrase)
     
     def process_voice_command(self, user_id: str, voice_input: str, context: Dict = None) -> Dict:
         """Process voice input and return command response"""
@@ -180,65 +219,61 @@ class VoiceNavigationEngine:
         if user_id not in self.command_history:
             self.command_history[user_id] = []
         
-        # Clean and normalize input
-        cleaned_input = self._clean_voice_input(voice_input)
-        
-        # Find matching command
-        command_match = self._find_command_match(cleaned_input)
-        
-        # Record command attempt
-        command_record = {
-            'timestamp': datetime.now().isoformat(),
-            'input': voice_input,
-            'cleaned_input': cleaned_input,
-            'command_found': command_match is not None,
-            'context': context or {}
-        }
-        
-        if command_match:
-            command_record['command'] = command_match
-            command_record['action'] = self.commands[command_match]['action']
+        with record_store.editing(f'{self.data_file}#user_data', self.user_voice_data, user_id), \
+                record_store.editing(f'{self.data_file}#command_history', self.command_history, user_id):
+            # Clean and normalize input
+            cleaned_input = self._clean_voice_input(voice_input)
             
-            # Update user statistics
-            self.user_voice_data[user_id]['command_count'] += 1
-            self.user_voice_data[user_id]['successful_commands'] += 1
+            # Find matching command
+            command_match = self._find_command_match(cleaned_input)
             
-            # Track preferred commands
-            preferred = self.user_voice_data[user_id]['preferred_commands']
-            preferred[command_match] = preferred.get(command_match, 0) + 1
+            # Record command attempt
+            command_record = {
+                'timestamp': datetime.now().isoformat(),
+                'input': voice_input,
+                'cleaned_input': cleaned_input,
+                'command_found': command_match is not None,
+                'context': context or {}
+            }
+            
+            if command_match:
+                command_record['command'] = command_match
+                command_record['action'] = self.commands[command_match]['action']
+                
+                # Update user statistics
+                self.user_voice_data[user_id]['command_count'] += 1
+                self.user_voice_data[user_id]['successful_commands'] += 1
+                
+                # Track preferred commands
+                preferred = self.user_voice_data[user_id]['preferred_commands']
+                preferred[command_match] = preferred.get(command_match, 0) + 1
+                
+                # Execute command
+                response = self._execute_command(user_id, command_match, context)
+                command_record['response'] = response
+                
+            else:
+                # Handle unrecognized command
+                self.user_voice_data[user_id]['command_count'] += 1
+                response = self._handle_unrecognized_command(cleaned_input)
+                command_record['response'] = response
             
-            # Execute command
-            response = self._execute_command(user_id, command_match, context)
-            command_record['response'] = response
+            # Store command history
+            self.command_history[user_id].append(command_record)
             
-        else:
-            # Handle unrecognized command
-            self.user_voice_data[user_id]['command_count'] += 1
-            response = self._handle_unrecognized_command(cleaned_input)
-            command_record['response'] = response
-        
-        # Store command history
-        self.command_history[user_id].append(command_record)
-        
-        # Keep only recent history (last 100 commands)
-        if len(self.command_history[user_id]) > 100:
-            self.command_history[user_id] = self.command_history[user_id][-100:]
+            # Keep only recent history (last 100 commands)
+            if len(self.command_history[user_id]) > 100:
+                del self.command_history[user_id][:-100]
         
-        self.save_data()
         return command_record['response']
     
     def _clean_voice_input(self, voice_input: str) -> str:
         """Clean and normalize voice input for better matching"""
-        # Convert to lowercase
-        cleaned = voice_input.lower().strip()
-        
-        # Remove common voice recognition artifacts
-        artifacts = ['um', 'uh', 'er', 'ah', 'please', 'can you', 'could you', 'would you']
-        for artifact in artifacts:
-            cleaned = re.sub(rf'\b{artifact}\b', '', cleaned)
+        # Convert to lowercase and remove common voice recognition artifacts
+        cleaned = _ARTIFACTS.sub('', voice_input.lower().strip())
         
         # Remove extra whitespace
-        cleaned = re.sub(r'\s+', ' ', cleaned).strip()
+        cleaned = _WHITESPACE.sub(' ', cleaned).strip()
         
         # Handle common variations
         replacements = {
@@ -261,74 +296,24 @@ class VoiceNavigationEngine:
         if cleaned_input in self.commands:
             return cleaned_input
         
-        # Fuzzy matching for flexibility
-        best_match = None
-        highest_score = 0
-        
-        for command in self.commands.keys():
-            score = self._calculate_similarity(cleaned_input, command)
-            if score > highest_score and score >= 0.7:  # Minimum 70% similarity
-                highest_score = score
-                best_match = command
-        
-        # Pattern matching for flexible commands
-        if not best_match:
-            best_match = self._pattern_match(cleaned_input)
-        
-        return best_match
+        return self.matcher.cached(cleaned_input, self._match_uncached)
     
-    def _calculate_similarity(self, input_text: str, command: str) -> float:
-        """Calculate similarity between input and command"""
-        input_words = set(input_text.split())
-        command_words = set(command.split())
-        
-        if not command_words:
-            return 0
-        
-        # Jaccard similarity
-        intersection = len(input_words.intersection(command_words))
-        union = len(input_words.union(command_words))
-        
-        return intersection / union if union > 0 else 0
+    def _match_uncached(self, cleaned_input: str) -> Optional[str]:
+        # Fuzzy matching for flexibility (minimum 70% similarity), then flexible patterns
+        return self.matcher.best_match(cleaned_input, 0.7) or self._pattern_match(cleaned_input)
     
     def _pattern_match(self, cleaned_input: str) -> Optional[str]:
         """Pattern matching for more flexible command recognition"""
-        
-        patterns = {
-            r'learn\s+(\w+)': 'learn {}',
-            r'start\s+(\w+)': 'learn {}',
-            r'study\s+(\w+)': 'learn {}',
-            r'answer\s+([abcd]|\d)': 'answer {}',
-            r'option\s+([abcd]|\d)': 'answer {}',
-            r'confidence\s+(\d)': 'set_confidence_{}',
-            r'difficulty\s+(\w+)': '{} level',
-            r'(\d+)\s+questions?': '{}_question_session',
-        }
-        
-        for pattern, template in patterns.items():
-            match = re.search(pattern, cleaned_input)
-            if match:
-                param = match.group(1).lower()
-                potential_command = template.format(param)
-                
-                # Check if this creates a valid command
-                if potential_command in self.commands:
-                    return potential_command
-                
-                # Handle subject learning commands
-                if 'learn' in template:
-                    subject_map = {
-                        'python': 'learn python',
-                        'electrical': 'learn electrical',
-                        'finance': 'learn finance',
-                        'data': 'learn data analysis',
-                        'math': 'learn math',
-                        'chemistry': 'learn chemistry',
-                        'physics': 'learn physics',
-                        'botany': 'learn botany'
-                    }
-                    if param in subject_map:
-                        return subject_map[param]
+        for template, param in self.matcher.pattern_matches(cleaned_input):
+            potential_command = template.format(param)
+            
+            # Check if this creates a valid command
+            if potential_command in self.commands:
+                return potential_command
+            
+            # Handle subject learning commands
+            if 'learn' in template and param in SUBJECT_COMMANDS:
+                return SUBJECT_COMMANDS[param]
         
         return None
     
@@ -396,16 +381,8 @@ class VoiceNavigationEngine:
     def _handle_unrecognized_command(self, cleaned_input: str) -> Dict:
         """Handle unrecognized voice commands with helpful suggestions"""
         
-        # Find similar commands for suggestions
-        suggestions = []
-        for command in self.commands.keys():
-            similarity = self._calculate_similarity(cleaned_input, command)
-            if similarity >= 0.3:  # Lower threshold for suggestions
-                suggestions.append((command, similarity))
-        
-        # Sort by similarity and take top 3
-        suggestions.sort(key=lambda x: x[1], reverse=True)
-        top_suggestions = [cmd for cmd, _ in suggestions[:3]]
+        # Top 3 similar commands as suggestions (lower threshold than matching)
+        top_suggestions = self.matcher.suggestions(cleaned_input, 0.3, limit=3)
         
         return {
             'success': False,
@@ -0,0 +1,61 @@
+"""
+Whiteboard Operation Log for NeuroPulse
+Live whiteboard canvases as an element-id index plus a sequence-numbered operation log
+"""
+
+import copy
+from collections import deque
+from itertools import islice
+from typing import Dict, List, Optional
+
+OPERATION_TYPES = ('element_add', 'element_update', 'element_delete')
+
+
+class WhiteboardCanvas:
+    """Current elements of one whiteboard and the operations that produced them.
+
+    Every accepted change is an operation stamped with the next sequence
+    number. Elements are indexed by id, so updates and deletes are O(1).
+    The most recent operations stay in memory so a client that knows
+    sequence N can be sent just the operations after N; a client further
+    behind than that gets the full element list instead.
+    """
+
+    def __init__(self, elements: List[Dict], sequence: int = 0, history_size: int = 500):
+        self.elements = {element['id']: element for element in elements}
+        self.sequence = sequence
+        self.operations = deque(maxlen=history_size)
+
+    def apply(self, operation: Dict) -> bool:
+        """Apply an operation to the elements; False if it targets a missing element"""
+        operation_type = operation['type']
+        element_id = operation['element_id']
+        if operation_type == 'element_add':
+            self.elements[element_id] = copy.deepcopy(operation['element'])
+        elif operation_type == 'element_update':
+            element = self.elements.get(element_id)
+            if element is None:
+                return False
+            element['data'].update(operation['updates'])
+            element['last_modified'] = operation['timestamp']
+        elif operation_type == 'element_delete':
+            if self.elements.pop(element_id, None) is None:
+                return False
+        return True
+
+    def record(self, operation: Dict):
+        """Remember an applied operation for delta sync"""
+        self.sequence = operation['sequence']
+        self.operations.append(operation)
+
+    def changes_since(self, sequence: int) -> Optional[List[Dict]]:
+        """Operations after `sequence`, or None if they are no longer all in memory"""
+        if sequence >= self.sequence:
+            return []
+        oldest = self.operations[0]['sequence'] if self.operations else self.sequence + 1
+        if sequence + 1 < oldest:
+            return None
+        return list(islice(self.operations, sequence + 1 - oldest, None))
+
+    def snapshot(self) -> List[Dict]:
+        return list(self.elements.values())